@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Append-only archive of Bluesky posts with an offset index.
+
+Records are appended to gzip-compressed JSONL segments. Every record is written
+as its own gzip member, so the side index can point straight at it with a
+(segment, offset, length) triple and a lookup reads and inflates only that
+record. Edits append a new version and move the index entry; deletes append a
+tombstone and drop the entry. Compaction rewrites only the live records.
+"""
+
+import argparse
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import sys
+from pathlib import Path
+
+import yaml
+
+import listing_indexes
+import local_store
+import search_index
+from change_feed import FEED as changes
+
+ARCHIVE_DIR = '.cache/bluesky/archive'
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+INDEX_VERSION = 1
+
+
+def record_digest(post):
+    """Short content hash used to skip appending unchanged posts."""
+    canonical = json.dumps(post, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+class BlueskyArchive:
+    def __init__(self, path=ARCHIVE_DIR, segment_max_bytes=SEGMENT_MAX_BYTES):
+        """
+        Open (or create) an archive directory.
+
+        Args:
+            path: Directory holding the segments and index.json
+            segment_max_bytes: Size after which appends roll over to a new segment
+        """
+        self.path = Path(path)
+        self.segment_max_bytes = segment_max_bytes
+        self.index_file = self.path / 'index.json'
+        # uri -> [segment number, byte offset, byte length, created_at, digest]
+        self.index = {}
+        self.segment = 1
+        self.load_index()
+
+    def load_index(self):
+        """Load the side index. A missing index means an empty archive."""
+        try:
+            with open(self.index_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != INDEX_VERSION:
+            print(f"Warning: Ignoring archive index with unknown version {data.get('version')}")
+            return
+        self.index = data.get('entries', {})
+        self.segment = data.get('segment', 1)
+
+    def save_index(self):
+        """Write the side index atomically."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.index_file.with_name('index.json.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'segment': self.segment, 'entries': self.index},
+                      f, separators=(',', ':'))
+        os.replace(tmp_file, self.index_file)
+
+    def segment_path(self, segment):
+        return self.path / f'segment-{segment:06d}.jsonl.gz'
+
+    def segments(self):
+        """Segment numbers currently on disk, oldest first."""
+        return sorted(int(p.name[8:14]) for p in self.path.glob('segment-*.jsonl.gz'))
+
+    def write_record(self, record):
+        """Append one record as a standalone gzip member and return its location."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        segment_file = self.segment_path(self.segment)
+        try:
+            if segment_file.stat().st_size >= self.segment_max_bytes:
+                self.segment += 1
+                segment_file = self.segment_path(self.segment)
+        except FileNotFoundError:
+            pass
+
+        line = json.dumps(record, separators=(',', ':'), default=str) + '\n'
+        member = gzip.compress(line.encode('utf-8'), mtime=0)
+        with open(segment_file, 'ab') as f:
+            offset = f.tell()
+            f.write(member)
+        return self.segment, offset, len(member)
+
+    def read_record(self, segment, offset, length):
+        """Read and decode the record stored at a location."""
+        with open(self.segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            return json.loads(gzip.decompress(f.read(length)))
+
+    def append(self, posts):
+        """
+        Append new or changed posts and update the index.
+
+        Posts identical to their archived version are skipped.
+
+        Returns:
+            Number of records appended
+        """
+        appended = 0
+        for post in posts:
+            digest = record_digest(post)
+            entry = self.index.get(post['uri'])
+            if entry and entry[4] == digest:
+                continue
+            segment, offset, length = self.write_record({'op': 'put', 'post': post})
+            self.index[post['uri']] = [segment, offset, length, post.get('created_at'), digest]
+            appended += 1
+        if appended:
+            self.save_index()
+        return appended
+
+    def delete(self, uris):
+        """
+        Record deletions as tombstones and drop them from the index.
+
+        Returns:
+            Number of posts removed
+        """
+        removed = 0
+        for uri in uris:
+            if uri not in self.index:
+                continue
+            self.write_record({'op': 'delete', 'uri': uri})
+            del self.index[uri]
+            removed += 1
+        if removed:
+            self.save_index()
+        return removed
+
+    def get(self, uri):
+        """Return the current version of a post, or None."""
+        entry = self.index.get(uri)
+        if not entry:
+            return None
+        return self.read_record(*entry[:3])['post']
+
+    def __contains__(self, uri):
+        return uri in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def latest(self, limit=10):
+        """Return the newest posts, reading only their records."""
+        newest = heapq.nlargest(limit, self.index.values(), key=lambda entry: entry[3] or '')
+        return [self.read_record(*entry[:3])['post'] for entry in newest]
+
+    def compact(self):
+        """
+        Rewrite live records into fresh segments, folding edits and deletes.
+
+        Returns:
+            Dict with bytes before/after and the number of live records
+        """
+        old_segments = self.segments()
+        bytes_before = sum(self.segment_path(s).stat().st_size for s in old_segments)
+
+        # Oldest first so segments stay roughly time ordered
+        live = sorted(self.index.items(), key=lambda item: item[1][3] or '')
+        records = [(uri, entry, self.read_record(*entry[:3])) for uri, entry in live]
+
+        self.segment = (old_segments[-1] if old_segments else 0) + 1
+        new_index = {}
+        for uri, entry, record in records:
+            segment, offset, length = self.write_record(record)
+            new_index[uri] = [segment, offset, length, entry[3], entry[4]]
+
+        self.index = new_index
+        self.save_index()
+        for segment in old_segments:
+            self.segment_path(segment).unlink()
+
+        bytes_after = sum(self.segment_path(s).stat().st_size for s in self.segments())
+        return {'records': len(new_index), 'bytes_before': bytes_before, 'bytes_after': bytes_after}
+
+    def export(self, fetcher, output_file='data/bluesky.json', limit=10):
+        """
+        Write the newest posts as the Hugo data file. Returns the number exported.
+
+        The file is written by fetcher.save_data, so an export goes through the
+        change feed, last known good copy, store and authors table like a fetch.
+        """
+        posts = self.latest(limit)
+        if not posts:
+            print("No archived posts to export")
+            return 0
+
+        fetcher.save_data(posts, output_file)
+        print(f"Exported {len(posts)} archived posts to {output_file}")
+        return len(posts)
+
+
+def export_fetcher():
+    """A fetcher that saves data files as bluesky-config.yaml sets them up, without logging in."""
+    from fetch_bluesky_data import BlueskyFetcher  # Imports this module
+
+    config = {}
+    if Path(BlueskyFetcher.config_file).exists():
+        with open(BlueskyFetcher.config_file) as f:
+            config = yaml.safe_load(f) or {}
+    fetcher = BlueskyFetcher(None, None)
+    fetcher.author_table = bool(config.get('author_table'))
+    fetcher.store = local_store.open_store(config)
+    return fetcher
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the Bluesky post archive.")
+    parser.add_argument('--path', default=ARCHIVE_DIR, help="Archive directory")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('compact', help="Rewrite segments keeping only live records")
+    export_parser = subparsers.add_parser('export', help="Write the newest posts to the Hugo data file")
+    export_parser.add_argument('--limit', type=int, default=10, help="Number of posts to export")
+    export_parser.add_argument('--output', default='data/bluesky.json', help="Data file to write")
+    args = parser.parse_args(argv)
+
+    archive = BlueskyArchive(args.path)
+    if args.command == 'compact':
+        stats = archive.compact()
+        print(f"Compacted archive: {stats['records']} posts, "
+              f"{stats['bytes_before']} -> {stats['bytes_after']} bytes")
+    else:
+        changes.start()
+        if archive.export(export_fetcher(), args.output, limit=args.limit):
+            changes.write()
+            listing_indexes.write_indexes()
+            search_index.update_index(changes.changes)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
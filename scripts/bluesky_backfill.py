@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Backfill the full Bluesky post history from a CAR export of the repository.
+
+The repository is downloaded once with com.atproto.sync.getRepo and read as a
+stream of blocks, so memory use is bounded by the post index rather than the
+size of the export. Engagement counts are then filled in from the AppView in
+batches of getPosts calls.
+"""
+
+import os
+import tempfile
+
+import libipld
+import requests
+from atproto import models
+
+import bluesky_identity
+from metrics import REGISTRY as metrics
+
+POST_COLLECTION = 'app.bsky.feed.post'
+GET_POSTS_BATCH_SIZE = 25  # app.bsky.feed.getPosts accepts at most 25 URIs
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 60
+
+
+def read_varint(stream):
+    """Read an unsigned LEB128 varint. Returns None at end of stream."""
+    result = 0
+    shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            if shift:
+                raise ValueError("Truncated varint in CAR file")
+            return None
+        result |= (byte[0] & 0x7F) << shift
+        if not byte[0] & 0x80:
+            return result
+        shift += 7
+
+
+def split_cid(section):
+    """Split a CAR section into (cid bytes, block data)."""
+    # CIDv0 is a bare sha2-256 multihash
+    if section[:2] == b'\x12\x20':
+        return section[:34], section[34:]
+
+    position = 0
+    for _ in range(3):  # version, codec, multihash code
+        while section[position] & 0x80:
+            position += 1
+        position += 1
+    digest_length = 0
+    shift = 0
+    while True:
+        byte = section[position]
+        position += 1
+        digest_length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    end = position + digest_length
+    return section[:end], section[end:]
+
+
+def iter_car_blocks(stream):
+    """
+    Yield (cid bytes, block bytes) pairs from a CAR v1 stream.
+
+    Only one block is held in memory at a time.
+    """
+    header_length = read_varint(stream)
+    if header_length is None:
+        raise ValueError("Empty CAR file")
+    header = libipld.decode_dag_cbor(stream.read(header_length))
+    if header.get('version') != 1:
+        raise ValueError(f"Unsupported CAR version: {header.get('version')}")
+
+    while True:
+        section_length = read_varint(stream)
+        if section_length is None:
+            return
+        section = stream.read(section_length)
+        if len(section) != section_length:
+            raise ValueError("Truncated block in CAR file")
+        yield split_cid(section)
+
+
+def index_post_keys(car_path, collection=POST_COLLECTION):
+    """
+    First pass: walk the MST nodes and map record CID bytes to record keys.
+
+    Returns:
+        Dict of record CID bytes -> rkey for records in the collection
+    """
+    prefix = f"{collection}/".encode('utf-8')
+    rkeys = {}
+    with open(car_path, 'rb') as stream:
+        for _, block in iter_car_blocks(stream):
+            try:
+                node = libipld.decode_dag_cbor(block)
+            except Exception:
+                continue
+            if not isinstance(node, dict) or 'e' not in node or 'l' not in node:
+                continue
+
+            # MST entry keys are prefix-compressed against the previous entry
+            key = b''
+            for entry in node['e']:
+                key = key[:entry['p']] + entry['k']
+                if key.startswith(prefix):
+                    rkeys[entry['v']] = key[len(prefix):].decode('utf-8')
+    return rkeys
+
+
+def iter_post_records(car_path, did, collection=POST_COLLECTION):
+    """
+    Yield (uri, cid, record dict) for every post record in a CAR file.
+
+    Uses two streaming passes: one to index the MST, one to decode the records.
+    """
+    rkeys = index_post_keys(car_path, collection)
+    with open(car_path, 'rb') as stream:
+        for cid, block in iter_car_blocks(stream):
+            rkey = rkeys.get(cid)
+            if rkey is None:
+                continue
+            record = libipld.decode_dag_cbor(block)
+            if record.get('$type') != collection:
+                continue
+            yield f"at://{did}/{collection}/{rkey}", libipld.encode_cid(cid), record
+
+
+def download_repo(pds_url, did, destination):
+    """Stream com.atproto.sync.getRepo for a DID into a file."""
+    with metrics.api_call('bluesky', 'com.atproto.sync.getRepo'):
+        response = requests.get(
+            f"{pds_url}/xrpc/com.atproto.sync.getRepo",
+            params={'did': did},
+            stream=True,
+            timeout=DOWNLOAD_TIMEOUT
+        )
+        response.raise_for_status()
+    size = 0
+    with open(destination, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            f.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def fill_engagement_counts(client, posts, batch_size=GET_POSTS_BATCH_SIZE):
+    """Fill like/repost/reply counts from the AppView, batch_size posts per request."""
+    by_uri = {post['uri']: post for post in posts}
+    uris = list(by_uri)
+    for start in range(0, len(uris), batch_size):
+        batch = uris[start:start + batch_size]
+        try:
+            with metrics.api_call('bluesky', 'app.bsky.feed.getPosts'):
+                response = client.get_posts(uris=batch)
+        except Exception as e:
+            print(f"Warning: Could not fetch engagement counts for {len(batch)} posts: {e}")
+            continue
+        for view in response.posts:
+            post = by_uri.get(view.uri)
+            if post is None:
+                continue
+            post['like_count'] = view.like_count or 0
+            post['repost_count'] = view.repost_count or 0
+            post['reply_count'] = view.reply_count or 0
+
+
+def backfill_posts(fetcher, did, author, car_path, include_replies=False,
+                   batch_size=GET_POSTS_BATCH_SIZE, on_batch=None):
+    """
+    Convert the posts in a CAR file into post data, filling counts batch by batch.
+
+    Args:
+        fetcher: BlueskyFetcher used to shape records and to query the AppView
+        did: DID the repository belongs to
+        author: Author dict stored on each post
+        car_path: Path of the downloaded CAR file
+        include_replies: If True, replies are kept as well as top-level posts
+        batch_size: Posts per getPosts request
+        on_batch: Optional callable receiving each completed batch of posts
+
+    Returns:
+        Number of posts processed
+    """
+    batch = []
+    total = 0
+
+    def flush():
+        if fetcher.client:
+            fill_engagement_counts(fetcher.client, batch, batch_size)
+        if on_batch:
+            on_batch(list(batch))
+        batch.clear()
+
+    for uri, cid, raw_record in iter_post_records(car_path, did):
+        record = models.get_or_create(raw_record, strict=False)
+        if getattr(record, 'reply', None) and not include_replies:
+            continue
+        batch.append(fetcher.build_post_data(uri, cid, record, dict(author)))
+        total += 1
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return total
+
+
+def backfill_from_repo(fetcher, handle, on_batch, include_replies=False, work_dir=None):
+    """
+    Download a handle's repository and feed its posts to on_batch.
+
+    Returns:
+        Number of posts processed
+    """
+    profile = fetcher.get_author_profile(handle)
+    if not profile:
+        raise ValueError(f"Could not resolve @{handle}")
+    did = profile.pop('did')
+    pds_url = bluesky_identity.resolve_pds(did, cache=fetcher.identity_cache)
+
+    fd, car_path = tempfile.mkstemp(suffix='.car', dir=work_dir)
+    os.close(fd)
+    try:
+        size = download_repo(pds_url, did, car_path)
+        print(f"Downloaded repository for @{handle} ({size} bytes) from {pds_url}")
+        return backfill_posts(fetcher, did, profile, car_path,
+                              include_replies=include_replies, on_batch=on_batch)
+    finally:
+        os.unlink(car_path)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Resolve Bluesky handles to DIDs and DIDs to their PDS endpoint.
+
+Every resolver accepts an optional cache (see PersistentTTLCache) so handle and
+DID document lookups are shared between code paths and reused across runs
+until they expire.
+"""
+
+import requests
+
+from metrics import REGISTRY as metrics
+
+PUBLIC_API_URL = 'https://public.api.bsky.app/xrpc'
+PLC_DIRECTORY_URL = 'https://plc.directory'
+REQUEST_TIMEOUT = 10
+
+
+def handle_key(handle):
+    return f"handle:{handle.lower()}"
+
+
+def did_document_key(did):
+    return f"did:{did}"
+
+
+def resolve_handle(handle, api_url=PUBLIC_API_URL, cache=None):
+    """Resolve a handle (e.g. user.bsky.social) to its DID."""
+    if cache is not None:
+        did = cache.get(handle_key(handle))
+        if did:
+            return did
+
+    with metrics.api_call('bluesky', 'com.atproto.identity.resolveHandle', source=handle):
+        response = requests.get(
+            f"{api_url}/com.atproto.identity.resolveHandle",
+            params={'handle': handle},
+            timeout=REQUEST_TIMEOUT
+        )
+        response.raise_for_status()
+    did = response.json()['did']
+    if cache is not None:
+        cache.set(handle_key(handle), did)
+    return did
+
+
+def resolve_did_document(did, plc_url=PLC_DIRECTORY_URL, cache=None):
+    """Fetch the DID document for a did:plc or did:web identifier."""
+    if cache is not None:
+        document = cache.get(did_document_key(did))
+        if document:
+            return document
+
+    if did.startswith('did:plc:'):
+        url = f"{plc_url}/{did}"
+    elif did.startswith('did:web:'):
+        url = f"https://{did[len('did:web:'):]}/.well-known/did.json"
+    else:
+        raise ValueError(f"Unsupported DID method: {did}")
+
+    with metrics.api_call('bluesky', 'did.document'):
+        response = requests.get(url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+    document = response.json()
+    if cache is not None:
+        cache.set(did_document_key(did), document)
+    return document
+
+
+def pds_endpoint(did_document):
+    """Return the PDS service endpoint listed in a DID document."""
+    for service in did_document.get('service', []):
+        if service.get('id', '').endswith('#atproto_pds') or service.get('type') == 'AtprotoPersonalDataServer':
+            return service['serviceEndpoint'].rstrip('/')
+    raise ValueError(f"No PDS endpoint in DID document for {did_document.get('id')}")
+
+
+def resolve_pds(did, cache=None):
+    """Resolve a DID to the base URL of the PDS hosting its repository."""
+    return pds_endpoint(resolve_did_document(did, cache=cache))
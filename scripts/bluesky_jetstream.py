@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Keep data/bluesky.json up to date from the Bluesky Jetstream firehose.
+"""
+
+import json
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from atproto import models
+from websockets.exceptions import WebSocketException
+from websockets.sync.client import connect
+
+from metrics import REGISTRY as metrics
+
+DEFAULT_ENDPOINT = 'wss://jetstream2.us-east.bsky.network/subscribe'
+POST_COLLECTION = 'app.bsky.feed.post'
+
+
+class JetstreamSubscriber:
+    def __init__(self, fetcher, did, author, endpoint=DEFAULT_ENDPOINT,
+                 data_file='data/bluesky.json', state_file='.cache/bluesky/jetstream-cursor.json',
+                 max_posts=10, include_replies=False, on_rebuild=None, debounce_seconds=30,
+                 idle_timeout=1.0, archive=None):
+        """
+        Initialize the Jetstream subscriber.
+
+        Args:
+            fetcher: BlueskyFetcher used to shape records into post data
+            did: DID of the account whose posts are tracked
+            author: Author dict stored on each post ('handle', 'display_name', 'avatar')
+            endpoint: Jetstream websocket subscribe URL
+            data_file: Hugo data file updated in place
+            state_file: File the last processed cursor is persisted to
+            max_posts: Number of newest posts kept in the data file
+            include_replies: If True, replies are kept as well as top-level posts
+            on_rebuild: Callable invoked once a burst of changes has settled
+            debounce_seconds: Quiet period required before on_rebuild is called
+            idle_timeout: Seconds to wait for a message before checking timers
+            archive: Optional BlueskyArchive that every create/update/delete is recorded in
+        """
+        self.fetcher = fetcher
+        self.did = did
+        self.author = author
+        self.endpoint = endpoint
+        self.data_file = Path(data_file)
+        self.state_file = Path(state_file)
+        self.max_posts = max_posts
+        self.include_replies = include_replies
+        self.on_rebuild = on_rebuild
+        self.debounce_seconds = debounce_seconds
+        self.idle_timeout = idle_timeout
+        self.archive = archive
+
+        self.cursor = self.load_cursor()
+        self.posts = self.load_posts()
+        self.rebuild_due_at = None
+        self.stopped = False
+
+    def load_cursor(self):
+        """Load the persisted cursor (Jetstream time_us), if any."""
+        try:
+            with open(self.state_file) as f:
+                return json.load(f).get('cursor')
+        except (OSError, ValueError):
+            return None
+
+    def save_cursor(self):
+        """Persist the current cursor so a restart resumes from it."""
+        if self.cursor is None:
+            return
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.state_file, 'w') as f:
+            json.dump({'cursor': self.cursor}, f)
+
+    def load_posts(self):
+        """Load the posts currently in the data file, expanding authors stored by DID."""
+        try:
+            with open(self.data_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        authors = data.get('authors') or {}
+        posts = data.get('posts', [])
+        for post in posts:
+            if isinstance(post.get('author'), str):
+                post['author'] = authors.get(post['author'], self.author)
+        return posts
+
+    def subscription_url(self):
+        """Build the subscribe URL filtered to our DID and the post collection."""
+        params = {'wantedCollections': POST_COLLECTION, 'wantedDids': self.did}
+        if self.cursor is not None:
+            params['cursor'] = self.cursor
+        return f"{self.endpoint}?{urlencode(params)}"
+
+    def apply_event(self, event):
+        """
+        Apply one Jetstream event to the in-memory posts.
+
+        Returns:
+            True if the posts changed, False otherwise
+        """
+        if event.get('time_us') is not None:
+            self.cursor = event['time_us']
+
+        commit = event.get('commit')
+        if event.get('kind') != 'commit' or not commit:
+            return False
+        if event.get('did') != self.did or commit.get('collection') != POST_COLLECTION:
+            return False
+
+        uri = f"at://{self.did}/{POST_COLLECTION}/{commit['rkey']}"
+        operation = commit.get('operation')
+
+        if operation == 'delete':
+            if self.archive is not None:
+                self.archive.delete([uri])
+            remaining = [post for post in self.posts if post['uri'] != uri]
+            changed = len(remaining) != len(self.posts)
+            self.posts = remaining
+            return changed
+
+        if operation not in ('create', 'update') or not commit.get('record'):
+            return False
+
+        record = models.get_or_create(commit['record'], strict=False)
+        if getattr(record, 'reply', None) and not self.include_replies:
+            return False
+
+        post_data = self.fetcher.build_post_data(uri, commit.get('cid'), record, dict(self.author))
+        if self.archive is not None:
+            self.archive.append([post_data])
+
+        # Keep engagement counts from the last full fetch when a post is edited
+        for existing in self.posts:
+            if existing['uri'] == uri:
+                for key in ('like_count', 'repost_count', 'reply_count'):
+                    post_data[key] = existing.get(key, 0)
+
+        self.posts = [post for post in self.posts if post['uri'] != uri]
+        self.posts.append(post_data)
+        self.posts.sort(key=lambda x: x['created_at'], reverse=True)
+        del self.posts[self.max_posts:]
+        return any(post['uri'] == uri for post in self.posts)
+
+    def handle_message(self, message):
+        """Decode and apply a websocket message, writing the data file on change."""
+        try:
+            event = json.loads(message)
+        except ValueError:
+            print("Warning: Ignoring malformed Jetstream message")
+            return False
+
+        if not self.apply_event(event):
+            return False
+
+        self.fetcher.save_data(self.posts, output_file=str(self.data_file))
+        self.fetcher.save_caches()
+        self.save_cursor()
+        self.rebuild_due_at = time.monotonic() + self.debounce_seconds
+        return True
+
+    def flush(self, force=False):
+        """Persist the cursor and run a pending rebuild once the debounce window passes."""
+        self.save_cursor()
+        if self.rebuild_due_at is None:
+            return
+        if force or time.monotonic() >= self.rebuild_due_at:
+            self.rebuild_due_at = None
+            if self.on_rebuild:
+                self.on_rebuild()
+
+    def stop(self):
+        """Ask the run loop to exit after the current message."""
+        self.stopped = True
+
+    def run(self, max_events=None, reconnect_delay=1, max_reconnect_delay=60):
+        """
+        Consume events until stopped, reconnecting from the saved cursor on errors.
+
+        Args:
+            max_events: Optional number of messages to process before stopping
+            reconnect_delay: Initial backoff in seconds after a dropped connection
+            max_reconnect_delay: Upper bound for the reconnect backoff
+        """
+        processed = 0
+        delay = reconnect_delay
+
+        while not self.stopped:
+            try:
+                with connect(self.subscription_url(), open_timeout=10) as websocket:
+                    print(f"Subscribed to Jetstream for {self.did} (cursor: {self.cursor})")
+                    delay = reconnect_delay
+                    while not self.stopped:
+                        try:
+                            message = websocket.recv(timeout=self.idle_timeout)
+                        except TimeoutError:
+                            self.flush()
+                            continue
+
+                        self.handle_message(message)
+                        processed += 1
+                        if max_events and processed >= max_events:
+                            self.stop()
+                        else:
+                            self.flush()
+            except (WebSocketException, OSError) as e:  # Closed connections and rejected handshakes
+                if self.stopped:
+                    break
+                print(f"Jetstream connection lost ({e}), reconnecting in {delay}s")
+                metrics.increment('fetch_retries_total', provider='bluesky', endpoint='jetstream')
+                self.flush()
+                time.sleep(delay)
+                delay = min(delay * 2, max_reconnect_delay)
+
+        self.flush(force=True)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Render Bluesky post text and facets to a sanitized HTML fragment.
+
+Bluesky text is plain text; links, mentions and hashtags are described by
+facets that point at UTF-8 byte ranges of the text. Everything outside a facet
+is escaped, and only http(s) links, DID mentions and hashtags become anchors.
+"""
+
+import html
+import re
+from urllib.parse import quote
+
+PROFILE_URL = 'https://bsky.app/profile'
+HASHTAG_URL = 'https://bsky.app/hashtag'
+LINK_FEATURE = 'app.bsky.richtext.facet#link'
+MENTION_FEATURE = 'app.bsky.richtext.facet#mention'
+TAG_FEATURE = 'app.bsky.richtext.facet#tag'
+
+# Bare URLs in text without link facets, minus trailing punctuation
+BARE_URL_PATTERN = re.compile(r'https?://[^\s<>"]*[^\s<>".,;:!?)\]\']')
+
+
+def anchor(href, label):
+    """Build an escaped external anchor."""
+    return f'<a href="{html.escape(href, quote=True)}" target="_blank" rel="noopener">{label}</a>'
+
+
+def render_plain(text):
+    """Escape a run of text, linkifying bare URLs and keeping line breaks."""
+    parts = []
+    position = 0
+    for match in BARE_URL_PATTERN.finditer(text):
+        parts.append(html.escape(text[position:match.start()]))
+        parts.append(anchor(match.group(0), html.escape(match.group(0))))
+        position = match.end()
+    parts.append(html.escape(text[position:]))
+    return ''.join(parts).replace('\n', '<br>\n')
+
+
+def feature_href(feature):
+    """Return the URL a facet feature links to, or None if it is unsupported or unsafe."""
+    py_type = getattr(feature, 'py_type', None)
+    if py_type == LINK_FEATURE:
+        uri = getattr(feature, 'uri', '') or ''
+        return uri if uri.startswith(('https://', 'http://')) else None
+    if py_type == MENTION_FEATURE:
+        did = getattr(feature, 'did', '') or ''
+        return f"{PROFILE_URL}/{did}" if did.startswith('did:') else None
+    if py_type == TAG_FEATURE:
+        tag = getattr(feature, 'tag', '') or ''
+        return f"{HASHTAG_URL}/{quote(tag, safe='')}" if tag else None
+    return None
+
+
+def render_html(text, facets=None):
+    """
+    Render post text to HTML using its facets.
+
+    Args:
+        text: The post text
+        facets: List of app.bsky.richtext.facet models (byte-indexed), or None
+
+    Returns:
+        HTML fragment safe to emit without further escaping
+    """
+    text = text or ''
+    data = text.encode('utf-8')
+    spans = []
+    for facet in facets if isinstance(facets, list) else []:
+        index = getattr(facet, 'index', None)
+        start = getattr(index, 'byte_start', None)
+        end = getattr(index, 'byte_end', None)
+        if not isinstance(start, int) or not isinstance(end, int) or not 0 <= start < end <= len(data):
+            continue
+        href = next(filter(None, (feature_href(f) for f in getattr(facet, 'features', None) or [])), None)
+        if href:
+            spans.append((start, end, href))
+
+    parts = []
+    position = 0
+    for start, end, href in sorted(spans):
+        if start < position:
+            continue  # Overlapping facet
+        parts.append(render_plain(data[position:start].decode('utf-8', errors='replace')))
+        label = html.escape(data[start:end].decode('utf-8', errors='replace'))
+        parts.append(anchor(href, label))
+        position = end
+    parts.append(render_plain(data[position:].decode('utf-8', errors='replace')))
+    return ''.join(parts)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Per-run feed of the videos and posts that were added, updated or removed.
+
+Just before a fetcher rewrites a data file it compares the new items with the
+ones already in the file. The run's changes are written to changes.json next
+to the run report, so later steps can rebuild, purge or notify only what
+changed:
+
+    {
+      "generated_at": "...",
+      "videos": {"added": [...], "updated": [...], "removed": [...]},
+      "posts": {"added": [...], "updated": [...], "removed": [...]}
+    }
+
+Each entry has the item's 'id', 'url', 'provider' and 'data_file'; updated
+entries also list the 'fields' that changed. Bookkeeping timestamps a fetch
+sets on every item (IGNORED_FIELDS) do not count as changes, so an unchanged
+refetch reports nothing.
+"""
+
+import json
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+CHANGES_FILE = '.cache/changes.json'
+KINDS = ('videos', 'posts')
+CHANGE_TYPES = ('added', 'updated', 'removed')
+IGNORED_FIELDS = frozenset({'fetched_at', 'statistics_updated_at'})
+
+
+def load_items(data_file, kind):
+    """Items of a kind in an existing data file, or an empty list if it cannot be read."""
+    try:
+        with open(data_file) as f:
+            items = json.load(f).get(kind)
+    except (OSError, ValueError, AttributeError):
+        return []
+    return items if isinstance(items, list) else []
+
+
+def diff_items(previous, current, key):
+    """
+    Compare two lists of item dicts by a key field.
+
+    Returns:
+        Tuple of (added items, (item, changed field names) pairs, removed items)
+    """
+    before = {item[key]: item for item in previous if isinstance(item, dict) and key in item}
+    after = {item[key]: item for item in current if key in item}
+    added = [item for item_id, item in after.items() if item_id not in before]
+    removed = [item for item_id, item in before.items() if item_id not in after]
+    updated = []
+    for item_id, item in after.items():
+        old = before.get(item_id)
+        if old is None:
+            continue
+        fields = sorted(field for field in set(old) | set(item)
+                        if field not in IGNORED_FIELDS and old.get(field) != item.get(field))
+        if fields:
+            updated.append((item, fields))
+    return added, updated, removed
+
+
+class ChangeFeed:
+    """Thread-safe collection of one run's changes. Comparisons are skipped until start()."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = False
+        self.changes = {}
+
+    def start(self):
+        """Begin collecting changes for a new run."""
+        with self.lock:
+            self.changes = {kind: {change: [] for change in CHANGE_TYPES} for kind in KINDS}
+            self.active = True
+
+    def compare(self, kind, data_file, items, key, provider):
+        """
+        Record how items differ from those currently in data_file.
+
+        Must be called before data_file is rewritten.
+
+        Args:
+            kind: 'videos' or 'posts', the list key in the data file
+            data_file: Data file about to be written
+            items: The items about to be written
+            key: Field identifying an item ('id' or 'uri')
+            provider: Name of the provider writing the file
+        """
+        if not self.active:
+            return
+        added, updated, removed = diff_items(load_items(data_file, kind), items, key)
+
+        def entry(item, **extra):
+            return dict({'id': item[key], 'url': item.get('url'), 'provider': provider,
+                         'data_file': str(data_file)}, **extra)
+
+        with self.lock:
+            changes = self.changes.setdefault(kind, {change: [] for change in CHANGE_TYPES})
+            changes['added'].extend(entry(item) for item in added)
+            changes['updated'].extend(entry(item, fields=fields) for item, fields in updated)
+            changes['removed'].extend(entry(item) for item in removed)
+
+    def summary(self):
+        """Counts of each change type per kind."""
+        with self.lock:
+            return {kind: {change: len(items) for change, items in changes.items()}
+                    for kind, changes in self.changes.items()}
+
+    def write(self, path=CHANGES_FILE, stop=True):
+        """Write the collected changes as JSON and, unless stop is False, stop collecting."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            if stop:
+                self.active = False
+            feed = dict({'generated_at': datetime.now(timezone.utc).isoformat()}, **self.changes)
+            with open(path, 'w') as f:
+                json.dump(feed, f, indent=2)
+
+
+FEED = ChangeFeed()
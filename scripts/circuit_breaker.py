@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Circuit breakers for fetch sources, persisted between runs.
+
+After failure_threshold consecutive failures a source's breaker opens and the
+source is skipped until cooldown seconds have passed. The next run after that
+is a trial: a success closes the breaker, a failure opens it again.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+BREAKER_DIR = '.cache/circuit-breakers'
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 3600
+
+
+class CircuitBreaker:
+    def __init__(self, path, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN_SECONDS):
+        """
+        Load breaker state for a provider.
+
+        Args:
+            path: JSON file holding the state of this provider's sources
+            failure_threshold: Consecutive failures that open a breaker
+            cooldown: Seconds an open breaker skips its source
+        """
+        self.path = Path(path)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        # source -> {'failures': int, 'opened_at': float or None, 'last_error': str}
+        self.state = {}
+        try:
+            with open(self.path) as f:
+                self.state = json.load(f).get('sources', {})
+        except (OSError, ValueError, TypeError, AttributeError):
+            self.state = {}
+
+    @classmethod
+    def for_provider(cls, name, settings=None):
+        """Open the breaker file for a provider, applying an optional 'circuit_breaker' config dict."""
+        settings = settings if isinstance(settings, dict) else {}
+        return cls(
+            Path(BREAKER_DIR) / f'{name}.json',
+            failure_threshold=settings.get('failure_threshold', FAILURE_THRESHOLD),
+            cooldown=settings.get('cooldown_seconds', COOLDOWN_SECONDS)
+        )
+
+    def allow(self, source):
+        """Return False while the source's breaker is open and cooling down."""
+        opened_at = self.state.get(source, {}).get('opened_at')
+        return opened_at is None or time.time() - opened_at >= self.cooldown
+
+    def record_success(self, source):
+        self.state.pop(source, None)
+
+    def record_failure(self, source, error):
+        entry = self.state.setdefault(source, {'failures': 0, 'opened_at': None})
+        entry['failures'] += 1
+        entry['last_error'] = str(error)
+        if entry['failures'] >= self.failure_threshold:
+            entry['opened_at'] = time.time()
+
+    def save(self):
+        """Write the state atomically. Failures to write are reported, not raised."""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump({'sources': self.state}, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not save circuit breaker state: {e}")
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Publish the built site to S3-compatible object storage (Linode Object Storage).
+
+The bucket holds a manifest of the last published build: every key with the
+SHA-256 of its content and the headers it was uploaded with. A deploy hashes
+public/ locally, compares it with that manifest, uploads only new or changed
+objects from a bounded worker pool (large files go up in parts), deletes
+removed keys in batches of up to 1000, and finally replaces the manifest. The
+bucket is only listed when there is no manifest yet, as on the first deploy, or
+with --rebuild-manifest, and never checksummed remotely.
+
+If precompress.py's report lists a gzip variant for page.html, the bytes of
+page.html.gz are uploaded as page.html with Content-Encoding: gzip, since object
+storage cannot negotiate encodings itself. A listed page.html.br is uploaded as
+its own object with Content-Encoding: br for CDNs that can. Any other .gz or .br
+file is an ordinary download and is uploaded as it is.
+"""
+
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+except ImportError:
+    print("Error: boto3 package not installed. Install with: pip install boto3")
+    sys.exit(1)
+
+MANIFEST_KEY = '.deploy-manifest.json'
+MANIFEST_VERSION = 1
+DEFAULT_WORKERS = 16
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+DELETE_BATCH_SIZE = 1000  # DeleteObjects accepts at most 1000 keys
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Pages and feeds must be revalidated; fingerprinted assets never change
+REVALIDATE = 'public, max-age=0, must-revalidate'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+STATIC = 'public, max-age=86400'
+REVALIDATE_TYPES = {'text/html', 'application/xml', 'text/xml', 'application/json',
+                    'application/rss+xml', 'application/atom+xml', 'application/manifest+json'}
+# Hugo's resources.Fingerprint inserts a 64-character hex digest before the extension
+FINGERPRINT_PATTERN = re.compile(r'\.[0-9a-f]{32,64}\.[A-Za-z0-9]+$')
+
+CONTENT_TYPES = {
+    '.webmanifest': 'application/manifest+json',
+    '.xml': 'application/xml',
+    '.json': 'application/json',
+    '.js': 'text/javascript',
+    '.mjs': 'text/javascript',
+    '.woff2': 'font/woff2',
+    '.woff': 'font/woff',
+    '.webp': 'image/webp',
+    '.avif': 'image/avif',
+    '.svg': 'image/svg+xml',
+    '.ico': 'image/x-icon',
+}
+CHARSET_TYPES = {'application/json', 'application/xml', 'application/manifest+json', 'image/svg+xml'}
+PRECOMPRESSED_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+PRECOMPRESS_REPORT = '.cache/precompress-report.json'
+
+
+def content_type(path):
+    """Content-Type for a file, with a UTF-8 charset for text formats."""
+    suffix = Path(path).suffix.lower()
+    mime = CONTENT_TYPES.get(suffix) or mimetypes.guess_type(str(path))[0] or 'application/octet-stream'
+    if mime.startswith('text/') or mime in CHARSET_TYPES:
+        return f"{mime}; charset=utf-8"
+    return mime
+
+
+def cache_control(key, mime):
+    """Cache-Control for an object, by its type and whether its name is fingerprinted."""
+    if mime.split(';')[0] in REVALIDATE_TYPES:
+        return REVALIDATE
+    if FINGERPRINT_PATTERN.search(key):
+        return IMMUTABLE
+    return STATIC
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_file(key, entry):
+    """Local file, relative to public_dir, whose bytes are uploaded for a manifest entry."""
+    return f"{key}.gz" if entry.get('content_encoding') == 'gzip' else key
+
+
+def load_precompressed(report_file=PRECOMPRESS_REPORT):
+    """
+    The variants precompress.py wrote, from its report.
+
+    Returns:
+        Dict of file name relative to public_dir -> encodings it has a variant for,
+        empty if there is no report
+    """
+    try:
+        with open(report_file) as f:
+            files = json.load(f).get('files', {})
+    except (OSError, ValueError):
+        return {}
+    return {name: [encoding for encoding in PRECOMPRESSED_SUFFIXES if record.get(encoding) is not None]
+            for name, record in files.items()}
+
+
+def build_manifest(public_dir, workers=DEFAULT_WORKERS, precompressed=None):
+    """
+    Hash every file under public_dir.
+
+    Args:
+        public_dir: Built site directory
+        workers: Concurrent hashes
+        precompressed: Optional result of load_precompressed(); other .gz and .br
+            files are uploaded as they are
+
+    Returns:
+        Dict of object key -> {'sha256', 'size', 'content_type', 'cache_control'},
+        plus 'content_encoding' for precompressed objects
+    """
+    root = Path(public_dir)
+    names = {p.relative_to(root).as_posix() for p in root.rglob('*') if p.is_file()}
+
+    # key -> (content type source name, content encoding)
+    objects = {}
+    variants = set()
+    for name, encodings in (precompressed or {}).items():
+        if name not in names:
+            continue
+        for encoding in encodings:
+            variant = name + PRECOMPRESSED_SUFFIXES[encoding]
+            if variant not in names:
+                continue
+            variants.add(variant)
+            objects[name if encoding == 'gzip' else variant] = (name, encoding)
+    for name in sorted(names - variants):
+        objects.setdefault(name, (name, None))
+
+    keys = sorted(objects)
+    sources = [source_file(key, {'content_encoding': objects[key][1]}) for key in keys]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        digests = list(executor.map(hash_file, [root / source for source in sources]))
+
+    manifest = {}
+    for key, source, digest in zip(keys, sources, digests):
+        type_source, encoding = objects[key]
+        mime = content_type(type_source)
+        manifest[key] = {
+            'sha256': digest,
+            'size': (root / source).stat().st_size,
+            'content_type': mime,
+            'cache_control': cache_control(type_source, mime)
+        }
+        if encoding:
+            manifest[key]['content_encoding'] = encoding
+    return manifest
+
+
+def diff_manifests(published, current):
+    """
+    Compare the published manifest with the local build.
+
+    An object is uploaded again if its content or its headers changed.
+
+    Returns:
+        Tuple of (keys to upload, keys to delete), both sorted
+    """
+    uploads = sorted(key for key, entry in current.items() if published.get(key) != entry)
+    deletes = sorted(key for key in published if key not in current and key != MANIFEST_KEY)
+    return uploads, deletes
+
+
+def load_published_manifest(client, bucket):
+    """The manifest stored in the bucket, or None if there is no usable one."""
+    try:
+        response = client.get_object(Bucket=bucket, Key=MANIFEST_KEY)
+    except client.exceptions.NoSuchKey:
+        print("No published manifest found; listing the bucket instead")
+        return None
+    data = json.loads(response['Body'].read())
+    if data.get('version') != MANIFEST_VERSION:
+        print(f"Warning: Ignoring published manifest with unknown version {data.get('version')}")
+        return None
+    return data.get('files', {})
+
+
+def list_bucket(client, bucket):
+    """Every key in the bucket, as manifest entries with unknown content."""
+    keys = {}
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket):
+        for item in page.get('Contents', []):
+            keys[item['Key']] = {'sha256': None}
+    return keys
+
+
+def delete_keys(client, bucket, keys):
+    """Delete keys in DeleteObjects batches. Returns the number deleted."""
+    deleted = 0
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[start:start + DELETE_BATCH_SIZE]
+        response = client.delete_objects(
+            Bucket=bucket,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+        )
+        errors = response.get('Errors', [])
+        for error in errors:
+            print(f"Error deleting {error.get('Key')}: {error.get('Message')}")
+        if errors:
+            raise RuntimeError(f"Failed to delete {len(errors)} objects")
+        deleted += len(batch)
+    return deleted
+
+
+def sync(client, bucket, public_dir, workers=DEFAULT_WORKERS, dry_run=False, rebuild_manifest=False,
+         acl='public-read', transfer_config=None, precompressed=None):
+    """
+    Publish public_dir to the bucket, uploading and deleting only what changed.
+
+    Args:
+        client: boto3 S3 client
+        bucket: Bucket name
+        public_dir: Built site directory
+        workers: Concurrent uploads
+        dry_run: If True, only report what would change
+        rebuild_manifest: If True, diff against a listing of the bucket even if there is a manifest
+        acl: Canned ACL for uploaded objects, or None
+        transfer_config: Optional boto3 TransferConfig controlling multipart uploads
+        precompressed: Optional variants written by precompress.py (see load_precompressed)
+
+    Returns:
+        Dict with 'uploaded', 'deleted', 'unchanged' and 'bytes_uploaded'
+    """
+    current = build_manifest(public_dir, workers, precompressed)
+    published = None if rebuild_manifest else load_published_manifest(client, bucket)
+    if published is None:
+        # Without a manifest, e.g. on the first deploy, objects left by an earlier tool are only found by listing
+        published = list_bucket(client, bucket)
+    uploads, deletes = diff_manifests(published, current)
+    summary = {
+        'uploaded': len(uploads),
+        'deleted': len(deletes),
+        'unchanged': len(current) - len(uploads),
+        'bytes_uploaded': sum(current[key]['size'] for key in uploads)
+    }
+    if dry_run:
+        for key in uploads:
+            print(f"upload: {key}")
+        for key in deletes:
+            print(f"delete: {key}")
+        return summary
+
+    transfer_config = transfer_config or TransferConfig(
+        multipart_threshold=MULTIPART_THRESHOLD, multipart_chunksize=MULTIPART_CHUNK_SIZE
+    )
+
+    def upload(key):
+        entry = current[key]
+        extra_args = {'ContentType': entry['content_type'], 'CacheControl': entry['cache_control']}
+        if entry.get('content_encoding'):
+            extra_args['ContentEncoding'] = entry['content_encoding']
+        if acl:
+            extra_args['ACL'] = acl
+        client.upload_file(str(Path(public_dir) / source_file(key, entry)), bucket, key,
+                           ExtraArgs=extra_args, Config=transfer_config)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # list() re-raises the first failed upload
+        list(executor.map(upload, uploads))
+    delete_keys(client, bucket, deletes)
+
+    # Only record the new build once every object is in place
+    client.put_object(
+        Bucket=bucket,
+        Key=MANIFEST_KEY,
+        Body=json.dumps({
+            'version': MANIFEST_VERSION,
+            'published_at': datetime.now(timezone.utc).isoformat(),
+            'files': current
+        }, sort_keys=True).encode('utf-8'),
+        ContentType='application/json',
+        CacheControl='no-store'
+    )
+    return summary
+
+
+def create_client(endpoint_url):
+    """S3 client for the endpoint, using LINODE_ACCESS_KEY/LINODE_SECRET_KEY if set."""
+    return boto3.client(
+        's3',
+        endpoint_url=endpoint_url,
+        aws_access_key_id=os.getenv('LINODE_ACCESS_KEY'),
+        aws_secret_access_key=os.getenv('LINODE_SECRET_KEY')
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync the built site to S3-compatible object storage.")
+    parser.add_argument('public_dir', nargs='?', default='public', help="Built site directory")
+    parser.add_argument('--bucket', default=os.getenv('LINODE_BUCKET'), help="Bucket name (default: $LINODE_BUCKET)")
+    parser.add_argument('--endpoint-url',
+                        help="S3 endpoint (default: https://$LINODE_CLUSTER.linodeobjects.com)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Concurrent uploads")
+    parser.add_argument('--dry-run', action='store_true', help="List changes without uploading or deleting")
+    parser.add_argument('--rebuild-manifest', action='store_true',
+                        help="Diff against a listing of the bucket instead of the published manifest")
+    parser.add_argument('--precompress-report', default=PRECOMPRESS_REPORT,
+                        help=f"precompress.py report listing the gzip/Brotli variants (default: {PRECOMPRESS_REPORT})")
+    args = parser.parse_args(argv)
+
+    endpoint_url = args.endpoint_url
+    if not endpoint_url and os.getenv('LINODE_CLUSTER'):
+        endpoint_url = f"https://{os.getenv('LINODE_CLUSTER')}.linodeobjects.com"
+    if not args.bucket:
+        print("Error: No bucket given. Set LINODE_BUCKET or pass --bucket")
+        sys.exit(1)
+    if not Path(args.public_dir).is_dir():
+        print(f"Error: {args.public_dir} not found. Build the site first")
+        sys.exit(1)
+
+    summary = sync(create_client(endpoint_url), args.bucket, args.public_dir, workers=args.workers,
+                   dry_run=args.dry_run, rebuild_manifest=args.rebuild_manifest,
+                   precompressed=load_precompressed(args.precompress_report))
+    uploaded, deleted = ("Would upload", "would delete") if args.dry_run else ("Uploaded", "deleted")
+    print(f"{uploaded} {summary['uploaded']} objects ({summary['bytes_uploaded']} bytes), "
+          f"{deleted} {summary['deleted']}, {summary['unchanged']} unchanged")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -6,36 +6,136 @@ Fetch Bluesky posts and generate Hugo content files.
 import os
 import sys
 import json
+import shlex
+import signal
+import argparse
+import subprocess
 import yaml
+import requests
 import re
+import heapq
 from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
 
 try:
-    from atproto import Client
+    from atproto import Client, models
 except ImportError:
     print("Error: atproto package not installed. Install with: pip install atproto")
     sys.exit(1)
 
+import bluesky_identity
+import last_known_good
+import listing_indexes
+import local_store
+import profiling
+import search_index
+from bluesky_richtext import render_html
+from bluesky_archive import ARCHIVE_DIR, BlueskyArchive
+from change_feed import FEED as changes
+from circuit_breaker import CircuitBreaker
+from fetch_provider import FetchProvider
+from metrics import REGISTRY as metrics
+from persistent_cache import PersistentLRUCache, PersistentTTLCache
 
-class BlueskyFetcher:
-    def __init__(self, username, app_password):
+EMBED_CACHE_FILE = '.cache/bluesky/embeds.json'
+EMBED_CACHE_SIZE = 2000
+THREAD_CACHE_FILE = '.cache/bluesky/threads.json'
+THREAD_CACHE_SIZE = 500
+HTML_CACHE_FILE = '.cache/bluesky/html.json'
+HTML_CACHE_SIZE = 2000
+IDENTITY_CACHE_FILE = '.cache/bluesky/identity.json'
+IDENTITY_CACHE_SIZE = 1000
+IDENTITY_CACHE_TTL = 24 * 3600  # Handles and DID documents rarely change
+DATA_FILE = 'data/bluesky.json'
+HANDLE_DATA_DIR = 'data/bluesky_accounts'
+POST_COLLECTION = 'app.bsky.feed.post'
+AVATAR_CDN_URL = 'https://cdn.bsky.app/img/avatar/plain'
+REQUEST_TIMEOUT = 10
+
+
+class BlueskyFetcher(FetchProvider):
+    name = 'bluesky'
+    config_file = 'config/bluesky-config.yaml'
+    
+    def __init__(self, username, app_password, embed_cache=None, thread_cache=None, identity_cache=None,
+                 html_cache=None):
         """
         Initialize Bluesky fetcher.
         
         Args:
             username: Your Bluesky handle (e.g., user.bsky.social)
             app_password: Your Bluesky App Password (NOT your main password)
+            embed_cache: Optional PersistentLRUCache for processed embeds, keyed by CID
+            thread_cache: Optional PersistentLRUCache for reply thread snapshots
+            identity_cache: Optional PersistentTTLCache for profiles, handles and DID documents
+            html_cache: Optional PersistentLRUCache for rendered post HTML, keyed by CID
         """
         self.username = username
         self.app_password = app_password
         self.client = None
+        self.embed_cache = embed_cache or PersistentLRUCache(EMBED_CACHE_FILE, max_entries=EMBED_CACHE_SIZE)
+        self.thread_cache = thread_cache or PersistentLRUCache(THREAD_CACHE_FILE, max_entries=THREAD_CACHE_SIZE)
+        self.html_cache = html_cache or PersistentLRUCache(HTML_CACHE_FILE, max_entries=HTML_CACHE_SIZE)
+        self.identity_cache = identity_cache or PersistentTTLCache(
+            IDENTITY_CACHE_FILE, max_entries=IDENTITY_CACHE_SIZE, ttl=IDENTITY_CACHE_TTL
+        )
+        self.authors = {}  # Authors referenced by DID from hydrated content
+        self.author_table = False  # Store post authors once in 'authors', referenced by DID
+        self.store = None  # Optional LocalStore the data files are projected from
         
+    @classmethod
+    def from_environment(cls):
+        """
+        Create a fetcher from BLUESKY_USERNAME and BLUESKY_APP_PASSWORD.
+        
+        Returns None if they are not set, unless the configuration reads from the
+        PDS without threads, which needs no login.
+        """
+        username = os.getenv('BLUESKY_USERNAME')
+        app_password = os.getenv('BLUESKY_APP_PASSWORD')
+        if username and app_password:
+            return cls(username, app_password)
+        fetcher = cls(None, None)
+        try:
+            config = fetcher.load_config()
+        except OSError:
+            return None
+        if config.get('engine') == 'pds' and not config.get('threads'):
+            return fetcher
+        return None
+    
+    def fetch(self, config):
+        """Fetch the configured handles (provider interface used by fetch_all.py)."""
+        self.author_table = bool(config.get('author_table'))
+        return {'items': fetch_posts(self, config, engine=config.get('engine', 'feed'))}
+    
+    def fall_back(self, config, reason, since):
+        """Restore the data files not written since a run started (see FetchProvider.fall_back)."""
+        handles = [h['handle'] for h in load_handle_configs(config)] if config.get('handles') else [config.get('handle')]
+        if config.get('handles') and config.get('output', 'merged') == 'per_handle':
+            sources = [(handle_data_file(handle), [handle]) for handle in handles]
+        else:
+            sources = [(DATA_FILE, handles)]
+        breaker = open_breaker(config)
+        restored = []
+        for data_file, source_handles in sources:
+            if last_known_good.written_since(data_file, since, 'last_updated'):
+                continue
+            for handle in source_handles:
+                if handle:
+                    breaker.record_failure(handle, reason)
+            if last_known_good.fall_back(data_file, reason):
+                restored.append(str(data_file))
+        breaker.save()
+        return restored
+    
     def connect(self):
         """Connect to Bluesky API."""
         try:
             self.client = Client()
-            self.client.login(self.username, self.app_password)
+            with metrics.api_call(self.name, 'com.atproto.server.createSession'):
+                self.client.login(self.username, self.app_password)
             print(f"Successfully connected to Bluesky as {self.username}")
             return True
         except Exception as e:
@@ -79,12 +179,13 @@ class BlueskyFetcher:
                     seen_cursors.add(cursor)
                 
                 # Get author feed with posts only (no replies by default)
-                response = self.client.get_author_feed(
-                    actor=handle, 
-                    filter='posts_no_replies',  # Only original posts, no replies
-                    limit=min(limit - len(posts), 100) if enable_pagination else limit,
-                    cursor=cursor
-                )
+                with metrics.api_call(self.name, 'app.bsky.feed.getAuthorFeed', source=handle):
+                    response = self.client.get_author_feed(
+                        actor=handle, 
+                        filter='posts_no_replies',  # Only original posts, no replies
+                        limit=min(limit - len(posts), 100) if enable_pagination else limit,
+                        cursor=cursor
+                    )
                 
                 # Validate response structure
                 if not hasattr(response, 'feed') or response.feed is None:
@@ -108,29 +209,19 @@ class BlueskyFetcher:
                     if feed_item.reason:
                         continue
                         
-                    post_data = {
-                        'uri': post.uri,
-                        'cid': post.cid,
-                        'text': record.text,
-                        'created_at': record.created_at,
-                        'author': {
+                    post_data = self.build_post_data(
+                        post.uri,
+                        post.cid,
+                        record,
+                        {
                             'handle': post.author.handle,
                             'display_name': post.author.display_name or post.author.handle,
                             'avatar': post.author.avatar
                         },
-                        'like_count': post.like_count or 0,
-                        'repost_count': post.repost_count or 0,
-                        'reply_count': post.reply_count or 0,
-                        'url': f"https://bsky.app/profile/{post.author.handle}/post/{post.uri.split('/')[-1]}"
-                    }
-                    
-                    # Extract links and mentions from text
-                    post_data['links'] = self.extract_links(record.text)
-                    post_data['mentions'] = self.extract_mentions(record.text)
-                    
-                    # Handle embedded content (images, external links, etc.)
-                    if hasattr(record, 'embed') and record.embed:
-                        post_data['embed'] = self.process_embed(record.embed, max_depth=3)
+                        like_count=post.like_count or 0,
+                        repost_count=post.repost_count or 0,
+                        reply_count=post.reply_count or 0
+                    )
                     
                     posts.append(post_data)
                     
@@ -160,6 +251,363 @@ class BlueskyFetcher:
             print(f"Error fetching posts for {handle}: {e}")
             return []
     
+    def build_post_data(self, uri, cid, record, author, like_count=0, repost_count=0, reply_count=0):
+        """
+        Build the post dict written to the Hugo data file.
+        
+        Args:
+            uri: AT URI of the post
+            cid: CID of the post record
+            record: The app.bsky.feed.post record model
+            author: Dict with 'handle', 'display_name' and 'avatar'
+            like_count, repost_count, reply_count: Engagement counts, if known
+        """
+        post_data = {
+            'uri': uri,
+            'cid': cid,
+            'text': record.text,
+            'html': self.render_post_html(cid, record),
+            'created_at': record.created_at,
+            'author': author,
+            'like_count': like_count,
+            'repost_count': repost_count,
+            'reply_count': reply_count,
+            'url': f"https://bsky.app/profile/{author['handle']}/post/{uri.split('/')[-1]}"
+        }
+        
+        # Extract links and mentions from text
+        post_data['links'] = self.extract_links(record.text)
+        post_data['mentions'] = self.extract_mentions(record.text)
+        
+        # Handle embedded content (images, external links, etc.)
+        # A post's CID covers its embed, so a processed embed can be reused for as long as it exists
+        if hasattr(record, 'embed') and record.embed:
+            cache_key = f"post:{cid}" if isinstance(cid, str) else None
+            embed = self.embed_cache.get(cache_key) if cache_key else None
+            if embed is None:
+                with profiling.stage(profiling.current, 'process_embed'):
+                    embed = self.process_embed(record.embed, max_depth=3)
+                if cache_key and embed['type'] != 'ProcessingError':
+                    self.embed_cache.set(cache_key, embed)
+            post_data['embed'] = embed
+            
+        return post_data
+    
+    def render_post_html(self, cid, record):
+        """Render a record's text and facets to HTML, reusing the result for the same CID."""
+        cache_key = cid if isinstance(cid, str) else None
+        rendered = self.html_cache.get(cache_key) if cache_key else None
+        if rendered is None:
+            rendered = render_html(record.text, getattr(record, 'facets', None))
+            if cache_key:
+                self.html_cache.set(cache_key, rendered)
+        return rendered
+    
+    def get_author_profile(self, handle):
+        """
+        Look up the DID and display details for a handle.
+        
+        Returns:
+            Dict with 'did', 'handle', 'display_name' and 'avatar', or None on failure
+        """
+        cache_key = f"profile:{handle.lower()}"
+        cached = self.identity_cache.get(cache_key)
+        if cached:
+            return cached
+            
+        if not self.client:
+            if not self.connect():
+                return None
+                
+        try:
+            with metrics.api_call(self.name, 'app.bsky.actor.getProfile', source=handle):
+                profile = self.client.get_profile(handle)
+            author = {
+                'did': profile.did,
+                'handle': profile.handle,
+                'display_name': profile.display_name or profile.handle,
+                'avatar': profile.avatar
+            }
+        except Exception as e:
+            print(f"Error fetching profile for {handle}: {e}")
+            return None
+            
+        self.identity_cache.set(cache_key, author)
+        self.identity_cache.set(bluesky_identity.handle_key(handle), author['did'])
+        return author
+    
+    def get_posts_for_handles(self, handle_configs, default_limit=10, max_workers=4, engine='feed'):
+        """
+        Fetch posts for several handles concurrently over one authenticated client.
+        
+        Args:
+            handle_configs: List of dicts with 'handle' and optional 'max_posts'
+            default_limit: Limit used for handles without their own 'max_posts'
+            max_workers: Maximum number of concurrent feed requests
+            engine: 'feed' for getAuthorFeed, or 'pds' to read records from each PDS without logging in
+            
+        Returns:
+            Dict mapping each handle to its newest-first list of posts. A handle
+            whose fetch fails maps to an empty list so other handles are unaffected.
+        """
+        # Log in once up front so the worker threads share a single session
+        if engine != 'pds' and not self.client:
+            if not self.connect():
+                return {}
+        
+        results = {}
+        with profiling.executor(max(1, min(max_workers, len(handle_configs)))) as executor:
+            futures = {}
+            for config in handle_configs:
+                limit = config.get('max_posts', default_limit)
+                if engine == 'pds':
+                    futures[config['handle']] = executor.submit(
+                        self.get_user_posts_from_pds, config['handle'], limit=limit, engagement_counts=True
+                    )
+                    continue
+                # getAuthorFeed caps a single page at 100 items
+                futures[config['handle']] = executor.submit(
+                    self.get_user_posts, config['handle'], limit=limit, enable_pagination=limit > 100
+                )
+            for handle, future in futures.items():
+                try:
+                    results[handle] = future.result()
+                except Exception as e:
+                    print(f"Error fetching posts for {handle}: {e}")
+                    results[handle] = []
+                    
+        return results
+    
+    def merge_feeds(self, feeds, limit=None):
+        """
+        Merge per-handle feeds into one newest-first timeline.
+        
+        Each feed is already sorted newest first by get_user_posts, so this is a
+        k-way merge rather than a full re-sort of the combined posts.
+        
+        Args:
+            feeds: Iterable of newest-first post lists
+            limit: Optional maximum number of posts to return
+        """
+        merged = heapq.merge(*feeds, key=lambda post: post['created_at'], reverse=True)
+        return list(islice(merged, limit))
+    
+    def hydrate_threads(self, posts, max_depth=2, max_replies=5, max_workers=4):
+        """
+        Attach reply threads to posts that have replies.
+        
+        Threads are fetched with getPostThread and cached by root CID plus reply
+        count, so a thread is only fetched again once its reply count changes.
+        Reply authors are stored once in self.authors and referenced by DID.
+        
+        Args:
+            posts: Posts from get_user_posts; each gets a 'thread' key if it has replies
+            max_depth: Maximum reply nesting depth to keep
+            max_replies: Maximum replies kept at each level of a thread
+            max_workers: Maximum number of concurrent thread requests
+        """
+        pending = {}
+        for post in posts:
+            if not post.get('reply_count'):
+                continue
+            cache_key = f"{post['cid']}:{post['reply_count']}:{max_depth}:{max_replies}"
+            snapshot = self.thread_cache.get(cache_key)
+            if snapshot is None:
+                pending[cache_key] = post
+            else:
+                self.apply_thread_snapshot(post, snapshot)
+        
+        if not pending:
+            return
+            
+        if not self.client:
+            if not self.connect():
+                return
+        
+        with profiling.executor(max(1, min(max_workers, len(pending)))) as executor:
+            futures = {
+                cache_key: executor.submit(self.fetch_thread_snapshot, post['uri'], max_depth, max_replies)
+                for cache_key, post in pending.items()
+            }
+            for cache_key, future in futures.items():
+                snapshot = future.result()
+                if snapshot is None:
+                    continue
+                self.thread_cache.set(cache_key, snapshot)
+                self.apply_thread_snapshot(pending[cache_key], snapshot)
+    
+    def fetch_thread_snapshot(self, uri, max_depth, max_replies):
+        """
+        Fetch one post's replies, bounded in depth and breadth.
+        
+        Returns:
+            Dict with 'replies' (nested reply dicts) and 'authors' (DID -> author),
+            or None if the thread could not be fetched
+        """
+        try:
+            with metrics.api_call(self.name, 'app.bsky.feed.getPostThread'):
+                response = self.client.get_post_thread(uri, depth=max_depth, parent_height=0)
+        except Exception as e:
+            print(f"Error fetching thread for {uri}: {e}")
+            return None
+            
+        authors = {}
+        seen_uris = {uri}
+        
+        def collect(thread, depth):
+            replies = []
+            if depth > max_depth:
+                return replies
+            for reply in getattr(thread, 'replies', None) or []:
+                # Skip not-found and blocked placeholders, which have no post
+                post = getattr(reply, 'post', None)
+                if not post or not getattr(post, 'record', None) or post.uri in seen_uris:
+                    continue
+                seen_uris.add(post.uri)
+                
+                author = post.author
+                authors[author.did] = {
+                    'handle': author.handle,
+                    'display_name': author.display_name or author.handle,
+                    'avatar': author.avatar
+                }
+                replies.append({
+                    'uri': post.uri,
+                    'cid': post.cid,
+                    'text': post.record.text,
+                    'html': self.render_post_html(post.cid, post.record),
+                    'created_at': post.record.created_at,
+                    'author': author.did,
+                    'like_count': post.like_count or 0,
+                    'reply_count': post.reply_count or 0,
+                    'url': f"https://bsky.app/profile/{author.handle}/post/{post.uri.split('/')[-1]}",
+                    'replies': collect(reply, depth + 1)
+                })
+                if len(replies) >= max_replies:
+                    break
+            return replies
+        
+        return {
+            'replies': collect(getattr(response, 'thread', None), 1),
+            'authors': authors
+        }
+    
+    def apply_thread_snapshot(self, post, snapshot):
+        """Attach a thread snapshot to a post and merge its authors into the shared table."""
+        post['thread'] = {'replies': snapshot['replies']}
+        self.authors.update(snapshot['authors'])
+    
+    def get_user_posts_from_pds(self, handle, limit=10, include_replies=False, engagement_counts=False):
+        """
+        Fetch recent posts directly from the user's PDS with listRecords.
+        
+        Unlike get_user_posts this needs no login and skips the AppView entirely,
+        so posts carry zero engagement counts unless engagement_counts is set, in
+        which case they are filled from the public AppView in batches.
+        
+        Args:
+            handle: User handle to fetch posts from
+            limit: Maximum number of posts to return
+            include_replies: If True, replies are kept as well as top-level posts
+            engagement_counts: If True, fill like/repost/reply counts from the public AppView
+        """
+        try:
+            did = bluesky_identity.resolve_handle(handle, cache=self.identity_cache)
+            pds_url = bluesky_identity.resolve_pds(did, cache=self.identity_cache)
+            author = self.get_author_from_pds(pds_url, did, handle)
+            
+            posts = []
+            cursor = None
+            seen_cursors = set()  # Track cursors to prevent infinite loops
+            
+            while len(posts) < limit:
+                params = {
+                    'repo': did,
+                    'collection': POST_COLLECTION,
+                    'limit': min(limit - len(posts), 100) if include_replies else 100
+                }
+                if cursor:
+                    params['cursor'] = cursor
+                    
+                with metrics.api_call(self.name, 'com.atproto.repo.listRecords', source=handle):
+                    response = requests.get(
+                        f"{pds_url}/xrpc/com.atproto.repo.listRecords",
+                        params=params,
+                        timeout=REQUEST_TIMEOUT
+                    )
+                    response.raise_for_status()
+                page = response.json()
+                
+                for item in page.get('records', []):
+                    record = models.get_or_create(item['value'], strict=False)
+                    if getattr(record, 'reply', None) and not include_replies:
+                        continue
+                    posts.append(self.build_post_data(item['uri'], item['cid'], record, dict(author)))
+                    if len(posts) >= limit:
+                        break
+                
+                # listRecords returns newest first; stop when pages run out or repeat
+                next_cursor = page.get('cursor')
+                if not page.get('records') or not next_cursor or next_cursor in seen_cursors:
+                    break
+                seen_cursors.add(next_cursor)
+                cursor = next_cursor
+            
+            if engagement_counts:
+                self.fill_public_engagement_counts(posts)
+                
+            posts.sort(key=lambda x: x['created_at'], reverse=True)
+            return posts[:limit]
+            
+        except Exception as e:
+            print(f"Error fetching posts for {handle} from PDS: {e}")
+            return []
+    
+    def get_author_from_pds(self, pds_url, did, handle):
+        """Build the author dict from the app.bsky.actor.profile/self record on the PDS."""
+        author = {'handle': handle, 'display_name': handle, 'avatar': None}
+        try:
+            with metrics.api_call(self.name, 'com.atproto.repo.getRecord', source=handle):
+                response = requests.get(
+                    f"{pds_url}/xrpc/com.atproto.repo.getRecord",
+                    params={'repo': did, 'collection': 'app.bsky.actor.profile', 'rkey': 'self'},
+                    timeout=REQUEST_TIMEOUT
+                )
+                response.raise_for_status()
+            profile = response.json().get('value', {})
+        except requests.RequestException as e:
+            print(f"Warning: Could not fetch profile for {handle}: {e}")
+            return author
+            
+        author['display_name'] = profile.get('displayName') or handle
+        avatar_link = (profile.get('avatar') or {}).get('ref', {}).get('$link')
+        if avatar_link:
+            author['avatar'] = f"{AVATAR_CDN_URL}/{did}/{avatar_link}@jpeg"
+        return author
+    
+    def fill_public_engagement_counts(self, posts, batch_size=25):
+        """Fill like/repost/reply counts from the unauthenticated public AppView."""
+        by_uri = {post['uri']: post for post in posts}
+        uris = list(by_uri)
+        for start in range(0, len(uris), batch_size):
+            try:
+                with metrics.api_call(self.name, 'app.bsky.feed.getPosts'):
+                    response = requests.get(
+                        f"{bluesky_identity.PUBLIC_API_URL}/app.bsky.feed.getPosts",
+                        params={'uris': uris[start:start + batch_size]},
+                        timeout=REQUEST_TIMEOUT
+                    )
+                    response.raise_for_status()
+            except requests.RequestException as e:
+                print(f"Warning: Could not fetch engagement counts: {e}")
+                continue
+            for view in response.json().get('posts', []):
+                post = by_uri.get(view.get('uri'))
+                if post:
+                    post['like_count'] = view.get('likeCount', 0)
+                    post['repost_count'] = view.get('repostCount', 0)
+                    post['reply_count'] = view.get('replyCount', 0)
+    
     def extract_links(self, text):
         """Extract HTTP/HTTPS links from post text."""
         url_pattern = r'https?://[^\s]+'
@@ -223,6 +671,14 @@ class BlueskyFetcher:
             elif hasattr(embed, 'record') and embed.record:
                 # Quote post embed - handle with recursion limit
                 quoted = embed.record
+                
+                # Quoted records are immutable per CID; reuse the result for the same remaining depth
+                quoted_cid = getattr(quoted, 'cid', None)
+                cache_key = f"record:{quoted_cid}@{max_depth - current_depth}" if isinstance(quoted_cid, str) else None
+                cached = self.embed_cache.get(cache_key) if cache_key else None
+                if cached is not None:
+                    return cached
+                
                 embed_data['data'] = {
                     'uri': getattr(quoted, 'uri', None),
                     'author': getattr(quoted.author, 'handle', None) if hasattr(quoted, 'author') else None,
@@ -240,6 +696,9 @@ class BlueskyFetcher:
                         )
                         nested_embeds.append(nested_result)
                     embed_data['data']['nested_embeds'] = nested_embeds
+                
+                if cache_key:
+                    self.embed_cache.set(cache_key, embed_data)
             else:
                 # Unknown embed type
                 embed_data['data'] = {
@@ -263,39 +722,150 @@ class BlueskyFetcher:
         if not posts:
             print("No posts to generate data for")
             return
+        if self.cancelled:
+            print(f"Fetch cancelled; not writing {output_file}")
+            return
             
         # Create data directory
         data_file = Path(output_file)
         data_file.parent.mkdir(parents=True, exist_ok=True)
         
-        # Prepare data structure
-        bluesky_data = {
-            'last_updated': datetime.now(timezone.utc).isoformat(),
-            'post_count': len(posts),
-            'posts': posts
-        }
+        if self.store:
+            # The data file is a projection of the stored posts
+            self.store.upsert_posts(posts, self.authors)
+            bluesky_data = self.store.bluesky_data([post['uri'] for post in posts], author_table=self.author_table)
+        else:
+            authors = dict(self.authors)
+            if self.author_table:
+                posts = self.reference_authors(posts, authors)
+            
+            # Prepare data structure
+            bluesky_data = {
+                'last_updated': datetime.now(timezone.utc).isoformat(),
+                'post_count': len(posts),
+                'posts': posts
+            }
+            if authors:
+                bluesky_data['authors'] = authors
         
         # Write data file
-        with open(data_file, 'w') as f:
-            json.dump(bluesky_data, f, indent=2, default=str)
+        changes.compare('posts', data_file, bluesky_data['posts'], 'uri', self.name)
+        metrics.write_file(data_file, json.dumps(bluesky_data, indent=2, default=str), self.name)
+        last_known_good.save(output_file, bluesky_data)
             
-        print(f"Generated Bluesky data: {len(posts)} posts saved to {output_file}")
+        print(f"Generated Bluesky data: {bluesky_data['post_count']} posts saved to {output_file}")
+    
+    def reference_authors(self, posts, authors):
+        """
+        Move each post's author into the authors table and reference it by DID.
+        
+        The DID is taken from the post's AT URI, so no lookups are needed.
+        Posts whose author is already a DID are left as they are.
+        
+        Returns:
+            New list of posts; the input posts are not modified
+        """
+        referenced = []
+        for post in posts:
+            author = post.get('author')
+            if isinstance(author, dict):
+                did = post['uri'].split('/')[2]
+                authors[did] = author
+                post = dict(post, author=did)
+            referenced.append(post)
+        return referenced
+    
+    def save_caches(self):
+        """Persist caches built up during the run."""
+        self.embed_cache.save()
+        self.thread_cache.save()
+        self.html_cache.save()
+        self.identity_cache.save()
+    
+    def save_handle_data(self, posts_by_handle, output_dir=HANDLE_DATA_DIR):
+        """Write one Hugo data file per handle, keyed by a slug of the handle."""
+        for handle, posts in posts_by_handle.items():
+            self.save_data(posts, output_file=handle_data_file(handle, output_dir))
 
 
-def main():
-    # Get credentials from environment
-    username = os.getenv('BLUESKY_USERNAME')
-    app_password = os.getenv('BLUESKY_APP_PASSWORD')
-    
-    if not username or not app_password:
-        print("Error: BLUESKY_USERNAME and BLUESKY_APP_PASSWORD environment variables not set")
-        print("Set them with:")
-        print("  export BLUESKY_USERNAME=\"your-handle.bsky.social\"")
-        print("  export BLUESKY_APP_PASSWORD=\"your-app-password\"")
-        print("\nIMPORTANT: Use an App Password, NOT your main password!")
-        print("Generate an App Password at: https://bsky.app/settings/app-passwords")
-        sys.exit(1)
+def handle_data_file(handle, output_dir=HANDLE_DATA_DIR):
+    """Path of a handle's data file in per_handle output mode."""
+    slug = re.sub(r'[^a-z0-9-]+', '-', handle.lower()).strip('-')
+    return str(Path(output_dir) / f'{slug}.json')
+
+
+def open_breaker(config):
+    """Load the Bluesky circuit breakers, keyed by handle."""
+    return CircuitBreaker.for_provider('bluesky', config.get('circuit_breaker'))
+
+
+def last_known_posts(data_file, handles):
+    """Return the posts by the given handles from a data file's last known good snapshot."""
+    data = last_known_good.load(data_file) or {}
+    authors = data.get('authors') or {}
+    posts = []
+    for post in data.get('posts', []):
+        author = post.get('author')
+        if isinstance(author, str):
+            author = authors.get(author)
+            if author is None:
+                continue
+            post = dict(post, author=author)
+        if (author or {}).get('handle') in handles:
+            posts.append(post)
+    return posts
+
+
+def load_handle_configs(config):
+    """
+    Normalize the 'handles' list from bluesky-config.yaml.
     
+    Entries may be plain handle strings or dicts with 'handle' and 'max_posts'.
+    Placeholder and empty entries are dropped.
+    """
+    default_limit = config.get('max_posts', 10)
+    handle_configs = []
+    for entry in config.get('handles') or []:
+        if isinstance(entry, str):
+            entry = {'handle': entry}
+        handle = (entry or {}).get('handle')
+        if not handle or handle == 'your-handle.bsky.social':
+            continue
+        handle_configs.append({
+            'handle': handle,
+            'max_posts': entry.get('max_posts', default_limit)
+        })
+    return handle_configs
+
+
+def parse_args(argv):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Fetch Bluesky posts for the Hugo site.")
+    parser.add_argument('--subscribe', action='store_true',
+                        help="Stay running and apply new posts from Jetstream as they happen")
+    parser.add_argument('--backfill', action='store_true',
+                        help="Seed the archive with the full post history from a repository export")
+    parser.add_argument('--engine', choices=['feed', 'pds'],
+                        help="Read posts via getAuthorFeed (default) or listRecords on the PDS without logging in")
+    profiling.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv if argv is not None else [])
+    # A live subscription never ends, so it has no per-run change feed
+    if not args.subscribe:
+        changes.start()
+    with profiling.profiled(args, BlueskyFetcher.name):
+        run(args)
+    if changes.active:
+        changes.write()
+        listing_indexes.write_indexes()
+        search_index.update_index(changes.changes)
+
+
+def run(args):
+    """Fetch, backfill or subscribe according to the options and bluesky-config.yaml."""
     # Read configuration
     config_file = Path('config') / 'bluesky-config.yaml'
     if not config_file.exists():
@@ -308,8 +878,33 @@ def main():
     with open(config_file) as f:
         config = yaml.safe_load(f)
     
+    # Get credentials from environment
+    username = os.getenv('BLUESKY_USERNAME')
+    app_password = os.getenv('BLUESKY_APP_PASSWORD')
+    
+    # Reading records straight from the PDS is public, so read-only runs need no login
+    engine = args.engine or config.get('engine', 'feed')
+    needs_login = engine != 'pds' or args.subscribe or args.backfill or config.get('threads')
+    if needs_login and (not username or not app_password):
+        print("Error: BLUESKY_USERNAME and BLUESKY_APP_PASSWORD environment variables not set")
+        print("Set them with:")
+        print("  export BLUESKY_USERNAME=\"your-handle.bsky.social\"")
+        print("  export BLUESKY_APP_PASSWORD=\"your-app-password\"")
+        print("\nIMPORTANT: Use an App Password, NOT your main password!")
+        print("Generate an App Password at: https://bsky.app/settings/app-passwords")
+        sys.exit(1)
+    
     handle = config.get('handle')
-    max_posts = config.get('max_posts', 10)
+    
+    if config.get('handles'):
+        if args.subscribe:
+            print("Error: --subscribe follows the single 'handle' in bluesky-config.yaml")
+            sys.exit(1)
+        if args.backfill:
+            print("Error: --backfill follows the single 'handle' in bluesky-config.yaml")
+            sys.exit(1)
+        fetch_multiple_handles(username, app_password, config, engine=engine)
+        return
     
     if not handle or handle == 'your-handle.bsky.social':
         print("Error: Please update 'handle' in bluesky-config.yaml with your actual Bluesky handle")
@@ -318,16 +913,245 @@ def main():
     
     # Fetch posts
     fetcher = BlueskyFetcher(username, app_password)
+    fetcher.author_table = bool(config.get('author_table'))
+    
+    if args.subscribe:
+        subscribe(fetcher, handle, config)
+        return
+    
+    if args.backfill:
+        backfill(fetcher, handle, config)
+        return
+    
+    fetch_handle(fetcher, handle, config, engine=engine)
+
+
+def open_archive(config):
+    """Open the post archive if 'archive' is enabled (true or a dict with 'path')."""
+    settings = config.get('archive')
+    if not settings:
+        return None
+    path = settings.get('path', ARCHIVE_DIR) if isinstance(settings, dict) else ARCHIVE_DIR
+    return BlueskyArchive(path)
+
+
+def archive_posts(posts, config):
+    """Append fetched posts to the archive when it is enabled."""
+    archive = open_archive(config)
+    if archive is None or not posts:
+        return
+    appended = archive.append(posts)
+    print(f"Archived {appended} new or changed posts ({len(archive)} total)")
+
+
+def thread_options(config):
+    """Read hydrate_threads options from the 'threads' setting (true or a dict of limits)."""
+    threads = config.get('threads')
+    if not isinstance(threads, dict):
+        return {}
+    return {key: threads[key] for key in ('max_depth', 'max_replies', 'max_workers') if key in threads}
+
+
+def fetch_posts(fetcher, config, engine='feed'):
+    """
+    Run a regular fetch of the configured handle or handles and write the data files.
+    
+    Returns:
+        Number of posts fetched
+    """
+    if config.get('handles'):
+        return fetch_handles(fetcher, config, engine=engine)
+    handle = config.get('handle')
+    if not handle or handle == 'your-handle.bsky.social':
+        raise ValueError("No Bluesky handle configured in bluesky-config.yaml")
+    return fetch_handle(fetcher, handle, config, engine=engine)
+
+
+def fetch_handle(fetcher, handle, config, engine='feed'):
+    """
+    Fetch the latest posts for one handle and write data/bluesky.json.
+    
+    If the fetch fails, or the handle's circuit breaker is open, the last known
+    good data file is restored and marked stale.
+    
+    Returns:
+        Number of posts fetched
+    """
+    max_posts = config.get('max_posts', 10)
+    breaker = open_breaker(config)
+    fetcher.store = local_store.open_store(config)
+    
+    if not breaker.allow(handle):
+        print(f"Skipping @{handle}: too many recent failures")
+        last_known_good.fall_back(DATA_FILE, "circuit open")
+        return 0
     
     print(f"Fetching latest {max_posts} posts from @{handle}...")
-    posts = fetcher.get_user_posts(handle, limit=max_posts)
+    if engine == 'pds':
+        posts = fetcher.get_user_posts_from_pds(
+            handle, limit=max_posts, engagement_counts=config.get('engagement_counts', True)
+        )
+    else:
+        posts = fetcher.get_user_posts(handle, limit=max_posts)
+    if posts and config.get('threads'):
+        fetcher.hydrate_threads(posts, **thread_options(config))
+    fetcher.save_caches()
+    archive_posts(posts, config)
     
     if posts:
         fetcher.save_data(posts)
+        breaker.record_success(handle)
+        metrics.increment('fetch_items_total', len(posts), provider=fetcher.name, source=handle)
         print(f"✓ Successfully fetched {len(posts)} posts from Bluesky")
     else:
         print("No posts retrieved")
+        breaker.record_failure(handle, "no posts retrieved")
+        last_known_good.fall_back(DATA_FILE, "no posts retrieved")
+    breaker.save()
+    return len(posts)
+
+
+def fetch_multiple_handles(username, app_password, config, engine='feed'):
+    """Fetch every configured handle and write per-handle files or one merged feed."""
+    if not load_handle_configs(config):
+        print("Error: No valid entries in 'handles' in bluesky-config.yaml")
+        print("Example:")
+        print("handles:")
+        print("  - handle: yourname.bsky.social")
+        print("    max_posts: 5")
+        sys.exit(1)
+    
+    fetcher = BlueskyFetcher(username, app_password)
+    fetcher.author_table = bool(config.get('author_table'))
+    fetch_handles(fetcher, config, engine=engine)
+
+
+def fetch_handles(fetcher, config, engine='feed'):
+    """Fetch several handles concurrently and write the merged or per-handle data. Returns the post count."""
+    handle_configs = load_handle_configs(config)
+    if not handle_configs:
+        raise ValueError("No valid entries in 'handles' in bluesky-config.yaml")
+    
+    breaker = open_breaker(config)
+    fetcher.store = local_store.open_store(config)
+    skipped = [h['handle'] for h in handle_configs if not breaker.allow(h['handle'])]
+    for skipped_handle in skipped:
+        print(f"Skipping @{skipped_handle}: too many recent failures")
+    
+    print(f"Fetching posts from {len(handle_configs) - len(skipped)} handles...")
+    posts_by_handle = fetcher.get_posts_for_handles(
+        [h for h in handle_configs if h['handle'] not in skipped],
+        default_limit=config.get('max_posts', 10),
+        max_workers=config.get('max_workers', 4),
+        engine=engine
+    )
+    
+    if config.get('threads'):
+        for posts in posts_by_handle.values():
+            fetcher.hydrate_threads(posts, **thread_options(config))
+    fetcher.save_caches()
+    for posts in posts_by_handle.values():
+        archive_posts(posts, config)
+    
+    failed = [h['handle'] for h in handle_configs if not posts_by_handle.get(h['handle'])]
+    for failed_handle in failed:
+        if failed_handle not in skipped:
+            print(f"Warning: No posts retrieved for @{failed_handle}")
+            breaker.record_failure(failed_handle, "no posts retrieved")
+    for handle, posts in posts_by_handle.items():
+        if posts:
+            breaker.record_success(handle)
+            metrics.increment('fetch_items_total', len(posts), provider=fetcher.name, source=handle)
+    breaker.save()
+    
+    if config.get('output', 'merged') == 'per_handle':
+        fetcher.save_handle_data(posts_by_handle)
+        for failed_handle in failed:
+            last_known_good.fall_back(handle_data_file(failed_handle), "no posts retrieved")
+    else:
+        # Keep failed handles in the merged feed with their last known posts
+        feeds = list(posts_by_handle.values())
+        if failed:
+            feeds.append(sorted(last_known_posts(DATA_FILE, failed), key=lambda p: p['created_at'], reverse=True))
+        posts = fetcher.merge_feeds(feeds, limit=config.get('merged_max_posts'))
+        if posts and len(failed) < len(handle_configs):
+            fetcher.save_data(posts)
+        else:
+            last_known_good.fall_back(DATA_FILE, "no posts retrieved")
+    
+    fetched = sum(len(posts) for posts in posts_by_handle.values())
+    print(f"✓ Successfully fetched {fetched} posts from {len(handle_configs) - len(failed)} of {len(handle_configs)} handles")
+    return fetched
+
+
+def backfill(fetcher, handle, config):
+    """Seed the archive and data file with the full history from a CAR export."""
+    import bluesky_backfill
+    
+    archive = open_archive(config)
+    if archive is None:
+        archive = BlueskyArchive()
+    print(f"Backfilling full post history for @{handle}...")
+    try:
+        total = bluesky_backfill.backfill_from_repo(
+            fetcher,
+            handle,
+            on_batch=archive.append,
+            include_replies=not config.get('filter_replies', True)
+        )
+    except Exception as e:
+        print(f"Error backfilling posts for {handle}: {e}")
+        sys.exit(1)
+    fetcher.save_caches()
+    
+    posts = archive.latest(config.get('max_posts', 10))
+    if posts:
+        fetcher.save_data(posts)
+    print(f"✓ Backfilled {total} posts ({len(archive)} in archive)")
+
+
+def subscribe(fetcher, handle, config):
+    """Run the long-lived Jetstream subscriber for a single handle."""
+    from bluesky_jetstream import DEFAULT_ENDPOINT, JetstreamSubscriber
+    
+    profile = fetcher.get_author_profile(handle)
+    if not profile:
+        print(f"Error: Could not resolve @{handle}")
+        sys.exit(1)
+    
+    subscribe_config = config.get('subscribe') or {}
+    rebuild_command = subscribe_config.get('rebuild_command')
+    
+    def rebuild():
+        listing_indexes.write_indexes()
+        search_index.update_index()
+        if not rebuild_command:
+            return
+        print(f"Running rebuild: {rebuild_command}")
+        result = subprocess.run(shlex.split(rebuild_command))
+        if result.returncode != 0:
+            print(f"Warning: Rebuild exited with status {result.returncode}")
+    
+    subscriber = JetstreamSubscriber(
+        fetcher,
+        profile.pop('did'),
+        profile,
+        endpoint=subscribe_config.get('endpoint', DEFAULT_ENDPOINT),
+        max_posts=config.get('max_posts', 10),
+        include_replies=not config.get('filter_replies', True),
+        archive=open_archive(config),
+        on_rebuild=rebuild,
+        debounce_seconds=subscribe_config.get('debounce_seconds', 30)
+    )
+    
+    # Finish the current message and flush state on Ctrl+C / SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: subscriber.stop())
+    try:
+        subscriber.run()
+    except KeyboardInterrupt:
+        subscriber.stop()
+        subscriber.flush(force=True)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main(sys.argv[1:])
\ No newline at end of file
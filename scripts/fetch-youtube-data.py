@@ -5,32 +5,182 @@ Fetch YouTube channel data and generate Hugo content files.
 
 import os
 import sys
+import argparse
 import json
+import shlex
+import signal
+import subprocess
 import yaml
 import requests
 import re
-from datetime import datetime
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
-class YouTubeFetcher:
+import last_known_good
+import listing_indexes
+import local_store
+import profiling
+import search_index
+import youtube_backfill
+from change_feed import FEED as changes
+from circuit_breaker import CircuitBreaker
+from fetch_provider import FetchProvider
+from metrics import REGISTRY as metrics
+from persistent_cache import PersistentLRUCache
+
+REQUEST_TIMEOUT = 10  # Seconds per API request, so a slow API cannot hang the deploy
+
+# Public Atom feed of a channel's latest 15 uploads; reading it costs no API quota
+FEED_URL = 'https://www.youtube.com/feeds/videos.xml'
+FEED_CACHE_FILE = '.cache/youtube-feeds.json'
+FEED_CHUNK_SIZE = 16 * 1024
+FULL_REFRESH_HOURS = 24
+ATOM = '{http://www.w3.org/2005/Atom}'
+YT = '{http://www.youtube.com/xml/schemas/2015}'
+MEDIA = '{http://search.yahoo.com/mrss/}'
+VIDEOS_PER_REQUEST = 50  # videos.list, playlists.list and playlistItems.list all accept at most 50
+STATISTICS_REFRESH_HOURS = 24  # Counts of videos not looked up by a run are refreshed this often
+# Shorts can be up to 3 minutes long; the Data API has no flag for them, so
+# videos up to a minute are Shorts and longer ones only when tagged #shorts
+SHORTS_MAX_SECONDS = 180
+SHORTS_UNTAGGED_MAX_SECONDS = 60
+DURATION_PATTERN = re.compile(r'P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+# Playlist data lives beside data/youtube/, whose files the templates range over as channels
+PLAYLISTS_DIR = 'youtube_playlists'
+
+
+def parse_feed(chunks):
+    """
+    Stream-parse a channel's Atom feed, discarding each entry once it is read.
+    
+    Args:
+        chunks: Iterable of bytes, e.g. response.iter_content()
+    
+    Returns:
+        List of dicts with each entry's 'id', 'title' and 'description'
+    """
+    parser = ET.XMLPullParser(events=('end',))
+    entries = []
+    
+    def read_entries():
+        for _, element in parser.read_events():
+            if element.tag != f'{ATOM}entry':
+                continue
+            entries.append({
+                'id': element.findtext(f'{YT}videoId'),
+                'title': element.findtext(f'{ATOM}title'),
+                'description': element.findtext(f'{MEDIA}group/{MEDIA}description') or ''
+            })
+            element.clear()
+    
+    for chunk in chunks:
+        parser.feed(chunk)
+        read_entries()
+    parser.close()
+    read_entries()
+    return [entry for entry in entries if entry['id']]
+
+def parse_duration(value):
+    """
+    Parse an ISO-8601 duration such as 'PT1H2M3S' into seconds.
+    
+    Returns:
+        Number of seconds, or None if the value is missing or not a duration
+    """
+    match = DURATION_PATTERN.match(value or '')
+    if not match or value == 'P':
+        return None
+    weeks, days, hours, minutes, seconds = (int(part) if part else 0 for part in match.groups())
+    return (((weeks * 7 + days) * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def is_short(video):
+    """Whether a video record looks like a Short (see SHORTS_MAX_SECONDS)."""
+    duration = video.get('duration_seconds')
+    if video.get('is_live_stream') or not duration or duration > SHORTS_MAX_SECONDS:
+        return False
+    text = f"{video.get('title') or ''} {video.get('description') or ''}".lower()
+    return duration <= SHORTS_UNTAGGED_MAX_SECONDS or '#short' in text
+
+def statistics_fields(statistics, updated_at):
+    """Video record fields from a videos.list 'statistics' part. Hidden counts are None."""
+    def count(name):
+        return int(statistics[name]) if name in statistics else None
+    return {
+        'view_count': count('viewCount'),
+        'like_count': count('likeCount'),
+        'comment_count': count('commentCount'),
+        'statistics_updated_at': updated_at
+    }
+
+class YouTubeFetcher(FetchProvider):
+    name = 'youtube'
+    config_file = 'config/youtube-channels.yaml'
+    
     def __init__(self, api_key):
         self.api_key = api_key
         self.base_url = "https://www.googleapis.com/youtube/v3"
+        self.store = None  # Optional LocalStore the data files are projected from
+        self.feed_cache = None  # Feed validators per channel, set when the RSS fast path is enabled
+        self.session = None  # Optional requests.Session kept open between runs by the scheduler
+        self.keep_history = False  # Keep videos older than the latest max_results once backfilled
+        self.video_cache = None  # Video details by ID, shared by everything one run fetches
+        self.video_cache_lock = threading.Lock()
+    
+    @classmethod
+    def from_environment(cls):
+        """Create a fetcher from YOUTUBE_API_KEY, or return None if it is not set."""
+        api_key = os.getenv('YOUTUBE_API_KEY')
+        return cls(api_key) if api_key else None
+    
+    def fetch(self, config):
+        """Fetch every configured channel (provider interface used by fetch_all.py)."""
+        return fetch_channels(self, config)
+    
+    def refresh_live(self, config):
+        """Refresh only the status of live and upcoming streams (scheduler job)."""
+        return refresh_live_streams(self, config)
+    
+    def fall_back(self, config, reason, since):
+        """Restore the channels not refreshed since a run started (see FetchProvider.fall_back)."""
+        breaker = CircuitBreaker.for_provider('youtube', config.get('circuit_breaker'))
+        restored = []
+        for channel_config in config.get('channels') or []:
+            channel_id = channel_config['channel_id']
+            data_file = Path('data') / 'youtube' / f'{channel_id}.json'
+            if last_known_good.written_since(data_file, since, 'fetched_at'):
+                continue
+            breaker.record_failure(channel_id, reason)
+            if last_known_good.fall_back(data_file, reason):
+                restored.append(str(data_file))
+        breaker.save()
+        return restored
+    
+    def http_get(self, url, **kwargs):
+        """GET through the shared session if one is set, else a one-off connection."""
+        return (self.session or requests).get(url, timeout=REQUEST_TIMEOUT, **kwargs)
         
+    def api_get(self, endpoint, params, source=None):
+        """GET a Data API endpoint, recording its latency and outcome. Returns the decoded JSON."""
+        with metrics.api_call(self.name, endpoint, source):
+            response = self.http_get(f"{self.base_url}/{endpoint}", params=params)
+            response.raise_for_status()
+        # Every list call the fetcher makes costs one unit of the daily quota
+        metrics.increment('fetch_quota_units_total', provider=self.name, source=source)
+        return response.json()
+    
     def get_channel_videos(self, channel_id, max_results=50):
         """Fetch videos from a YouTube channel."""
         try:
             # Get channel's uploads playlist ID
-            channel_url = f"{self.base_url}/channels"
             channel_params = {
                 'part': 'contentDetails,snippet',
                 'id': channel_id,
                 'key': self.api_key
             }
             
-            response = requests.get(channel_url, params=channel_params)
-            response.raise_for_status()
-            channel_data = response.json()
+            channel_data = self.api_get('channels', channel_params, channel_id)
             
             if not channel_data['items']:
                 print(f"Channel {channel_id} not found")
@@ -41,7 +191,6 @@ class YouTubeFetcher:
             channel_title = channel_info['snippet']['title']
             
             # Get videos from uploads playlist
-            playlist_url = f"{self.base_url}/playlistItems"
             playlist_params = {
                 'part': 'snippet',
                 'playlistId': uploads_playlist_id,
@@ -50,70 +199,11 @@ class YouTubeFetcher:
                 'key': self.api_key
             }
             
-            response = requests.get(playlist_url, params=playlist_params)
-            response.raise_for_status()
-            playlist_data = response.json()
+            playlist_data = self.api_get('playlistItems', playlist_params, channel_id)
             
             # Get video IDs for detailed info
             video_ids = [item['snippet']['resourceId']['videoId'] for item in playlist_data['items']]
-            
-            # Get detailed video information including live stream status
-            videos_url = f"{self.base_url}/videos"
-            videos_params = {
-                'part': 'snippet,liveStreamingDetails',
-                'id': ','.join(video_ids),
-                'key': self.api_key
-            }
-            
-            response = requests.get(videos_url, params=videos_params)
-            response.raise_for_status()
-            videos_data = response.json()
-            
-            # Use set to track video IDs and prevent duplicates
-            seen_video_ids = set()
-            videos = []
-            
-            for video in videos_data['items']:
-                video_id = video['id']
-                
-                # Skip if we've already seen this video
-                if video_id in seen_video_ids:
-                    continue
-                seen_video_ids.add(video_id)
-                
-                # Determine if this is a live stream
-                is_live_stream = 'liveStreamingDetails' in video
-                live_status = None
-                if is_live_stream:
-                    live_details = video['liveStreamingDetails']
-                    if 'actualEndTime' in live_details:
-                        live_status = 'completed'
-                    elif 'actualStartTime' in live_details:
-                        live_status = 'live'
-                    else:
-                        live_status = 'upcoming'
-                        
-                        # Filter out old upcoming streams (likely canceled/never happened)
-                        from datetime import datetime, timezone
-                        published_date = datetime.fromisoformat(video['snippet']['publishedAt'].replace('Z', '+00:00'))
-                        days_old = (datetime.now(timezone.utc) - published_date).days
-                        
-                        # Skip upcoming streams older than 7 days (likely canceled)
-                        if days_old > 7:
-                            print(f"Skipping old upcoming stream: {video['snippet']['title']}")
-                            continue
-                
-                video_data = {
-                    'id': video_id,
-                    'title': video['snippet']['title'],
-                    'description': video['snippet']['description'],
-                    'published_at': video['snippet']['publishedAt'],
-                    'thumbnail': video['snippet']['thumbnails']['maxres']['url'] if 'maxres' in video['snippet']['thumbnails'] else video['snippet']['thumbnails']['high']['url'],
-                    'url': f"https://www.youtube.com/watch?v={video_id}",
-                    'is_live_stream': is_live_stream,
-                    'live_status': live_status
-                }
-                videos.append(video_data)
+            videos = self.get_video_details(channel_id, video_ids)
                 
             # Sort by published date (newest first)
             videos.sort(key=lambda x: x['published_at'], reverse=True)
@@ -131,11 +221,367 @@ class YouTubeFetcher:
             print(f"Unexpected API response structure: {e}")
             return []
 
+    def get_channel_updates(self, channel_id, known, max_results=50, full_refresh_hours=FULL_REFRESH_HOURS):
+        """
+        Refresh a channel from its Atom feed, spending API quota only where needed.
+        
+        The feed is requested with the ETag and Last-Modified of the previous
+        run. The Data API is then only asked about videos the feed lists that
+        are not known yet and known streams that are live or upcoming, so an
+        idle channel costs no quota. Without known data, when the feed cannot
+        be read, or every full_refresh_hours (to pick up deletions and edits
+        beyond the feed's 15 entries) the full get_channel_videos path is used.
+        
+        Args:
+            channel_id: YouTube channel ID
+            known: The channel's last written data, or None
+            max_results: Maximum number of videos kept
+            full_refresh_hours: Hours between full API refreshes
+        
+        Returns:
+            Channel data like get_channel_videos, or [] on failure
+        """
+        state = self.feed_cache.get(channel_id) or {}
+        full_fetch_at = state.get('full_fetch_at')
+        due = (full_fetch_at is None or datetime.now(timezone.utc) - datetime.fromisoformat(full_fetch_at)
+               >= timedelta(hours=full_refresh_hours))
+        if not known or not known.get('videos') or due:
+            return self.full_refresh(channel_id, max_results)
+        
+        headers = {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+        try:
+            with metrics.api_call(self.name, 'feed', channel_id):
+                response = self.http_get(FEED_URL, params={'channel_id': channel_id}, headers=headers, stream=True)
+                with response:
+                    if response.status_code == 304:
+                        entries = None
+                    else:
+                        response.raise_for_status()
+                        entries = parse_feed(response.iter_content(FEED_CHUNK_SIZE))
+        except (requests.RequestException, ET.ParseError) as e:
+            print(f"Could not read the feed for channel {channel_id} ({e}); using the Data API")
+            return self.full_refresh(channel_id, max_results)
+        
+        videos = {video['id']: dict(video) for video in known['videos']}
+        new_ids = []
+        if entries is not None:
+            state['etag'] = response.headers.get('ETag')
+            state['last_modified'] = response.headers.get('Last-Modified')
+            for entry in entries:
+                if entry['id'] in videos:
+                    videos[entry['id']].update(title=entry['title'], description=entry['description'])
+                else:
+                    new_ids.append(entry['id'])
+        live_ids = [video_id for video_id, video in videos.items() if video.get('live_status') in ('live', 'upcoming')]
+        
+        refresh_ids = new_ids + live_ids
+        if refresh_ids:
+            print(f"Fetching details of {len(new_ids)} new and {len(live_ids)} live videos")
+            try:
+                details = self.get_video_details(channel_id, refresh_ids)
+            except requests.RequestException as e:
+                print(f"Error fetching data for channel {channel_id}: {e}")
+                return []
+            except KeyError as e:
+                print(f"Unexpected API response structure: {e}")
+                return []
+            for video_id in live_ids:
+                del videos[video_id]
+            videos.update((video['id'], video) for video in details)
+        else:
+            print(f"No new videos in the feed for channel {channel_id}; no API quota used")
+        
+        self.feed_cache.set(channel_id, state)
+        return {
+            'channel_title': known['channel_title'],
+            'channel_id': channel_id,
+            'videos': sorted(videos.values(), key=lambda x: x['published_at'], reverse=True)[:max_results]
+        }
+    
+    def full_refresh(self, channel_id, max_results):
+        """get_channel_videos, remembering when it last succeeded for get_channel_updates."""
+        channel_data = self.get_channel_videos(channel_id, max_results)
+        if channel_data:
+            state = self.feed_cache.get(channel_id) or {}
+            state['full_fetch_at'] = datetime.now(timezone.utc).isoformat()
+            self.feed_cache.set(channel_id, state)
+        return channel_data
+    
+    def update_videos(self, channel_id, channel_slug, video_ids, deleted_ids=(), max_results=50):
+        """
+        Merge fresh details of some videos into a channel's data file.
+        
+        Only the given videos are requested from the Data API. One the API no
+        longer returns (deleted, made private or a stale upcoming stream) is
+        dropped, like it would be by a full fetch.
+        
+        Args:
+            channel_id: YouTube channel ID
+            channel_slug: Slug of the channel's content section
+            video_ids: Videos to look up again
+            deleted_ids: Videos to remove without a lookup
+            max_results: Maximum number of videos kept
+        
+        Returns:
+            True if the data file was rewritten
+        """
+        known = last_known_good.load(Path('data') / 'youtube' / f'{channel_id}.json')
+        if not known or 'videos' not in known:
+            print(f"No data for channel {channel_id} yet; run a full fetch first")
+            return False
+        
+        details = []
+        if video_ids:
+            try:
+                details = self.get_video_details(channel_id, list(dict.fromkeys(video_ids)))
+            except requests.RequestException as e:
+                print(f"Error fetching videos for channel {channel_id}: {e}")
+                return False
+            except KeyError as e:
+                print(f"Unexpected API response structure: {e}")
+                return False
+        
+        gone = set(video_ids) | set(deleted_ids)
+        videos = {video['id']: video for video in known['videos'] if video['id'] not in gone}
+        videos.update((video['id'], video) for video in details)
+        channel_data = {
+            'channel_title': known['channel_title'],
+            'channel_id': channel_id,
+            'videos': sorted(videos.values(), key=lambda x: x['published_at'], reverse=True)
+        }
+        if not self.keep_history:
+            del channel_data['videos'][max_results:]
+        self.generate_hugo_content(channel_data, 'content', channel_slug)
+        return True
+    
+    def get_channel_playlists(self, channel_id, max_playlists=50, max_videos=200, max_workers=4):
+        """
+        Fetch a channel's playlists and the details of the videos they list.
+        
+        The playlists' items are paged concurrently. Their videos are then looked
+        up once, deduplicated across playlists, through get_video_details, so
+        while a run's video_cache is set a video already fetched as an upload or
+        for another playlist costs no further quota. Raises
+        requests.RequestException or KeyError like get_channel_videos.
+        
+        Args:
+            channel_id: YouTube channel ID
+            max_playlists: Maximum number of playlists fetched
+            max_videos: Maximum number of videos read from each playlist
+            max_workers: Maximum number of concurrent API requests
+        
+        Returns:
+            Dict with 'playlists', each listing its available 'video_ids' in
+            playlist order, and 'videos', the details of those videos by ID
+        """
+        playlists = []
+        params = {
+            'part': 'snippet,contentDetails',
+            'channelId': channel_id,
+            'maxResults': VIDEOS_PER_REQUEST,
+            'key': self.api_key
+        }
+        while len(playlists) < max_playlists:
+            page = self.api_get('playlists', params, channel_id)
+            playlists.extend(page['items'])
+            if not page.get('nextPageToken'):
+                break
+            params = dict(params, pageToken=page['nextPageToken'])
+        del playlists[max_playlists:]
+        
+        with profiling.executor(max(1, min(max_workers, len(playlists)))) as executor:
+            playlist_video_ids = list(executor.map(
+                lambda playlist: self.get_playlist_video_ids(channel_id, playlist['id'], max_videos), playlists
+            ))
+            video_ids = list(dict.fromkeys(video_id for ids in playlist_video_ids for video_id in ids))
+            batches = [video_ids[start:start + VIDEOS_PER_REQUEST]
+                       for start in range(0, len(video_ids), VIDEOS_PER_REQUEST)]
+            videos = {video['id']: video
+                      for details in executor.map(lambda batch: self.get_video_details(channel_id, batch), batches)
+                      for video in details}
+        
+        return {
+            'playlists': [{
+                'id': playlist['id'],
+                'title': playlist['snippet']['title'],
+                'description': playlist['snippet']['description'],
+                'published_at': playlist['snippet']['publishedAt'],
+                'thumbnail': (playlist['snippet']['thumbnails'].get('high')
+                              or playlist['snippet']['thumbnails'].get('default') or {}).get('url'),
+                'url': f"https://www.youtube.com/playlist?list={playlist['id']}",
+                'video_ids': [video_id for video_id in dict.fromkeys(ids) if video_id in videos]
+            } for playlist, ids in zip(playlists, playlist_video_ids)],
+            'videos': videos
+        }
+    
+    def get_playlist_video_ids(self, channel_id, playlist_id, max_videos=200):
+        """IDs of the first max_videos items of a playlist, in playlist order."""
+        video_ids = []
+        params = {
+            'part': 'contentDetails',
+            'playlistId': playlist_id,
+            'maxResults': VIDEOS_PER_REQUEST,
+            'key': self.api_key
+        }
+        while len(video_ids) < max_videos:
+            page = self.api_get('playlistItems', params, channel_id)
+            video_ids.extend(item['contentDetails']['videoId'] for item in page['items'])
+            if not page.get('nextPageToken'):
+                break
+            params = dict(params, pageToken=page['nextPageToken'])
+        return video_ids[:max_videos]
+    
+    def get_video_details(self, channel_id, video_ids):
+        """
+        Fetch snippet and live stream details for videos.
+        
+        While a run's video_cache is set, each video is requested from the API
+        at most once, in batches of up to 50, and later calls are answered from
+        the cache. Upcoming streams more than 7 days old are dropped as likely
+        canceled. Raises requests.RequestException or KeyError like
+        get_channel_videos.
+        
+        Returns:
+            List of video dicts in API order, without duplicates
+        """
+        if self.video_cache is None:
+            return self.request_video_details(channel_id, video_ids)
+        
+        video_ids = list(dict.fromkeys(video_ids))
+        with self.video_cache_lock:
+            missing = [video_id for video_id in video_ids if video_id not in self.video_cache]
+        for start in range(0, len(missing), VIDEOS_PER_REQUEST):
+            batch = missing[start:start + VIDEOS_PER_REQUEST]
+            found = {video['id']: video for video in self.request_video_details(channel_id, batch)}
+            with self.video_cache_lock:
+                # Videos the API did not return (private, deleted or skipped) are cached as None
+                self.video_cache.update((video_id, found.get(video_id)) for video_id in batch)
+        with self.video_cache_lock:
+            return [self.video_cache[video_id] for video_id in video_ids if self.video_cache.get(video_id)]
+    
+    def request_video_details(self, channel_id, video_ids):
+        """One videos.list call for get_video_details."""
+        # Get detailed video information including live stream status
+        # statistics and contentDetails come with the same call at no extra quota
+        videos_params = {
+            'part': 'snippet,liveStreamingDetails,statistics,contentDetails',
+            'id': ','.join(video_ids),
+            'key': self.api_key
+        }
+        
+        videos_data = self.api_get('videos', videos_params, channel_id)
+        fetched_at = datetime.now(timezone.utc).isoformat()
+        
+        # Use set to track video IDs and prevent duplicates
+        seen_video_ids = set()
+        videos = []
+        
+        for video in videos_data['items']:
+            video_id = video['id']
+            
+            # Skip if we've already seen this video
+            if video_id in seen_video_ids:
+                continue
+            seen_video_ids.add(video_id)
+            
+            # Determine if this is a live stream
+            is_live_stream = 'liveStreamingDetails' in video
+            live_status = None
+            if is_live_stream:
+                live_details = video['liveStreamingDetails']
+                if 'actualEndTime' in live_details:
+                    live_status = 'completed'
+                elif 'actualStartTime' in live_details:
+                    live_status = 'live'
+                else:
+                    live_status = 'upcoming'
+                    
+                    # Filter out old upcoming streams (likely canceled/never happened)
+                    published_date = datetime.fromisoformat(video['snippet']['publishedAt'].replace('Z', '+00:00'))
+                    days_old = (datetime.now(timezone.utc) - published_date).days
+                    
+                    # Skip upcoming streams older than 7 days (likely canceled)
+                    if days_old > 7:
+                        print(f"Skipping old upcoming stream: {video['snippet']['title']}")
+                        continue
+            
+            video_data = {
+                'id': video_id,
+                'title': video['snippet']['title'],
+                'description': video['snippet']['description'],
+                'published_at': video['snippet']['publishedAt'],
+                'thumbnail': video['snippet']['thumbnails']['maxres']['url'] if 'maxres' in video['snippet']['thumbnails'] else video['snippet']['thumbnails']['high']['url'],
+                'url': f"https://www.youtube.com/watch?v={video_id}",
+                'is_live_stream': is_live_stream,
+                'live_status': live_status,
+                'duration_seconds': parse_duration(video.get('contentDetails', {}).get('duration'))
+            }
+            video_data['is_short'] = is_short(video_data)
+            video_data.update(statistics_fields(video.get('statistics', {}), fetched_at))
+            videos.append(video_data)
+        return videos
+    
+    def refresh_statistics(self, channel_id, videos, max_age_hours=STATISTICS_REFRESH_HOURS):
+        """
+        Update the counts of videos whose statistics are older than max_age_hours.
+        
+        Videos looked up by this run already have fresh counts, so this only
+        touches older videos, e.g. those the feed fast path kept or the
+        backfilled history, and only requests their statistics part (plus
+        contentDetails for records written before durations were kept), 50
+        videos per call. Videos are updated in place; on an API error they keep
+        their previous counts.
+        
+        Args:
+            channel_id: YouTube channel ID
+            videos: Video records of the channel
+            max_age_hours: Hours after which a video's counts are refreshed
+        
+        Returns:
+            Number of videos whose counts were refreshed
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=max_age_hours)).isoformat()
+        due = [video for video in videos if (video.get('statistics_updated_at') or '') < cutoff]
+        refreshed = 0
+        try:
+            for start in range(0, len(due), VIDEOS_PER_REQUEST):
+                batch = due[start:start + VIDEOS_PER_REQUEST]
+                parts = 'statistics'
+                if any('duration_seconds' not in video for video in batch):
+                    parts += ',contentDetails'
+                data = self.api_get('videos', {'part': parts, 'id': ','.join(video['id'] for video in batch),
+                                               'key': self.api_key}, channel_id)
+                fetched_at = datetime.now(timezone.utc).isoformat()
+                items = {item['id']: item for item in data['items']}
+                for video in batch:
+                    item = items.get(video['id'])
+                    if item is None:
+                        continue
+                    if 'contentDetails' in item:
+                        video['duration_seconds'] = parse_duration(item['contentDetails'].get('duration'))
+                        video['is_short'] = is_short(video)
+                    video.update(statistics_fields(item.get('statistics', {}), fetched_at))
+                    refreshed += 1
+        except requests.RequestException as e:
+            print(f"Error refreshing statistics for channel {channel_id}: {e}")
+        except KeyError as e:
+            print(f"Unexpected API response structure: {e}")
+        if refreshed:
+            print(f"Refreshed statistics of {refreshed} older videos")
+        return refreshed
+    
     def generate_hugo_content(self, channel_data, output_dir, channel_slug):
         """Generate Hugo content files from YouTube data."""
         if not channel_data or not channel_data.get('videos'):
             print(f"No data to generate content for channel")
             return
+        if self.cancelled:
+            print(f"Fetch cancelled; not writing {channel_data['channel_id']}")
+            return
             
         channel_title = channel_data['channel_title']
         channel_id = channel_data['channel_id']
@@ -166,8 +612,7 @@ Latest videos from my YouTube channel.
 {{{{< youtube-channel "{channel_id}" >}}}}
 """
         
-        with open(channel_dir / '_index.md', 'w') as f:
-            f.write(channel_content)
+        metrics.write_file(channel_dir / '_index.md', channel_content, self.name)
             
         # Generate video data file for Hugo to use (still use channel_id for data file)
         data_dir = Path('data') / 'youtube'
@@ -175,13 +620,212 @@ Latest videos from my YouTube channel.
         
         # Add channel_slug to the data for template use
         channel_data['channel_slug'] = channel_slug
+        if not channel_data.get('stale'):
+            channel_data['fetched_at'] = datetime.now(timezone.utc).isoformat()
+            if self.store:
+                self.store.upsert_channel(channel_data)
+                channel_data = self.store.channel_data(channel_id)
         
-        with open(data_dir / f'{channel_id}.json', 'w') as f:
-            json.dump(channel_data, f, indent=2)
+        data_file = data_dir / f'{channel_id}.json'
+        if not channel_data.get('stale'):
+            changes.compare('videos', data_file, channel_data['videos'], 'id', self.name)
+        metrics.write_file(data_file, json.dumps(channel_data, indent=2), self.name)
+        if not channel_data.get('stale'):
+            last_known_good.save(data_file, channel_data)
             
         print(f"Generated content for {channel_title} ({len(videos)} videos)")
 
-def main():
+def configure(fetcher, config):
+    """Apply the settings shared by every mode that writes channel data files."""
+    fetcher.store = local_store.open_store(config)
+    fetcher.keep_history = bool(config.get('backfill'))
+
+def create_slug(name):
+    """Create URL-friendly slug from channel name."""
+    # Convert to lowercase, replace spaces and special chars with hyphens
+    slug = re.sub(r'[^\w\s-]', '', name.lower())
+    slug = re.sub(r'[-\s]+', '-', slug)
+    return slug.strip('-')
+
+def fetch_channels(fetcher, config):
+    """
+    Fetch each channel in the configuration and generate its Hugo content.
+    
+    Channels whose circuit breaker is open are not requested. Failed or skipped
+    channels fall back to their last known good data, marked stale.
+    
+    Returns:
+        Dict with the number of channels and videos written and the stale channel IDs
+    """
+    breaker = CircuitBreaker.for_provider('youtube', config.get('circuit_breaker'))
+    configure(fetcher, config)
+    fast_path = config.get('rss_fast_path')
+    fetcher.feed_cache = PersistentLRUCache(FEED_CACHE_FILE) if fast_path else None
+    full_refresh_hours = FULL_REFRESH_HOURS
+    if isinstance(fast_path, dict):
+        full_refresh_hours = fast_path.get('full_refresh_hours', FULL_REFRESH_HOURS)
+    playlists = playlist_settings(config)
+    statistics_hours = config.get('statistics_refresh_hours', STATISTICS_REFRESH_HOURS)
+    fetcher.video_cache = {}
+    channels = 0
+    videos = 0
+    stale = []
+    for channel_config in config['channels']:
+        if fetcher.cancelled:
+            print("Fetch cancelled; not fetching the remaining channels")
+            break
+        channel_id = channel_config['channel_id']
+        channel_name = channel_config.get('name', 'Unknown Channel')
+        channel_slug = create_slug(channel_name)
+        
+        if breaker.allow(channel_id):
+            print(f"Fetching data for channel: {channel_name} (/{channel_slug}/)")
+            known = None
+            if fetcher.feed_cache is not None or fetcher.keep_history:
+                known = last_known_good.load(Path('data') / 'youtube' / f'{channel_id}.json')
+            with profiling.stage(profiling.current, 'get_channel_videos'):
+                if fetcher.feed_cache is not None:
+                    channel_data = fetcher.get_channel_updates(channel_id, known, full_refresh_hours=full_refresh_hours)
+                else:
+                    channel_data = fetcher.get_channel_videos(channel_id)
+            if channel_data and fetcher.keep_history and known:
+                channel_data['videos'] = youtube_backfill.merge_history(channel_data['videos'], known.get('videos'))
+            if channel_data:
+                fetcher.refresh_statistics(channel_id, channel_data['videos'], statistics_hours)
+                breaker.record_success(channel_id)
+                metrics.increment('fetch_items_total', len(channel_data.get('videos') or []),
+                                  provider='youtube', source=channel_id)
+            else:
+                breaker.record_failure(channel_id, "fetch failed")
+                channel_data = fall_back_channel(channel_id, "fetch failed")
+        else:
+            print(f"Skipping channel {channel_name}: too many recent failures")
+            channel_data = fall_back_channel(channel_id, "circuit open")
+        
+        if channel_data:
+            with profiling.stage(profiling.current, 'generate_hugo_content'):
+                fetcher.generate_hugo_content(channel_data, 'content', channel_slug)
+            channels += 1
+            videos += len(channel_data.get('videos') or [])
+            if channel_data.get('stale'):
+                stale.append(channel_id)
+            elif playlists is not None:
+                fetch_playlists(fetcher, channel_id, channel_data['videos'], playlists)
+    fetcher.video_cache = None
+    breaker.save()
+    if fetcher.feed_cache is not None:
+        fetcher.feed_cache.save()
+    return {'items': videos, 'channels': channels, 'stale': stale}
+
+def playlist_settings(config):
+    """get_channel_playlists keyword arguments from the 'playlists' section, or None if it is off."""
+    playlists = config.get('playlists')
+    if not playlists:
+        return None
+    if not isinstance(playlists, dict):
+        return {}
+    return {key: playlists[key] for key in ('max_playlists', 'max_videos', 'max_workers') if key in playlists}
+
+def fetch_playlists(fetcher, channel_id, channel_videos, settings):
+    """
+    Fetch a channel's playlists into data/youtube_playlists/<channel_id>.json.
+    
+    Playlists reference their videos by ID. Videos already in the channel's
+    data file are not repeated; the others (older uploads, other channels'
+    videos) are stored once under 'videos', however many playlists list them.
+    A failed fetch keeps the previous file.
+    
+    Args:
+        fetcher: YouTubeFetcher with the run's video_cache set
+        channel_id: YouTube channel ID
+        channel_videos: Videos of the channel's data file
+        settings: Keyword arguments for get_channel_playlists
+    
+    Returns:
+        Number of playlists written, or None if the fetch failed
+    """
+    # Uploads the feed fast path did not look up again still need no lookup
+    with fetcher.video_cache_lock:
+        for video in channel_videos:
+            fetcher.video_cache.setdefault(video['id'], video)
+    try:
+        playlists = fetcher.get_channel_playlists(channel_id, **settings)
+    except requests.RequestException as e:
+        print(f"Error fetching playlists for channel {channel_id}: {e}")
+        return None
+    except KeyError as e:
+        print(f"Unexpected API response structure: {e}")
+        return None
+    
+    upload_ids = {video['id'] for video in channel_videos}
+    playlist_data = {
+        'channel_id': channel_id,
+        'fetched_at': datetime.now(timezone.utc).isoformat(),
+        'playlists': playlists['playlists'],
+        'videos': {video_id: video for video_id, video in playlists['videos'].items() if video_id not in upload_ids}
+    }
+    if fetcher.cancelled:
+        return None
+    data_dir = Path('data') / PLAYLISTS_DIR
+    data_dir.mkdir(parents=True, exist_ok=True)
+    metrics.write_file(data_dir / f'{channel_id}.json', json.dumps(playlist_data, indent=2), fetcher.name)
+    print(f"Generated {len(playlist_data['playlists'])} playlists for channel {channel_id} "
+          f"({len(playlist_data['videos'])} videos outside its uploads)")
+    return len(playlist_data['playlists'])
+
+def refresh_live_streams(fetcher, config):
+    """
+    Look up the live and upcoming streams in each channel's data file again.
+    
+    Costs one API call per channel that has such streams and none otherwise,
+    so it can run far more often than a full fetch.
+    
+    Returns:
+        Dict with the number of streams refreshed
+    """
+    configure(fetcher, config)
+    refreshed = 0
+    for channel_config in config['channels']:
+        channel_id = channel_config['channel_id']
+        known = last_known_good.load(Path('data') / 'youtube' / f'{channel_id}.json') or {}
+        live_ids = [video['id'] for video in known.get('videos') or []
+                    if video.get('live_status') in ('live', 'upcoming')]
+        if not live_ids:
+            continue
+        print(f"Refreshing {len(live_ids)} live and upcoming streams for channel {channel_id}")
+        channel_slug = create_slug(channel_config.get('name', 'Unknown Channel'))
+        if fetcher.update_videos(channel_id, channel_slug, live_ids):
+            refreshed += len(live_ids)
+    return {'items': refreshed}
+
+def fall_back_channel(channel_id, reason):
+    """Load a channel's last known good data, marked stale, or None if there is none."""
+    data = last_known_good.load(Path('data') / 'youtube' / f'{channel_id}.json')
+    if data is None:
+        return None
+    print(f"Using last known good data for channel {channel_id} ({reason})")
+    return last_known_good.mark_stale(data, reason)
+
+def parse_args(argv):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Fetch YouTube videos for the Hugo site.")
+    parser.add_argument('--subscribe', action='store_true',
+                        help="Stay running and apply new uploads pushed by the YouTube WebSub hub")
+    parser.add_argument('--backfill', action='store_true',
+                        help="Fetch the full upload history, resuming from the last checkpoint")
+    parser.add_argument('--channel', metavar='CHANNEL_ID', help="With --backfill, only this channel")
+    profiling.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv if argv is not None else [])
+    with profiling.profiled(args, YouTubeFetcher.name):
+        run(args)
+
+
+def run(args):
+    """Fetch every channel in youtube-channels.yaml, or subscribe to them with --subscribe."""
     # Get API key from environment
     api_key = os.getenv('YOUTUBE_API_KEY')
     if not api_key:
@@ -205,24 +849,95 @@ def main():
         
     fetcher = YouTubeFetcher(api_key)
     
-    def create_slug(name):
-        """Create URL-friendly slug from channel name."""
-        # Convert to lowercase, replace spaces and special chars with hyphens
-        slug = re.sub(r'[^\w\s-]', '', name.lower())
-        slug = re.sub(r'[-\s]+', '-', slug)
-        return slug.strip('-')
+    if args.subscribe:
+        subscribe(fetcher, config)
+        return
+    if args.backfill:
+        backfill(fetcher, config, args.channel)
+        return
     
     # Process each channel
-    for channel_config in config['channels']:
-        channel_id = channel_config['channel_id']
-        channel_name = channel_config.get('name', 'Unknown Channel')
-        channel_slug = create_slug(channel_name)
-        
-        print(f"Fetching data for channel: {channel_name} (/{channel_slug}/)")
-        
-        channel_data = fetcher.get_channel_videos(channel_id)
-        if channel_data:
-            fetcher.generate_hugo_content(channel_data, 'content', channel_slug)
+    changes.start()
+    fetch_channels(fetcher, config)
+    changes.write()
+    listing_indexes.write_indexes()
+    search_index.update_index(changes.changes)
+
+
+def backfill(fetcher, config, channel_id=None):
+    """Walk the configured channels' full upload history, resuming from their checkpoints."""
+    backfill_config = config.get('backfill') if isinstance(config.get('backfill'), dict) else {}
+    channels = [(channel['channel_id'], create_slug(channel.get('name', 'Unknown Channel')))
+                for channel in config['channels'] if channel_id in (None, channel['channel_id'])]
+    if not channels:
+        print(f"Error: Channel {channel_id} is not in youtube-channels.yaml")
+        sys.exit(1)
+    if not config.get('backfill'):
+        print("Warning: Without a 'backfill' section in youtube-channels.yaml, "
+              "the next regular fetch drops the backfilled history")
+    
+    configure(fetcher, config)
+    fetcher.keep_history = True
+    changes.start()
+    results = youtube_backfill.backfill_channels(
+        fetcher,
+        channels,
+        quota_budget=backfill_config.get('quota_budget', youtube_backfill.DEFAULT_QUOTA_BUDGET),
+        deadline_seconds=backfill_config.get('deadline_seconds', youtube_backfill.DEFAULT_DEADLINE_SECONDS)
+    )
+    changes.write()
+    listing_indexes.write_indexes()
+    search_index.update_index(changes.changes)
+    
+    spent = sum(result['quota_spent'] for result in results.values())
+    print(f"Backfill used {spent} quota units; "
+          f"{sum(result['status'] == 'complete' for result in results.values())} of {len(channels)} channels complete")
+    if any(result['status'] == 'error' for result in results.values()):
+        sys.exit(1)
+
+
+def subscribe(fetcher, config):
+    """Run the long-lived WebSub receiver for the configured channels."""
+    from youtube_websub import DEFAULT_HUB, LEASE_SECONDS, WebSubReceiver
+    
+    websub_config = config.get('websub') or {}
+    callback_url = websub_config.get('callback_url')
+    if not callback_url:
+        print("Error: Set websub.callback_url in youtube-channels.yaml to the receiver's public URL")
+        sys.exit(1)
+    rebuild_command = websub_config.get('rebuild_command')
+    
+    def rebuild():
+        listing_indexes.write_indexes()
+        search_index.update_index()
+        if not rebuild_command:
+            return
+        print(f"Running rebuild: {rebuild_command}")
+        result = subprocess.run(shlex.split(rebuild_command))
+        if result.returncode != 0:
+            print(f"Warning: Rebuild exited with status {result.returncode}")
+    
+    configure(fetcher, config)
+    receiver = WebSubReceiver(
+        fetcher,
+        {channel['channel_id']: create_slug(channel.get('name', 'Unknown Channel'))
+         for channel in config['channels']},
+        callback_url,
+        hub=websub_config.get('hub', DEFAULT_HUB),
+        secret=os.getenv('YOUTUBE_WEBSUB_SECRET'),
+        host=websub_config.get('host', '0.0.0.0'),
+        port=websub_config.get('port', 8080),
+        lease_seconds=websub_config.get('lease_seconds', LEASE_SECONDS),
+        on_rebuild=rebuild,
+        debounce_seconds=websub_config.get('debounce_seconds', 30)
+    )
+    
+    # Shut the server down and run a pending rebuild on Ctrl+C / SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: receiver.stop())
+    try:
+        receiver.run()
+    except KeyboardInterrupt:
+        receiver.stop()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main(sys.argv[1:])
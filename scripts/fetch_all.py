@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Run every configured fetch provider concurrently in one process.
+
+Each provider (YouTube, Bluesky) runs in its own thread with its own deadline,
+so the fetch phase of a deploy takes as long as the slowest provider rather
+than the sum of all of them. A provider that misses its deadline is cancelled
+and falls back to its last known good data. Afterwards the run report, the
+change feed and the listing and search indexes are written.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fetch_bluesky_data import BlueskyFetcher
+import listing_indexes
+import profiling
+import search_index
+from change_feed import FEED as changes
+from fetch_youtube_data import YouTubeFetcher
+from metrics import REGISTRY as metrics
+
+PROVIDERS = [YouTubeFetcher, BlueskyFetcher]
+REPORT_FILE = '.cache/fetch-report.json'
+CANCEL_GRACE_SECONDS = 10  # How long a provider past its deadline gets to stop after cancel()
+
+
+class ProviderRun:
+    """Runs one provider's fetch in a daemon thread and records the outcome."""
+
+    def __init__(self, provider, deadline, profiler=None, grace=CANCEL_GRACE_SECONDS):
+        self.provider = provider
+        self.deadline = deadline
+        self.profiler = profiler
+        self.grace = grace
+        self.result = {'status': 'running'}
+        self.config = None
+        self.started = None
+        self.started_at = None
+        self.thread = threading.Thread(target=self.run, name=f"fetch-{provider.name}", daemon=True)
+
+    def start(self):
+        self.started = time.monotonic()
+        self.started_at = datetime.now(timezone.utc)
+        self.thread.start()
+
+    def run(self):
+        try:
+            with profiling.stage(self.profiler, self.provider.name):
+                self.config = self.provider.load_config()
+                summary = self.provider.fetch(self.config) or {}
+            result = dict(summary, status='ok')
+        except (Exception, SystemExit) as e:
+            traceback.print_exc()
+            result = {'status': 'error', 'error': str(e) or e.__class__.__name__}
+        result['duration_seconds'] = round(time.monotonic() - self.started, 3)
+        self.result = result
+
+    def wait(self):
+        """
+        Wait until the provider finishes or its deadline passes.
+
+        A provider past its deadline is cancelled and given a grace period to
+        stop; one stuck in a request keeps its thread, but writes nothing more.
+        The data files it did not refresh are then restored from their last
+        known good snapshots and marked stale.
+        """
+        remaining = self.started + self.deadline - time.monotonic()
+        self.thread.join(max(remaining, 0))
+        if self.thread.is_alive():
+            self.provider.cancel()
+            self.thread.join(self.grace)
+            error = f"Did not finish within {self.deadline}s"
+            self.result = {
+                'status': 'timeout',
+                'error': error,
+                'stale': self.fall_back(error),
+                'duration_seconds': round(time.monotonic() - self.started, 3)
+            }
+        return self.result
+
+    def fall_back(self, reason):
+        """Restore the provider's unrefreshed data files. Returns the files restored."""
+        try:
+            config = self.config if self.config is not None else self.provider.load_config()
+            return self.provider.fall_back(config, reason, self.started_at)
+        except Exception:
+            traceback.print_exc()
+            return []
+
+
+def parse_deadlines(values):
+    """Parse repeated NAME=SECONDS options into a dict."""
+    deadlines = {}
+    for value in values or []:
+        name, _, seconds = value.partition('=')
+        try:
+            deadlines[name] = float(seconds)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid deadline '{value}', expected NAME=SECONDS")
+    return deadlines
+
+
+def run_providers(providers, deadlines=None, profiler=None):
+    """
+    Run providers concurrently, each bounded by its deadline.
+
+    Args:
+        providers: Provider instances implementing FetchProvider
+        deadlines: Optional dict of provider name -> seconds, overriding provider defaults
+        profiler: Optional profiling.Profiler; providers then run one at a time so
+            each profile only contains its own provider's work
+
+    Returns:
+        Dict of provider name -> result dict with 'status' and 'duration_seconds'
+    """
+    deadlines = deadlines or {}
+    runs = [ProviderRun(provider, deadlines.get(provider.name, provider.deadline), profiler) for provider in providers]
+    if profiler:
+        results = {}
+        for run in runs:
+            run.start()
+            results[run.provider.name] = run.wait()
+    else:
+        for run in runs:
+            run.start()
+        # Every thread started at the same time, so waiting in turn still honours each deadline
+        results = {run.provider.name: run.wait() for run in runs}
+    for name, result in results.items():
+        metrics.set_gauge('fetch_provider_duration_seconds', result['duration_seconds'], provider=name)
+        metrics.set_gauge('fetch_provider_success', int(result['status'] == 'ok'), provider=name)
+    return results
+
+
+def write_report(report, report_file=REPORT_FILE):
+    """Write the run report as JSON."""
+    path = Path(report_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch all social media data concurrently.")
+    parser.add_argument('--only', action='append', choices=[p.name for p in PROVIDERS],
+                        help="Run only this provider (may be repeated)")
+    parser.add_argument('--deadline', action='append', metavar='NAME=SECONDS',
+                        help="Override a provider's deadline (may be repeated)")
+    parser.add_argument('--report', default=REPORT_FILE, help="Where to write the run report")
+    parser.add_argument('--prometheus', metavar='PATH',
+                        help="Also write metrics as a Prometheus textfile (e.g. for node_exporter)")
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        deadlines = parse_deadlines(args.deadline)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    started_at = datetime.now(timezone.utc)
+    start = time.monotonic()
+    providers = []
+    results = {}
+    for provider_class in PROVIDERS:
+        if args.only and provider_class.name not in args.only:
+            continue
+        if not Path(provider_class.config_file).exists():
+            results[provider_class.name] = {'status': 'skipped', 'error': f"{provider_class.config_file} not found"}
+            continue
+        provider = provider_class.from_environment()
+        if provider is None:
+            results[provider_class.name] = {'status': 'skipped', 'error': "Credentials not set"}
+            continue
+        providers.append(provider)
+
+    profiler = profiling.from_args(args, Path(args.report).parent / 'profile')
+    changes.start()
+    results.update(run_providers(providers, deadlines, profiler))
+    changes.write(Path(args.report).parent / 'changes.json')
+    listing_indexes.write_indexes()
+    search_stats = search_index.update_index(changes.changes)
+    report = {
+        'started_at': started_at.isoformat(),
+        'finished_at': datetime.now(timezone.utc).isoformat(),
+        'duration_seconds': round(time.monotonic() - start, 3),
+        'providers': results,
+        'metrics': metrics.to_dict(),
+        'changes': changes.summary(),
+        'search_index': search_stats
+    }
+    if profiler:
+        report['profile'] = str(profiler.save())
+    write_report(report, args.report)
+    if args.prometheus:
+        metrics.write_prometheus(args.prometheus)
+
+    for name, result in results.items():
+        detail = f" ({result['error']})" if result.get('error') else ''
+        items = f", {result['items']} items" if 'items' in result else ''
+        print(f"{name}: {result['status']}{items}{detail}")
+    if profiler:
+        profiler.print_summary()
+
+    # Fail only when nothing could be fetched, so one outage does not block a deploy
+    if providers and all(result['status'] != 'ok' for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
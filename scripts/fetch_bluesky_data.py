@@ -0,0 +1 @@
+fetch-bluesky-data.py
\ No newline at end of file
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Interface shared by the data sources run from fetch_all.py.
+"""
+
+from pathlib import Path
+
+import yaml
+
+
+class FetchProvider:
+    """
+    A data source the fetch orchestrator can run.
+
+    Subclasses set name, config_file and deadline, build themselves from the
+    environment and implement fetch().
+    """
+
+    name = None
+    config_file = None
+    deadline = 300  # Seconds the orchestrator waits for fetch() by default
+    cancelled = False  # Set by cancel() once the orchestrator stops waiting
+
+    @classmethod
+    def from_environment(cls):
+        """Create the provider from environment credentials, or return None if they are missing."""
+        raise NotImplementedError
+
+    def load_config(self):
+        """Read the provider's YAML configuration file."""
+        with open(Path(self.config_file)) as f:
+            return yaml.safe_load(f) or {}
+
+    def cancel(self):
+        """
+        Ask a running fetch() to stop.
+
+        fetch() checks this between sources and writes no data files once it
+        is set, so the orchestrator can build its indexes without the provider
+        still writing underneath it.
+        """
+        self.cancelled = True
+
+    def fall_back(self, config, reason, since):
+        """
+        Restore the data files a run did not refresh from their last known good
+        snapshots, marked stale, and record the failure in the circuit breakers.
+
+        Called by the orchestrator when fetch() misses its deadline. Providers
+        without data files keep this default.
+
+        Args:
+            config: The provider's configuration
+            reason: Why the files are stale
+            since: Timezone-aware datetime the run started at; files written
+                since then are fresh and left alone
+
+        Returns:
+            List of the data files restored
+        """
+        return []
+
+    def fetch(self, config):
+        """
+        Fetch the source and write its data and content files.
+
+        Returns:
+            Dict summarising the run, with at least an 'items' count
+        """
+        raise NotImplementedError
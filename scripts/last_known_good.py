@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Last-known-good snapshots of the Hugo data files.
+
+Every successful write of a data file is also saved under .cache, which the
+deploy workflow keeps between runs. When a source fails, its data file is
+restored from the snapshot and marked stale, so templates can say so instead
+of the section disappearing.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+SNAPSHOT_DIR = '.cache/last-known-good'
+
+
+def snapshot_path(data_file, snapshot_dir=SNAPSHOT_DIR):
+    return Path(snapshot_dir) / Path(data_file)
+
+
+def save(data_file, data, snapshot_dir=SNAPSHOT_DIR):
+    """Save a freshly written data file's contents as its last-known-good snapshot."""
+    path = snapshot_path(data_file, snapshot_dir)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f, default=str)
+    except OSError as e:
+        print(f"Warning: Could not save snapshot of {data_file}: {e}")
+
+
+def load(data_file, snapshot_dir=SNAPSHOT_DIR):
+    """Return the snapshot of a data file, else the data file itself, else None."""
+    for path in (snapshot_path(data_file, snapshot_dir), Path(data_file)):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError, TypeError):
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def written_since(data_file, since, timestamp_field):
+    """
+    Whether a data file holds fresh (not stale) data written at or after since.
+
+    Args:
+        data_file: Data file to check
+        since: Timezone-aware datetime, e.g. when the run started
+        timestamp_field: Key of the file's write timestamp ('fetched_at', 'last_updated')
+    """
+    try:
+        with open(data_file) as f:
+            data = json.load(f)
+        written = datetime.fromisoformat(str(data[timestamp_field]).replace('Z', '+00:00'))
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        return False
+    if written.tzinfo is None:
+        written = written.replace(tzinfo=timezone.utc)
+    return not data.get('stale') and written >= since
+
+
+def mark_stale(data, reason):
+    """Flag data as served from a snapshot; its own timestamp says how old it is."""
+    data['stale'] = True
+    data['stale_reason'] = str(reason)
+    return data
+
+
+def fall_back(data_file, reason, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Restore a data file from its last-known-good snapshot, marked stale.
+
+    Returns:
+        The restored data, or None if there is nothing to fall back to
+    """
+    data = load(data_file, snapshot_dir)
+    if data is None:
+        return None
+    mark_stale(data, reason)
+    path = Path(data_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A provider that missed its deadline may still be writing the same file
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.stale.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+    print(f"Using last known good {data_file} ({reason})")
+    return data
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Precomputed listing indexes for the Hugo templates.
+
+The templates used to range over whole data files and format every item
+(dateFormat, truncate, live badge logic, author lookups) on every build. This
+module does that work once per fetch and writes small, display-ready files to
+data/indexes/, which Hugo exposes as .Site.Data.indexes:
+
+    channels/<channel_id>.json  Per-channel summaries with formatted dates,
+                                truncated descriptions and badge state, plus
+                                'by_year', 'status' (live/upcoming/completed),
+                                'popular' (most viewed first) and 'shorts'
+                                buckets holding positions into 'videos', and
+                                'playlists' holding positions into 'videos'
+                                followed by 'playlist_videos'
+    latest.json                 The newest videos across every channel
+    popular.json                The most viewed videos across every channel
+    bluesky.json                Posts with authors resolved and dates formatted
+    activity.json               YouTube videos and Bluesky posts in one timeline
+
+The indexes are regenerated at the end of every fetch, store export and
+archive export, and can be rebuilt by hand with `python scripts/listing_indexes.py`.
+"""
+
+import argparse
+import json
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from metrics import REGISTRY as metrics
+
+DATA_DIR = 'data'
+INDEX_DIR = 'indexes'
+PLAYLISTS_DIR = 'youtube_playlists'
+DESCRIPTION_LENGTH = 150
+POST_TITLE_LENGTH = 100
+LATEST_LIMIT = 12
+POPULAR_LIMIT = 12
+ACTIVITY_LIMIT = 20
+LIVE_STATUSES = ('live', 'upcoming', 'completed')
+BADGE_LABELS = {'live': '🔴 LIVE', 'upcoming': '📅 Upcoming'}
+STREAM_LABEL = '📺 Stream'
+EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+# Providers fetched concurrently by fetch_all.py may both finish at once
+write_lock = threading.Lock()
+
+
+def truncate(text, length=DESCRIPTION_LENGTH, ellipsis=' …'):
+    """Shorten text at a word boundary the way Hugo's truncate does."""
+    if not text or len(text) <= length:
+        return text or ''
+    cut = max(text.rfind(' ', 0, length + 1), text.rfind('\n', 0, length + 1))
+    return text[:cut if cut > 0 else length].rstrip() + ellipsis
+
+
+def parse_timestamp(value):
+    """Parse an ISO-8601 timestamp, or return None if it is missing or malformed."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def format_date(value, short=False):
+    """Format a timestamp as 'January 2, 2006', or 'Jan 2, 2006' when short."""
+    parsed = parse_timestamp(value)
+    if parsed is None:
+        return None
+    month = f"{parsed:%b}" if short else f"{parsed:%B}"
+    return f"{month} {parsed.day}, {parsed.year}"
+
+
+def format_duration(seconds):
+    """Format a duration as 'M:SS', or 'H:MM:SS' from an hour on."""
+    if not seconds:
+        return None
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def live_badge(video):
+    """Badge class and label for a live stream, or None for a regular upload."""
+    if not video.get('is_live_stream'):
+        return None
+    status = video.get('live_status')
+    return {'class': status, 'label': BADGE_LABELS.get(status, STREAM_LABEL)}
+
+
+def video_summary(video):
+    """The fields a listing shows for one video, already formatted."""
+    return {
+        'id': video.get('id'),
+        'title': video.get('title'),
+        'url': video.get('url'),
+        'thumbnail': video.get('thumbnail'),
+        'published_at': video.get('published_at'),
+        'date': format_date(video.get('published_at')),
+        'date_short': format_date(video.get('published_at'), short=True),
+        'excerpt': truncate(video.get('description')),
+        'badge': live_badge(video),
+        'duration': format_duration(video.get('duration_seconds')),
+        'view_count': video.get('view_count'),
+        'is_short': bool(video.get('is_short'))
+    }
+
+
+def channel_index(channel_data, playlist_data=None):
+    """
+    Build the index for one channel data file.
+
+    Args:
+        channel_data: Contents of data/youtube/<channel_id>.json
+        playlist_data: Contents of data/youtube_playlists/<channel_id>.json, if any
+
+    Returns:
+        Dict with the channel fields, 'videos' summaries in data file order,
+        'by_year'/'status'/'popular'/'shorts' buckets of positions into
+        'videos' and 'playlists'
+        whose positions count on into 'playlist_videos', the summaries of
+        playlist videos that are not uploads in the data file
+    """
+    videos = [video_summary(video) for video in channel_data.get('videos', [])]
+    by_year = {}
+    status = {name: [] for name in LIVE_STATUSES}
+    for position, video in enumerate(channel_data.get('videos', [])):
+        published = parse_timestamp(video.get('published_at'))
+        if published is not None:
+            by_year.setdefault(published.year, []).append(position)
+        if video.get('is_live_stream') and video.get('live_status') in status:
+            status[video['live_status']].append(position)
+
+    viewed = [position for position, video in enumerate(videos) if video['view_count'] is not None]
+    popular = sorted(viewed, key=lambda position: videos[position]['view_count'], reverse=True)[:POPULAR_LIMIT]
+    shorts = [position for position, video in enumerate(videos) if video['is_short']]
+
+    positions = {video.get('id'): position for position, video in enumerate(channel_data.get('videos', []))}
+    playlist_videos = []
+    playlists = []
+    for playlist in (playlist_data or {}).get('playlists', []):
+        entries = []
+        for video_id in playlist.get('video_ids', []):
+            if video_id not in positions:
+                video = (playlist_data.get('videos') or {}).get(video_id)
+                if not video:
+                    continue
+                positions[video_id] = len(videos) + len(playlist_videos)
+                playlist_videos.append(video_summary(video))
+            entries.append(positions[video_id])
+        playlists.append({
+            'id': playlist.get('id'),
+            'title': playlist.get('title'),
+            'url': playlist.get('url'),
+            'thumbnail': playlist.get('thumbnail'),
+            'excerpt': truncate(playlist.get('description')),
+            'video_count': len(entries),
+            'videos': entries
+        })
+
+    return {
+        'channel_id': channel_data.get('channel_id'),
+        'channel_title': channel_data.get('channel_title'),
+        'channel_slug': channel_data.get('channel_slug') or channel_data.get('channel_id'),
+        'video_count': len(videos),
+        'stale': bool(channel_data.get('stale')),
+        'fetched_date': format_date(channel_data.get('fetched_at'), short=True),
+        'videos': videos,
+        'by_year': [{'year': year, 'videos': by_year[year]} for year in sorted(by_year, reverse=True)],
+        'status': status,
+        'popular': popular,
+        'shorts': shorts,
+        'playlists': playlists,
+        'playlist_videos': playlist_videos
+    }
+
+
+def resolve_author(author, authors):
+    """An author dict, looking it up by DID when the post uses the author table."""
+    if isinstance(author, dict):
+        return author
+    return authors.get(author) or {'handle': author, 'display_name': author, 'avatar': None}
+
+
+def resolve_replies(replies, authors):
+    return [dict(reply, author=resolve_author(reply.get('author'), authors),
+                 replies=resolve_replies(reply.get('replies', []), authors))
+            for reply in replies]
+
+
+def bluesky_index(bluesky_data):
+    """
+    Build the Bluesky index: every post with its author and thread authors
+    resolved and its date formatted.
+
+    Args:
+        bluesky_data: Contents of data/bluesky.json
+    """
+    authors = bluesky_data.get('authors') or {}
+    posts = []
+    for post in bluesky_data.get('posts', []):
+        post = dict(post, author=resolve_author(post.get('author'), authors),
+                    date_short=format_date(post.get('created_at'), short=True))
+        if post.get('thread'):
+            post['thread'] = dict(post['thread'], replies=resolve_replies(post['thread'].get('replies', []), authors))
+        posts.append(post)
+
+    profile = posts[0]['author'].get('handle') if posts else None
+    return {
+        'stale': bool(bluesky_data.get('stale')),
+        'updated_date': format_date(bluesky_data.get('last_updated'), short=True),
+        'profile_url': f"https://bsky.app/profile/{profile}" if profile else None,
+        'posts': posts
+    }
+
+
+def latest_videos(channels, limit=LATEST_LIMIT):
+    """The newest videos across channel indexes, each with its channel's title and slug."""
+    videos = [dict(video, channel_title=channel['channel_title'], channel_slug=channel['channel_slug'])
+              for channel in channels for video in channel['videos']]
+    videos.sort(key=lambda video: parse_timestamp(video['published_at']) or EPOCH, reverse=True)
+    return videos[:limit]
+
+
+def popular_videos(channels, limit=POPULAR_LIMIT):
+    """The most viewed videos across channel indexes, each with its channel's title and slug."""
+    videos = [dict(video, channel_title=channel['channel_title'], channel_slug=channel['channel_slug'])
+              for channel in channels for video in channel['videos'] if video['view_count'] is not None]
+    videos.sort(key=lambda video: video['view_count'], reverse=True)
+    return videos[:limit]
+
+
+def activity_timeline(channels, bluesky, limit=ACTIVITY_LIMIT):
+    """
+    Merge videos and posts into one newest-first timeline.
+
+    Every entry has 'type' ('video' or 'post'), 'title', 'url', 'published_at',
+    'date', 'source' and 'source_url', so templates render both alike.
+    """
+    items = [{
+        'type': 'video',
+        'title': video['title'],
+        'url': video['url'],
+        'thumbnail': video['thumbnail'],
+        'published_at': video['published_at'],
+        'date': video['date_short'],
+        'badge': video['badge'],
+        'source': channel['channel_title'],
+        'source_url': f"/youtube/{channel['channel_slug']}/"
+    } for channel in channels for video in channel['videos']]
+    items.extend({
+        'type': 'post',
+        'title': truncate(post.get('text'), POST_TITLE_LENGTH),
+        'url': post.get('url'),
+        'thumbnail': None,
+        'published_at': post.get('created_at'),
+        'date': post['date_short'],
+        'badge': None,
+        'source': f"@{post['author'].get('handle')}",
+        'source_url': f"https://bsky.app/profile/{post['author'].get('handle')}"
+    } for post in bluesky['posts'])
+    items.sort(key=lambda item: parse_timestamp(item['published_at']) or EPOCH, reverse=True)
+    return items[:limit]
+
+
+def load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Warning: Skipping {path} for listing indexes: {e}")
+        return None
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return metrics.write_file(path, json.dumps(data, indent=2, ensure_ascii=False), 'indexes')
+
+
+def write_indexes(data_dir=DATA_DIR):
+    """
+    Regenerate every listing index under <data_dir>/indexes from the data files.
+
+    Indexes of channels whose data file is gone are removed.
+
+    Returns:
+        Number of index files whose content changed
+    """
+    data_dir = Path(data_dir)
+    index_dir = data_dir / INDEX_DIR
+    with write_lock:
+        channels = []
+        for data_file in sorted((data_dir / 'youtube').glob('*.json')):
+            channel_data = load_json(data_file)
+            if isinstance(channel_data, dict):
+                playlist_data = load_json(data_dir / PLAYLISTS_DIR / data_file.name)
+                channel = channel_index(channel_data, playlist_data if isinstance(playlist_data, dict) else None)
+                channel['channel_id'] = channel['channel_id'] or data_file.stem
+                channels.append(channel)
+
+        bluesky_data = load_json(data_dir / 'bluesky.json')
+        bluesky = bluesky_index(bluesky_data if isinstance(bluesky_data, dict) else {})
+
+        changed = 0
+        for channel in channels:
+            changed += write_json(index_dir / 'channels' / f"{channel['channel_id']}.json", channel)
+        current = {f"{channel['channel_id']}.json" for channel in channels}
+        for index_file in (index_dir / 'channels').glob('*.json'):
+            if index_file.name not in current:
+                index_file.unlink()
+                changed += 1
+
+        changed += write_json(index_dir / 'latest.json', {'videos': latest_videos(channels)})
+        changed += write_json(index_dir / 'popular.json', {'videos': popular_videos(channels)})
+        changed += write_json(index_dir / 'bluesky.json', bluesky)
+        changed += write_json(index_dir / 'activity.json', {'items': activity_timeline(channels, bluesky)})
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate the listing indexes used by the Hugo templates.")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Hugo data directory")
+    args = parser.parse_args(argv)
+
+    changed = write_indexes(args.data_dir)
+    print(f"Listing indexes written to {Path(args.data_dir) / INDEX_DIR}/ ({changed} changed)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+SQLite store for fetched YouTube and Bluesky entities.
+
+Both fetchers upsert channels, videos, posts, authors and embeds into one
+database, so lookups and partial updates are indexed instead of re-reading the
+JSON data files. The Hugo data files become projections of the store:
+channel_data() and bluesky_data() rebuild the data/youtube/<channel_id>.json
+and data/bluesky.json shapes from queries, with a fixed key and row order.
+
+Fields a fetcher adds that have no column of their own are kept in an 'extra'
+JSON column and returned unchanged, so the projection never drops data.
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import listing_indexes
+import search_index
+from change_feed import FEED as changes
+
+STORE_FILE = '.cache/store.sqlite3'
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    slug TEXT,
+    fetched_at TEXT
+);
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL REFERENCES channels (channel_id),
+    title TEXT,
+    description TEXT,
+    published_at TEXT,
+    thumbnail TEXT,
+    url TEXT,
+    is_live_stream INTEGER NOT NULL DEFAULT 0,
+    live_status TEXT,
+    listed INTEGER NOT NULL DEFAULT 1,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS videos_by_channel ON videos (channel_id, listed, published_at DESC);
+CREATE TABLE IF NOT EXISTS authors (
+    did TEXT PRIMARY KEY,
+    handle TEXT,
+    display_name TEXT,
+    avatar TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS authors_by_handle ON authors (handle);
+CREATE TABLE IF NOT EXISTS posts (
+    uri TEXT PRIMARY KEY,
+    cid TEXT,
+    author_did TEXT NOT NULL,
+    created_at TEXT,
+    text TEXT,
+    html TEXT,
+    like_count INTEGER NOT NULL DEFAULT 0,
+    repost_count INTEGER NOT NULL DEFAULT 0,
+    reply_count INTEGER NOT NULL DEFAULT 0,
+    url TEXT,
+    links TEXT,
+    mentions TEXT,
+    thread TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_by_created_at ON posts (created_at DESC);
+CREATE INDEX IF NOT EXISTS posts_by_author ON posts (author_did, created_at DESC);
+CREATE TABLE IF NOT EXISTS embeds (
+    post_uri TEXT PRIMARY KEY REFERENCES posts (uri),
+    type TEXT,
+    data TEXT
+);
+"""
+
+# Keys of the exported dicts, in output order
+VIDEO_FIELDS = ['id', 'title', 'description', 'published_at', 'thumbnail', 'url', 'is_live_stream', 'live_status']
+POST_FIELDS = ['uri', 'cid', 'text', 'html', 'created_at', 'author', 'like_count', 'repost_count',
+               'reply_count', 'url', 'links', 'mentions', 'embed', 'thread']
+AUTHOR_FIELDS = ['handle', 'display_name', 'avatar']
+
+
+def dumps(value):
+    return None if value is None else json.dumps(value, sort_keys=True, default=str)
+
+
+def loads(value):
+    return None if value is None else json.loads(value)
+
+
+def extra_fields(item, known):
+    """JSON of the keys in item that have no column, or None if there are none."""
+    extra = {key: value for key, value in item.items() if key not in known}
+    return dumps(extra) if extra else None
+
+
+def post_did(uri):
+    return uri.split('/')[2]
+
+
+def reply_authors(replies):
+    """Yield the author DIDs referenced anywhere in a reply tree."""
+    for reply in replies or []:
+        if isinstance(reply.get('author'), str):
+            yield reply['author']
+        yield from reply_authors(reply.get('replies'))
+
+
+class LocalStore:
+    def __init__(self, path=STORE_FILE):
+        """
+        Open (or create) the store.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.local = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
+        # Providers write from their own threads and connections; WAL lets them share the file
+        self.db.execute('PRAGMA journal_mode=WAL')
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"{self.path} has schema version {version}, newer than {SCHEMA_VERSION}")
+        with self.db:
+            self.db.executescript(SCHEMA)
+            self.db.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+    @property
+    def db(self):
+        """
+        The calling thread's connection, opened on first use.
+
+        A store opened on the main thread is also used from worker and HTTP
+        handler threads (e.g. the WebSub receiver), and a SQLite connection
+        must stay on the thread that uses it.
+        """
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            # Only close() touches a connection from another thread
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA foreign_keys=ON')
+            self.local.db = db
+            with self.connections_lock:
+                self.connections.append(db)
+        return db
+
+    def close(self):
+        """Close the connections of every thread that used the store."""
+        with self.connections_lock:
+            for db in self.connections:
+                db.close()
+            self.connections = []
+        self.local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # YouTube
+
+    def upsert_channel(self, channel_data):
+        """
+        Upsert a channel and the videos from its latest fetch.
+
+        Videos of the channel that are missing from channel_data stay in the
+        store but are no longer listed in its data file.
+        """
+        channel_id = channel_data['channel_id']
+        with self.db:
+            self.db.execute(
+                """INSERT INTO channels (channel_id, title, slug, fetched_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (channel_id) DO UPDATE SET
+                       title = excluded.title,
+                       slug = COALESCE(excluded.slug, channels.slug),
+                       fetched_at = COALESCE(excluded.fetched_at, channels.fetched_at)""",
+                (channel_id, channel_data['channel_title'], channel_data.get('channel_slug'),
+                 channel_data.get('fetched_at'))
+            )
+            self.db.execute('UPDATE videos SET listed = 0 WHERE channel_id = ?', (channel_id,))
+            self.db.executemany(
+                """INSERT INTO videos (video_id, channel_id, title, description, published_at, thumbnail,
+                                       url, is_live_stream, live_status, listed, extra)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
+                   ON CONFLICT (video_id) DO UPDATE SET
+                       channel_id = excluded.channel_id,
+                       title = excluded.title,
+                       description = excluded.description,
+                       published_at = excluded.published_at,
+                       thumbnail = excluded.thumbnail,
+                       url = excluded.url,
+                       is_live_stream = excluded.is_live_stream,
+                       live_status = excluded.live_status,
+                       listed = 1,
+                       extra = excluded.extra""",
+                [(video['id'], channel_id, video.get('title'), video.get('description'),
+                  video.get('published_at'), video.get('thumbnail'), video.get('url'),
+                  int(bool(video.get('is_live_stream'))), video.get('live_status'),
+                  extra_fields(video, VIDEO_FIELDS))
+                 for video in channel_data.get('videos') or []]
+            )
+
+    def channel_ids(self):
+        return [row[0] for row in self.db.execute('SELECT channel_id FROM channels ORDER BY channel_id')]
+
+    def channel_data(self, channel_id):
+        """
+        Project a channel into the data/youtube/<channel_id>.json shape.
+
+        Returns:
+            Dict with the channel and its listed videos, newest first, or None if unknown
+        """
+        channel = self.db.execute('SELECT * FROM channels WHERE channel_id = ?', (channel_id,)).fetchone()
+        if channel is None:
+            return None
+        rows = self.db.execute(
+            """SELECT * FROM videos WHERE channel_id = ? AND listed = 1
+               ORDER BY published_at DESC, video_id""",
+            (channel_id,)
+        )
+        videos = []
+        for row in rows:
+            video = {
+                'id': row['video_id'],
+                'title': row['title'],
+                'description': row['description'],
+                'published_at': row['published_at'],
+                'thumbnail': row['thumbnail'],
+                'url': row['url'],
+                'is_live_stream': bool(row['is_live_stream']),
+                'live_status': row['live_status']
+            }
+            video.update(loads(row['extra']) or {})
+            videos.append(video)
+
+        data = {
+            'channel_title': channel['title'],
+            'channel_id': channel_id,
+            'videos': videos,
+            'channel_slug': channel['slug']
+        }
+        if channel['fetched_at']:
+            data['fetched_at'] = channel['fetched_at']
+        return data
+
+    # Bluesky
+
+    def upsert_authors(self, authors):
+        """Upsert author dicts keyed by DID."""
+        now = datetime.now(timezone.utc).isoformat()
+        with self.db:
+            self.db.executemany(
+                """INSERT INTO authors (did, handle, display_name, avatar, updated_at) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (did) DO UPDATE SET
+                       handle = excluded.handle,
+                       display_name = excluded.display_name,
+                       avatar = excluded.avatar,
+                       updated_at = excluded.updated_at""",
+                [(did, author.get('handle'), author.get('display_name'), author.get('avatar'), now)
+                 for did, author in authors.items()]
+            )
+
+    def upsert_posts(self, posts, authors=None):
+        """
+        Upsert posts with their embeds, and their authors.
+
+        Args:
+            posts: Post dicts as built by BlueskyFetcher; 'author' may be a dict or a DID
+            authors: Optional dict of DID -> author for authors referenced by DID
+        """
+        post_authors = dict(authors or {})
+        for post in posts:
+            if isinstance(post.get('author'), dict):
+                post_authors[post_did(post['uri'])] = post['author']
+        self.upsert_authors(post_authors)
+
+        with self.db:
+            for post in posts:
+                author = post.get('author')
+                self.db.execute(
+                    """INSERT INTO posts (uri, cid, author_did, created_at, text, html, like_count,
+                                          repost_count, reply_count, url, links, mentions, thread, extra)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (uri) DO UPDATE SET
+                           cid = excluded.cid,
+                           author_did = excluded.author_did,
+                           created_at = excluded.created_at,
+                           text = excluded.text,
+                           html = excluded.html,
+                           like_count = excluded.like_count,
+                           repost_count = excluded.repost_count,
+                           reply_count = excluded.reply_count,
+                           url = excluded.url,
+                           links = excluded.links,
+                           mentions = excluded.mentions,
+                           thread = excluded.thread,
+                           extra = excluded.extra""",
+                    (post['uri'], post.get('cid'), author if isinstance(author, str) else post_did(post['uri']),
+                     post.get('created_at'), post.get('text'), post.get('html'), post.get('like_count') or 0,
+                     post.get('repost_count') or 0, post.get('reply_count') or 0, post.get('url'),
+                     dumps(post.get('links')), dumps(post.get('mentions')), dumps(post.get('thread')),
+                     extra_fields(post, POST_FIELDS))
+                )
+                embed = post.get('embed')
+                if embed:
+                    self.db.execute(
+                        """INSERT INTO embeds (post_uri, type, data) VALUES (?, ?, ?)
+                           ON CONFLICT (post_uri) DO UPDATE SET type = excluded.type, data = excluded.data""",
+                        (post['uri'], embed.get('type'), dumps(embed.get('data')))
+                    )
+                else:
+                    self.db.execute('DELETE FROM embeds WHERE post_uri = ?', (post['uri'],))
+
+    def authors(self, dids):
+        """Return DID -> author dict for the DIDs that are known, sorted by DID."""
+        rows = self.db.execute(
+            'SELECT * FROM authors WHERE did IN (SELECT value FROM json_each(?)) ORDER BY did',
+            (json.dumps(sorted(set(dids))),)
+        )
+        return {row['did']: {field: row[field] for field in AUTHOR_FIELDS} for row in rows}
+
+    def posts(self, uris=None, limit=None):
+        """
+        Load posts with their embeds.
+
+        Args:
+            uris: Optional list of URIs to load, returned in that order
+            limit: Without uris, the number of newest posts to load
+
+        Returns:
+            List of post dicts whose 'author' is the author's DID
+        """
+        select = """SELECT posts.*, embeds.type AS embed_type, embeds.data AS embed_data
+                    FROM posts LEFT JOIN embeds ON embeds.post_uri = posts.uri"""
+        if uris is not None:
+            rows = self.db.execute(f"{select} WHERE uri IN (SELECT value FROM json_each(?))", (json.dumps(uris),))
+            order = {uri: position for position, uri in enumerate(uris)}
+            rows = sorted(rows, key=lambda row: order[row['uri']])
+        else:
+            rows = self.db.execute(f"{select} ORDER BY created_at DESC, uri LIMIT ?",
+                                   (-1 if limit is None else limit,))
+
+        posts = []
+        for row in rows:
+            post = {
+                'uri': row['uri'],
+                'cid': row['cid'],
+                'text': row['text'],
+                'html': row['html'],
+                'created_at': row['created_at'],
+                'author': row['author_did'],
+                'like_count': row['like_count'],
+                'repost_count': row['repost_count'],
+                'reply_count': row['reply_count'],
+                'url': row['url'],
+                'links': loads(row['links']),
+                'mentions': loads(row['mentions'])
+            }
+            if row['embed_type'] is not None:
+                post['embed'] = {'type': row['embed_type'], 'data': loads(row['embed_data'])}
+            if row['thread'] is not None:
+                post['thread'] = loads(row['thread'])
+            post.update(loads(row['extra']) or {})
+            posts.append(post)
+        return posts
+
+    def bluesky_data(self, uris=None, limit=10, author_table=False):
+        """
+        Project posts into the data/bluesky.json shape.
+
+        Args:
+            uris: Optional list of URIs to include, in output order; otherwise the newest posts
+            limit: Without uris, the number of newest posts
+            author_table: If True, post authors are referenced by DID from 'authors'
+
+        Returns:
+            Dict with 'last_updated', 'post_count', 'posts' and, if any are referenced, 'authors'
+        """
+        posts = self.posts(uris, limit=None if uris is not None else limit)
+        thread_dids = [did for post in posts for did in reply_authors((post.get('thread') or {}).get('replies'))]
+        known = self.authors([post['author'] for post in posts] + thread_dids)
+
+        referenced = set(thread_dids)
+        if author_table:
+            referenced.update(post['author'] for post in posts)
+        else:
+            for post in posts:
+                post['author'] = dict(known.get(post['author']) or {'handle': post['author']})
+
+        data = {
+            'last_updated': datetime.now(timezone.utc).isoformat(),
+            'post_count': len(posts),
+            'posts': posts
+        }
+        authors = {did: author for did, author in known.items() if did in referenced}
+        if authors:
+            data['authors'] = authors
+        return data
+
+
+def open_store(config):
+    """Open the store if 'store' is enabled (true or a dict with 'path')."""
+    settings = config.get('store')
+    if not settings:
+        return None
+    path = settings.get('path', STORE_FILE) if isinstance(settings, dict) else STORE_FILE
+    return LocalStore(path)
+
+
+def export_youtube(store, fetcher):
+    """
+    Write every stored channel's data file and content page. Returns the number of channels.
+
+    The files are written by fetcher.generate_hugo_content, so an export goes
+    through the change feed and last known good copy like a fetch.
+    """
+    from fetch_youtube_data import create_slug  # Imports this module
+
+    channel_ids = store.channel_ids()
+    for channel_id in channel_ids:
+        channel_data = store.channel_data(channel_id)
+        channel_slug = channel_data.get('channel_slug') or create_slug(channel_data['channel_title'])
+        fetcher.generate_hugo_content(channel_data, 'content', channel_slug)
+    print(f"Exported {len(channel_ids)} channels to data/youtube/")
+    return len(channel_ids)
+
+
+def export_bluesky(store, fetcher, output_file='data/bluesky.json', limit=10):
+    """
+    Write the newest stored posts as the Hugo data file. Returns the number exported.
+
+    The file is written by fetcher.save_data, honouring its author_table setting.
+    """
+    data = store.bluesky_data(limit=limit, author_table=fetcher.author_table)
+    if not data['posts']:
+        print("No stored posts to export")
+        return 0
+    fetcher.authors.update(data.get('authors') or {})
+    fetcher.save_data(data['posts'], output_file)
+    print(f"Exported {data['post_count']} stored posts to {output_file}")
+    return data['post_count']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate Hugo data files from the local store.")
+    parser.add_argument('--path', default=STORE_FILE, help="SQLite store file")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help="Write data files from the store")
+    export_parser.add_argument('source', choices=['youtube', 'bluesky'], help="Which data files to write")
+    export_parser.add_argument('--limit', type=int, default=10, help="Number of Bluesky posts to export")
+    export_parser.add_argument('--author-table', action='store_true',
+                               help="Reference Bluesky post authors by DID from an 'authors' table")
+    args = parser.parse_args(argv)
+
+    # The fetchers only write files here; they need no credentials, and no
+    # store since the data comes from it
+    changes.start()
+    with LocalStore(args.path) as store:
+        if args.source == 'youtube':
+            from fetch_youtube_data import YouTubeFetcher
+            export_youtube(store, YouTubeFetcher(None))
+        else:
+            from fetch_bluesky_data import BlueskyFetcher
+            fetcher = BlueskyFetcher(None, None)
+            fetcher.author_table = args.author_table
+            export_bluesky(store, fetcher, limit=args.limit)
+    changes.write()
+    listing_indexes.write_indexes()
+    search_index.update_index(changes.changes)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
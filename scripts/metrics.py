@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Counters and timers for fetch runs, exported as JSON or a Prometheus textfile.
+
+Both fetchers record into the shared REGISTRY: every API call through
+api_call() and every file through write_file(). The orchestrator adds
+per-provider totals and writes the registry into its run report.
+
+Metric names and labels are stable so runs can be graphed over time:
+
+    fetch_api_requests_total{provider, endpoint, source, status}  counter
+    fetch_api_request_duration_seconds{provider, endpoint}         summary
+    fetch_retries_total{provider, endpoint}                        counter
+    fetch_quota_units_total{provider, source}                      counter
+    fetch_items_total{provider, source}                            counter
+    fetch_files_written_total{provider}                            counter
+    fetch_files_changed_total{provider}                            counter
+    fetch_bytes_written_total{provider}                            counter
+    fetch_write_duration_seconds{provider}                         summary
+    fetch_provider_duration_seconds{provider}                      gauge
+    fetch_provider_success{provider}                               gauge
+    scheduler_job_runs_total{job, status}                          counter
+    scheduler_job_duration_seconds{job}                            summary
+    scheduler_jobs_coalesced_total{job}                            counter
+    scheduler_publishes_total{status}                              counter
+
+'source' is the YouTube channel ID or Bluesky handle, or empty when a call is
+not tied to one.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+SUMMARY = 'summary'
+
+
+def label_key(labels):
+    return tuple(sorted((name, '' if value is None else str(value)) for name, value in labels.items()))
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and summaries."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            # name -> (type, {label key: value or [count, sum, max]})
+            self.series = {}
+
+    def _values(self, name, kind):
+        metric_type, values = self.series.setdefault(name, (kind, {}))
+        if metric_type != kind:
+            raise ValueError(f"Metric {name} is a {metric_type}, not a {kind}")
+        return values
+
+    def increment(self, name, value=1, **labels):
+        with self.lock:
+            values = self._values(name, COUNTER)
+            key = label_key(labels)
+            values[key] = values.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self._values(name, GAUGE)[label_key(labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        with self.lock:
+            values = self._values(name, SUMMARY)
+            entry = values.setdefault(label_key(labels), [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of the block, whether or not it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def api_call(self, provider, endpoint, source=None):
+        """Time an API call and count it by outcome. Exceptions propagate."""
+        status = 'error'
+        try:
+            with self.timer('fetch_api_request_duration_seconds', provider=provider, endpoint=endpoint):
+                yield
+            status = 'ok'
+        finally:
+            self.increment('fetch_api_requests_total', provider=provider, endpoint=endpoint,
+                           source=source, status=status)
+
+    def write_file(self, path, content, provider):
+        """
+        Write text to a file atomically, recording bytes written and whether the content changed.
+
+        Returns:
+            True if the file content changed
+        """
+        path = Path(path)
+        data = content.encode('utf-8')
+        with self.timer('fetch_write_duration_seconds', provider=provider):
+            try:
+                changed = path.read_bytes() != data
+            except OSError:
+                changed = True
+            # Readers, and a process exit mid-write, only ever see the old or the new file
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        self.increment('fetch_files_written_total', provider=provider)
+        self.increment('fetch_bytes_written_total', len(data), provider=provider)
+        if changed:
+            self.increment('fetch_files_changed_total', provider=provider)
+        return changed
+
+    def to_dict(self):
+        """Return all series as JSON-friendly dicts, sorted by name."""
+        metrics = []
+        with self.lock:
+            for name in sorted(self.series):
+                metric_type, values = self.series[name]
+                for key in sorted(values):
+                    entry = {'name': name, 'type': metric_type, 'labels': dict(key)}
+                    if metric_type == SUMMARY:
+                        count, total, maximum = values[key]
+                        entry.update(count=count, sum=round(total, 6), max=round(maximum, 6))
+                    else:
+                        entry['value'] = values[key]
+                    metrics.append(entry)
+        return metrics
+
+    def prometheus_text(self):
+        """Render the registry in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for name in sorted(self.series):
+                metric_type, values = self.series[name]
+                lines.append(f"# TYPE {name} {metric_type}")
+                for key in sorted(values):
+                    labels = ','.join(f'{label}="{escape_label(value)}"' for label, value in key)
+                    labels = f"{{{labels}}}" if labels else ''
+                    if metric_type == SUMMARY:
+                        count, total, _ = values[key]
+                        lines.append(f"{name}_count{labels} {count}")
+                        lines.append(f"{name}_sum{labels} {total:.6f}")
+                    else:
+                        lines.append(f"{name}{labels} {values[key]}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Write a textfile-collector file atomically, so the collector never reads a partial file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = Metrics()
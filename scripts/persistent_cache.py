@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Size-bounded LRU caches persisted to a JSON file between fetch runs.
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class PersistentLRUCache:
+    def __init__(self, path, max_entries=1000):
+        """
+        Initialize the cache.
+
+        Args:
+            path: JSON file the cache is loaded from and saved to
+            max_entries: Maximum number of entries kept; least recently used are evicted
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.entries = None
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Load entries from disk on first use. A missing or corrupt file starts empty."""
+        if self.entries is not None:
+            return
+        self.entries = OrderedDict()
+        try:
+            with open(self.path) as f:
+                for key, value in json.load(f).get('entries', []):
+                    self.entries[key] = value
+        except (OSError, ValueError, TypeError, AttributeError):
+            self.entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Return a copy of the cached value and mark it as recently used."""
+        with self.lock:
+            self.load()
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            self.dirty = True
+            return copy.deepcopy(self.entries[key])
+
+    def set(self, key, value):
+        """Store a JSON-serializable value, evicting the least recently used entries."""
+        with self.lock:
+            self.load()
+            self.entries[key] = copy.deepcopy(value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def __contains__(self, key):
+        with self.lock:
+            self.load()
+            return key in self.entries
+
+    def __len__(self):
+        with self.lock:
+            self.load()
+            return len(self.entries)
+
+    def save(self):
+        """Write the cache to disk if it changed, replacing the old file atomically."""
+        with self.lock:
+            if not self.dirty or self.entries is None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump({'entries': list(self.entries.items())}, f, default=str)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+
+class PersistentTTLCache(PersistentLRUCache):
+    def __init__(self, path, max_entries=1000, ttl=86400):
+        """
+        Initialize the cache.
+
+        Args:
+            path: JSON file the cache is loaded from and saved to
+            max_entries: Maximum number of entries kept; least recently used are evicted
+            ttl: Seconds an entry stays valid after it was set
+        """
+        super().__init__(path, max_entries=max_entries)
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        """Return a copy of the cached value, or default if it is missing or expired."""
+        entry = super().get(key)
+        if entry is None or entry.get('expires_at', 0) <= time.time():
+            return default
+        return entry['value']
+
+    def set(self, key, value):
+        """Store a JSON-serializable value that expires after the cache's TTL."""
+        super().set(key, {'value': value, 'expires_at': time.time() + self.ttl})
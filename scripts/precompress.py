@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Precompress the built site for upload.
+
+Every compressible file in public/ (HTML, CSS, JS, JSON, XML, SVG, ...) gets a
+gzip sibling (page.html.gz) and, if the brotli package is installed, a Brotli
+sibling (page.html.br). Compression runs in a process pool. Results are kept in
+a content-addressed cache under .cache/precompress/, so a file whose content
+hash matches an earlier build is copied from the cache instead of being
+compressed again. Per-file sizes and savings are written to
+.cache/precompress-report.json.
+
+deploy_sync.py uploads the gzip variant under the original key with
+Content-Encoding: gzip, and the Brotli variant as a .br object for CDNs that
+pick an encoding from Accept-Encoding.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CACHE_DIR = '.cache/precompress'
+REPORT_FILE = '.cache/precompress-report.json'
+COMPRESSIBLE_EXTENSIONS = {'.html', '.htm', '.css', '.js', '.mjs', '.json', '.xml', '.svg', '.txt',
+                           '.webmanifest', '.map', '.ico', '.csv', '.md'}
+MIN_SIZE = 256  # Smaller files gain less than the request headers cost
+MIN_SAVING = 0.05  # Keep a variant only if it is at least 5% smaller
+ENCODINGS = {'gzip': '.gz', 'br': '.br'}
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def compressible(path):
+    return path.suffix.lower() in COMPRESSIBLE_EXTENSIONS and path.stat().st_size >= MIN_SIZE
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compress_file(path, cache_dir, use_brotli=True):
+    """
+    Compress one file into the cache, keyed by its content hash.
+
+    Runs in a worker process. gzip output uses mtime 0 so identical input
+    always gives identical bytes.
+
+    Returns:
+        Dict of encoding -> compressed size, or None where the variant was not worth keeping
+    """
+    data = Path(path).read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if use_brotli:
+        variants['br'] = brotli.compress(data, quality=11)
+
+    sizes = {}
+    for encoding, compressed in variants.items():
+        if len(compressed) > len(data) * (1 - MIN_SAVING):
+            sizes[encoding] = None
+            continue
+        blob = Path(cache_dir) / f"{digest}{ENCODINGS[encoding]}"
+        tmp_blob = blob.with_name(f"{blob.name}.{os.getpid()}.tmp")
+        tmp_blob.write_bytes(compressed)
+        os.replace(tmp_blob, blob)
+        sizes[encoding] = len(compressed)
+    return sizes
+
+
+class CompressionCache:
+    """Index of content hash -> compressed sizes, with the compressed blobs beside it."""
+
+    def __init__(self, path=CACHE_DIR):
+        self.path = Path(path)
+        self.index_file = self.path / 'index.json'
+        self.entries = {}
+        try:
+            with open(self.index_file) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, digest, encodings):
+        """Cached sizes for a hash if every requested encoding is cached and its blob exists."""
+        entry = self.entries.get(digest)
+        if entry is None or any(encoding not in entry for encoding in encodings):
+            return None
+        for encoding in encodings:
+            if entry[encoding] is not None and not self.blob(digest, encoding).exists():
+                return None
+        return entry
+
+    def blob(self, digest, encoding):
+        return self.path / f"{digest}{ENCODINGS[encoding]}"
+
+    def save(self, used):
+        """Keep only the hashes used by this build, deleting the blobs of the rest."""
+        for digest in set(self.entries) - set(used):
+            for encoding in ENCODINGS:
+                self.blob(digest, encoding).unlink(missing_ok=True)
+        self.entries = {digest: self.entries[digest] for digest in used if digest in self.entries}
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.index_file.with_name('index.json.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(self.entries, f, separators=(',', ':'))
+        os.replace(tmp_file, self.index_file)
+
+
+def precompress(public_dir, cache_dir=CACHE_DIR, workers=None, use_brotli=None):
+    """
+    Write compressed siblings for every compressible file in public_dir.
+
+    Args:
+        public_dir: Built site directory
+        cache_dir: Content-addressed cache of compressed output
+        workers: Worker processes (default: one per CPU)
+        use_brotli: Produce .br variants; defaults to whether brotli is installed
+
+    Returns:
+        Report dict with per-file 'files' and overall 'totals'
+    """
+    if use_brotli is None:
+        use_brotli = brotli is not None
+    encodings = ['gzip', 'br'] if use_brotli else ['gzip']
+    root = Path(public_dir)
+    paths = sorted(p for p in root.rglob('*') if p.is_file() and compressible(p))
+    cache = CompressionCache(cache_dir)
+    cache.path.mkdir(parents=True, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        digests = list(executor.map(hash_file, paths, chunksize=16))
+        misses = {}
+        for path, digest in zip(paths, digests):
+            if cache.get(digest, encodings) is None and digest not in misses:
+                misses[digest] = path
+        compressed = executor.map(compress_file, misses.values(), [cache.path] * len(misses),
+                                  [use_brotli] * len(misses))
+        for digest, sizes in zip(misses, compressed):
+            cache.entries[digest] = sizes
+
+    files = {}
+    totals = {'files': len(paths), 'compressed': len(misses), 'size': 0}
+    for encoding in encodings:
+        totals[encoding] = 0
+    for path, digest in zip(paths, digests):
+        entry = cache.entries[digest]
+        size = path.stat().st_size
+        record = {'size': size, 'cached': digest not in misses}
+        totals['size'] += size
+        for encoding in encodings:
+            sibling = path.with_name(path.name + ENCODINGS[encoding])
+            if entry.get(encoding) is None:
+                sibling.unlink(missing_ok=True)
+                totals[encoding] += size
+                continue
+            shutil.copyfile(cache.blob(digest, encoding), sibling)
+            record[encoding] = entry[encoding]
+            totals[encoding] += entry[encoding]
+        files[path.relative_to(root).as_posix()] = record
+
+    cache.save(set(digests))
+    for encoding in encodings:
+        totals[f'{encoding}_saved'] = totals['size'] - totals[encoding]
+    return {'files': files, 'totals': totals}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write gzip and Brotli variants of the built site.")
+    parser.add_argument('public_dir', nargs='?', default='public', help="Built site directory")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="Cache of compressed output")
+    parser.add_argument('--report', default=REPORT_FILE, help="Where to write per-file sizes")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--no-brotli', action='store_true', help="Only write gzip variants")
+    args = parser.parse_args(argv)
+
+    if not Path(args.public_dir).is_dir():
+        print(f"Error: {args.public_dir} not found. Build the site first")
+        sys.exit(1)
+    if brotli is None and not args.no_brotli:
+        print("Note: brotli package not installed, writing gzip variants only. Install with: pip install brotli")
+
+    report = precompress(args.public_dir, args.cache_dir, args.workers, use_brotli=False if args.no_brotli else None)
+    Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    totals = report['totals']
+    print(f"Precompressed {totals['files']} files ({totals['compressed']} compressed, "
+          f"{totals['files'] - totals['compressed']} from cache)")
+    for encoding in ENCODINGS:
+        if encoding in totals:
+            print(f"  {encoding}: {totals['size']} -> {totals[encoding]} bytes "
+                  f"({totals[f'{encoding}_saved']} saved)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Opt-in profiling for fetch runs.
+
+With --profile, each stage of a run is recorded with cProfile and
+tracemalloc. A provider is one stage, and the hot spots inside it
+(get_channel_videos, process_embed, generate_hugo_content) are stages of their
+own, nested in it. Every stage gets a .prof dump that pstats, snakeviz or
+gprof2dot can open, and profile.json summarises the slowest functions and the
+largest new allocations per stage. The files are written next to the run
+report, in .cache/profile/ by default.
+
+cProfile only sees the thread that enables it, so while a profile is running
+executor() hands out an inline executor and worker pool tasks run in the
+profiled thread.
+"""
+
+import cProfile
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+PROFILE_DIR = '.cache/profile'
+SUMMARY_FILE = 'profile.json'
+DEFAULT_TOP = 10
+
+# The Profiler whose outermost stage is running, for stages nested in code
+# that has no profiler passed to it
+current = None
+
+# Allocations made by the profilers themselves are noise
+IGNORED_ALLOCATIONS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+]
+
+
+def add_arguments(parser):
+    """Add --profile and --profile-top to an entry point's argument parser."""
+    parser.add_argument('--profile', action='store_true',
+                        help="Record cProfile and tracemalloc data for the run (slows it down)")
+    parser.add_argument('--profile-top', type=int, default=DEFAULT_TOP, metavar='N',
+                        help=f"Functions and allocations to list per stage (default: {DEFAULT_TOP}, 0 to hide)")
+
+
+def format_function(key):
+    filename, line, function = key
+    if filename == '~':
+        return function  # Built-in
+    return f"{Path(filename).name}:{line}({function})"
+
+
+class Profiler:
+    """Records a cProfile dump and tracemalloc allocations for each named stage."""
+
+    def __init__(self, output_dir=PROFILE_DIR, top=DEFAULT_TOP):
+        self.output_dir = Path(output_dir)
+        self.top = top
+        self.stages = {}
+        self.profiles = {}
+        self.active = []
+        self.thread = None
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Profile the block as one stage.
+
+        cProfile only sees the thread that enables it, so stages must run in
+        the thread doing the work, one outermost stage at a time. A stage
+        opened inside another one is profiled separately and left out of the
+        enclosing stage's functions; entering it again adds to its profile.
+        Nested stages only get timings, tracemalloc snapshots are taken for
+        the outermost stage.
+        """
+        global current
+        if self.active:
+            if name in self.active or threading.get_ident() != self.thread:
+                yield  # Recursion, or a worker thread cProfile cannot see
+                return
+            with self.nested(name):
+                yield
+            return
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        self.stages.setdefault(name, {})  # Keep stages in the order they started
+        self.active.append(name)
+        self.thread = threading.get_ident()
+        current = self
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            wall_seconds = time.perf_counter() - start
+            current = None
+            self.active.pop()
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            self.record(name, profile, wall_seconds, after, before, peak)
+            for nested, stage in self.stages.items():
+                if 'nested_in' in stage:
+                    self.record_nested(nested)
+
+    @contextmanager
+    def nested(self, name):
+        outer = self.profiles[self.active[-1]]
+        outer.disable()
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        self.active.append(name)
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            wall_seconds = time.perf_counter() - start
+            self.active.pop()
+            stage = self.stages.setdefault(name, {'wall_seconds': 0, 'calls': 0, 'nested_in': self.active[0]})
+            stage['wall_seconds'] += wall_seconds
+            stage['calls'] += 1
+            outer.enable()
+
+    def record(self, name, profile, wall_seconds, after, before, peak):
+        differences = after.filter_traces(IGNORED_ALLOCATIONS).compare_to(
+            before.filter_traces(IGNORED_ALLOCATIONS), 'lineno'
+        )
+        allocations = [{
+            'location': f"{Path(diff.traceback[0].filename).name}:{diff.traceback[0].lineno}",
+            'size_bytes': diff.size_diff,
+            'count': diff.count_diff
+        } for diff in differences if diff.size_diff > 0][:self.top]
+
+        self.stages[name] = {
+            'wall_seconds': round(wall_seconds, 3),
+            'peak_memory_bytes': peak,
+            'prof_file': str(self.dump(name, profile)),
+            'functions': self.slowest_functions(profile),
+            'allocations': allocations
+        }
+
+    def record_nested(self, name):
+        """Dump a nested stage's profile, accumulated over every time it was entered."""
+        stage = self.stages[name]
+        stage['wall_seconds'] = round(stage['wall_seconds'], 3)
+        stage['prof_file'] = str(self.dump(name, self.profiles[name]))
+        stage['functions'] = self.slowest_functions(self.profiles[name])
+
+    def dump(self, name, profile):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        prof_file = self.output_dir / f"{name}.prof"
+        profile.dump_stats(prof_file)
+        return prof_file
+
+    def slowest_functions(self, profile):
+        stats = pstats.Stats(profile).stats
+        slowest = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]
+        return [{
+            'function': format_function(key),
+            'calls': calls,
+            'total_seconds': round(total, 6),
+            'cumulative_seconds': round(cumulative, 6)
+        } for key, (_, calls, total, cumulative, _) in slowest]
+
+    def save(self):
+        """Write profile.json with every stage recorded so far. Returns its path."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        summary_file = self.output_dir / SUMMARY_FILE
+        with open(summary_file, 'w') as f:
+            json.dump(self.stages, f, indent=2)
+        return summary_file
+
+    def print_summary(self):
+        """Print the slowest functions and largest allocations of each stage."""
+        if not self.top:
+            return
+        for name, stage in self.stages.items():
+            if 'nested_in' in stage:
+                print(f"\nProfile: {name} in {stage['nested_in']} "
+                      f"({stage['wall_seconds']}s over {stage['calls']} calls)")
+            else:
+                print(f"\nProfile: {name} ({stage['wall_seconds']}s, "
+                      f"peak {stage['peak_memory_bytes'] / 1024:.0f} KiB traced)")
+            print(f"  {'cumulative':>10}  {'own':>8}  {'calls':>7}  function")
+            for entry in stage['functions']:
+                print(f"  {entry['cumulative_seconds']:>10.3f}  {entry['total_seconds']:>8.3f}  "
+                      f"{entry['calls']:>7}  {entry['function']}")
+            if stage.get('allocations'):
+                print(f"  {'KiB':>10}  {'blocks':>8}  allocated at")
+                for entry in stage['allocations']:
+                    print(f"  {entry['size_bytes'] / 1024:>10.1f}  {entry['count']:>8}  {entry['location']}")
+        print(f"\nProfiles written to {self.output_dir}/")
+
+
+def from_args(args, output_dir=PROFILE_DIR):
+    """Return a Profiler if --profile was given, otherwise None."""
+    return Profiler(output_dir, args.profile_top) if args.profile else None
+
+
+def stage(profiler, name):
+    """Profile a block as a stage, or do nothing when profiling is off."""
+    return profiler.stage(name) if profiler else nullcontext()
+
+
+class InlineExecutor:
+    """An Executor that runs each task in the calling thread as it is submitted."""
+
+    def __init__(self, max_workers=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def executor(max_workers):
+    """
+    Return a ThreadPoolExecutor, or an InlineExecutor while a profile is
+    running so the tasks show up in it.
+    """
+    return InlineExecutor(max_workers) if current else ThreadPoolExecutor(max_workers=max_workers)
+
+
+@contextmanager
+def profiled(args, name, output_dir=PROFILE_DIR):
+    """
+    Profile a whole entry point as a single stage when --profile is set.
+
+    The summary is written and printed even if the run exits early.
+    """
+    profiler = from_args(args, output_dir)
+    try:
+        with stage(profiler, name):
+            yield
+    finally:
+        if profiler:
+            profiler.save()
+            profiler.print_summary()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Long-running scheduler that refreshes each source on its own interval.
+
+Instead of fetching everything at the cadence of deploys, the daemon runs each
+job in JOBS on its own schedule, e.g. YouTube uploads hourly, the status of
+live streams every two minutes and Bluesky every five. Providers are created
+once, so the Bluesky login, the in-memory caches and the YouTube HTTP session
+stay warm between runs.
+
+A job that comes due while a job of the same provider is still running waits
+and then runs once, however many of its ticks were missed. Whenever no job is
+running and the finished ones changed any videos or posts (see
+change_feed.py), the change feed, listing indexes and search index are written
+and the publish commands (hugo, then the deploy) run in order. If one fails,
+the changes are kept and published again a minute later. GET /health reports
+every job's last run and the last publish, and /metrics the registry in the
+Prometheus text format.
+"""
+
+import argparse
+import json
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+import yaml
+
+import listing_indexes
+import search_index
+from change_feed import FEED as changes
+from fetch_bluesky_data import BlueskyFetcher
+from fetch_youtube_data import YouTubeFetcher
+from metrics import REGISTRY as metrics
+
+CONFIG_FILE = 'config/scheduler.yaml'
+# Job name -> (provider class, provider method called with the provider's config)
+JOBS = {
+    'youtube': (YouTubeFetcher, 'fetch'),
+    'youtube-live': (YouTubeFetcher, 'refresh_live'),
+    'bluesky': (BlueskyFetcher, 'fetch')
+}
+DEFAULT_INTERVALS = {'youtube': 3600, 'youtube-live': 120, 'bluesky': 300}
+DEFAULT_PUBLISH_COMMANDS = ['hugo --minify', 'python scripts/precompress.py public/',
+                            'python scripts/deploy_sync.py public/']
+STALE_AFTER_INTERVALS = 3  # A job is unhealthy once it has not succeeded for this many intervals
+PUBLISH_RETRY_SECONDS = 60  # Wait before running publish commands again after one failed
+
+
+class Job:
+    """One scheduled job and the outcome of its runs."""
+
+    def __init__(self, name, provider, method, interval):
+        self.name = name
+        self.provider = provider
+        self.method = method
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.created = time.monotonic()
+        self.next_run = self.created
+        self.thread = None
+        self.running = False
+        self.waiting = False
+        self.runs = 0
+        self.failures = 0
+        self.coalesced = 0
+        self.last_result = None
+        self.last_success = None
+
+    def start(self, now):
+        """Run the job in a background thread and schedule its next run."""
+        self.running = True
+        self.waiting = False
+        self.next_run = now + self.interval
+        self.thread = threading.Thread(target=self.run, name=f"job-{self.name}", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        started = time.monotonic()
+        try:
+            summary = getattr(self.provider, self.method)(self.provider.load_config()) or {}
+            result = dict(summary, status='ok')
+        except (Exception, SystemExit) as e:
+            traceback.print_exc()
+            result = {'status': 'error', 'error': str(e) or e.__class__.__name__}
+        finished = time.monotonic()
+        result['duration_seconds'] = round(finished - started, 3)
+        result['finished_at'] = datetime.now(timezone.utc).isoformat()
+        metrics.increment('scheduler_job_runs_total', job=self.name, status=result['status'])
+        metrics.observe('scheduler_job_duration_seconds', finished - started, job=self.name)
+        print(f"{self.name}: {result['status']} in {result['duration_seconds']}s")
+        with self.lock:
+            self.runs += 1
+            if result['status'] == 'ok':
+                self.last_success = finished
+            else:
+                self.failures += 1
+            self.last_result = result
+            self.running = False
+
+    def status(self, now):
+        """Health of the job for the health endpoint."""
+        with self.lock:
+            since_success = now - (self.last_success if self.last_success is not None else self.created)
+            return {
+                'interval_seconds': self.interval,
+                'running': self.running,
+                'next_run_in_seconds': round(max(self.next_run - now, 0), 3),
+                'runs': self.runs,
+                'failures': self.failures,
+                'coalesced': self.coalesced,
+                'last_result': self.last_result,
+                # Allow the provider's own deadline on top, so a slow first run is not unhealthy
+                'healthy': since_success <= self.interval * STALE_AFTER_INTERVALS + self.provider.deadline
+            }
+
+
+class Scheduler:
+    def __init__(self, jobs, publish_commands=(), host='127.0.0.1', port=8081, tick_seconds=1.0,
+                 shutdown_timeout=300):
+        """
+        Initialize the scheduler.
+
+        Args:
+            jobs: Job instances to run
+            publish_commands: Shell commands run in order after a change; a failure skips the rest
+            host: Interface the health endpoint listens on
+            port: Port the health endpoint listens on (0 picks a free one, None disables it)
+            tick_seconds: How often due jobs are checked
+            shutdown_timeout: Seconds to wait for running jobs when stopping
+        """
+        self.jobs = jobs
+        self.publish_commands = list(publish_commands)
+        self.host = host
+        self.port = port
+        self.tick_seconds = tick_seconds
+        self.shutdown_timeout = shutdown_timeout
+        self.started = time.monotonic()
+        self.stopped = threading.Event()
+        self.server = None
+        self.last_publish = None
+        self.publish_retry_at = 0
+
+    def tick(self, now=None):
+        """Start due jobs whose provider is free, then publish if everything has settled."""
+        now = time.monotonic() if now is None else now
+        busy = {id(job.provider) for job in self.jobs if job.running}
+        for job in self.jobs:
+            if now < job.next_run:
+                continue
+            if id(job.provider) in busy:
+                # Run once when the provider is free instead of stacking up runs
+                if not job.waiting:
+                    job.waiting = True
+                    job.coalesced += 1
+                    metrics.increment('scheduler_jobs_coalesced_total', job=job.name)
+                continue
+            busy.add(id(job.provider))
+            job.start(now)
+        if not any(job.running for job in self.jobs) and now >= self.publish_retry_at:
+            self.publish(now)
+
+    def publish(self, now=None):
+        """
+        Write the indexes and run the publish commands if the finished jobs changed data.
+
+        The change feed only starts over once every command has succeeded. After
+        a failure the changes are kept, and published together with any newer
+        ones PUBLISH_RETRY_SECONDS later.
+
+        Returns:
+            True if the commands ran and all succeeded
+        """
+        summary = changes.summary()
+        if not any(count for counts in summary.values() for count in counts.values()):
+            return False
+        changes.write(stop=False)
+        listing_indexes.write_indexes()
+        search_index.update_index(changes.changes)
+
+        succeeded = True
+        for command in self.publish_commands:
+            print(f"Running: {command}")
+            result = subprocess.run(shlex.split(command))
+            if result.returncode != 0:
+                print(f"Warning: {command} exited with status {result.returncode}; not publishing")
+                succeeded = False
+                break
+        if succeeded:
+            changes.start()
+        else:
+            self.publish_retry_at = (time.monotonic() if now is None else now) + PUBLISH_RETRY_SECONDS
+        metrics.increment('scheduler_publishes_total', status='ok' if succeeded else 'error')
+        self.last_publish = {'finished_at': datetime.now(timezone.utc).isoformat(), 'changes': summary,
+                             'status': 'ok' if succeeded else 'error'}
+        return succeeded
+
+    def status(self):
+        """Overall and per-job health."""
+        now = time.monotonic()
+        jobs = {job.name: job.status(now) for job in self.jobs}
+        published = self.last_publish is None or self.last_publish['status'] == 'ok'
+        return {
+            'status': 'ok' if published and all(job['healthy'] for job in jobs.values()) else 'degraded',
+            'uptime_seconds': round(now - self.started, 3),
+            'jobs': jobs,
+            'last_publish': self.last_publish
+        }
+
+    def start_health_server(self):
+        """Serve the health endpoint in a background thread."""
+        if self.port is None:
+            return
+        self.server = ThreadingHTTPServer((self.host, self.port), make_handler(self))
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Health endpoint on http://{self.host}:{self.port}/health")
+
+    def stop(self):
+        """Ask the run loop to exit."""
+        self.stopped.set()
+
+    def run(self):
+        """Run jobs until stopped, then let running jobs finish and publish what they changed."""
+        changes.start()
+        self.start_health_server()
+        print(f"Scheduling {', '.join(f'{job.name} every {job.interval}s' for job in self.jobs)}")
+        try:
+            while not self.stopped.is_set():
+                self.tick()
+                self.stopped.wait(self.tick_seconds)
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        for job in self.jobs:
+            if job.running:
+                print(f"Waiting for {job.name} to finish...")
+                job.thread.join(self.shutdown_timeout)
+        if not any(job.running for job in self.jobs):
+            self.publish()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def make_handler(scheduler):
+    """Build the request handler class bound to a scheduler."""
+
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            if path == '/health':
+                status = scheduler.status()
+                self.respond(200 if status['status'] == 'ok' else 503, json.dumps(status, indent=2),
+                             'application/json')
+            elif path == '/metrics':
+                self.respond(200, metrics.prometheus_text(), 'text/plain; version=0.0.4')
+            else:
+                self.respond(404, 'Not found\n', 'text/plain')
+
+        def respond(self, status, body, content_type):
+            data = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return HealthHandler
+
+
+def build_jobs(config):
+    """
+    Create the providers once and a Job for every enabled entry in 'jobs'.
+
+    An interval of 0 or null disables a job. Jobs whose provider has no
+    configuration file or credentials are skipped.
+    """
+    intervals = dict(DEFAULT_INTERVALS, **(config.get('jobs') or {}))
+    providers = {}
+    jobs = []
+    for name, interval in intervals.items():
+        if name not in JOBS:
+            print(f"Warning: Unknown job '{name}' in {CONFIG_FILE}")
+            continue
+        if not interval:
+            continue
+        provider_class, method = JOBS[name]
+        if provider_class.name not in providers:
+            provider = None
+            if not Path(provider_class.config_file).exists():
+                print(f"Skipping {provider_class.name} jobs: {provider_class.config_file} not found")
+            else:
+                provider = provider_class.from_environment()
+                if provider is None:
+                    print(f"Skipping {provider_class.name} jobs: credentials not set")
+            if isinstance(provider, YouTubeFetcher):
+                provider.session = requests.Session()
+            providers[provider_class.name] = provider
+        if providers[provider_class.name] is not None:
+            jobs.append(Job(name, providers[provider_class.name], method, interval))
+    return jobs
+
+
+def load_config(config_file):
+    """Read the scheduler configuration, or use the defaults if the file does not exist."""
+    try:
+        with open(config_file) as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh each source on its own schedule and publish changes.")
+    parser.add_argument('--config', default=CONFIG_FILE, help="Scheduler configuration file")
+    parser.add_argument('--port', type=int, help="Port of the health endpoint (overrides health.port)")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    jobs = build_jobs(config)
+    if not jobs:
+        print("Error: No jobs to run; check the provider configuration and credentials")
+        sys.exit(1)
+
+    health = config.get('health') or {}
+    scheduler = Scheduler(
+        jobs,
+        publish_commands=config.get('publish_commands', DEFAULT_PUBLISH_COMMANDS),
+        host=health.get('host', '127.0.0.1'),
+        port=args.port if args.port is not None else health.get('port', 8081),
+        shutdown_timeout=config.get('shutdown_timeout', 300)
+    )
+
+    # Let running jobs finish and publish their changes on Ctrl+C / SIGTERM
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: scheduler.stop())
+    scheduler.run()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Sharded client-side search index for videos and posts.
+
+Video titles and descriptions and post text are tokenized, stemmed and
+written as an inverted index under static/search/, which Hugo publishes as
+/search/. The index is split so the browser only downloads what a query
+needs:
+
+    manifest.json      Document count, shard names and the build id
+    terms/<xx>.json    Postings of every term starting with the prefix xx
+                       (terms/_.json holds terms that do not start with a-z
+                       or 0-9), as {term: [doc, weight, doc delta, weight, ...]}
+    docs/<n>.json      Display fields of documents n*256 .. n*256+255, as
+                       {doc: [type, title, url, date, source]}
+
+Each run passes its change feed (see change_feed.py), so only the documents
+that were added, updated or removed are re-tokenized, and only the shards
+holding their terms are rewritten. Without a change feed the data files are
+compared with the digests recorded in .cache/search-index.json instead. If
+that state is missing or belongs to a different build of the shards, the
+index is rebuilt from scratch.
+
+The tokenizer and stemmer are mirrored in themes/maison-de-freyssinet/static/js/search.js;
+change both together and bump INDEX_VERSION.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+DATA_DIR = 'data'
+SEARCH_DIR = 'static/search'
+STATE_FILE = '.cache/search-index.json'
+INDEX_VERSION = 1
+PREFIX_LENGTH = 2
+DOC_SHARD_SIZE = 256
+TITLE_WEIGHT = 3
+TITLE_LENGTH = 100
+MIN_TOKEN_LENGTH = 2
+
+URL_PATTERN = re.compile(r'https?://\S+')
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+SHARD_PATTERN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or our
+she so that the their them then there these they this to us was we were what when which who will with you your
+""".split())
+
+
+def stem(word):
+    """
+    Strip plural and -ing/-ed endings (an S-stemmer with two extra rules).
+
+    Deliberately simpler than Porter so the browser can apply exactly the same rules.
+    """
+    if word.endswith('ies') and not word.endswith(('eies', 'aies')) and len(word) > 4:
+        word = word[:-3] + 'y'
+    elif word.endswith('es') and not word.endswith(('aes', 'ees', 'oes')) and len(word) > 3:
+        word = word[:-1]
+    elif word.endswith('s') and not word.endswith(('us', 'ss')) and len(word) > 3:
+        word = word[:-1]
+    for suffix in ('ing', 'ed'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """Lowercased, stemmed search terms of a text, without URLs or stopwords."""
+    words = TOKEN_PATTERN.findall(URL_PATTERN.sub(' ', text or '').lower())
+    return [stem(word) for word in words if len(word) >= MIN_TOKEN_LENGTH and word not in STOPWORDS]
+
+
+def document_terms(title, body):
+    """Weight of each term in a document; a title occurrence counts TITLE_WEIGHT times."""
+    weights = {}
+    for term in tokenize(title):
+        weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+    for term in tokenize(body):
+        weights[term] = weights.get(term, 0) + 1
+    return weights
+
+
+def shard_name(term):
+    prefix = term[:PREFIX_LENGTH]
+    return prefix if SHARD_PATTERN.fullmatch(prefix) else '_'
+
+
+def video_document(video, channel_title):
+    """Display fields and term weights of a video."""
+    meta = ['video', video.get('title'), video.get('url'), (video.get('published_at') or '')[:10], channel_title]
+    return meta, document_terms(video.get('title'), video.get('description'))
+
+
+def post_document(post, authors):
+    """Display fields and term weights of a Bluesky post."""
+    author = post.get('author')
+    if not isinstance(author, dict):
+        author = authors.get(author) or {}
+    text = post.get('text') or ''
+    title = text if len(text) <= TITLE_LENGTH else text[:TITLE_LENGTH].rsplit(' ', 1)[0] + ' …'
+    meta = ['post', title, post.get('url'), (post.get('created_at') or '')[:10], f"@{author.get('handle', '')}"]
+    return meta, document_terms('', text)
+
+
+def load_data_file(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Warning: Skipping {path} for the search index: {e}")
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def file_documents(path, kind):
+    """
+    Documents in one data file.
+
+    Returns:
+        Dict of document key ('videos:<id>' or 'posts:<uri>') -> (meta, terms)
+    """
+    data = load_data_file(path)
+    if data is None:
+        return {}
+    if kind == 'videos':
+        title = data.get('channel_title') or data.get('channel_id')
+        return {f"videos:{video['id']}": video_document(video, title)
+                for video in data.get('videos', []) if 'id' in video}
+    authors = data.get('authors') or {}
+    return {f"posts:{post['uri']}": post_document(post, authors) for post in data.get('posts', []) if 'uri' in post}
+
+
+def source_files(data_dir=DATA_DIR):
+    """Data files that are indexed, as path -> kind."""
+    data_dir = Path(data_dir)
+    sources = {path: 'videos' for path in sorted((data_dir / 'youtube').glob('*.json'))}
+    sources[data_dir / 'bluesky.json'] = 'posts'
+    return sources
+
+
+def digest(document):
+    return hashlib.sha256(json.dumps(document, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def encode_postings(postings):
+    """Encode {doc: weight} as a flat list of doc number deltas and weights."""
+    encoded = []
+    previous = 0
+    for doc in sorted(postings):
+        encoded.extend((doc - previous, postings[doc]))
+        previous = doc
+    return encoded
+
+
+def decode_postings(encoded):
+    postings = {}
+    doc = 0
+    for delta, weight in zip(encoded[::2], encoded[1::2]):
+        doc += delta
+        postings[doc] = weight
+    return postings
+
+
+class SearchIndex:
+    """The published shards plus the state needed to update them in place."""
+
+    def __init__(self, output_dir=SEARCH_DIR, state_file=STATE_FILE):
+        self.output_dir = Path(output_dir)
+        self.state_file = Path(state_file)
+        self.state = self.load_json(self.state_file) or {}
+        self.manifest = self.load_json(self.output_dir / 'manifest.json') or {}
+
+    @staticmethod
+    def load_json(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_current(self):
+        """True if the state describes the shards on disk."""
+        return (self.state.get('version') == INDEX_VERSION and self.manifest.get('version') == INDEX_VERSION
+                and self.state.get('build_id') == self.manifest.get('build_id'))
+
+    def reset(self):
+        """Forget every document and delete the shards."""
+        for subdir in ('terms', 'docs'):
+            shutil.rmtree(self.output_dir / subdir, ignore_errors=True)
+        self.state = {'version': INDEX_VERSION, 'build_id': uuid.uuid4().hex, 'next_doc': 0, 'docs': {}}
+        self.manifest = {'shards': []}
+
+    def changed_documents(self, documents):
+        """The documents whose content differs from what is indexed."""
+        indexed = self.state['docs']
+        return {key: document for key, document in documents.items()
+                if key not in indexed or indexed[key]['digest'] != digest(document)}
+
+    def apply(self, documents, removed):
+        """
+        Index new or changed documents and drop removed ones, rewriting only touched shards.
+
+        Args:
+            documents: Dict of document key -> (meta, terms) to add or replace
+            removed: Document keys to remove
+
+        Returns:
+            Number of shard files written or deleted
+        """
+        indexed = self.state['docs']
+        # shard -> term -> doc -> weight, or None to remove the doc from the term
+        term_updates = {}
+        doc_updates = {}
+
+        for key in set(removed) | set(documents):
+            old = indexed.get(key)
+            if old is None:
+                continue
+            for term in old['terms']:
+                term_updates.setdefault(shard_name(term), {}).setdefault(term, {})[old['num']] = None
+            doc_updates[old['num']] = None
+            if key not in documents:
+                del indexed[key]
+
+        for key, (meta, terms) in documents.items():
+            if key in indexed:
+                num = indexed[key]['num']
+            else:
+                num = self.state['next_doc']
+                self.state['next_doc'] += 1
+            indexed[key] = {'num': num, 'digest': digest((meta, terms)), 'terms': sorted(terms)}
+            for term, weight in terms.items():
+                term_updates.setdefault(shard_name(term), {}).setdefault(term, {})[num] = weight
+            doc_updates[num] = meta
+
+        shards = set(self.manifest.get('shards', []))
+        written = 0
+        for shard, updates in term_updates.items():
+            path = self.output_dir / 'terms' / f"{shard}.json"
+            postings = {term: decode_postings(encoded) for term, encoded in (self.load_json(path) or {}).items()}
+            for term, docs in updates.items():
+                term_postings = postings.setdefault(term, {})
+                for num, weight in docs.items():
+                    if weight is None:
+                        term_postings.pop(num, None)
+                    else:
+                        term_postings[num] = weight
+                if not term_postings:
+                    del postings[term]
+            written += self.write_shard(path, {term: encode_postings(postings[term]) for term in sorted(postings)})
+            if postings:
+                shards.add(shard)
+            else:
+                shards.discard(shard)
+
+        doc_shards = {}
+        for num, meta in doc_updates.items():
+            doc_shards.setdefault(num // DOC_SHARD_SIZE, {})[num] = meta
+        for shard, updates in doc_shards.items():
+            path = self.output_dir / 'docs' / f"{shard}.json"
+            docs = {int(num): meta for num, meta in (self.load_json(path) or {}).items()}
+            for num, meta in updates.items():
+                if meta is None:
+                    docs.pop(num, None)
+                else:
+                    docs[num] = meta
+            written += self.write_shard(path, {str(num): docs[num] for num in sorted(docs)})
+
+        updated_at = self.manifest.get('updated_at') if not written else None
+        self.manifest = {
+            'version': INDEX_VERSION,
+            'build_id': self.state['build_id'],
+            'updated_at': updated_at or datetime.now(timezone.utc).isoformat(),
+            'documents': len(indexed),
+            'prefix_length': PREFIX_LENGTH,
+            'doc_shard_size': DOC_SHARD_SIZE,
+            'title_weight': TITLE_WEIGHT,
+            'shards': sorted(shards)
+        }
+        return written
+
+    @staticmethod
+    def write_shard(path, content):
+        """Write a shard, or delete it if it is empty. Returns 1 if a file was touched."""
+        if not content:
+            if path.exists():
+                path.unlink()
+                return 1
+            return 0
+        write_json(path, content, separators=(',', ':'), ensure_ascii=False)
+        return 1
+
+    def save(self):
+        """Write the manifest and then the state that matches it."""
+        write_json(self.output_dir / 'manifest.json', self.manifest, indent=2)
+        write_json(self.state_file, self.state, separators=(',', ':'))
+
+
+def write_json(path, data, **options):
+    """Write JSON atomically, so a Hugo build or a crash never leaves a truncated file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **options)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def feed_documents(feed, sources):
+    """
+    Documents touched by a change feed, read back from their data files.
+
+    Returns:
+        Tuple of (dict of key -> (meta, terms) for added and updated items, removed keys)
+    """
+    kinds = {str(path): kind for path, kind in sources.items()}
+    loaded = {}
+    documents = {}
+    removed = []
+    for kind in ('videos', 'posts'):
+        changes = feed.get(kind) or {}
+        for entry in changes.get('added', []) + changes.get('updated', []):
+            data_file = str(Path(entry['data_file']))
+            if kinds.get(data_file) != kind:
+                continue
+            if data_file not in loaded:
+                loaded[data_file] = file_documents(data_file, kind)
+            key = f"{kind}:{entry['id']}"
+            if key in loaded[data_file]:
+                documents[key] = loaded[data_file][key]
+        removed.extend(f"{kind}:{entry['id']}" for entry in changes.get('removed', [])
+                       if kinds.get(str(Path(entry['data_file']))) == kind)
+    return documents, removed
+
+
+def update_index(feed=None, data_dir=DATA_DIR, output_dir=SEARCH_DIR, state_file=STATE_FILE, rebuild=False):
+    """
+    Bring the search index up to date with the data files.
+
+    Args:
+        feed: Change feed of the run ({'videos': {'added': [...], ...}, 'posts': ...}),
+              or None to compare every data file with the indexed digests
+        data_dir: Hugo data directory
+        output_dir: Where the shards are published from
+        state_file: Where the per-document state is kept between runs
+        rebuild: If True, reindex everything from scratch
+
+    Returns:
+        Dict with 'documents', 'indexed', 'removed', 'shards_written' and 'rebuilt'
+    """
+    index = SearchIndex(output_dir, state_file)
+    sources = source_files(data_dir)
+    rebuilt = rebuild or not index.is_current()
+    if rebuilt:
+        index.reset()
+
+    if feed is not None and not rebuilt:
+        documents, removed = feed_documents(feed, sources)
+        documents = index.changed_documents(documents)
+        removed = [key for key in removed if key in index.state['docs'] and key not in documents]
+    else:
+        current = {}
+        for path, kind in sources.items():
+            current.update(file_documents(path, kind))
+        documents = index.changed_documents(current)
+        removed = [key for key in index.state['docs'] if key not in current]
+
+    written = index.apply(documents, removed)
+    index.save()
+    return {
+        'documents': index.manifest['documents'],
+        'indexed': len(documents),
+        'removed': len(removed),
+        'shards_written': written,
+        'rebuilt': rebuilt
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the client-side search index from the data files.")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Hugo data directory")
+    parser.add_argument('--output-dir', default=SEARCH_DIR, help="Where to write the index shards")
+    parser.add_argument('--changes', metavar='PATH',
+                        help="Only reindex the items in this change feed (e.g. .cache/changes.json)")
+    parser.add_argument('--rebuild', action='store_true', help="Reindex every document from scratch")
+    args = parser.parse_args(argv)
+
+    feed = None
+    if args.changes:
+        feed = SearchIndex.load_json(args.changes)
+        if feed is None:
+            print(f"Warning: Could not read {args.changes}; comparing every data file instead")
+
+    stats = update_index(feed, args.data_dir, args.output_dir, rebuild=args.rebuild)
+    action = "Rebuilt" if stats['rebuilt'] else "Updated"
+    print(f"{action} search index: {stats['documents']} documents ({stats['indexed']} indexed, "
+          f"{stats['removed']} removed), {stats['shards_written']} shards written to {args.output_dir}/")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Resumable backfill of a YouTube channel's full upload history.
+
+The uploads playlist is walked a page (50 videos) at a time. After each page
+the new videos are merged into data/youtube/<channel_id>.json, and only then
+is the checkpoint in .cache/youtube-backfill/<channel_id>.json advanced with
+the next page token, the IDs fetched so far and the quota spent. A run stops
+when its quota budget or deadline would be exceeded, or on an API error, and
+the next run resumes from the checkpoint; an interrupted run repeats at most
+one page, and merging by video ID makes that harmless.
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+import last_known_good
+
+CHECKPOINT_DIR = '.cache/youtube-backfill'
+PAGE_SIZE = 50  # playlistItems and videos both accept at most 50
+UNITS_PER_PAGE = 2  # One playlistItems and one videos call
+DEFAULT_QUOTA_BUDGET = 2000
+DEFAULT_DEADLINE_SECONDS = 1500
+
+
+def checkpoint_path(channel_id, checkpoint_dir=CHECKPOINT_DIR):
+    return Path(checkpoint_dir) / f'{channel_id}.json'
+
+
+def load_checkpoint(channel_id, checkpoint_dir=CHECKPOINT_DIR):
+    """Load a channel's checkpoint, or a fresh one if there is none."""
+    try:
+        with open(checkpoint_path(channel_id, checkpoint_dir)) as f:
+            checkpoint = json.load(f)
+        if isinstance(checkpoint, dict) and checkpoint.get('channel_id') == channel_id:
+            return checkpoint
+    except (OSError, ValueError):
+        pass
+    return {
+        'channel_id': channel_id,
+        'uploads_playlist_id': None,
+        'page_token': None,
+        'fetched_ids': [],
+        'pages': 0,
+        'quota_spent': 0,
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'completed_at': None
+    }
+
+
+def save_checkpoint(checkpoint, checkpoint_dir=CHECKPOINT_DIR):
+    """Write a checkpoint atomically, so an interrupted write never loses the previous one."""
+    path = checkpoint_path(checkpoint['channel_id'], checkpoint_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    checkpoint['updated_at'] = datetime.now(timezone.utc).isoformat()
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def merge_history(videos, known_videos):
+    """
+    Keep known videos older than a fetch's oldest video.
+
+    A regular fetch only sees the latest uploads; once a channel has been
+    backfilled, the older part of its history is carried over from the data
+    file instead of being dropped.
+
+    Args:
+        videos: Videos of the latest fetch, newest first
+        known_videos: Videos currently in the data file
+
+    Returns:
+        The fetched videos followed by the older known ones, newest first
+    """
+    if not videos:
+        return list(known_videos or [])
+    oldest = min(video['published_at'] for video in videos)
+    fetched_ids = {video['id'] for video in videos}
+    older = [video for video in known_videos or []
+             if video['id'] not in fetched_ids and video['published_at'] < oldest]
+    return sorted(videos + older, key=lambda x: x['published_at'], reverse=True)
+
+
+def write_page(fetcher, channel_id, channel_slug, channel_title, videos):
+    """Merge one page of backfilled videos into the channel's data file."""
+    known = last_known_good.load(Path('data') / 'youtube' / f'{channel_id}.json') or {}
+    merged = {video['id']: video for video in known.get('videos') or []}
+    # A regular fetch's copy of a video is at least as fresh, so it is kept
+    for video in videos:
+        merged.setdefault(video['id'], video)
+    channel_data = {
+        'channel_title': known.get('channel_title') or channel_title,
+        'channel_id': channel_id,
+        'videos': sorted(merged.values(), key=lambda x: x['published_at'], reverse=True)
+    }
+    fetcher.generate_hugo_content(channel_data, 'content', channel_slug)
+
+
+def backfill_channel(fetcher, channel_id, channel_slug, quota_budget=DEFAULT_QUOTA_BUDGET, deadline=None,
+                     checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Walk a channel's uploads playlist from its checkpoint until done, out of budget or out of time.
+
+    Args:
+        fetcher: YouTubeFetcher used for the API calls and to write the data file
+        channel_id: YouTube channel ID
+        channel_slug: Slug of the channel's content section
+        quota_budget: API units this call may spend
+        deadline: time.monotonic() value after which no new page is started, or None
+        checkpoint_dir: Directory the checkpoints are kept in
+
+    Returns:
+        Dict with the 'status' ('complete', 'budget', 'deadline' or 'error'), the
+        'quota_spent' and 'videos' added by this call, and the checkpoint's totals
+    """
+    checkpoint = load_checkpoint(channel_id, checkpoint_dir)
+    spent = 0
+    added = 0
+
+    def result(status):
+        return {'status': status, 'quota_spent': spent, 'videos': added, 'pages': checkpoint['pages'],
+                'total_videos': len(checkpoint['fetched_ids']), 'total_quota_spent': checkpoint['quota_spent']}
+
+    if checkpoint['completed_at']:
+        print(f"Backfill of channel {channel_id} already completed at {checkpoint['completed_at']}")
+        return result('complete')
+
+    fetched = set(checkpoint['fetched_ids'])
+    channel_title = checkpoint.get('channel_title')
+    try:
+        if not checkpoint['uploads_playlist_id']:
+            if quota_budget < 1:
+                return result('budget')
+            channel_data = fetcher.api_get('channels', {'part': 'contentDetails,snippet', 'id': channel_id,
+                                                        'key': fetcher.api_key}, channel_id)
+            spent += 1
+            checkpoint['quota_spent'] += 1
+            if not channel_data['items']:
+                print(f"Channel {channel_id} not found")
+                return result('error')
+            channel_info = channel_data['items'][0]
+            checkpoint['uploads_playlist_id'] = channel_info['contentDetails']['relatedPlaylists']['uploads']
+            checkpoint['channel_title'] = channel_title = channel_info['snippet']['title']
+            save_checkpoint(checkpoint, checkpoint_dir)
+
+        while True:
+            if spent + UNITS_PER_PAGE > quota_budget:
+                status = 'budget'
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                status = 'deadline'
+                break
+
+            params = {'part': 'snippet', 'playlistId': checkpoint['uploads_playlist_id'],
+                      'maxResults': PAGE_SIZE, 'key': fetcher.api_key}
+            if checkpoint['page_token']:
+                params['pageToken'] = checkpoint['page_token']
+            page = fetcher.api_get('playlistItems', params, channel_id)
+            spent += 1
+            checkpoint['quota_spent'] += 1
+
+            new_ids = list(dict.fromkeys(item['snippet']['resourceId']['videoId'] for item in page['items']
+                                         if item['snippet']['resourceId']['videoId'] not in fetched))
+            if new_ids:
+                videos = fetcher.get_video_details(channel_id, new_ids)
+                spent += 1
+                checkpoint['quota_spent'] += 1
+                write_page(fetcher, channel_id, channel_slug, channel_title, videos)
+                added += len(videos)
+
+            # The data file is written before the checkpoint moves past the page
+            fetched.update(new_ids)
+            checkpoint['fetched_ids'].extend(new_ids)
+            checkpoint['pages'] += 1
+            checkpoint['page_token'] = page.get('nextPageToken')
+            if not checkpoint['page_token']:
+                checkpoint['completed_at'] = datetime.now(timezone.utc).isoformat()
+            save_checkpoint(checkpoint, checkpoint_dir)
+            if checkpoint['completed_at']:
+                status = 'complete'
+                break
+    except requests.RequestException as e:
+        print(f"Error backfilling channel {channel_id}: {e}")
+        save_checkpoint(checkpoint, checkpoint_dir)
+        return result('error')
+    except KeyError as e:
+        print(f"Unexpected API response structure: {e}")
+        save_checkpoint(checkpoint, checkpoint_dir)
+        return result('error')
+
+    if status == 'complete':
+        print(f"✓ Backfilled channel {channel_id}: {len(fetched)} videos in {checkpoint['pages']} pages")
+    else:
+        print(f"Paused backfill of channel {channel_id} ({'quota budget' if status == 'budget' else 'deadline'} "
+              f"reached) after {checkpoint['pages']} pages; run again to resume")
+    return result(status)
+
+
+def backfill_channels(fetcher, channels, quota_budget=DEFAULT_QUOTA_BUDGET, deadline_seconds=DEFAULT_DEADLINE_SECONDS,
+                      checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Backfill channels in turn, sharing one quota budget and deadline.
+
+    Args:
+        channels: List of (channel_id, channel_slug) pairs
+
+    Returns:
+        Dict of channel ID -> backfill_channel result, for the channels reached
+    """
+    deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+    remaining = quota_budget
+    results = {}
+    for channel_id, channel_slug in channels:
+        result = backfill_channel(fetcher, channel_id, channel_slug, quota_budget=remaining, deadline=deadline,
+                                  checkpoint_dir=checkpoint_dir)
+        results[channel_id] = result
+        remaining -= result['quota_spent']
+        if result['status'] in ('budget', 'deadline'):
+            break
+    return results
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Keep data/youtube/<channel_id>.json up to date from YouTube's WebSub hub.
+
+Each configured channel's topic is subscribed at the hub with this receiver's
+public callback URL. The hub confirms a subscription with a GET carrying a
+challenge, then POSTs an Atom entry whenever a video is published or edited
+(and a tombstone when one is deleted). Only the notified video is looked up
+in the Data API, and its channel's data file is updated in place. Leases are
+renewed a day before they run out.
+"""
+
+import hashlib
+import hmac
+import json
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from metrics import REGISTRY as metrics
+
+DEFAULT_HUB = 'https://pubsubhubbub.appspot.com/subscribe'
+TOPIC_URL = 'https://www.youtube.com/xml/feeds/videos.xml?channel_id={}'
+STATE_FILE = '.cache/youtube-websub.json'
+LEASE_SECONDS = 5 * 24 * 3600  # The hub's default and maximum lease
+RENEW_BEFORE_SECONDS = 24 * 3600
+RETRY_SECONDS = 300  # Wait this long for a pending verification before asking again
+MAX_BODY_BYTES = 1024 * 1024
+REQUEST_TIMEOUT = 10
+SIGNATURE_METHODS = ('sha1', 'sha256', 'sha384', 'sha512')
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+YT = '{http://www.youtube.com/xml/schemas/2015}'
+TOMBSTONE = '{http://purl.org/atompub/tombstones/1.0}'
+
+
+def topic_url(channel_id):
+    return TOPIC_URL.format(channel_id)
+
+
+def verify_signature(secret, body, header):
+    """
+    Check a notification's X-Hub-Signature header ('sha1=<hex digest>').
+
+    Args:
+        secret: The hub.secret the subscription was made with
+        body: Raw request body
+        header: Value of the X-Hub-Signature header, or None
+
+    Returns:
+        True if the body was signed with the secret
+    """
+    method, _, digest = (header or '').partition('=')
+    if method not in SIGNATURE_METHODS:
+        return False
+    expected = hmac.new(secret.encode('utf-8'), body, getattr(hashlib, method)).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+def parse_notification(body):
+    """
+    Read the videos a hub notification is about.
+
+    Raises ET.ParseError for a body that is not XML.
+
+    Returns:
+        Tuple of (updated, deleted) lists of (channel_id, video_id) pairs
+    """
+    root = ET.fromstring(body)
+    updated = []
+    for entry in root.iter(f'{ATOM}entry'):
+        video_id = entry.findtext(f'{YT}videoId')
+        channel_id = entry.findtext(f'{YT}channelId')
+        if video_id and channel_id:
+            updated.append((channel_id, video_id))
+
+    deleted = []
+    for entry in root.iter(f'{TOMBSTONE}deleted-entry'):
+        ref = entry.get('ref') or ''
+        channel_uri = entry.findtext(f'{TOMBSTONE}by/{ATOM}uri') or ''
+        if ref.startswith('yt:video:') and channel_uri:
+            deleted.append((channel_uri.rstrip('/').rsplit('/', 1)[-1], ref[len('yt:video:'):]))
+    return updated, deleted
+
+
+class WebSubReceiver:
+    def __init__(self, fetcher, channels, callback_url, hub=DEFAULT_HUB, secret=None,
+                 host='0.0.0.0', port=8080, state_file=STATE_FILE, max_results=50,
+                 lease_seconds=LEASE_SECONDS, renew_before_seconds=RENEW_BEFORE_SECONDS,
+                 on_rebuild=None, debounce_seconds=30, idle_timeout=1.0):
+        """
+        Initialize the WebSub receiver.
+
+        Args:
+            fetcher: YouTubeFetcher used to look up notified videos and write the data files
+            channels: Dict of channel ID to channel slug for the configured channels
+            callback_url: Public URL the hub reaches this receiver at
+            hub: Hub subscribe endpoint
+            secret: Optional hub.secret; notifications without a matching signature are ignored
+            host: Interface the HTTP server listens on
+            port: Port the HTTP server listens on (0 picks a free one)
+            state_file: File subscription leases are persisted to
+            max_results: Number of newest videos kept per channel
+            lease_seconds: Lease requested from the hub
+            renew_before_seconds: How long before a lease expires it is renewed
+            on_rebuild: Callable invoked once a burst of changes has settled
+            debounce_seconds: Quiet period required before on_rebuild is called
+            idle_timeout: Seconds between lease and rebuild checks
+        """
+        self.fetcher = fetcher
+        self.channels = channels
+        self.callback_url = callback_url
+        self.hub = hub
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.state_file = Path(state_file)
+        self.max_results = max_results
+        self.lease_seconds = lease_seconds
+        self.renew_before_seconds = renew_before_seconds
+        self.on_rebuild = on_rebuild
+        self.debounce_seconds = debounce_seconds
+        self.idle_timeout = idle_timeout
+
+        # Handler threads and the run loop share the state and data files
+        self.lock = threading.RLock()
+        self.subscriptions = self.load_state()
+        self.rebuild_due_at = None
+        self.server = None
+        self.stopped = False
+
+    def load_state(self):
+        """Load the persisted subscriptions, keyed by channel ID."""
+        try:
+            with open(self.state_file) as f:
+                return json.load(f).get('subscriptions') or {}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def save_state(self):
+        """Persist the subscriptions so a restart only renews what is due."""
+        with self.lock:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.state_file, 'w') as f:
+                json.dump({'subscriptions': self.subscriptions}, f, indent=2)
+
+    def due_requests(self, now):
+        """
+        Work out which subscribe and unsubscribe requests to send.
+
+        Returns:
+            List of (channel_id, mode) pairs
+        """
+        due = []
+        with self.lock:
+            for channel_id in self.channels:
+                subscription = self.subscriptions.get(channel_id) or {}
+                requested_at = subscription.get('requested_at')
+                if requested_at and now - datetime.fromisoformat(requested_at) < timedelta(seconds=RETRY_SECONDS):
+                    continue
+                expires_at = subscription.get('expires_at')
+                if (not expires_at or datetime.fromisoformat(expires_at) - now
+                        <= timedelta(seconds=self.renew_before_seconds)):
+                    due.append((channel_id, 'subscribe'))
+            # Channels dropped from the configuration stop being pushed to us
+            due.extend((channel_id, 'unsubscribe') for channel_id in self.subscriptions
+                       if channel_id not in self.channels)
+        return due
+
+    def renew(self):
+        """Subscribe channels without a verified lease or whose lease is about to expire."""
+        now = datetime.now(timezone.utc)
+        for channel_id, mode in self.due_requests(now):
+            # The hub may verify before it answers, so the lock is not held while waiting
+            if not self.request(channel_id, mode):
+                continue
+            with self.lock:
+                if mode == 'unsubscribe':
+                    self.subscriptions.pop(channel_id, None)
+                else:
+                    self.subscriptions.setdefault(channel_id, {})['requested_at'] = now.isoformat()
+            self.save_state()
+
+    def request(self, channel_id, mode):
+        """
+        Send a subscribe or unsubscribe request for a channel's topic to the hub.
+
+        Returns:
+            True if the hub accepted the request
+        """
+        data = {
+            'hub.callback': self.callback_url,
+            'hub.topic': topic_url(channel_id),
+            'hub.mode': mode,
+            'hub.verify': 'async'
+        }
+        if mode == 'subscribe':
+            data['hub.lease_seconds'] = self.lease_seconds
+            if self.secret:
+                data['hub.secret'] = self.secret
+        try:
+            with metrics.api_call('youtube', 'websub', channel_id):
+                response = requests.post(self.hub, data=data, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"Error sending WebSub {mode} request for channel {channel_id}: {e}")
+            return False
+        print(f"Sent WebSub {mode} request for channel {channel_id}")
+        return True
+
+    def verify_intent(self, params):
+        """
+        Answer the hub's verification GET.
+
+        Args:
+            params: Query parameters of the request
+
+        Returns:
+            Tuple of (HTTP status, response body)
+        """
+        mode = params.get('hub.mode')
+        topic = params.get('hub.topic', '')
+        channel_id = parse_qs(urlsplit(topic).query).get('channel_id', [None])[0]
+        if topic != topic_url(channel_id):
+            return 404, ''
+
+        if mode == 'denied':
+            print(f"Warning: Hub denied the subscription for channel {channel_id}: {params.get('hub.reason')}")
+            with self.lock:
+                self.subscriptions.pop(channel_id, None)
+            self.save_state()
+            return 200, ''
+
+        challenge = params.get('hub.challenge')
+        wanted = channel_id in self.channels
+        if not challenge or mode not in ('subscribe', 'unsubscribe') or wanted != (mode == 'subscribe'):
+            return 404, ''
+
+        with self.lock:
+            if mode == 'subscribe':
+                try:
+                    lease = int(params.get('hub.lease_seconds') or self.lease_seconds)
+                except ValueError:
+                    lease = self.lease_seconds
+                expires_at = datetime.now(timezone.utc) + timedelta(seconds=lease)
+                self.subscriptions[channel_id] = {'expires_at': expires_at.isoformat()}
+                print(f"Subscribed to channel {channel_id} until {expires_at:%Y-%m-%d %H:%M} UTC")
+            else:
+                self.subscriptions.pop(channel_id, None)
+                print(f"Unsubscribed from channel {channel_id}")
+        self.save_state()
+        return 200, challenge
+
+    def handle_notification(self, body, signature):
+        """
+        Apply a content notification from the hub.
+
+        Args:
+            body: Raw Atom body
+            signature: Value of the X-Hub-Signature header, or None
+
+        Returns:
+            True if any data file changed
+        """
+        if self.secret and not verify_signature(self.secret, body, signature):
+            print("Warning: Ignoring WebSub notification with a missing or bad signature")
+            return False
+        try:
+            updated, deleted = parse_notification(body)
+        except ET.ParseError as e:
+            print(f"Warning: Ignoring malformed WebSub notification: {e}")
+            return False
+
+        by_channel = {}
+        for channel_id, video_id in updated:
+            by_channel.setdefault(channel_id, ([], []))[0].append(video_id)
+        for channel_id, video_id in deleted:
+            by_channel.setdefault(channel_id, ([], []))[1].append(video_id)
+
+        changed = False
+        for channel_id, (video_ids, deleted_ids) in by_channel.items():
+            if channel_id not in self.channels:
+                print(f"Warning: Ignoring notification for unconfigured channel {channel_id}")
+                continue
+            changed = self.update_channel(channel_id, video_ids, deleted_ids) or changed
+        if changed:
+            with self.lock:
+                self.rebuild_due_at = time.monotonic() + self.debounce_seconds
+        return changed
+
+    def update_channel(self, channel_id, video_ids, deleted_ids):
+        """
+        Merge notified videos into a channel's data file.
+
+        Returns:
+            True if the data file was rewritten
+        """
+        with self.lock:
+            print(f"Notified of {len(video_ids)} updated and {len(deleted_ids)} deleted videos "
+                  f"for channel {channel_id}")
+            return self.fetcher.update_videos(channel_id, self.channels[channel_id], video_ids, deleted_ids,
+                                              max_results=self.max_results)
+
+    def flush(self, force=False):
+        """Run a pending rebuild once the debounce window passes."""
+        with self.lock:
+            if self.rebuild_due_at is None:
+                return
+            if not force and time.monotonic() < self.rebuild_due_at:
+                return
+            self.rebuild_due_at = None
+        if self.on_rebuild:
+            self.on_rebuild()
+
+    def start(self):
+        """Start the HTTP server in a background thread."""
+        self.server = ThreadingHTTPServer((self.host, self.port), make_handler(self))
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Listening for WebSub notifications on {self.host}:{self.port} ({self.callback_url})")
+
+    def stop(self):
+        """Ask the run loop to exit."""
+        self.stopped = True
+
+    def run(self):
+        """Serve notifications and keep the leases renewed until stopped."""
+        self.start()
+        try:
+            while not self.stopped:
+                self.renew()
+                self.flush()
+                time.sleep(self.idle_timeout)
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+            self.flush(force=True)
+
+
+def make_handler(receiver):
+    """Build the request handler class bound to a receiver."""
+
+    class WebSubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = {key: values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+            self.respond(*receiver.verify_intent(params))
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                length = -1
+            if not 0 <= length <= MAX_BODY_BYTES:
+                self.respond(413)
+                return
+            body = self.rfile.read(length)
+            receiver.handle_notification(body, self.headers.get('X-Hub-Signature'))
+            # Acknowledge even ignored notifications, as the spec asks, so the hub does not retry them
+            self.respond(204)
+
+        def respond(self, status, body=''):
+            data = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            # Notifications are reported by the receiver itself
+            pass
+
+    return WebSubHandler
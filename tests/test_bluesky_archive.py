@@ -0,0 +1,172 @@
+"""Tests for the append-only Bluesky archive"""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import bluesky_archive
+import last_known_good
+from bluesky_archive import BlueskyArchive
+from fetch_bluesky_data import BlueskyFetcher
+
+
+def make_post(rkey, created_at, text='Post', like_count=0):
+    return {
+        'uri': f'at://did:plc:test/app.bsky.feed.post/{rkey}',
+        'cid': f'cid-{rkey}',
+        'text': text,
+        'created_at': created_at,
+        'like_count': like_count
+    }
+
+
+class TestBlueskyArchive:
+    """Test cases for BlueskyArchive"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        self.archive_dir = os.path.join(self.test_dir, 'archive')
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_append_and_lookup(self):
+        """Test that appended posts can be looked up by URI"""
+        archive = BlueskyArchive(self.archive_dir)
+        posts = [make_post('a', '2024-01-01T00:00:00Z'), make_post('b', '2024-01-02T00:00:00Z')]
+
+        assert archive.append(posts) == 2
+        assert len(archive) == 2
+        assert posts[0]['uri'] in archive
+        assert archive.get(posts[1]['uri']) == posts[1]
+        assert archive.get('at://missing') is None
+
+    def test_unchanged_posts_not_appended(self):
+        """Test that re-archiving identical posts writes nothing"""
+        archive = BlueskyArchive(self.archive_dir)
+        archive.append([make_post('a', '2024-01-01T00:00:00Z')])
+        size = os.path.getsize(archive.segment_path(1))
+
+        assert archive.append([make_post('a', '2024-01-01T00:00:00Z')]) == 0
+        assert os.path.getsize(archive.segment_path(1)) == size
+
+    def test_edits_update_index_and_persist(self):
+        """Test that a changed post is appended and the reopened index points at it"""
+        archive = BlueskyArchive(self.archive_dir)
+        archive.append([make_post('a', '2024-01-01T00:00:00Z', like_count=1)])
+        archive.append([make_post('a', '2024-01-01T00:00:00Z', like_count=5)])
+
+        reopened = BlueskyArchive(self.archive_dir)
+        assert len(reopened) == 1
+        assert reopened.get('at://did:plc:test/app.bsky.feed.post/a')['like_count'] == 5
+
+    def test_segments_are_plain_gzip_jsonl(self):
+        """Test that a whole segment can be read as gzip JSONL"""
+        archive = BlueskyArchive(self.archive_dir)
+        archive.append([make_post('a', '2024-01-01T00:00:00Z'), make_post('b', '2024-01-02T00:00:00Z')])
+        archive.delete(['at://did:plc:test/app.bsky.feed.post/a'])
+
+        with gzip.open(archive.segment_path(1), 'rt') as f:
+            ops = [json.loads(line)['op'] for line in f]
+        assert ops == ['put', 'put', 'delete']
+
+    def test_segments_roll_over(self):
+        """Test that appends start a new segment once the size limit is reached"""
+        archive = BlueskyArchive(self.archive_dir, segment_max_bytes=1)
+        archive.append([make_post('a', '2024-01-01T00:00:00Z'), make_post('b', '2024-01-02T00:00:00Z')])
+
+        assert archive.segments() == [1, 2]
+        assert archive.get('at://did:plc:test/app.bsky.feed.post/b')['cid'] == 'cid-b'
+
+    def test_delete(self):
+        """Test that deleted posts disappear from lookups"""
+        archive = BlueskyArchive(self.archive_dir)
+        archive.append([make_post('a', '2024-01-01T00:00:00Z')])
+
+        assert archive.delete(['at://did:plc:test/app.bsky.feed.post/a', 'at://missing']) == 1
+        assert archive.get('at://did:plc:test/app.bsky.feed.post/a') is None
+        assert len(BlueskyArchive(self.archive_dir)) == 0
+
+    def test_compact_folds_edits_and_deletes(self):
+        """Test that compaction keeps only live records"""
+        archive = BlueskyArchive(self.archive_dir)
+        for likes in range(5):
+            archive.append([make_post('a', '2024-01-01T00:00:00Z', like_count=likes)])
+        archive.append([make_post('b', '2024-01-02T00:00:00Z')])
+        archive.delete(['at://did:plc:test/app.bsky.feed.post/b'])
+
+        stats = archive.compact()
+
+        assert stats['records'] == 1
+        assert stats['bytes_after'] < stats['bytes_before']
+        assert archive.segments() == [2]
+        reopened = BlueskyArchive(self.archive_dir)
+        assert reopened.get('at://did:plc:test/app.bsky.feed.post/a')['like_count'] == 4
+        with gzip.open(reopened.segment_path(2), 'rt') as f:
+            assert len(f.readlines()) == 1
+
+    def test_export_reads_only_newest_records(self):
+        """Test that export writes the newest posts without reading older records"""
+        archive = BlueskyArchive(self.archive_dir)
+        archive.append([make_post(str(i), f'2024-01-{i:02d}T00:00:00Z') for i in range(1, 21)])
+
+        with patch.object(archive, 'read_record', wraps=archive.read_record) as mock_read:
+            assert archive.export(BlueskyFetcher(None, None), 'data/bluesky.json', limit=3) == 3
+
+        assert mock_read.call_count == 3
+        with open('data/bluesky.json') as f:
+            data = json.load(f)
+        assert data['post_count'] == 3
+        assert [p['created_at'][:10] for p in data['posts']] == ['2024-01-20', '2024-01-19', '2024-01-18']
+
+    def test_export_empty_archive(self):
+        """Test that exporting an empty archive leaves the data file alone"""
+        assert BlueskyArchive(self.archive_dir).export(BlueskyFetcher(None, None), 'data/bluesky.json') == 0
+        assert not os.path.exists('data/bluesky.json')
+
+    def test_unknown_index_version_ignored(self):
+        """Test that an index from an incompatible version is not used"""
+        os.makedirs(self.archive_dir)
+        with open(os.path.join(self.archive_dir, 'index.json'), 'w') as f:
+            json.dump({'version': 99, 'entries': {'x': [1, 0, 1, None, 'd']}}, f)
+
+        assert len(BlueskyArchive(self.archive_dir)) == 0
+
+    def test_main_compact_and_export(self):
+        """Test the archive command line"""
+        archive = BlueskyArchive(self.archive_dir)
+        archive.append([make_post('a', '2024-01-01T00:00:00Z')])
+
+        bluesky_archive.main(['--path', self.archive_dir, 'compact'])
+        bluesky_archive.main(['--path', self.archive_dir, 'export', '--limit', '5', '--output', 'out.json'])
+
+        with open('out.json') as f:
+            assert json.load(f)['post_count'] == 1
+
+    def test_export_saved_like_a_fetch(self):
+        """Test that export goes through save_data: change feed, last known good, authors table"""
+        os.makedirs('config')
+        with open('config/bluesky-config.yaml', 'w') as f:
+            f.write("handle: test.bsky.social\nauthor_table: true\n")
+        post = dict(make_post('a', '2024-01-01T00:00:00Z'),
+                    author={'handle': 'test.bsky.social', 'display_name': 'Test', 'avatar': None})
+        BlueskyArchive(self.archive_dir).append([post])
+
+        with patch('builtins.print'):
+            bluesky_archive.main(['--path', self.archive_dir, 'export'])
+
+        with open('data/bluesky.json') as f:
+            data = json.load(f)
+        assert data['posts'][0]['author'] == 'did:plc:test'
+        assert data['authors']['did:plc:test']['handle'] == 'test.bsky.social'
+        with open('.cache/changes.json') as f:
+            assert [p['id'] for p in json.load(f)['posts']['added']] == [post['uri']]
+        assert last_known_good.snapshot_path('data/bluesky.json').exists()
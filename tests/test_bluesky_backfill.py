@@ -0,0 +1,312 @@
+"""Tests for the Bluesky CAR backfill"""
+
+import hashlib
+import io
+import os
+import shutil
+import struct
+import tempfile
+from unittest.mock import Mock, patch
+
+import libipld
+import pytest
+
+# Import the Bluesky fetcher
+import sys
+import importlib.util
+script_path = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'fetch-bluesky-data.py')
+spec = importlib.util.spec_from_file_location("fetch_bluesky_data", script_path)
+fetch_bluesky_data = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(fetch_bluesky_data)
+BlueskyFetcher = fetch_bluesky_data.BlueskyFetcher
+
+import bluesky_backfill
+
+DID = 'did:plc:test123'
+AUTHOR = {'handle': 'test.bsky.social', 'display_name': 'Test User', 'avatar': None}
+
+
+class Link(bytes):
+    """CID bytes that should be encoded as a DAG-CBOR link (tag 42)"""
+
+
+def cbor_head(major, value):
+    if value < 24:
+        return bytes([major << 5 | value])
+    if value < 256:
+        return bytes([major << 5 | 24, value])
+    if value < 65536:
+        return bytes([major << 5 | 25]) + struct.pack('>H', value)
+    return bytes([major << 5 | 26]) + struct.pack('>I', value)
+
+
+def encode(value):
+    """Minimal DAG-CBOR encoder with link support for building test CAR files"""
+    if value is None:
+        return b'\xf6'
+    if isinstance(value, Link):
+        payload = b'\x00' + bytes(value)
+        return b'\xd8\x2a' + cbor_head(2, len(payload)) + payload
+    if isinstance(value, bytes):
+        return cbor_head(2, len(value)) + value
+    if isinstance(value, str):
+        data = value.encode('utf-8')
+        return cbor_head(3, len(data)) + data
+    if isinstance(value, int):
+        return cbor_head(0, value)
+    if isinstance(value, list):
+        return cbor_head(4, len(value)) + b''.join(encode(item) for item in value)
+    keys = sorted(value, key=lambda k: (len(k.encode('utf-8')), k.encode('utf-8')))
+    return cbor_head(5, len(keys)) + b''.join(encode(k) + encode(value[k]) for k in keys)
+
+
+def cid_for(block):
+    return Link(bytes([1, 0x71, 0x12, 0x20]) + hashlib.sha256(block).digest())
+
+
+def varint(value):
+    out = b''
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out += bytes([byte | 0x80])
+        else:
+            return out + bytes([byte])
+
+
+def build_car(records):
+    """Build a CAR file with one MST node holding the given {key: record} entries"""
+    blocks = []
+    entries = []
+    previous = b''
+    for key in sorted(records):
+        block = encode(records[key])
+        cid = cid_for(block)
+        blocks.append((cid, block))
+        key_bytes = key.encode('utf-8')
+        prefix = len(os.path.commonprefix([previous, key_bytes]))
+        entries.append({'p': prefix, 'k': key_bytes[prefix:], 'v': cid, 't': None})
+        previous = key_bytes
+
+    node = encode({'l': None, 'e': entries})
+    node_cid = cid_for(node)
+    commit = encode({'did': DID, 'version': 3, 'data': node_cid, 'rev': 'rev1', 'prev': None})
+    commit_cid = cid_for(commit)
+
+    header = encode({'version': 1, 'roots': [commit_cid]})
+    car = varint(len(header)) + header
+    for cid, block in [(commit_cid, commit), (node_cid, node)] + blocks:
+        car += varint(len(cid) + len(block)) + bytes(cid) + block
+    return car
+
+
+RECORDS = {
+    'app.bsky.actor.profile/self': {'$type': 'app.bsky.actor.profile', 'displayName': 'Test User'},
+    'app.bsky.feed.like/3kaaa': {'$type': 'app.bsky.feed.like', 'createdAt': '2024-01-01T00:00:00Z',
+                                 'subject': {'uri': 'at://did:plc:other/app.bsky.feed.post/x', 'cid': 'bafyx'}},
+    'app.bsky.feed.post/3kpost1': {'$type': 'app.bsky.feed.post', 'text': 'First post https://example.com',
+                                   'createdAt': '2024-01-01T10:00:00Z'},
+    'app.bsky.feed.post/3kpost2': {'$type': 'app.bsky.feed.post', 'text': 'Second post',
+                                   'createdAt': '2024-01-02T10:00:00Z'},
+    'app.bsky.feed.post/3kreply': {'$type': 'app.bsky.feed.post', 'text': 'A reply',
+                                   'createdAt': '2024-01-03T10:00:00Z',
+                                   'reply': {'root': {'uri': 'at://did:plc:other/app.bsky.feed.post/r', 'cid': 'bafyr'},
+                                             'parent': {'uri': 'at://did:plc:other/app.bsky.feed.post/r', 'cid': 'bafyr'}}},
+}
+
+
+class TestBlueskyBackfill:
+    """Test cases for the CAR backfill"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        self.car_path = os.path.join(self.test_dir, 'repo.car')
+        with open(self.car_path, 'wb') as f:
+            f.write(build_car(RECORDS))
+        os.makedirs('config')
+        with open('config/bluesky-config.yaml', 'w') as f:
+            f.write('handle: test.bsky.social\n')
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_iter_car_blocks_matches_reference_decoder(self):
+        """Test that streamed blocks match libipld's whole-file CAR decoder"""
+        with open(self.car_path, 'rb') as f:
+            data = f.read()
+        _, reference = libipld.decode_car(data)
+
+        with open(self.car_path, 'rb') as f:
+            blocks = {cid: libipld.decode_dag_cbor(block) for cid, block in bluesky_backfill.iter_car_blocks(f)}
+
+        assert set(blocks) == set(reference)
+
+    def test_split_cid_v0(self):
+        """Test that CIDv0 sections are split at the 34-byte multihash"""
+        multihash = b'\x12\x20' + bytes(32)
+        assert bluesky_backfill.split_cid(multihash + b'data') == (multihash, b'data')
+
+    def test_truncated_and_empty_car_rejected(self):
+        """Test that malformed CAR files raise errors"""
+        with open(self.car_path, 'rb') as f:
+            data = f.read()
+
+        with pytest.raises(ValueError):
+            list(bluesky_backfill.iter_car_blocks(io.BytesIO(data[:-5])))
+        with pytest.raises(ValueError):
+            list(bluesky_backfill.iter_car_blocks(io.BytesIO(b'')))
+        with pytest.raises(ValueError):
+            list(bluesky_backfill.iter_car_blocks(io.BytesIO(b'\x80')))
+
+        header = encode({'version': 2, 'roots': []})
+        with pytest.raises(ValueError):
+            list(bluesky_backfill.iter_car_blocks(io.BytesIO(varint(len(header)) + header)))
+
+    def test_iter_post_records(self):
+        """Test that only post records are extracted, with URIs from the MST keys"""
+        posts = list(bluesky_backfill.iter_post_records(self.car_path, DID))
+
+        assert sorted(uri for uri, _, _ in posts) == [
+            f'at://{DID}/app.bsky.feed.post/3kpost1',
+            f'at://{DID}/app.bsky.feed.post/3kpost2',
+            f'at://{DID}/app.bsky.feed.post/3kreply'
+        ]
+        for _, cid, record in posts:
+            assert cid.startswith('bafyrei')
+            assert record['$type'] == 'app.bsky.feed.post'
+
+    def test_backfill_posts_fills_counts_in_batches(self):
+        """Test that posts get the feed shape and counts from batched getPosts calls"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        fetcher.client = Mock()
+
+        def get_posts(uris):
+            return Mock(posts=[Mock(uri=uri, like_count=3, repost_count=2, reply_count=None) for uri in uris])
+
+        fetcher.client.get_posts.side_effect = get_posts
+        batches = []
+
+        total = bluesky_backfill.backfill_posts(fetcher, DID, AUTHOR, self.car_path, batch_size=1,
+                                                on_batch=batches.append)
+
+        assert total == 2
+        assert fetcher.client.get_posts.call_count == 2
+        posts = sorted((post for batch in batches for post in batch), key=lambda p: p['created_at'])
+        assert [p['text'] for p in posts] == ['First post https://example.com', 'Second post']
+        assert posts[0]['links'] == ['https://example.com']
+        assert posts[0]['url'] == 'https://bsky.app/profile/test.bsky.social/post/3kpost1'
+        assert (posts[0]['like_count'], posts[0]['repost_count'], posts[0]['reply_count']) == (3, 2, 0)
+
+    def test_backfill_posts_count_errors_are_isolated(self):
+        """Test that a failing getPosts batch keeps the posts with zero counts"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        fetcher.client = Mock()
+        fetcher.client.get_posts.side_effect = Exception("API Error")
+        batches = []
+
+        total = bluesky_backfill.backfill_posts(fetcher, DID, AUTHOR, self.car_path,
+                                                include_replies=True, on_batch=batches.append)
+
+        assert total == 3
+        assert all(post['like_count'] == 0 for post in batches[0])
+
+    @patch('bluesky_backfill.requests.get')
+    def test_download_repo_streams_to_file(self, mock_get):
+        """Test that the repository is written to disk chunk by chunk"""
+        mock_get.return_value.iter_content.return_value = [b'abc', b'def']
+
+        size = bluesky_backfill.download_repo('https://pds.example.com', DID, 'out.car')
+
+        assert size == 6
+        with open('out.car', 'rb') as f:
+            assert f.read() == b'abcdef'
+        args, kwargs = mock_get.call_args
+        assert args[0] == 'https://pds.example.com/xrpc/com.atproto.sync.getRepo'
+        assert kwargs['params'] == {'did': DID}
+        assert kwargs['stream'] is True
+
+    @patch('bluesky_backfill.bluesky_identity.resolve_pds')
+    @patch('bluesky_backfill.download_repo')
+    def test_backfill_from_repo(self, mock_download, mock_resolve_pds):
+        """Test the download and conversion of a handle's repository"""
+        with open(self.car_path, 'rb') as f:
+            car = f.read()
+
+        def download(pds_url, did, destination):
+            with open(destination, 'wb') as out:
+                out.write(car)
+            return len(car)
+
+        mock_download.side_effect = download
+        mock_resolve_pds.return_value = 'https://pds.example.com'
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        fetcher.client = Mock()
+        fetcher.client.get_posts.return_value = Mock(posts=[])
+
+        with patch.object(fetcher, 'get_author_profile', return_value=dict(AUTHOR, did=DID)):
+            batches = []
+            total = bluesky_backfill.backfill_from_repo(fetcher, 'test.bsky.social', batches.append,
+                                                        work_dir=self.test_dir)
+
+        assert total == 2
+        mock_resolve_pds.assert_called_once_with(DID, cache=fetcher.identity_cache)
+        assert sorted(os.listdir(self.test_dir)) == ['config', 'repo.car']
+
+    def test_backfill_from_repo_unresolved_handle(self):
+        """Test that an unknown handle is reported"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        with patch.object(fetcher, 'get_author_profile', return_value=None):
+            with pytest.raises(ValueError):
+                bluesky_backfill.backfill_from_repo(fetcher, 'missing.bsky.social', print)
+
+    @patch.object(fetch_bluesky_data, 'BlueskyFetcher')
+    @patch('yaml.safe_load')
+    @patch('pathlib.Path.exists')
+    def test_main_backfill_seeds_archive_and_data(self, mock_exists, mock_yaml_load, mock_fetcher_class):
+        """Test that --backfill stores history in the archive and exports the newest posts"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {'handle': 'test.bsky.social', 'max_posts': 1, 'archive': {'path': 'archive'}}
+        mock_fetcher = Mock()
+        mock_fetcher_class.return_value = mock_fetcher
+        history = [
+            {'uri': f'at://{DID}/app.bsky.feed.post/1', 'created_at': '2024-01-01T00:00:00Z'},
+            {'uri': f'at://{DID}/app.bsky.feed.post/2', 'created_at': '2024-01-02T00:00:00Z'}
+        ]
+
+        def fake_backfill(fetcher, handle, on_batch, include_replies):
+            on_batch(history)
+            return len(history)
+
+        with patch.dict(os.environ, {
+            'BLUESKY_USERNAME': 'test.bsky.social',
+            'BLUESKY_APP_PASSWORD': 'test-app-password'
+        }), patch.object(bluesky_backfill, 'backfill_from_repo', side_effect=fake_backfill):
+            fetch_bluesky_data.main(['--backfill'])
+
+        mock_fetcher.get_user_posts.assert_not_called()
+        mock_fetcher.save_data.assert_called_once_with([history[1]])
+        assert len(fetch_bluesky_data.BlueskyArchive('archive')) == 2
+
+    @patch('builtins.print')
+    @patch.object(fetch_bluesky_data, 'BlueskyFetcher')
+    @patch('yaml.safe_load')
+    @patch('pathlib.Path.exists')
+    def test_main_backfill_failure_exits(self, mock_exists, mock_yaml_load, mock_fetcher_class, mock_print):
+        """Test that a failed backfill exits with an error"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {'handle': 'test.bsky.social'}
+
+        with patch.dict(os.environ, {
+            'BLUESKY_USERNAME': 'test.bsky.social',
+            'BLUESKY_APP_PASSWORD': 'test-app-password'
+        }), patch.object(bluesky_backfill, 'backfill_from_repo', side_effect=ValueError("boom")):
+            with pytest.raises(SystemExit):
+                fetch_bluesky_data.main(['--backfill'])
+
+        mock_print.assert_any_call("Error backfilling posts for test.bsky.social: boom")
@@ -277,7 +277,9 @@ class TestBlueskyFetcher:
     @patch('yaml.safe_load')
     @patch('builtins.open')
     @patch('pathlib.Path.exists')
-    def test_main_function_success(self, mock_exists, mock_open, mock_yaml_load, mock_fetcher_class):
+    @patch('listing_indexes.write_indexes')
+    @patch('search_index.update_index')
+    def test_main_function_success(self, mock_update_search, mock_write_indexes, mock_exists, mock_open, mock_yaml_load, mock_fetcher_class):
         """Test main function execution"""
         # Mock file operations
         mock_exists.return_value = True
@@ -299,6 +301,8 @@ class TestBlueskyFetcher:
         mock_fetcher_class.assert_called_once_with('test.bsky.social', 'test-app-password')
         mock_fetcher.get_user_posts.assert_called_once_with('test.bsky.social', limit=3)
         mock_fetcher.save_data.assert_called_once_with(mock_posts)
+        mock_write_indexes.assert_called_once_with()
+        mock_update_search.assert_called_once()
     
     def test_main_function_missing_env_vars(self):
         """Test main function with missing environment variables"""
@@ -506,7 +510,9 @@ class TestBlueskyFetcher:
     @patch('yaml.safe_load')
     @patch('builtins.open')
     @patch('pathlib.Path.exists')
-    def test_main_invalid_handle_in_config(self, mock_exists, mock_open, mock_yaml_load, mock_exit, mock_print):
+    @patch('listing_indexes.write_indexes')
+    @patch('search_index.update_index')
+    def test_main_invalid_handle_in_config(self, mock_update_search, mock_write_indexes, mock_exists, mock_open, mock_yaml_load, mock_exit, mock_print):
         """Test main function with invalid handle in config"""
         mock_exists.return_value = True
         mock_yaml_load.return_value = {'handle': 'your-handle.bsky.social', 'max_posts': 10}
@@ -518,4 +524,764 @@ class TestBlueskyFetcher:
             fetch_bluesky_data.main()
         
         mock_exit.assert_called_once_with(1)
-        mock_print.assert_any_call("Error: Please update 'handle' in bluesky-config.yaml with your actual Bluesky handle")
\ No newline at end of file
+        mock_print.assert_any_call("Error: Please update 'handle' in bluesky-config.yaml with your actual Bluesky handle")
+    
+    def make_feed_item(self, rkey, created_at, handle='test.bsky.social', text='Post'):
+        """Build a mock feed item for an original (non-repost) post"""
+        mock_post = Mock()
+        mock_post.uri = f'at://did:plc:{handle}/app.bsky.feed.post/{rkey}'
+        mock_post.cid = f'cid-{rkey}'
+        mock_post.author = Mock()
+        mock_post.author.handle = handle
+        mock_post.author.display_name = handle
+        mock_post.author.avatar = None
+        mock_post.record = Mock()
+        mock_post.record.text = text
+        mock_post.record.created_at = created_at
+        mock_post.record.embed = None
+        mock_post.like_count = 0
+        mock_post.repost_count = 0
+        mock_post.reply_count = 0
+        
+        mock_feed_item = Mock()
+        mock_feed_item.post = mock_post
+        mock_feed_item.reason = None
+        return mock_feed_item
+    
+    @patch.object(fetch_bluesky_data, 'Client')
+    def test_get_posts_for_handles_shares_one_client(self, mock_client_class):
+        """Test that multiple handles are fetched with a single login and per-handle limits"""
+        feeds = {
+            'alice.bsky.social': [self.make_feed_item('a1', '2024-01-03T00:00:00Z', 'alice.bsky.social')],
+            'bob.bsky.social': [self.make_feed_item('b1', '2024-01-02T00:00:00Z', 'bob.bsky.social')],
+        }
+        
+        def get_author_feed(actor, filter, limit, cursor):
+            response = Mock()
+            response.feed = feeds[actor]
+            return response
+        
+        mock_client = Mock()
+        mock_client.get_author_feed.side_effect = get_author_feed
+        mock_client_class.return_value = mock_client
+        
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        results = fetcher.get_posts_for_handles([
+            {'handle': 'alice.bsky.social', 'max_posts': 1},
+            {'handle': 'bob.bsky.social'}
+        ], default_limit=5)
+        
+        mock_client_class.assert_called_once()
+        mock_client.login.assert_called_once()
+        assert [p['uri'] for p in results['alice.bsky.social']] == ['at://did:plc:alice.bsky.social/app.bsky.feed.post/a1']
+        assert len(results['bob.bsky.social']) == 1
+        limits = {c.kwargs['actor']: c.kwargs['limit'] for c in mock_client.get_author_feed.call_args_list}
+        assert limits == {'alice.bsky.social': 1, 'bob.bsky.social': 5}
+    
+    @patch.object(fetch_bluesky_data, 'Client')
+    def test_get_posts_for_handles_isolates_failures(self, mock_client_class):
+        """Test that one failing handle does not prevent other handles from being fetched"""
+        def get_author_feed(actor, filter, limit, cursor):
+            if actor == 'broken.bsky.social':
+                raise Exception("API Error")
+            response = Mock()
+            response.feed = [self.make_feed_item('ok1', '2024-01-01T00:00:00Z', actor)]
+            return response
+        
+        mock_client = Mock()
+        mock_client.get_author_feed.side_effect = get_author_feed
+        mock_client_class.return_value = mock_client
+        
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        results = fetcher.get_posts_for_handles([
+            {'handle': 'broken.bsky.social'},
+            {'handle': 'ok.bsky.social'}
+        ])
+        
+        assert results['broken.bsky.social'] == []
+        assert len(results['ok.bsky.social']) == 1
+    
+    @patch.object(fetch_bluesky_data, 'Client')
+    def test_get_posts_for_handles_connect_failure(self, mock_client_class):
+        """Test that no handles are fetched when login fails"""
+        mock_client = Mock()
+        mock_client.login.side_effect = Exception("Authentication failed")
+        mock_client_class.return_value = mock_client
+        
+        fetcher = BlueskyFetcher('test.bsky.social', 'bad-password')
+        
+        assert fetcher.get_posts_for_handles([{'handle': 'alice.bsky.social'}]) == {}
+        mock_client.get_author_feed.assert_not_called()
+    
+    def test_merge_feeds_interleaves_sorted_feeds(self):
+        """Test that per-handle feeds are merged newest first and truncated to the limit"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        feed_a = [{'uri': 'a2', 'created_at': '2024-01-04T00:00:00Z'}, {'uri': 'a1', 'created_at': '2024-01-01T00:00:00Z'}]
+        feed_b = [{'uri': 'b2', 'created_at': '2024-01-03T00:00:00Z'}, {'uri': 'b1', 'created_at': '2024-01-02T00:00:00Z'}]
+        
+        merged = fetcher.merge_feeds([feed_a, feed_b])
+        assert [p['uri'] for p in merged] == ['a2', 'b2', 'b1', 'a1']
+        
+        assert [p['uri'] for p in fetcher.merge_feeds([feed_a, feed_b, []], limit=2)] == ['a2', 'b2']
+    
+    def test_save_handle_data_writes_file_per_handle(self):
+        """Test that per-handle output writes one data file per handle slug"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        fetcher.save_handle_data({
+            'alice.bsky.social': [{'uri': 'a1', 'created_at': '2024-01-01T00:00:00Z'}],
+            'bob.bsky.social': []
+        })
+        
+        with open('data/bluesky_accounts/alice-bsky-social.json') as f:
+            data = json.load(f)
+        assert data['post_count'] == 1
+        assert not os.path.exists('data/bluesky_accounts/bob-bsky-social.json')
+    
+    def test_load_handle_configs_normalizes_entries(self):
+        """Test that handle entries accept strings and dicts and skip placeholders"""
+        config = {
+            'max_posts': 4,
+            'handles': [
+                'alice.bsky.social',
+                {'handle': 'bob.bsky.social', 'max_posts': 2},
+                {'handle': 'your-handle.bsky.social'},
+                None
+            ]
+        }
+        
+        assert fetch_bluesky_data.load_handle_configs(config) == [
+            {'handle': 'alice.bsky.social', 'max_posts': 4},
+            {'handle': 'bob.bsky.social', 'max_posts': 2}
+        ]
+    
+    @patch.object(fetch_bluesky_data, 'BlueskyFetcher')
+    @patch('yaml.safe_load')
+    @patch('builtins.open')
+    @patch('pathlib.Path.exists')
+    @patch('listing_indexes.write_indexes')
+    @patch('search_index.update_index')
+    def test_main_multiple_handles_merged(self, mock_update_search, mock_write_indexes, mock_exists, mock_open, mock_yaml_load, mock_fetcher_class):
+        """Test main function merges feeds when several handles are configured"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {
+            'handles': ['alice.bsky.social', 'bob.bsky.social'],
+            'max_posts': 3,
+            'merged_max_posts': 5
+        }
+        
+        mock_fetcher = Mock()
+        posts_by_handle = {'alice.bsky.social': [{'uri': 'a1'}], 'bob.bsky.social': []}
+        mock_fetcher.get_posts_for_handles.return_value = posts_by_handle
+        mock_fetcher.merge_feeds.return_value = [{'uri': 'a1'}]
+        mock_fetcher_class.return_value = mock_fetcher
+        
+        with patch.dict(os.environ, {
+            'BLUESKY_USERNAME': 'test.bsky.social',
+            'BLUESKY_APP_PASSWORD': 'test-app-password'
+        }):
+            fetch_bluesky_data.main()
+        
+        mock_fetcher.get_user_posts.assert_not_called()
+        mock_fetcher.merge_feeds.assert_called_once()
+        assert mock_fetcher.merge_feeds.call_args.kwargs == {'limit': 5}
+        mock_fetcher.save_data.assert_called_once_with([{'uri': 'a1'}])
+    
+    @patch.object(fetch_bluesky_data, 'BlueskyFetcher')
+    @patch('yaml.safe_load')
+    @patch('builtins.open')
+    @patch('pathlib.Path.exists')
+    @patch('listing_indexes.write_indexes')
+    @patch('search_index.update_index')
+    def test_main_multiple_handles_per_handle_output(self, mock_update_search, mock_write_indexes, mock_exists, mock_open, mock_yaml_load, mock_fetcher_class):
+        """Test main function writes per-handle files when configured"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {'handles': ['alice.bsky.social'], 'output': 'per_handle'}
+        
+        mock_fetcher = Mock()
+        mock_fetcher.get_posts_for_handles.return_value = {'alice.bsky.social': [{'uri': 'a1'}]}
+        mock_fetcher_class.return_value = mock_fetcher
+        
+        with patch.dict(os.environ, {
+            'BLUESKY_USERNAME': 'test.bsky.social',
+            'BLUESKY_APP_PASSWORD': 'test-app-password'
+        }):
+            fetch_bluesky_data.main()
+        
+        mock_fetcher.save_handle_data.assert_called_once_with({'alice.bsky.social': [{'uri': 'a1'}]})
+        mock_fetcher.save_data.assert_not_called()
+    
+    @patch('builtins.print')
+    @patch('sys.exit')
+    @patch('yaml.safe_load')
+    @patch('builtins.open')
+    @patch('pathlib.Path.exists')
+    def test_main_multiple_handles_all_placeholders(self, mock_exists, mock_open, mock_yaml_load, mock_exit, mock_print):
+        """Test main function exits when the handles list has no usable entries"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {'handles': ['your-handle.bsky.social']}
+        mock_exit.side_effect = SystemExit(1)
+        
+        with patch.dict(os.environ, {
+            'BLUESKY_USERNAME': 'test.bsky.social',
+            'BLUESKY_APP_PASSWORD': 'test-password'
+        }):
+            with pytest.raises(SystemExit):
+                fetch_bluesky_data.main()
+        
+        mock_exit.assert_called_once_with(1)
+    
+    @patch.object(fetch_bluesky_data, 'Client')
+    def test_get_author_profile(self, mock_client_class):
+        """Test that a handle resolves to its DID and display details"""
+        mock_profile = Mock()
+        mock_profile.did = 'did:plc:test123'
+        mock_profile.handle = 'test.bsky.social'
+        mock_profile.display_name = None
+        mock_profile.avatar = 'https://example.com/avatar.jpg'
+        mock_client = Mock()
+        mock_client.get_profile.return_value = mock_profile
+        mock_client_class.return_value = mock_client
+        
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        
+        assert fetcher.get_author_profile('test.bsky.social') == {
+            'did': 'did:plc:test123',
+            'handle': 'test.bsky.social',
+            'display_name': 'test.bsky.social',
+            'avatar': 'https://example.com/avatar.jpg'
+        }
+        
+        mock_client.get_profile.side_effect = Exception("Profile not found")
+        assert fetcher.get_author_profile('missing.bsky.social') is None
+    
+    @patch.object(fetch_bluesky_data, 'Client')
+    def test_get_author_profile_cached_across_runs(self, mock_client_class):
+        """Test that a cached profile is reused without logging in"""
+        mock_profile = Mock(did='did:plc:test123', handle='test.bsky.social',
+                            display_name='Test User', avatar=None)
+        mock_client_class.return_value.get_profile.return_value = mock_profile
+        
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        profile = fetcher.get_author_profile('test.bsky.social')
+        fetcher.save_caches()
+        
+        mock_client_class.reset_mock()
+        next_run = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        assert next_run.get_author_profile('test.bsky.social') == profile
+        mock_client_class.assert_not_called()
+        # The handle -> DID mapping is shared with the public resolvers
+        assert fetch_bluesky_data.bluesky_identity.resolve_handle(
+            'test.bsky.social', cache=next_run.identity_cache
+        ) == 'did:plc:test123'
+    
+    def make_quote_embed(self, cid, text='Quoted post'):
+        """Build a mock quote-post embed pointing at a record with the given CID"""
+        mock_embed = Mock(spec=['record'])
+        mock_embed.__class__.__name__ = 'Record'
+        mock_embed.record = Mock()
+        mock_embed.record.cid = cid
+        mock_embed.record.uri = f'at://did:plc:other/app.bsky.feed.post/{cid}'
+        mock_embed.record.author = Mock()
+        mock_embed.record.author.handle = 'other.bsky.social'
+        mock_embed.record.value = Mock()
+        mock_embed.record.value.text = text
+        mock_embed.record.embeds = []
+        return mock_embed
+    
+    def test_process_embed_memoizes_quoted_records_by_cid(self):
+        """Test that the same quoted record is only processed once"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        first = fetcher.process_embed(self.make_quote_embed('bafyquoted'))
+        
+        # A later embed quoting the same CID is served from the cache
+        second = fetcher.process_embed(self.make_quote_embed('bafyquoted', text='Changed'))
+        
+        assert second == first
+        assert second['data']['text'] == 'Quoted post'
+        assert fetcher.embed_cache.hits == 1
+        
+        # Different remaining depth is cached separately
+        nested = fetcher.process_embed(self.make_quote_embed('bafyquoted', text='Nested'), current_depth=1)
+        assert nested['data']['text'] == 'Nested'
+    
+    def test_post_embeds_cached_across_runs(self):
+        """Test that post embeds are reused from the persisted cache by post CID"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        record = Mock()
+        record.text = 'Quoting something'
+        record.created_at = '2024-01-15T10:30:00Z'
+        record.embed = self.make_quote_embed('bafyquoted')
+        author = {'handle': 'test.bsky.social', 'display_name': 'Test', 'avatar': None}
+        
+        post = fetcher.build_post_data('at://did:plc:test/app.bsky.feed.post/1', 'bafypost', record, author)
+        fetcher.save_caches()
+        assert os.path.exists('.cache/bluesky/embeds.json')
+        
+        next_run = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        with patch.object(next_run, 'process_embed') as mock_process_embed:
+            again = next_run.build_post_data('at://did:plc:test/app.bsky.feed.post/1', 'bafypost', record, author)
+        
+        mock_process_embed.assert_not_called()
+        assert again['embed'] == post['embed']
+    
+    def test_processing_errors_not_cached(self):
+        """Test that failed embed processing is retried on the next run"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        record = Mock()
+        record.text = 'Broken embed'
+        record.created_at = '2024-01-15T10:30:00Z'
+        record.embed = Mock(spec=['external'])
+        type(record.embed).external = PropertyMock(side_effect=Exception("boom"))
+        author = {'handle': 'test.bsky.social', 'display_name': 'Test', 'avatar': None}
+        
+        post = fetcher.build_post_data('at://did:plc:test/app.bsky.feed.post/2', 'bafybroken', record, author)
+        
+        assert post['embed']['type'] == 'ProcessingError'
+        assert 'post:bafybroken' not in fetcher.embed_cache
+    
+    def make_thread_node(self, rkey, did, handle, text, replies=None):
+        """Build a mock ThreadViewPost node"""
+        node = Mock()
+        node.post = Mock()
+        node.post.uri = f'at://{did}/app.bsky.feed.post/{rkey}'
+        node.post.cid = f'cid-{rkey}'
+        node.post.author = Mock()
+        node.post.author.did = did
+        node.post.author.handle = handle
+        node.post.author.display_name = None
+        node.post.author.avatar = None
+        node.post.record = Mock()
+        node.post.record.text = text
+        node.post.record.created_at = '2024-01-16T10:00:00Z'
+        node.post.like_count = 1
+        node.post.reply_count = len(replies or [])
+        node.replies = replies or []
+        return node
+    
+    @patch.object(fetch_bluesky_data, 'Client')
+    def test_hydrate_threads_bounded_and_deduplicated(self, mock_client_class):
+        """Test that threads respect depth/breadth limits and share one author table"""
+        not_found = Mock(spec=['uri', 'not_found'])
+        nested = self.make_thread_node('r3', 'did:plc:alice', 'alice.bsky.social', 'Deep reply', replies=[
+            self.make_thread_node('r4', 'did:plc:bob', 'bob.bsky.social', 'Too deep')
+        ])
+        root = self.make_thread_node('root', 'did:plc:me', 'test.bsky.social', 'Root', replies=[
+            not_found,
+            self.make_thread_node('r1', 'did:plc:alice', 'alice.bsky.social', 'First', replies=[nested]),
+            self.make_thread_node('r2', 'did:plc:bob', 'bob.bsky.social', 'Second'),
+            self.make_thread_node('r5', 'did:plc:carol', 'carol.bsky.social', 'Over breadth')
+        ])
+        
+        mock_client = Mock()
+        mock_client.get_post_thread.return_value = Mock(thread=root)
+        mock_client_class.return_value = mock_client
+        
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        posts = [
+            {'uri': 'at://did:plc:me/app.bsky.feed.post/root', 'cid': 'cid-root', 'reply_count': 3},
+            {'uri': 'at://did:plc:me/app.bsky.feed.post/quiet', 'cid': 'cid-quiet', 'reply_count': 0}
+        ]
+        fetcher.hydrate_threads(posts, max_depth=2, max_replies=2)
+        
+        replies = posts[0]['thread']['replies']
+        assert [r['text'] for r in replies] == ['First', 'Second']
+        assert replies[0]['author'] == 'did:plc:alice'
+        assert [r['text'] for r in replies[0]['replies']] == ['Deep reply']
+        assert replies[0]['replies'][0]['replies'] == []
+        assert set(fetcher.authors) == {'did:plc:alice', 'did:plc:bob'}
+        assert 'thread' not in posts[1]
+        mock_client.get_post_thread.assert_called_once_with(
+            'at://did:plc:me/app.bsky.feed.post/root', depth=2, parent_height=0
+        )
+    
+    @patch.object(fetch_bluesky_data, 'Client')
+    def test_hydrate_threads_cached_by_cid_and_reply_count(self, mock_client_class):
+        """Test that unchanged reply counts reuse the cached thread snapshot"""
+        root = self.make_thread_node('root', 'did:plc:me', 'test.bsky.social', 'Root', replies=[
+            self.make_thread_node('r1', 'did:plc:alice', 'alice.bsky.social', 'First')
+        ])
+        mock_client = Mock()
+        mock_client.get_post_thread.return_value = Mock(thread=root)
+        mock_client_class.return_value = mock_client
+        
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        fetcher.hydrate_threads([{'uri': 'at://did:plc:me/app.bsky.feed.post/root', 'cid': 'cid-root', 'reply_count': 1}])
+        fetcher.save_caches()
+        
+        next_run = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        post = {'uri': 'at://did:plc:me/app.bsky.feed.post/root', 'cid': 'cid-root', 'reply_count': 1}
+        next_run.hydrate_threads([post])
+        
+        assert mock_client.get_post_thread.call_count == 1
+        assert post['thread']['replies'][0]['text'] == 'First'
+        assert 'did:plc:alice' in next_run.authors
+        
+        # A new reply invalidates the snapshot
+        next_run.hydrate_threads([dict(post, reply_count=2)])
+        assert mock_client.get_post_thread.call_count == 2
+    
+    @patch.object(fetch_bluesky_data, 'Client')
+    def test_hydrate_threads_failure_leaves_post_unchanged(self, mock_client_class):
+        """Test that a failed thread fetch is skipped and not cached"""
+        mock_client = Mock()
+        mock_client.get_post_thread.side_effect = Exception("API Error")
+        mock_client_class.return_value = mock_client
+        
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        post = {'uri': 'at://did:plc:me/app.bsky.feed.post/root', 'cid': 'cid-root', 'reply_count': 1}
+        fetcher.hydrate_threads([post])
+        
+        assert 'thread' not in post
+        assert len(fetcher.thread_cache) == 0
+    
+    def test_save_data_includes_author_table(self):
+        """Test that hydrated authors are written to the data file"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        fetcher.authors = {'did:plc:alice': {'handle': 'alice.bsky.social'}}
+        fetcher.save_data([{'uri': 'a1', 'created_at': '2024-01-01T00:00:00Z'}])
+        
+        with open('data/bluesky.json') as f:
+            assert json.load(f)['authors'] == {'did:plc:alice': {'handle': 'alice.bsky.social'}}
+    
+    def test_save_data_skipped_once_cancelled(self):
+        """Test that a fetch cancelled by the orchestrator writes no data file"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        fetcher.cancel()
+        with patch('builtins.print'):
+            fetcher.save_data([{'uri': 'a1', 'created_at': '2024-01-01T00:00:00Z'}])
+        
+        assert not os.path.exists('data/bluesky.json')
+    
+    def test_post_html_rendered_and_cached_by_cid(self):
+        """Test that post HTML is rendered from facets once per CID"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        record = Mock(text='Hello <world>', facets=None, embed=None)
+        author = {'handle': 'test.bsky.social', 'display_name': 'Test', 'avatar': None}
+        
+        post = fetcher.build_post_data('at://did:plc:test/app.bsky.feed.post/1', 'bafy1', record, author)
+        assert post['html'] == 'Hello &lt;world&gt;'
+        
+        fetcher.save_caches()
+        next_run = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        with patch.object(fetch_bluesky_data, 'render_html') as mock_render:
+            again = next_run.build_post_data('at://did:plc:test/app.bsky.feed.post/1', 'bafy1', record, author)
+        mock_render.assert_not_called()
+        assert again['html'] == post['html']
+    
+    def test_save_data_references_authors_by_did(self):
+        """Test that author_table stores each author once and references it by DID"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        fetcher.author_table = True
+        alice = {'handle': 'alice.bsky.social', 'display_name': 'Alice', 'avatar': None}
+        posts = [
+            {'uri': 'at://did:plc:alice/app.bsky.feed.post/1', 'author': dict(alice)},
+            {'uri': 'at://did:plc:alice/app.bsky.feed.post/2', 'author': dict(alice)},
+            {'uri': 'at://did:plc:bob/app.bsky.feed.post/3', 'author': 'did:plc:bob'},
+        ]
+        fetcher.save_data(posts)
+        
+        with open('data/bluesky.json') as f:
+            data = json.load(f)
+        assert [post['author'] for post in data['posts']] == ['did:plc:alice', 'did:plc:alice', 'did:plc:bob']
+        assert data['authors'] == {'did:plc:alice': alice}
+        assert posts[0]['author'] == alice
+    
+    def test_save_data_records_changes(self):
+        """Test that save_data diffs the posts against the previous data file"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        first = {'uri': 'at://did:plc:alice/app.bsky.feed.post/1', 'created_at': '2024-01-01', 'like_count': 0}
+        second = {'uri': 'at://did:plc:alice/app.bsky.feed.post/2', 'created_at': '2024-01-02', 'like_count': 0}
+        fetcher.save_data([first])
+        
+        feed = fetch_bluesky_data.changes
+        feed.start()
+        fetcher.save_data([second, dict(first, like_count=3)])
+        
+        assert feed.summary()['posts'] == {'added': 1, 'updated': 1, 'removed': 0}
+        assert feed.changes['posts']['updated'][0]['fields'] == ['like_count']
+        feed.write()
+    
+    def test_save_data_projects_from_store(self):
+        """Test that with a store the data file is built from the stored posts"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        fetcher.store = fetch_bluesky_data.local_store.open_store({'store': True})
+        alice = {'handle': 'alice.bsky.social', 'display_name': 'Alice', 'avatar': None}
+        posts = [
+            {'uri': 'at://did:plc:alice/app.bsky.feed.post/2', 'created_at': '2024-01-02T00:00:00Z',
+             'author': dict(alice), 'embed': {'type': 'Main', 'data': {'uri': 'https://example.com'}}},
+            {'uri': 'at://did:plc:alice/app.bsky.feed.post/1', 'created_at': '2024-01-01T00:00:00Z',
+             'author': dict(alice)},
+        ]
+        fetcher.save_data(posts)
+        fetcher.store.close()
+        
+        with open('data/bluesky.json') as f:
+            data = json.load(f)
+        assert [post['uri'] for post in data['posts']] == [post['uri'] for post in posts]
+        assert data['posts'][0]['author'] == alice
+        assert data['posts'][0]['embed'] == posts[0]['embed']
+        assert os.path.exists('.cache/store.sqlite3')
+    
+    @patch.object(fetch_bluesky_data, 'BlueskyFetcher')
+    @patch('yaml.safe_load')
+    @patch('builtins.open')
+    @patch('pathlib.Path.exists')
+    @patch('listing_indexes.write_indexes')
+    @patch('search_index.update_index')
+    def test_main_hydrates_threads_when_configured(self, mock_update_search, mock_write_indexes, mock_exists, mock_open, mock_yaml_load, mock_fetcher_class):
+        """Test main function passes thread limits from the config"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {
+            'handle': 'test.bsky.social',
+            'max_posts': 3,
+            'threads': {'max_depth': 1, 'max_replies': 3, 'unknown': True}
+        }
+        mock_fetcher = Mock()
+        mock_posts = [{'uri': 'a1'}]
+        mock_fetcher.get_user_posts.return_value = mock_posts
+        mock_fetcher_class.return_value = mock_fetcher
+        
+        with patch.dict(os.environ, {
+            'BLUESKY_USERNAME': 'test.bsky.social',
+            'BLUESKY_APP_PASSWORD': 'test-app-password'
+        }):
+            fetch_bluesky_data.main()
+        
+        mock_fetcher.hydrate_threads.assert_called_once_with(mock_posts, max_depth=1, max_replies=3)
+        mock_fetcher.save_data.assert_called_once_with(mock_posts)
+    
+    def test_thread_options_accepts_boolean(self):
+        """Test that 'threads: true' uses the default limits"""
+        assert fetch_bluesky_data.thread_options({'threads': True}) == {}
+    
+    @patch.object(fetch_bluesky_data, 'BlueskyFetcher')
+    @patch('yaml.safe_load')
+    @patch('pathlib.Path.exists')
+    def test_main_appends_to_archive_when_configured(self, mock_exists, mock_yaml_load, mock_fetcher_class):
+        """Test main function archives fetched posts"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {'handle': 'test.bsky.social', 'archive': {'path': 'archive'}}
+        mock_fetcher = Mock()
+        mock_posts = [{'uri': 'at://did:plc:test/app.bsky.feed.post/1', 'created_at': '2024-01-01T00:00:00Z'}]
+        mock_fetcher.get_user_posts.return_value = mock_posts
+        mock_fetcher_class.return_value = mock_fetcher
+        
+        with patch.dict(os.environ, {
+            'BLUESKY_USERNAME': 'test.bsky.social',
+            'BLUESKY_APP_PASSWORD': 'test-app-password'
+        }):
+            fetch_bluesky_data.main()
+        
+        archive = fetch_bluesky_data.BlueskyArchive('archive')
+        assert archive.get('at://did:plc:test/app.bsky.feed.post/1') == mock_posts[0]
+    
+    def make_list_records_page(self, rkeys, cursor=None, reply_rkeys=()):
+        records = []
+        for index, rkey in enumerate(rkeys):
+            value = {
+                '$type': 'app.bsky.feed.post',
+                'text': f'Post {rkey}',
+                'createdAt': f'2024-01-{20 - index:02d}T12:00:00Z'
+            }
+            if rkey in reply_rkeys:
+                parent = {'uri': 'at://did:plc:other/app.bsky.feed.post/p', 'cid': 'bafyparent'}
+                value['reply'] = {'root': parent, 'parent': parent}
+            records.append({
+                'uri': f'at://did:plc:test/app.bsky.feed.post/{rkey}',
+                'cid': f'bafy{rkey}',
+                'value': value
+            })
+        page = {'records': records}
+        if cursor:
+            page['cursor'] = cursor
+        return page
+    
+    def make_response(self, payload):
+        response = Mock()
+        response.json.return_value = payload
+        response.raise_for_status.return_value = None
+        return response
+    
+    @patch.object(fetch_bluesky_data.bluesky_identity, 'resolve_pds')
+    @patch.object(fetch_bluesky_data.bluesky_identity, 'resolve_handle')
+    @patch.object(fetch_bluesky_data.requests, 'get')
+    def test_get_user_posts_from_pds(self, mock_get, mock_resolve_handle, mock_resolve_pds):
+        """Test that posts are read from listRecords without logging in"""
+        mock_resolve_handle.return_value = 'did:plc:test'
+        mock_resolve_pds.return_value = 'https://pds.example.com'
+        pages = [
+            self.make_list_records_page(['3a', '3b'], cursor='c1', reply_rkeys=['3b']),
+            self.make_list_records_page(['3c', '3d'], cursor='c2'),
+        ]
+        profile = {'value': {'displayName': 'Test User', 'avatar': {'ref': {'$link': 'bafyavatar'}}}}
+        
+        def get(url, params, timeout):
+            if url.endswith('getRecord'):
+                return self.make_response(profile)
+            if url.endswith('listRecords'):
+                return self.make_response(pages.pop(0))
+            return self.make_response({'posts': [
+                {'uri': 'at://did:plc:test/app.bsky.feed.post/3a', 'likeCount': 4, 'repostCount': 1, 'replyCount': 2}
+            ]})
+        mock_get.side_effect = get
+        
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        posts = fetcher.get_user_posts_from_pds('test.bsky.social', limit=2, engagement_counts=True)
+        
+        assert fetcher.client is None
+        assert [post['text'] for post in posts] == ['Post 3a', 'Post 3c']
+        assert posts[0]['url'] == 'https://bsky.app/profile/test.bsky.social/post/3a'
+        assert posts[0]['author'] == {
+            'handle': 'test.bsky.social',
+            'display_name': 'Test User',
+            'avatar': 'https://cdn.bsky.app/img/avatar/plain/did:plc:test/bafyavatar@jpeg'
+        }
+        assert posts[0]['like_count'] == 4
+        assert posts[1]['like_count'] == 0
+        list_calls = [c for c in mock_get.call_args_list if c.args[0].endswith('listRecords')]
+        assert list_calls[0].args[0] == 'https://pds.example.com/xrpc/com.atproto.repo.listRecords'
+        assert list_calls[0].kwargs['params']['collection'] == 'app.bsky.feed.post'
+        assert list_calls[1].kwargs['params']['cursor'] == 'c1'
+    
+    @patch('builtins.print')
+    @patch.object(fetch_bluesky_data.bluesky_identity, 'resolve_handle')
+    def test_get_user_posts_from_pds_resolution_failure(self, mock_resolve_handle, mock_print):
+        """Test that an unresolvable handle returns an empty list"""
+        mock_resolve_handle.side_effect = ValueError("not found")
+        
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        assert fetcher.get_user_posts_from_pds('missing.bsky.social') == []
+    
+    @patch.object(fetch_bluesky_data.bluesky_identity, 'resolve_pds')
+    @patch.object(fetch_bluesky_data.bluesky_identity, 'resolve_handle')
+    @patch.object(fetch_bluesky_data.requests, 'get')
+    def test_get_user_posts_from_pds_profile_failure(self, mock_get, mock_resolve_handle, mock_resolve_pds):
+        """Test that a missing profile record falls back to the handle"""
+        mock_resolve_handle.return_value = 'did:plc:test'
+        mock_resolve_pds.return_value = 'https://pds.example.com'
+        
+        def get(url, params, timeout):
+            if url.endswith('getRecord'):
+                raise fetch_bluesky_data.requests.ConnectionError("down")
+            return self.make_response(self.make_list_records_page(['3a']))
+        mock_get.side_effect = get
+        
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        with patch('builtins.print'):
+            posts = fetcher.get_user_posts_from_pds('test.bsky.social', limit=5)
+        
+        assert len(posts) == 1
+        assert posts[0]['author'] == {'handle': 'test.bsky.social', 'display_name': 'test.bsky.social', 'avatar': None}
+    
+    @patch.object(fetch_bluesky_data, 'Client')
+    def test_get_posts_for_handles_pds_engine_skips_login(self, mock_client_class):
+        """Test that the PDS engine never logs in"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        with patch.object(fetcher, 'get_user_posts_from_pds', return_value=[{'uri': 'a1'}]) as mock_pds:
+            results = fetcher.get_posts_for_handles([{'handle': 'alice.bsky.social'}], engine='pds')
+        
+        assert results == {'alice.bsky.social': [{'uri': 'a1'}]}
+        mock_pds.assert_called_once_with('alice.bsky.social', limit=10, engagement_counts=True)
+        mock_client_class.assert_not_called()
+    
+    @patch.object(fetch_bluesky_data, 'BlueskyFetcher')
+    @patch('yaml.safe_load')
+    @patch('builtins.open')
+    @patch('pathlib.Path.exists')
+    @patch('listing_indexes.write_indexes')
+    @patch('search_index.update_index')
+    def test_main_pds_engine_without_credentials(self, mock_update_search, mock_write_indexes, mock_exists, mock_open, mock_yaml_load, mock_fetcher_class):
+        """Test that --engine pds runs without Bluesky credentials"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {'handle': 'test.bsky.social', 'max_posts': 3}
+        mock_fetcher = Mock()
+        mock_fetcher.get_user_posts_from_pds.return_value = [{'uri': 'a1'}]
+        mock_fetcher_class.return_value = mock_fetcher
+        
+        with patch.dict(os.environ, {}, clear=True):
+            fetch_bluesky_data.main(['--engine', 'pds'])
+        
+        mock_fetcher.get_user_posts.assert_not_called()
+        mock_fetcher.get_user_posts_from_pds.assert_called_once_with(
+            'test.bsky.social', limit=3, engagement_counts=True
+        )
+        mock_fetcher.save_data.assert_called_once_with([{'uri': 'a1'}])
+    
+    @patch('builtins.print')
+    @patch('yaml.safe_load')
+    @patch('builtins.open')
+    @patch('pathlib.Path.exists')
+    def test_main_feed_engine_requires_credentials(self, mock_exists, mock_open, mock_yaml_load, mock_print):
+        """Test that the default engine still requires credentials"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {'handle': 'test.bsky.social'}
+        
+        with patch.dict(os.environ, {}, clear=True):
+            with pytest.raises(SystemExit):
+                fetch_bluesky_data.main()
+    
+    def test_failed_fetch_falls_back_to_last_known_good(self):
+        """Test that a failed fetch restores the last good data file, marked stale"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        config = {'handle': 'test.bsky.social', 'max_posts': 2}
+        posts = [{'uri': 'at://did:plc:test/app.bsky.feed.post/1', 'created_at': '2024-01-01T00:00:00Z'}]
+        
+        with patch('builtins.print'):
+            with patch.object(fetcher, 'get_user_posts', return_value=posts):
+                fetch_bluesky_data.fetch_handle(fetcher, 'test.bsky.social', config)
+            os.remove('data/bluesky.json')
+            with patch.object(fetcher, 'get_user_posts', return_value=[]):
+                assert fetch_bluesky_data.fetch_handle(fetcher, 'test.bsky.social', config) == 0
+        
+        with open('data/bluesky.json') as f:
+            data = json.load(f)
+        assert data['posts'] == posts
+        assert data['stale'] is True
+    
+    def test_open_circuit_skips_handle(self):
+        """Test that a handle with repeated failures is not requested"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        config = {'handle': 'test.bsky.social', 'circuit_breaker': {'failure_threshold': 1}}
+        
+        with patch('builtins.print'), patch.object(fetcher, 'get_user_posts', return_value=[]) as mock_get:
+            fetch_bluesky_data.fetch_handle(fetcher, 'test.bsky.social', config)
+            fetch_bluesky_data.fetch_handle(fetcher, 'test.bsky.social', config)
+        
+        mock_get.assert_called_once()
+    
+    def test_merged_feed_keeps_last_known_posts_of_failed_handles(self):
+        """Test that a failing handle's last known posts stay in the merged feed"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        fetcher.author_table = True
+        config = {'handles': ['alice.bsky.social', 'bob.bsky.social']}
+        alice = [{'uri': 'at://did:plc:alice/app.bsky.feed.post/1', 'created_at': '2024-01-02T00:00:00Z',
+                  'author': {'handle': 'alice.bsky.social'}}]
+        bob = [{'uri': 'at://did:plc:bob/app.bsky.feed.post/1', 'created_at': '2024-01-01T00:00:00Z',
+                'author': {'handle': 'bob.bsky.social'}}]
+        
+        with patch('builtins.print'):
+            with patch.object(fetcher, 'get_posts_for_handles',
+                              return_value={'alice.bsky.social': alice, 'bob.bsky.social': bob}):
+                fetch_bluesky_data.fetch_handles(fetcher, config)
+            with patch.object(fetcher, 'get_posts_for_handles',
+                              return_value={'alice.bsky.social': alice, 'bob.bsky.social': []}):
+                fetch_bluesky_data.fetch_handles(fetcher, config)
+        
+        with open('data/bluesky.json') as f:
+            data = json.load(f)
+        assert [post['uri'] for post in data['posts']] == [alice[0]['uri'], bob[0]['uri']]
+    
+    def test_per_handle_output_falls_back_for_failed_handles(self):
+        """Test that a failing handle's own data file is restored and marked stale"""
+        fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+        config = {'handles': ['bob.bsky.social'], 'output': 'per_handle'}
+        bob = [{'uri': 'at://did:plc:bob/app.bsky.feed.post/1', 'created_at': '2024-01-01T00:00:00Z'}]
+        
+        with patch('builtins.print'):
+            with patch.object(fetcher, 'get_posts_for_handles', return_value={'bob.bsky.social': bob}):
+                fetch_bluesky_data.fetch_handles(fetcher, config)
+            with patch.object(fetcher, 'get_posts_for_handles', return_value={'bob.bsky.social': []}):
+                fetch_bluesky_data.fetch_handles(fetcher, config)
+        
+        with open('data/bluesky_accounts/bob-bsky-social.json') as f:
+            assert json.load(f)['stale'] is True
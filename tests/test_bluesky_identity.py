@@ -0,0 +1,110 @@
+"""Tests for Bluesky handle and DID resolution"""
+
+import os
+import shutil
+import tempfile
+from unittest.mock import Mock, patch
+
+import pytest
+
+import bluesky_identity
+from persistent_cache import PersistentTTLCache
+
+DID_DOCUMENT = {
+    'id': 'did:plc:test123',
+    'alsoKnownAs': ['at://test.bsky.social'],
+    'service': [{
+        'id': '#atproto_pds',
+        'type': 'AtprotoPersonalDataServer',
+        'serviceEndpoint': 'https://pds.example.com/'
+    }]
+}
+
+
+def json_response(payload):
+    response = Mock()
+    response.json.return_value = payload
+    response.raise_for_status.return_value = None
+    return response
+
+
+class TestBlueskyIdentity:
+    """Test cases for identity resolution helpers"""
+
+    def setup_method(self):
+        """Set up a resolution cache in a temporary directory"""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache = PersistentTTLCache(os.path.join(self.test_dir, 'identity.json'), ttl=60)
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    @patch('bluesky_identity.requests.get')
+    def test_resolve_handle(self, mock_get):
+        """Test that a handle resolves through resolveHandle"""
+        mock_get.return_value = json_response({'did': 'did:plc:test123'})
+
+        assert bluesky_identity.resolve_handle('test.bsky.social') == 'did:plc:test123'
+        args, kwargs = mock_get.call_args
+        assert args[0].endswith('/com.atproto.identity.resolveHandle')
+        assert kwargs['params'] == {'handle': 'test.bsky.social'}
+        assert kwargs['timeout'] == bluesky_identity.REQUEST_TIMEOUT
+
+    @patch('bluesky_identity.requests.get')
+    def test_resolve_pds_for_plc_did(self, mock_get):
+        """Test that did:plc documents come from the PLC directory"""
+        mock_get.return_value = json_response(DID_DOCUMENT)
+
+        assert bluesky_identity.resolve_pds('did:plc:test123') == 'https://pds.example.com'
+        assert mock_get.call_args[0][0] == 'https://plc.directory/did:plc:test123'
+
+    @patch('bluesky_identity.requests.get')
+    def test_resolve_pds_is_cached(self, mock_get):
+        """Test that repeated lookups for a DID fetch its document once"""
+        mock_get.return_value = json_response(DID_DOCUMENT)
+
+        bluesky_identity.resolve_pds('did:plc:test123', cache=self.cache)
+        assert bluesky_identity.resolve_pds('did:plc:test123', cache=self.cache) == 'https://pds.example.com'
+        assert mock_get.call_count == 1
+
+    @patch('bluesky_identity.requests.get')
+    def test_resolve_handle_cache_shared_across_runs(self, mock_get):
+        """Test that a saved cache answers handle lookups in the next run"""
+        mock_get.return_value = json_response({'did': 'did:plc:test123'})
+        bluesky_identity.resolve_handle('Test.bsky.social', cache=self.cache)
+        self.cache.save()
+
+        next_run = PersistentTTLCache(self.cache.path, ttl=60)
+        assert bluesky_identity.resolve_handle('test.bsky.social', cache=next_run) == 'did:plc:test123'
+        assert mock_get.call_count == 1
+
+    @patch('bluesky_identity.requests.get')
+    def test_expired_entries_are_resolved_again(self, mock_get):
+        """Test that entries older than the TTL are fetched again"""
+        mock_get.return_value = json_response({'did': 'did:plc:test123'})
+        cache = PersistentTTLCache(self.cache.path, ttl=60)
+
+        with patch('persistent_cache.time.time', return_value=1000):
+            bluesky_identity.resolve_handle('test.bsky.social', cache=cache)
+        with patch('persistent_cache.time.time', return_value=1061):
+            bluesky_identity.resolve_handle('test.bsky.social', cache=cache)
+        assert mock_get.call_count == 2
+
+    @patch('bluesky_identity.requests.get')
+    def test_resolve_did_document_for_web_did(self, mock_get):
+        """Test that did:web documents come from the domain's well-known path"""
+        mock_get.return_value = json_response(DID_DOCUMENT)
+
+        bluesky_identity.resolve_did_document('did:web:example.com')
+        assert mock_get.call_args[0][0] == 'https://example.com/.well-known/did.json'
+
+    def test_unsupported_did_method(self):
+        """Test that unknown DID methods are rejected"""
+        with pytest.raises(ValueError):
+            bluesky_identity.resolve_did_document('did:key:abc')
+
+    def test_missing_pds_service(self):
+        """Test that a DID document without a PDS is an error"""
+        with pytest.raises(ValueError):
+            bluesky_identity.pds_endpoint({'id': 'did:plc:test123', 'service': []})
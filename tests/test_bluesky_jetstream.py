@@ -0,0 +1,282 @@
+"""Tests for the Bluesky Jetstream subscriber"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+from websockets.exceptions import InvalidHandshake
+from websockets.sync.server import serve
+
+# Import the Bluesky fetcher and subscriber
+import sys
+import importlib.util
+script_path = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'fetch-bluesky-data.py')
+spec = importlib.util.spec_from_file_location("fetch_bluesky_data", script_path)
+fetch_bluesky_data = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(fetch_bluesky_data)
+BlueskyFetcher = fetch_bluesky_data.BlueskyFetcher
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import bluesky_jetstream
+from bluesky_jetstream import JetstreamSubscriber
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'jetstream-events.jsonl')
+DID = 'did:plc:testuser'
+AUTHOR = {'handle': 'test.bsky.social', 'display_name': 'Test User', 'avatar': None}
+
+
+class ReplayServer:
+    """Local Jetstream stand-in that replays recorded events to each connection"""
+
+    def __init__(self, events):
+        self.events = events
+        self.paths = []
+        self.server = serve(self.handler, 'localhost', 0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def handler(self, websocket):
+        self.paths.append(websocket.request.path)
+        for event in self.events:
+            websocket.send(event)
+
+    @property
+    def url(self):
+        host, port = self.server.socket.getsockname()[:2]
+        return f"ws://{host}:{port}/subscribe"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.thread.join()
+
+
+class TestJetstreamSubscriber:
+    """Test cases for JetstreamSubscriber"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        with open(FIXTURE) as f:
+            self.events = [line.strip() for line in f if line.strip()]
+        self.fetcher = BlueskyFetcher('test.bsky.social', 'test-app-password')
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def make_subscriber(self, **kwargs):
+        kwargs.setdefault('debounce_seconds', 0)
+        kwargs.setdefault('idle_timeout', 0.1)
+        return JetstreamSubscriber(self.fetcher, DID, AUTHOR, **kwargs)
+
+    def test_replayed_events_update_data_file(self):
+        """Test that recorded create/delete events are applied to the data file"""
+        rebuild = Mock()
+
+        with ReplayServer(self.events[:4]) as server:
+            subscriber = self.make_subscriber(endpoint=server.url, on_rebuild=rebuild)
+            subscriber.run(max_events=4)
+
+        with open('data/bluesky.json') as f:
+            data = json.load(f)
+
+        # The reply is skipped, both top-level posts are stored newest first
+        assert [post['text'] for post in data['posts']] == [
+            'Second post',
+            'First post from the firehose https://example.com'
+        ]
+        assert data['posts'][1]['links'] == ['https://example.com']
+        assert data['posts'][0]['url'] == 'https://bsky.app/profile/test.bsky.social/post/3l3qo2vuowo2d'
+        assert 'wantedDids=did%3Aplc%3Atestuser' in server.paths[0]
+        assert 'wantedCollections=app.bsky.feed.post' in server.paths[0]
+        rebuild.assert_called()
+
+    def test_cursor_persisted_and_resumed(self):
+        """Test that the cursor survives a restart and is sent on reconnect"""
+        with ReplayServer(self.events[:4]) as server:
+            self.make_subscriber(endpoint=server.url).run(max_events=4)
+
+        with open('.cache/bluesky/jetstream-cursor.json') as f:
+            assert json.load(f)['cursor'] == 1725911164000000
+
+        with ReplayServer(self.events[4:]) as server:
+            subscriber = self.make_subscriber(endpoint=server.url)
+            subscriber.run(max_events=1)
+
+        assert 'cursor=1725911164000000' in server.paths[0]
+        with open('data/bluesky.json') as f:
+            assert [post['text'] for post in json.load(f)['posts']] == ['Second post']
+
+    def test_reconnects_after_connection_drop(self):
+        """Test that a dropped connection is retried from the last cursor"""
+        with ReplayServer(self.events[:1]) as server:
+            subscriber = self.make_subscriber(endpoint=server.url)
+            with patch.object(bluesky_jetstream.time, 'sleep') as mock_sleep:
+                # Stop on the second connection attempt
+                mock_sleep.side_effect = lambda delay: subscriber.stop() if len(server.paths) > 1 else None
+                subscriber.run()
+
+        assert len(server.paths) >= 2
+        assert 'cursor=1725911162329308' in server.paths[-1]
+
+    def test_reconnects_after_rejected_handshake(self):
+        """Test that a failed handshake, e.g. a 503 from the endpoint, is retried"""
+        subscriber = self.make_subscriber(endpoint='ws://localhost:1/subscribe')
+        with patch.object(bluesky_jetstream, 'connect', side_effect=InvalidHandshake("server rejected WebSocket connection: HTTP 503")) as mock_connect, \
+                patch.object(bluesky_jetstream.time, 'sleep') as mock_sleep, \
+                patch('builtins.print'):
+            mock_sleep.side_effect = lambda delay: subscriber.stop() if mock_connect.call_count > 1 else None
+            subscriber.run()
+
+        assert mock_connect.call_count == 2
+        assert [call.args[0] for call in mock_sleep.call_args_list] == [1, 2]
+
+    def test_apply_event_ignores_other_dids_and_collections(self):
+        """Test that events for other accounts or collections are ignored"""
+        subscriber = self.make_subscriber()
+        other_did = json.loads(self.events[0])
+        other_did['did'] = 'did:plc:someoneelse'
+        like = json.loads(self.events[0])
+        like['commit']['collection'] = 'app.bsky.feed.like'
+
+        assert subscriber.apply_event(other_did) is False
+        assert subscriber.apply_event(like) is False
+        assert subscriber.apply_event({'kind': 'account', 'time_us': 5}) is False
+        assert subscriber.cursor == 5
+        assert subscriber.posts == []
+
+    def test_update_keeps_engagement_counts(self):
+        """Test that an edited post keeps the counts from the last full fetch"""
+        subscriber = self.make_subscriber()
+        subscriber.apply_event(json.loads(self.events[0]))
+        subscriber.posts[0]['like_count'] = 7
+
+        update = json.loads(self.events[0])
+        update['commit']['operation'] = 'update'
+        update['commit']['record']['text'] = 'Edited'
+
+        assert subscriber.apply_event(update) is True
+        assert len(subscriber.posts) == 1
+        assert subscriber.posts[0]['text'] == 'Edited'
+        assert subscriber.posts[0]['like_count'] == 7
+
+    def test_old_posts_beyond_limit_are_not_kept(self):
+        """Test that only the newest max_posts posts are kept"""
+        subscriber = self.make_subscriber(max_posts=1)
+        assert subscriber.apply_event(json.loads(self.events[3])) is True
+        assert subscriber.apply_event(json.loads(self.events[0])) is False
+        assert [post['text'] for post in subscriber.posts] == ['Second post']
+
+    def test_malformed_message_ignored(self):
+        """Test that non-JSON messages do not stop the subscriber"""
+        subscriber = self.make_subscriber()
+        assert subscriber.handle_message('not json') is False
+
+    def test_rebuild_debounced_until_quiet(self):
+        """Test that a rebuild waits for the debounce window to pass"""
+        rebuild = Mock()
+        subscriber = self.make_subscriber(on_rebuild=rebuild, debounce_seconds=60)
+        subscriber.handle_message(self.events[0])
+        subscriber.handle_message(self.events[3])
+
+        subscriber.flush()
+        rebuild.assert_not_called()
+
+        subscriber.flush(force=True)
+        rebuild.assert_called_once()
+
+    @patch.object(fetch_bluesky_data, 'BlueskyFetcher')
+    @patch.object(bluesky_jetstream, 'JetstreamSubscriber')
+    @patch('yaml.safe_load')
+    @patch('builtins.open')
+    @patch('pathlib.Path.exists')
+    @patch('listing_indexes.write_indexes')
+    @patch('search_index.update_index')
+    def test_main_subscribe_mode(self, mock_update_search, mock_write_indexes, mock_exists, mock_open, mock_yaml_load, mock_subscriber_class, mock_fetcher_class):
+        """Test that --subscribe starts the subscriber for the configured handle"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {
+            'handle': 'test.bsky.social',
+            'max_posts': 3,
+            'subscribe': {'rebuild_command': 'hugo --minify', 'debounce_seconds': 5}
+        }
+        mock_fetcher = Mock()
+        mock_fetcher.get_author_profile.return_value = dict(AUTHOR, did=DID)
+        mock_fetcher_class.return_value = mock_fetcher
+
+        with patch.dict(os.environ, {
+            'BLUESKY_USERNAME': 'test.bsky.social',
+            'BLUESKY_APP_PASSWORD': 'test-app-password'
+        }), patch.object(fetch_bluesky_data.signal, 'signal'):
+            fetch_bluesky_data.main(['--subscribe'])
+
+        args, kwargs = mock_subscriber_class.call_args
+        assert args == (mock_fetcher, DID, AUTHOR)
+        assert kwargs['max_posts'] == 3
+        assert kwargs['debounce_seconds'] == 5
+        mock_subscriber_class.return_value.run.assert_called_once()
+        mock_fetcher.get_user_posts.assert_not_called()
+
+        mock_write_indexes.reset_mock()
+        mock_update_search.reset_mock()
+        with patch.object(fetch_bluesky_data.subprocess, 'run') as mock_run:
+            mock_run.return_value.returncode = 0
+            kwargs['on_rebuild']()
+        mock_run.assert_called_once_with(['hugo', '--minify'])
+        mock_write_indexes.assert_called_once_with()
+        mock_update_search.assert_called_once_with()
+
+    @patch('builtins.print')
+    @patch.object(fetch_bluesky_data, 'BlueskyFetcher')
+    @patch('yaml.safe_load')
+    @patch('builtins.open')
+    @patch('pathlib.Path.exists')
+    def test_main_subscribe_unresolved_handle(self, mock_exists, mock_open, mock_yaml_load, mock_fetcher_class, mock_print):
+        """Test that --subscribe exits when the handle cannot be resolved"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {'handle': 'test.bsky.social'}
+        mock_fetcher_class.return_value.get_author_profile.return_value = None
+
+        with patch.dict(os.environ, {
+            'BLUESKY_USERNAME': 'test.bsky.social',
+            'BLUESKY_APP_PASSWORD': 'test-app-password'
+        }):
+            with pytest.raises(SystemExit):
+                fetch_bluesky_data.main(['--subscribe'])
+
+        mock_print.assert_any_call("Error: Could not resolve @test.bsky.social")
+
+    def test_events_recorded_in_archive(self):
+        """Test that creates and deletes are mirrored into the archive"""
+        from bluesky_archive import BlueskyArchive
+        archive = BlueskyArchive('archive')
+        subscriber = self.make_subscriber(archive=archive, max_posts=1)
+
+        subscriber.apply_event(json.loads(self.events[3]))
+        subscriber.apply_event(json.loads(self.events[0]))
+        assert len(archive) == 2
+
+        subscriber.apply_event(json.loads(self.events[4]))
+        assert len(archive) == 1
+
+    def test_posts_with_author_references_are_expanded(self):
+        """Test that a data file written with an author table is loaded with full authors"""
+        self.fetcher.author_table = True
+        subscriber = self.make_subscriber()
+        subscriber.handle_message(self.events[0])
+
+        with open('data/bluesky.json') as f:
+            assert json.load(f)['posts'][0]['author'] == DID
+
+        restarted = self.make_subscriber()
+        assert restarted.posts[0]['author'] == AUTHOR
@@ -0,0 +1,69 @@
+"""Tests for Bluesky rich-text rendering"""
+
+from atproto import models
+
+from bluesky_richtext import render_html
+
+
+def make_record(text, facets):
+    """Build a post record model the way the fetcher receives it"""
+    return models.get_or_create({
+        '$type': 'app.bsky.feed.post',
+        'text': text,
+        'createdAt': '2024-01-01T00:00:00Z',
+        'facets': facets
+    }, strict=False)
+
+
+def facet(start, end, feature):
+    return {'index': {'byteStart': start, 'byteEnd': end}, 'features': [feature]}
+
+
+class TestRenderHtml:
+    """Test cases for render_html"""
+
+    def test_plain_text_is_escaped(self):
+        """Test that markup in the text is escaped and newlines kept"""
+        assert render_html('<b>hi</b> & bye\nnext') == '&lt;b&gt;hi&lt;/b&gt; &amp; bye<br>\nnext'
+
+    def test_facets_become_links(self):
+        """Test that link, mention and tag facets are rendered as anchors"""
+        text = 'Hi @alice.bsky.social see example.com/a… #python'
+        record = make_record(text, [
+            facet(3, 21, {'$type': 'app.bsky.richtext.facet#mention', 'did': 'did:plc:alice'}),
+            facet(26, 42, {'$type': 'app.bsky.richtext.facet#link', 'uri': 'https://example.com/a/long/path'}),
+            facet(43, 50, {'$type': 'app.bsky.richtext.facet#tag', 'tag': 'python'}),
+        ])
+
+        assert render_html(record.text, record.facets) == (
+            'Hi <a href="https://bsky.app/profile/did:plc:alice" target="_blank" rel="noopener">@alice.bsky.social</a>'
+            ' see <a href="https://example.com/a/long/path" target="_blank" rel="noopener">example.com/a…</a>'
+            ' <a href="https://bsky.app/hashtag/python" target="_blank" rel="noopener">#python</a>'
+        )
+
+    def test_byte_offsets_with_multibyte_text(self):
+        """Test that facet offsets are applied to UTF-8 bytes, not characters"""
+        text = 'Café 🦋 #tag'
+        start = len('Café 🦋 '.encode('utf-8'))
+        record = make_record(text, [
+            facet(start, start + 4, {'$type': 'app.bsky.richtext.facet#tag', 'tag': 'tag'})
+        ])
+
+        assert render_html(record.text, record.facets).endswith(
+            'Café 🦋 <a href="https://bsky.app/hashtag/tag" target="_blank" rel="noopener">#tag</a>'
+        )
+
+    def test_unsafe_and_invalid_facets_are_ignored(self):
+        """Test that non-http links and out-of-range facets stay plain text"""
+        record = make_record('click me', [
+            facet(0, 5, {'$type': 'app.bsky.richtext.facet#link', 'uri': 'javascript:alert(1)'}),
+            facet(6, 99, {'$type': 'app.bsky.richtext.facet#tag', 'tag': 'x'}),
+        ])
+
+        assert render_html(record.text, record.facets) == 'click me'
+
+    def test_bare_urls_linkified_without_facets(self):
+        """Test that URLs in text without facets are linkified, minus trailing punctuation"""
+        assert render_html('See https://example.com/page.') == (
+            'See <a href="https://example.com/page" target="_blank" rel="noopener">https://example.com/page</a>.'
+        )
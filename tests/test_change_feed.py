@@ -0,0 +1,72 @@
+"""Tests for the per-run change feed"""
+
+import json
+import os
+import shutil
+import tempfile
+
+from change_feed import ChangeFeed, diff_items
+
+
+class TestChangeFeed:
+    """Test cases for the change feed"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        self.feed = ChangeFeed()
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def write_data(self, videos):
+        with open('UC1.json', 'w') as f:
+            json.dump({'channel_id': 'UC1', 'videos': videos}, f)
+
+    def test_diff_items(self):
+        """Test that items are matched by key and changed fields are listed"""
+        previous = [{'id': 'a', 'title': 'A'}, {'id': 'b', 'title': 'B', 'views': 1}, {'id': 'c'}]
+        current = [{'id': 'b', 'title': 'B2'}, {'id': 'c'}, {'id': 'd'}]
+
+        added, updated, removed = diff_items(previous, current, 'id')
+        assert added == [{'id': 'd'}]
+        assert updated == [({'id': 'b', 'title': 'B2'}, ['title', 'views'])]
+        assert removed == [{'id': 'a', 'title': 'A'}]
+
+        # Bookkeeping timestamps alone are not an update
+        assert diff_items([{'id': 'a', 'statistics_updated_at': '1'}], [{'id': 'a', 'statistics_updated_at': '2'}],
+                          'id') == ([], [], [])
+
+    def test_compare_records_changes_against_file(self):
+        """Test that a run's changes are written with their data file and URL"""
+        self.write_data([{'id': 'a', 'url': 'https://youtu.be/a'}, {'id': 'b', 'title': 'Old'}])
+        self.feed.start()
+        self.feed.compare('videos', 'UC1.json', [{'id': 'b', 'title': 'New'}, {'id': 'c'}], 'id', 'youtube')
+        self.feed.write('out/changes.json')
+
+        with open('out/changes.json') as f:
+            feed = json.load(f)
+        assert feed['videos']['added'] == [{'id': 'c', 'url': None, 'provider': 'youtube', 'data_file': 'UC1.json'}]
+        assert feed['videos']['updated'][0]['fields'] == ['title']
+        assert feed['videos']['removed'][0]['url'] == 'https://youtu.be/a'
+        assert feed['posts'] == {'added': [], 'updated': [], 'removed': []}
+        assert not self.feed.active
+
+    def test_missing_or_invalid_file_means_everything_is_new(self):
+        """Test that a first run reports every item as added"""
+        self.feed.start()
+        self.feed.compare('posts', 'missing.json', [{'uri': 'at://1'}], 'uri', 'bluesky')
+        with open('broken.json', 'w') as f:
+            f.write('not json')
+        self.feed.compare('posts', 'broken.json', [{'uri': 'at://2'}], 'uri', 'bluesky')
+
+        assert self.feed.summary()['posts'] == {'added': 2, 'updated': 0, 'removed': 0}
+
+    def test_compare_ignored_until_started(self):
+        """Test that long-running callers do not accumulate changes"""
+        self.feed.compare('posts', 'missing.json', [{'uri': 'at://1'}], 'uri', 'bluesky')
+        assert self.feed.summary() == {}
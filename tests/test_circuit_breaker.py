@@ -0,0 +1,62 @@
+"""Tests for the persisted circuit breakers"""
+
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from circuit_breaker import CircuitBreaker
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.test_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.test_dir, 'breakers', 'youtube.json')
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_opens_after_threshold_and_persists(self):
+        """Test that repeated failures open the breaker for the next run"""
+        breaker = CircuitBreaker(self.state_file, failure_threshold=2, cooldown=60)
+        breaker.record_failure('UC1', 'timeout')
+        assert breaker.allow('UC1')
+        breaker.record_failure('UC1', 'timeout')
+        assert not breaker.allow('UC1')
+        assert breaker.allow('UC2')
+        breaker.save()
+
+        next_run = CircuitBreaker(self.state_file, failure_threshold=2, cooldown=60)
+        assert not next_run.allow('UC1')
+        assert next_run.state['UC1']['last_error'] == 'timeout'
+
+    def test_cooldown_allows_trial_and_success_closes(self):
+        """Test that a breaker half-opens after the cooldown and closes on success"""
+        breaker = CircuitBreaker(self.state_file, failure_threshold=1, cooldown=60)
+        with patch('circuit_breaker.time.time', return_value=1000):
+            breaker.record_failure('UC1', 'down')
+        with patch('circuit_breaker.time.time', return_value=1030):
+            assert not breaker.allow('UC1')
+        with patch('circuit_breaker.time.time', return_value=1061):
+            assert breaker.allow('UC1')
+
+        breaker.record_success('UC1')
+        assert 'UC1' not in breaker.state
+
+    def test_for_provider_reads_settings(self):
+        """Test that provider settings override the defaults"""
+        with patch('circuit_breaker.BREAKER_DIR', self.test_dir):
+            breaker = CircuitBreaker.for_provider('bluesky', {'failure_threshold': 5, 'cooldown_seconds': 10})
+        assert breaker.path == CircuitBreaker(os.path.join(self.test_dir, 'bluesky.json')).path
+        assert (breaker.failure_threshold, breaker.cooldown) == (5, 10)
+
+    def test_corrupt_state_starts_closed(self):
+        """Test that an unreadable state file is ignored"""
+        os.makedirs(os.path.dirname(self.state_file))
+        with open(self.state_file, 'w') as f:
+            f.write('not json')
+        assert CircuitBreaker(self.state_file).allow('UC1')
@@ -0,0 +1,186 @@
+"""Tests for the manifest-based deploy sync, against moto's S3 stand-in"""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import boto3
+import pytest
+from boto3.s3.transfer import TransferConfig
+from moto import mock_aws
+
+import deploy_sync
+
+BUCKET = 'test-site'
+
+
+class TestDeploySync:
+    """Test cases for deploy_sync"""
+
+    def setup_method(self):
+        """Set up a fake bucket and a built site in a temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        self.env = patch.dict(os.environ, {'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+                                           'AWS_DEFAULT_REGION': 'us-east-1'})
+        self.env.start()
+        self.mock = mock_aws()
+        self.mock.start()
+        self.client = boto3.client('s3', region_name='us-east-1')
+        self.client.create_bucket(Bucket=BUCKET)
+        self.write('index.html', '<h1>Home</h1>')
+        self.write('css/main.0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef.css', 'body{}')
+        self.write('images/logo.png', b'\x89PNG')
+        self.write('index.xml', '<rss/>')
+
+    def teardown_method(self):
+        """Clean up the fake bucket and temporary directory"""
+        self.mock.stop()
+        self.env.stop()
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def write(self, key, content):
+        path = Path('public') / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        path.write_bytes(content)
+
+    def keys(self):
+        return sorted(item['Key'] for item in self.client.list_objects_v2(Bucket=BUCKET).get('Contents', []))
+
+    def sync(self, **kwargs):
+        with patch('builtins.print'):
+            return deploy_sync.sync(self.client, BUCKET, 'public', workers=4, **kwargs)
+
+    def test_first_deploy_uploads_everything_with_headers(self):
+        """Test that objects get content types, cache headers and a manifest"""
+        summary = self.sync()
+
+        assert summary['uploaded'] == 4
+        assert self.keys() == sorted([
+            deploy_sync.MANIFEST_KEY, 'css/main.0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef.css',
+            'images/logo.png', 'index.html', 'index.xml'
+        ])
+        page = self.client.head_object(Bucket=BUCKET, Key='index.html')
+        assert page['ContentType'] == 'text/html; charset=utf-8'
+        assert page['CacheControl'] == deploy_sync.REVALIDATE
+        css_key = 'css/main.0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef.css'
+        assert self.client.head_object(Bucket=BUCKET, Key=css_key)['CacheControl'] == deploy_sync.IMMUTABLE
+        logo = self.client.head_object(Bucket=BUCKET, Key='images/logo.png')
+        assert (logo['ContentType'], logo['CacheControl']) == ('image/png', deploy_sync.STATIC)
+
+    def test_second_deploy_only_sends_changes(self):
+        """Test that unchanged files are skipped and removed files deleted"""
+        self.sync()
+        assert self.sync()['uploaded'] == 0
+
+        self.write('index.html', '<h1>New home</h1>')
+        os.remove('public/index.xml')
+        summary = self.sync()
+
+        assert (summary['uploaded'], summary['deleted'], summary['unchanged']) == (1, 1, 2)
+        assert 'index.xml' not in self.keys()
+        body = self.client.get_object(Bucket=BUCKET, Key='index.html')['Body'].read()
+        assert body == b'<h1>New home</h1>'
+        manifest = json.loads(self.client.get_object(Bucket=BUCKET, Key=deploy_sync.MANIFEST_KEY)['Body'].read())
+        assert sorted(manifest['files']) == sorted(os.path.relpath(p, 'public').replace(os.sep, '/')
+                                                   for p in Path('public').rglob('*') if p.is_file())
+
+    def test_precompressed_variants(self):
+        """Test that gzip variants replace the original bytes and Brotli ones become sidecars"""
+        compressed = gzip.compress(b'<h1>Home</h1>', mtime=0)
+        self.write('index.html.gz', compressed)
+        self.write('index.html.br', b'brotli')
+        self.write('download.tar.gz', b'archive')
+        # A genuine download next to a same-named file is not in the report
+        self.write('data.csv', 'a,b')
+        self.write('data.csv.gz', b'csv archive')
+        Path('.cache').mkdir()
+        with open('.cache/precompress-report.json', 'w') as f:
+            json.dump({'files': {'index.html': {'size': 13, 'cached': False, 'gzip': len(compressed), 'br': 6},
+                                 'index.xml': {'size': 6, 'cached': False}}}, f)
+        self.sync(precompressed=deploy_sync.load_precompressed())
+
+        page = self.client.get_object(Bucket=BUCKET, Key='index.html')
+        assert page['ContentEncoding'] == 'gzip'
+        assert page['ContentType'] == 'text/html; charset=utf-8'
+        assert page['Body'].read() == compressed
+        sidecar = self.client.head_object(Bucket=BUCKET, Key='index.html.br')
+        assert (sidecar['ContentEncoding'], sidecar['ContentType']) == ('br', 'text/html; charset=utf-8')
+        assert 'index.html.gz' not in self.keys()
+        assert 'ContentEncoding' not in self.client.head_object(Bucket=BUCKET, Key='download.tar.gz')
+        assert 'ContentEncoding' not in self.client.head_object(Bucket=BUCKET, Key='data.csv')
+        assert self.client.get_object(Bucket=BUCKET, Key='data.csv.gz')['Body'].read() == b'csv archive'
+        assert deploy_sync.load_precompressed('missing.json') == {}
+
+    def test_dry_run_changes_nothing(self):
+        """Test that a dry run reports the plan without touching the bucket"""
+        summary = self.sync(dry_run=True)
+        assert summary['uploaded'] == 4
+        assert self.keys() == []
+
+    def test_rebuild_manifest_removes_unknown_keys(self):
+        """Test that a rebuild diffs against the bucket listing"""
+        self.client.put_object(Bucket=BUCKET, Key='old/page.html', Body=b'old')
+        summary = self.sync(rebuild_manifest=True)
+        assert summary['deleted'] == 1
+        assert 'old/page.html' not in self.keys()
+
+    def test_first_deploy_removes_keys_left_by_earlier_tools(self):
+        """Test that without a manifest the bucket is listed, so stale objects are deleted"""
+        self.client.put_object(Bucket=BUCKET, Key='old/page.html', Body=b'old')
+        summary = self.sync()
+        assert (summary['uploaded'], summary['deleted']) == (4, 1)
+        assert 'old/page.html' not in self.keys()
+
+        # Later deploys diff against the manifest without listing
+        with patch.object(deploy_sync, 'list_bucket') as mock_list:
+            assert self.sync()['uploaded'] == 0
+        mock_list.assert_not_called()
+
+    def test_large_files_use_multipart(self):
+        """Test that files above the threshold are uploaded in parts"""
+        self.write('video.mp4', os.urandom(6 * 1024 * 1024))
+        config = TransferConfig(multipart_threshold=5 * 1024 * 1024, multipart_chunksize=5 * 1024 * 1024)
+        self.sync(transfer_config=config)
+
+        head = self.client.head_object(Bucket=BUCKET, Key='video.mp4')
+        assert head['ETag'].strip('"').endswith('-2')
+        assert head['ContentType'] == 'video/mp4'
+
+    def test_delete_batches(self):
+        """Test that deletes are split into DeleteObjects requests of at most 1000 keys"""
+        keys = [f'k{i}' for i in range(2500)]
+        with patch.object(self.client, 'delete_objects', return_value={}) as mock_delete:
+            assert deploy_sync.delete_keys(self.client, BUCKET, keys) == 2500
+        assert [len(c.kwargs['Delete']['Objects']) for c in mock_delete.call_args_list] == [1000, 1000, 500]
+
+        with patch.object(self.client, 'delete_objects', return_value={'Errors': [{'Key': 'k1', 'Message': 'no'}]}):
+            with pytest.raises(RuntimeError), patch('builtins.print'):
+                deploy_sync.delete_keys(self.client, BUCKET, keys[:1])
+
+    def test_unknown_manifest_version_ignored(self):
+        """Test that an unreadable manifest version triggers a full upload"""
+        self.client.put_object(Bucket=BUCKET, Key=deploy_sync.MANIFEST_KEY, Body=b'{"version": 99, "files": {}}')
+        assert self.sync()['uploaded'] == 4
+
+    def test_main_requires_bucket_and_build(self):
+        """Test the command line checks and summary"""
+        with patch.dict(os.environ, {}, clear=False), patch('builtins.print'):
+            os.environ.pop('LINODE_BUCKET', None)
+            with pytest.raises(SystemExit):
+                deploy_sync.main(['public'])
+            with pytest.raises(SystemExit):
+                deploy_sync.main(['missing', '--bucket', BUCKET])
+
+        with patch.object(deploy_sync, 'create_client', return_value=self.client), \
+                patch.dict(os.environ, {'LINODE_CLUSTER': 'us-east-1'}), patch('builtins.print') as mock_print:
+            deploy_sync.main(['public', '--bucket', BUCKET, '--dry-run'])
+        mock_print.assert_called_with("Would upload 4 objects (29 bytes), would delete 0, 0 unchanged")
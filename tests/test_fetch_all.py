@@ -0,0 +1,293 @@
+"""Tests for the fetch orchestrator"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+import fetch_all
+from fetch_bluesky_data import BlueskyFetcher
+from fetch_provider import FetchProvider
+from fetch_youtube_data import YouTubeFetcher
+
+
+class FakeProvider(FetchProvider):
+    """Provider stand-in that sleeps, fails or returns a fixed summary"""
+
+    deadline = 5
+
+    def __init__(self, name, delay=0, error=None, items=1):
+        self.name = name
+        self.config_file = f'config/{name}.yaml'
+        self.delay = delay
+        self.error = error
+        self.items = items
+        self.release = threading.Event()
+
+    def load_config(self):
+        return {}
+
+    def cancel(self):
+        super().cancel()
+        self.release.set()
+
+    def fetch(self, config):
+        self.release.wait(self.delay)
+        if self.error:
+            raise self.error
+        return {'items': self.items}
+
+
+class TestFetchAll:
+    """Test cases for the orchestrator"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        os.makedirs('config')
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_providers_run_concurrently(self):
+        """Test that the run takes as long as the slowest provider, not the sum"""
+        providers = [FakeProvider('a', delay=0.3), FakeProvider('b', delay=0.3, items=4)]
+
+        start = time.monotonic()
+        results = fetch_all.run_providers(providers)
+        elapsed = time.monotonic() - start
+
+        assert elapsed < 0.55
+        assert results['a']['status'] == 'ok'
+        assert results['b'] == {'items': 4, 'status': 'ok', 'duration_seconds': results['b']['duration_seconds']}
+
+    def test_deadline_and_errors_are_isolated(self):
+        """Test that a slow or failing provider does not affect the others"""
+        slow = FakeProvider('slow', delay=10)
+        providers = [slow, FakeProvider('broken', error=RuntimeError("boom")), FakeProvider('fine')]
+
+        with patch('traceback.print_exc'):
+            results = fetch_all.run_providers(providers, deadlines={'slow': 0.1})
+        slow.release.set()
+
+        assert results['slow']['status'] == 'timeout'
+        assert slow.cancelled
+        assert results['broken'] == {'status': 'error', 'error': 'boom',
+                                     'duration_seconds': results['broken']['duration_seconds']}
+        assert results['fine']['status'] == 'ok'
+
+    def test_stuck_provider_is_given_a_grace_period(self):
+        """Test that a provider ignoring cancel() is waited for only up to the grace period"""
+        stuck = FakeProvider('stuck', delay=10)
+        stuck.cancel = lambda: FetchProvider.cancel(stuck)
+        run = fetch_all.ProviderRun(stuck, 0.05, grace=0.1)
+
+        start = time.monotonic()
+        run.start()
+        assert run.wait()['status'] == 'timeout'
+        assert time.monotonic() - start < 1
+        assert stuck.cancelled
+        stuck.release.set()
+
+    def test_timeout_falls_back_to_last_known_good(self):
+        """Test that a provider past its deadline has its unrefreshed data files restored"""
+        slow = FakeProvider('slow', delay=10)
+        calls = []
+
+        def fall_back(config, reason, since):
+            calls.append((config, reason, since))
+            return ['data/slow.json']
+
+        slow.fall_back = fall_back
+        run = fetch_all.ProviderRun(slow, 0.05)
+        run.start()
+        result = run.wait()
+
+        assert result['stale'] == ['data/slow.json']
+        assert calls == [({}, 'Did not finish within 0.05s', run.started_at)]
+
+    def test_youtube_fall_back_restores_unrefreshed_channels(self):
+        """Test that only channels not written since the run started are restored, marked stale"""
+        since = datetime.now(timezone.utc)
+        fresh = {'channel_id': 'UC1', 'channel_title': 'One', 'videos': [],
+                 'fetched_at': (since + timedelta(seconds=1)).isoformat()}
+        old = {'channel_id': 'UC2', 'channel_title': 'Two', 'videos': [],
+               'fetched_at': (since - timedelta(hours=1)).isoformat()}
+        os.makedirs('data/youtube')
+        for data in (fresh, old):
+            with open(f"data/youtube/{data['channel_id']}.json", 'w') as f:
+                json.dump(data, f)
+        config = {'channels': [{'channel_id': 'UC1'}, {'channel_id': 'UC2'}, {'channel_id': 'UC3'}]}
+
+        with patch('builtins.print'):
+            restored = YouTubeFetcher('key').fall_back(config, 'deadline', since)
+
+        assert restored == [os.path.join('data', 'youtube', 'UC2.json')]
+        with open('data/youtube/UC2.json') as f:
+            assert json.load(f)['stale_reason'] == 'deadline'
+        with open('data/youtube/UC1.json') as f:
+            assert 'stale' not in json.load(f)
+        with open('.cache/circuit-breakers/youtube.json') as f:
+            assert sorted(json.load(f)['sources']) == ['UC2', 'UC3']
+
+    def test_bluesky_fall_back_per_handle(self):
+        """Test that per-handle data files are restored with their handle's breaker"""
+        since = datetime.now(timezone.utc)
+        os.makedirs('data/bluesky_accounts')
+        with open('data/bluesky_accounts/a-bsky-social.json', 'w') as f:
+            json.dump({'last_updated': (since - timedelta(hours=1)).isoformat(), 'posts': []}, f)
+        config = {'handles': ['a.bsky.social', 'b.bsky.social'], 'output': 'per_handle'}
+
+        with patch('builtins.print'):
+            restored = BlueskyFetcher('me.bsky.social', 'pw').fall_back(config, 'deadline', since)
+            merged = BlueskyFetcher('me.bsky.social', 'pw').fall_back({'handle': 'a.bsky.social'}, 'deadline', since)
+
+        assert restored == [os.path.join('data', 'bluesky_accounts', 'a-bsky-social.json')]
+        assert merged == []
+        with open('.cache/circuit-breakers/bluesky.json') as f:
+            assert sorted(json.load(f)['sources']) == ['a.bsky.social', 'b.bsky.social']
+
+    def test_system_exit_reported_as_error(self):
+        """Test that a provider calling sys.exit is recorded rather than ending the run"""
+        with patch('traceback.print_exc'):
+            results = fetch_all.run_providers([FakeProvider('exits', error=SystemExit(1))])
+        assert results['exits']['status'] == 'error'
+
+    def test_main_writes_combined_report(self):
+        """Test that main skips unconfigured providers and reports every provider"""
+        open('config/a.yaml', 'w').close()
+        provider = FakeProvider('a', items=3)
+        provider_class = type('AProvider', (FakeProvider,), {
+            'name': 'a', 'config_file': 'config/a.yaml', 'from_environment': classmethod(lambda cls: provider)
+        })
+        missing_class = type('BProvider', (FakeProvider,), {'name': 'b', 'config_file': 'config/b.yaml'})
+
+        with patch.object(fetch_all, 'PROVIDERS', [provider_class, missing_class]), patch('builtins.print'):
+            fetch_all.main(['--report', 'report.json'])
+
+        with open('report.json') as f:
+            report = json.load(f)
+        assert report['providers']['a']['status'] == 'ok'
+        assert report['providers']['a']['items'] == 3
+        assert report['providers']['b']['status'] == 'skipped'
+        assert 'duration_seconds' in report
+        assert report['changes'] == {'videos': {'added': 0, 'updated': 0, 'removed': 0},
+                                     'posts': {'added': 0, 'updated': 0, 'removed': 0}}
+        assert os.path.exists('changes.json')
+        assert report['search_index']['documents'] == 0
+
+    def test_main_writes_metrics(self):
+        """Test that provider gauges land in the report and the Prometheus textfile"""
+        open('config/a.yaml', 'w').close()
+        provider = FakeProvider('a', items=3)
+        provider_class = type('AProvider', (FakeProvider,), {
+            'name': 'a', 'config_file': 'config/a.yaml', 'from_environment': classmethod(lambda cls: provider)
+        })
+
+        fetch_all.metrics.reset()
+        with patch.object(fetch_all, 'PROVIDERS', [provider_class]), patch('builtins.print'):
+            fetch_all.main(['--report', 'report.json', '--prometheus', 'metrics/fetch.prom'])
+
+        with open('report.json') as f:
+            report = json.load(f)
+        assert {'name': 'fetch_provider_success', 'type': 'gauge', 'labels': {'provider': 'a'}, 'value': 1} \
+            in report['metrics']
+        with open('metrics/fetch.prom') as f:
+            text = f.read()
+        assert '# TYPE fetch_provider_success gauge' in text
+        assert 'fetch_provider_success{provider="a"} 1' in text
+
+    def test_main_fails_when_every_provider_fails(self):
+        """Test that the run exits non-zero only when nothing was fetched"""
+        open('config/a.yaml', 'w').close()
+        provider = FakeProvider('a', error=RuntimeError("down"))
+        provider_class = type('AProvider', (FakeProvider,), {
+            'name': 'a', 'config_file': 'config/a.yaml', 'from_environment': classmethod(lambda cls: provider)
+        })
+
+        with patch.object(fetch_all, 'PROVIDERS', [provider_class]), \
+                patch('builtins.print'), patch('traceback.print_exc'):
+            with pytest.raises(SystemExit):
+                fetch_all.main(['--report', 'report.json'])
+
+    def test_main_profiles_each_provider(self):
+        """Test that --profile writes one profile per provider next to the report"""
+        open('config/a.yaml', 'w').close()
+        open('config/b.yaml', 'w').close()
+        providers = {name: FakeProvider(name) for name in ('a', 'b')}
+        provider_classes = [type(f'{name.upper()}Provider', (FakeProvider,), {
+            'name': name, 'config_file': f'config/{name}.yaml',
+            'from_environment': classmethod(lambda cls: providers[cls.name])
+        }) for name in providers]
+
+        with patch.object(fetch_all, 'PROVIDERS', provider_classes), patch('builtins.print'):
+            fetch_all.main(['--report', 'reports/report.json', '--profile'])
+
+        with open('reports/report.json') as f:
+            report = json.load(f)
+        assert report['profile'] == os.path.join('reports', 'profile', 'profile.json')
+        with open(report['profile']) as f:
+            assert sorted(json.load(f)) == ['a', 'b']
+        assert os.path.exists('reports/profile/a.prof')
+
+    def test_invalid_deadline_rejected(self):
+        """Test that malformed --deadline values are reported"""
+        with pytest.raises(SystemExit), patch('sys.stderr'):
+            fetch_all.main(['--deadline', 'youtube=soon'])
+
+    def test_youtube_from_environment(self):
+        """Test that the YouTube provider needs an API key"""
+        with patch.dict(os.environ, {}, clear=True):
+            assert YouTubeFetcher.from_environment() is None
+        with patch.dict(os.environ, {'YOUTUBE_API_KEY': 'key'}):
+            assert YouTubeFetcher.from_environment().api_key == 'key'
+
+    def test_bluesky_from_environment(self):
+        """Test that the Bluesky provider needs credentials unless it reads from the PDS"""
+        with patch.dict(os.environ, {'BLUESKY_USERNAME': 'me.bsky.social', 'BLUESKY_APP_PASSWORD': 'pw'}):
+            assert BlueskyFetcher.from_environment().username == 'me.bsky.social'
+
+        with patch.dict(os.environ, {}, clear=True):
+            assert BlueskyFetcher.from_environment() is None
+            with open('config/bluesky-config.yaml', 'w') as f:
+                f.write("handle: me.bsky.social\n")
+            assert BlueskyFetcher.from_environment() is None
+            with open('config/bluesky-config.yaml', 'w') as f:
+                f.write("handle: me.bsky.social\nengine: pds\n")
+            assert BlueskyFetcher.from_environment() is not None
+
+    def test_youtube_fetch_uses_configured_channels(self):
+        """Test the YouTube provider's fetch summary"""
+        fetcher = YouTubeFetcher('key')
+        channel = {'channel_title': 'Test', 'channel_id': 'UC1', 'videos': [{'id': 'v1'}, {'id': 'v2'}]}
+        with patch.object(fetcher, 'get_channel_videos', return_value=channel), \
+                patch.object(fetcher, 'generate_hugo_content') as mock_generate, patch('builtins.print'):
+            summary = fetcher.fetch({'channels': [{'channel_id': 'UC1', 'name': 'Test Channel'}]})
+
+        assert summary == {'items': 2, 'channels': 1, 'stale': []}
+        mock_generate.assert_called_once_with(channel, 'content', 'test-channel')
+
+    def test_bluesky_fetch_requires_handle(self):
+        """Test that the Bluesky provider reports a missing handle as an error"""
+        fetcher = BlueskyFetcher('me.bsky.social', 'pw')
+        with pytest.raises(ValueError):
+            fetcher.fetch({'handle': 'your-handle.bsky.social'})
+
+    def test_bluesky_fetch_single_handle(self):
+        """Test the Bluesky provider's fetch summary"""
+        fetcher = BlueskyFetcher('me.bsky.social', 'pw')
+        posts = [{'uri': 'at://did:plc:me/app.bsky.feed.post/1', 'created_at': '2024-01-01T00:00:00Z'}]
+        with patch.object(fetcher, 'get_user_posts', return_value=posts) as mock_get, patch('builtins.print'):
+            assert fetcher.fetch({'handle': 'me.bsky.social', 'max_posts': 2}) == {'items': 1}
+        mock_get.assert_called_once_with('me.bsky.social', limit=2)
+        assert os.path.exists('data/bluesky.json')
@@ -0,0 +1,256 @@
+"""Tests for the precomputed listing indexes"""
+
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import listing_indexes
+from listing_indexes import (activity_timeline, bluesky_index, channel_index, format_date, format_duration,
+                             latest_videos, popular_videos, truncate, write_indexes)
+
+AUTHOR = {'handle': 'test.bsky.social', 'display_name': 'Test User', 'avatar': None}
+DID = 'did:plc:test'
+
+
+def video(video_id, published_at, **extra):
+    return dict({
+        'id': video_id,
+        'title': f"Video {video_id}",
+        'description': f"About {video_id}",
+        'published_at': published_at,
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'is_live_stream': False,
+        'live_status': 'none'
+    }, **extra)
+
+
+CHANNEL = {
+    'channel_id': 'UC1',
+    'channel_title': 'Channel One',
+    'channel_slug': 'channel-one',
+    'videos': [
+        video('v3', '2025-03-01T10:00:00Z', is_live_stream=True, live_status='upcoming'),
+        video('v2', '2025-01-15T10:00:00Z', is_live_stream=True, live_status='completed'),
+        video('v1', '2024-12-31T23:00:00Z')
+    ]
+}
+
+
+class TestListingIndexes:
+    """Test cases for the listing indexes"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def write_data(self, channels=(CHANNEL,), bluesky=None):
+        Path('data/youtube').mkdir(parents=True, exist_ok=True)
+        for channel in channels:
+            with open(f"data/youtube/{channel['channel_id']}.json", 'w') as f:
+                json.dump(channel, f)
+        if bluesky is not None:
+            with open('data/bluesky.json', 'w') as f:
+                json.dump(bluesky, f)
+
+    def read_index(self, name):
+        with open(Path('data/indexes') / name) as f:
+            return json.load(f)
+
+    def test_truncate_matches_hugo(self):
+        """Test that text is cut at a word boundary with Hugo's ellipsis"""
+        assert truncate('short text') == 'short text'
+        assert truncate(None) == ''
+        assert truncate('one two three four', 10) == 'one two …'
+        assert truncate('abcdefghijklmnop', 10) == 'abcdefghij …'
+        assert truncate('first line\nsecond line', 15) == 'first line …'
+
+    def test_format_date(self):
+        """Test the long and short Hugo date layouts"""
+        assert format_date('2025-01-05T04:57:23Z') == 'January 5, 2025'
+        assert format_date('2025-07-18T20:31:22.785Z', short=True) == 'Jul 18, 2025'
+        assert format_date('2025-07-20T02:39:42.792919+00:00', short=True) == 'Jul 20, 2025'
+        assert format_date('not a date') is None
+        assert format_date(None) is None
+
+    def test_channel_index(self):
+        """Test that summaries are formatted and bucketed by year and live status"""
+        index = channel_index(dict(CHANNEL, stale=True, fetched_at='2025-03-02T00:00:00+00:00'))
+
+        assert index['channel_slug'] == 'channel-one'
+        assert index['video_count'] == 3
+        assert index['stale'] is True
+        assert index['fetched_date'] == 'Mar 2, 2025'
+        assert [v['id'] for v in index['videos']] == ['v3', 'v2', 'v1']
+        assert index['videos'][0]['date'] == 'March 1, 2025'
+        assert index['videos'][0]['excerpt'] == 'About v3'
+        assert index['videos'][0]['badge'] == {'class': 'upcoming', 'label': '📅 Upcoming'}
+        assert index['videos'][1]['badge'] == {'class': 'completed', 'label': '📺 Stream'}
+        assert index['videos'][2]['badge'] is None
+        assert 'description' not in index['videos'][0]
+        assert index['by_year'] == [{'year': 2025, 'videos': [0, 1]}, {'year': 2024, 'videos': [2]}]
+        assert index['status'] == {'live': [], 'upcoming': [0], 'completed': [1]}
+
+    def test_format_duration(self):
+        assert format_duration(59) == '0:59'
+        assert format_duration(605) == '10:05'
+        assert format_duration(3723) == '1:02:03'
+        assert format_duration(None) is None
+
+    def test_popular_and_shorts(self):
+        """Test that the most viewed videos and Shorts are bucketed, skipping videos without counts"""
+        channel = dict(CHANNEL, videos=[
+            video('v4', '2025-04-01T10:00:00Z', view_count=10, duration_seconds=45, is_short=True),
+            video('v3', '2025-03-01T10:00:00Z', view_count=500, duration_seconds=3723),
+            video('v2', '2025-01-15T10:00:00Z'),
+            video('v1', '2024-12-31T23:00:00Z', view_count=90)
+        ])
+        index = channel_index(channel)
+
+        assert index['popular'] == [1, 3, 0]
+        assert index['shorts'] == [0]
+        assert index['videos'][1]['duration'] == '1:02:03'
+        assert index['videos'][2]['duration'] is None
+
+        other = channel_index(dict(channel, channel_id='UC2', channel_slug='two', videos=[
+            video('x1', '2025-01-01T00:00:00Z', view_count=100)
+        ]))
+        popular = popular_videos([index, other], limit=3)
+        assert [(v['id'], v['channel_slug']) for v in popular] == [('v3', 'channel-one'), ('x1', 'two'),
+                                                                   ('v1', 'channel-one')]
+
+    def test_channel_index_playlists(self):
+        """Test that playlists point at uploads first and list other videos once"""
+        playlists = {
+            'playlists': [
+                {'id': 'PL1', 'title': 'Series', 'description': 'All of it', 'video_ids': ['v2', 'x1', 'gone']},
+                {'id': 'PL2', 'title': 'Mix', 'video_ids': ['x1', 'v3']}
+            ],
+            'videos': {'x1': video('x1', '2020-01-01T00:00:00Z')}
+        }
+        index = channel_index(CHANNEL, playlists)
+
+        assert [(p['id'], p['videos'], p['video_count']) for p in index['playlists']] == [
+            ('PL1', [1, 3], 2), ('PL2', [3, 0], 2)]
+        assert index['playlists'][0]['excerpt'] == 'All of it'
+        assert [v['id'] for v in index['playlist_videos']] == ['x1']
+        assert channel_index(CHANNEL)['playlists'] == []
+
+    def test_bluesky_index_resolves_authors(self):
+        """Test that posts referencing the author table get their author inlined"""
+        bluesky = {
+            'last_updated': '2025-07-20T02:39:42+00:00',
+            'authors': {DID: AUTHOR, 'did:plc:reply': {'handle': 'reply.bsky.social', 'display_name': 'Reply'}},
+            'posts': [{
+                'uri': 'at://post/1',
+                'text': 'Hello',
+                'created_at': '2025-07-18T20:31:22.785Z',
+                'author': DID,
+                'thread': {'replies': [{'uri': 'at://post/2', 'author': 'did:plc:reply', 'replies': []}]}
+            }, {
+                'uri': 'at://post/0',
+                'text': 'Inline author',
+                'created_at': '2025-07-17T20:31:22.785Z',
+                'author': AUTHOR
+            }]
+        }
+
+        index = bluesky_index(bluesky)
+        assert index['updated_date'] == 'Jul 20, 2025'
+        assert index['profile_url'] == 'https://bsky.app/profile/test.bsky.social'
+        assert index['posts'][0]['author'] == AUTHOR
+        assert index['posts'][0]['date_short'] == 'Jul 18, 2025'
+        assert index['posts'][0]['thread']['replies'][0]['author']['display_name'] == 'Reply'
+        assert index['posts'][1]['author'] == AUTHOR
+        assert bluesky['posts'][0]['author'] == DID
+
+    def test_latest_and_activity_are_merged_newest_first(self):
+        """Test that videos across channels and posts are sorted by time"""
+        other = {'channel_id': 'UC2', 'channel_title': 'Two', 'channel_slug': 'two',
+                 'videos': [video('w1', '2025-02-01T00:00:00Z')]}
+        channels = [channel_index(CHANNEL), channel_index(other)]
+        bluesky = bluesky_index({'posts': [{
+            'uri': 'at://post/1', 'text': 'Post', 'url': 'https://bsky.app/post/1',
+            'created_at': '2025-02-10T00:00:00.000Z', 'author': AUTHOR
+        }]})
+
+        latest = latest_videos(channels, limit=3)
+        assert [(v['id'], v['channel_slug']) for v in latest] == [('v3', 'channel-one'), ('w1', 'two'),
+                                                                   ('v2', 'channel-one')]
+
+        timeline = activity_timeline(channels, bluesky, limit=3)
+        assert [(item['type'], item['title']) for item in timeline] == [
+            ('video', 'Video v3'), ('post', 'Post'), ('video', 'Video w1')
+        ]
+        assert timeline[0]['source_url'] == '/youtube/channel-one/'
+        assert timeline[1]['source'] == '@test.bsky.social'
+
+    def test_write_indexes(self):
+        """Test that every index file is written under data/indexes"""
+        self.write_data(bluesky={'posts': [{'uri': 'at://post/1', 'text': 'Post', 'author': AUTHOR,
+                                            'created_at': '2025-04-01T00:00:00Z'}]})
+
+        with patch('builtins.print'):
+            assert write_indexes() == 5
+
+        assert self.read_index('channels/UC1.json')['video_count'] == 3
+        assert [v['id'] for v in self.read_index('latest.json')['videos']] == ['v3', 'v2', 'v1']
+        assert self.read_index('bluesky.json')['posts'][0]['date_short'] == 'Apr 1, 2025'
+        assert self.read_index('activity.json')['items'][0]['type'] == 'post'
+
+        # Unchanged data rewrites nothing
+        assert write_indexes() == 0
+
+    def test_write_indexes_reads_playlists(self):
+        """Test that a channel's playlist file is folded into its index"""
+        self.write_data()
+        Path('data/youtube_playlists').mkdir()
+        with open('data/youtube_playlists/UC1.json', 'w') as f:
+            json.dump({'playlists': [{'id': 'PL1', 'title': 'Series', 'video_ids': ['v1']}], 'videos': {}}, f)
+
+        write_indexes()
+
+        assert self.read_index('channels/UC1.json')['playlists'][0]['videos'] == [2]
+
+    def test_write_indexes_removes_deleted_channels(self):
+        """Test that a channel whose data file is gone loses its index"""
+        other = dict(CHANNEL, channel_id='UC2')
+        self.write_data(channels=[CHANNEL, other])
+        write_indexes()
+        assert Path('data/indexes/channels/UC2.json').exists()
+
+        os.remove('data/youtube/UC2.json')
+        write_indexes()
+        assert not Path('data/indexes/channels/UC2.json').exists()
+        assert self.read_index('bluesky.json')['posts'] == []
+
+    def test_write_indexes_skips_unreadable_files(self):
+        """Test that a corrupt data file is reported and skipped"""
+        self.write_data()
+        with open('data/youtube/UC9.json', 'w') as f:
+            f.write('{not json')
+
+        with patch('builtins.print') as mock_print:
+            write_indexes()
+
+        assert 'UC9.json' in mock_print.call_args[0][0]
+        assert [p.name for p in Path('data/indexes/channels').iterdir()] == ['UC1.json']
+
+    def test_main(self):
+        """Test the command line entry point"""
+        self.write_data()
+        with patch('builtins.print') as mock_print:
+            listing_indexes.main(['--data-dir', 'data'])
+
+        assert Path('data/indexes/latest.json').exists()
+        assert '5 changed' in mock_print.call_args[0][0]
@@ -0,0 +1,182 @@
+"""Tests for the SQLite local store"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+import last_known_good
+import local_store
+from fetch_bluesky_data import BlueskyFetcher
+from local_store import LocalStore
+
+ALICE = 'did:plc:alice'
+BOB = 'did:plc:bob'
+
+
+def video(video_id, published_at, **extra):
+    return dict({
+        'id': video_id,
+        'title': f'Video {video_id}',
+        'description': 'Description',
+        'published_at': published_at,
+        'thumbnail': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg',
+        'url': f'https://www.youtube.com/watch?v={video_id}',
+        'is_live_stream': False,
+        'live_status': None
+    }, **extra)
+
+
+def post(did, rkey, created_at, **extra):
+    return dict({
+        'uri': f'at://{did}/app.bsky.feed.post/{rkey}',
+        'cid': f'cid-{rkey}',
+        'text': f'Post {rkey}',
+        'html': f'Post {rkey}',
+        'created_at': created_at,
+        'author': {'handle': f'{did[8:]}.bsky.social', 'display_name': did[8:].title(), 'avatar': None},
+        'like_count': 1,
+        'repost_count': 0,
+        'reply_count': 0,
+        'url': f'https://bsky.app/profile/{did[8:]}.bsky.social/post/{rkey}',
+        'links': [],
+        'mentions': []
+    }, **extra)
+
+
+class TestLocalStore:
+    """Test cases for the local store"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        self.store = LocalStore('.cache/store.sqlite3')
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        self.store.close()
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_channel_round_trip(self):
+        """Test that a channel projects back to the data file shape, newest first"""
+        channel = {
+            'channel_title': 'Test Channel',
+            'channel_id': 'UC1',
+            'videos': [video('b', '2024-02-01T00:00:00Z', duration='PT1M'), video('a', '2024-01-01T00:00:00Z')],
+            'channel_slug': 'test-channel',
+            'fetched_at': '2024-02-02T00:00:00+00:00'
+        }
+        self.store.upsert_channel(channel)
+
+        assert self.store.channel_data('UC1') == channel
+        assert self.store.channel_data('UCmissing') is None
+
+    def test_videos_missing_from_latest_fetch_are_unlisted(self):
+        """Test that a video dropped from the uploads list leaves the data file but not the store"""
+        self.store.upsert_channel({'channel_title': 'T', 'channel_id': 'UC1', 'channel_slug': 't',
+                                   'videos': [video('a', '2024-01-01'), video('b', '2024-01-02')]})
+        self.store.upsert_channel({'channel_title': 'Renamed', 'channel_id': 'UC1',
+                                   'videos': [video('b', '2024-01-02')]})
+
+        data = self.store.channel_data('UC1')
+        assert [v['id'] for v in data['videos']] == ['b']
+        assert data['channel_title'] == 'Renamed'
+        assert data['channel_slug'] == 't'
+        assert 'fetched_at' not in data
+        assert self.store.db.execute('SELECT COUNT(*) FROM videos').fetchone()[0] == 2
+
+    def test_bluesky_projection_embeds_authors(self):
+        """Test the data/bluesky.json shape with embedded author dicts"""
+        embed = {'type': 'Main', 'data': {'uri': 'https://example.com', 'title': 'Example'}}
+        posts = [post(ALICE, '2', '2024-01-02T00:00:00Z', embed=embed), post(BOB, '1', '2024-01-01T00:00:00Z')]
+        self.store.upsert_posts(posts)
+
+        data = self.store.bluesky_data([p['uri'] for p in posts])
+        assert data['posts'] == posts
+        assert data['post_count'] == 2
+        assert 'authors' not in data
+
+    def test_bluesky_projection_author_table_and_thread_authors(self):
+        """Test that referenced authors are listed once by DID"""
+        reply = {'uri': f'at://{BOB}/app.bsky.feed.post/r', 'author': BOB, 'replies': []}
+        first = post(ALICE, '1', '2024-01-01T00:00:00Z', thread={'replies': [reply]})
+        self.store.upsert_posts([first, post(ALICE, '2', '2024-01-02T00:00:00Z')],
+                                authors={BOB: {'handle': 'bob.bsky.social', 'display_name': 'Bob', 'avatar': None}})
+
+        data = self.store.bluesky_data(limit=10)
+        assert [p['uri'].rsplit('/', 1)[1] for p in data['posts']] == ['2', '1']
+        assert data['posts'][1]['thread'] == {'replies': [reply]}
+        assert list(data['authors']) == [BOB]
+
+        data = self.store.bluesky_data(limit=1, author_table=True)
+        assert data['posts'][0]['author'] == ALICE
+        assert list(data['authors']) == [ALICE]
+
+    def test_upsert_updates_counts_and_removes_embed(self):
+        """Test that re-fetching a post replaces its counts and embed"""
+        self.store.upsert_posts([post(ALICE, '1', '2024-01-01', embed={'type': 'Main', 'data': {}})])
+        self.store.upsert_posts([post(ALICE, '1', '2024-01-01', like_count=5)])
+
+        stored = self.store.posts(limit=10)
+        assert stored[0]['like_count'] == 5
+        assert 'embed' not in stored[0]
+
+    def test_author_referenced_by_unknown_did(self):
+        """Test that a post by an author missing from the table still exports"""
+        self.store.upsert_posts([post(ALICE, '1', '2024-01-01', author=BOB)])
+        assert self.store.bluesky_data(limit=1)['posts'][0]['author'] == {'handle': BOB}
+
+    def test_newer_schema_rejected(self):
+        """Test that a store written by a newer version is not silently reused"""
+        self.store.db.execute(f'PRAGMA user_version={local_store.SCHEMA_VERSION + 1}')
+        with pytest.raises(ValueError):
+            LocalStore('.cache/store.sqlite3')
+
+    def test_open_store(self):
+        """Test that the store is opt-in and its path configurable"""
+        assert local_store.open_store({}) is None
+        with local_store.open_store({'store': {'path': 'other/store.sqlite3'}}) as store:
+            assert store.path.name == 'store.sqlite3'
+        assert os.path.exists('other/store.sqlite3')
+
+    def test_cli_export(self):
+        """Test regenerating both data files from the store"""
+        self.store.upsert_channel({'channel_title': 'T', 'channel_id': 'UC1', 'channel_slug': 't',
+                                   'videos': [video('a', '2024-01-01')]})
+        self.store.upsert_posts([post(ALICE, '1', '2024-01-01'), post(ALICE, '2', '2024-01-02')])
+
+        with patch('builtins.print'):
+            local_store.main(['export', 'youtube'])
+            local_store.main(['export', 'bluesky', '--limit', '1', '--author-table'])
+
+        with open('data/youtube/UC1.json') as f:
+            assert json.load(f)['videos'][0]['id'] == 'a'
+        with open('data/bluesky.json') as f:
+            data = json.load(f)
+        assert data['post_count'] == 1
+        assert data['authors'][ALICE]['handle'] == 'alice.bsky.social'
+        assert os.path.exists('content/youtube/t/_index.md')
+        assert last_known_good.snapshot_path('data/youtube/UC1.json').exists()
+        assert last_known_good.snapshot_path('data/bluesky.json').exists()
+        with open('.cache/changes.json') as f:
+            assert [change['id'] for change in json.load(f)['posts']['added']] == [f'at://{ALICE}/app.bsky.feed.post/2']
+
+    def test_cli_export_empty(self):
+        """Test that an empty store does not overwrite the data file"""
+        with patch('builtins.print'):
+            assert local_store.export_bluesky(self.store, BlueskyFetcher(None, None)) == 0
+        assert not os.path.exists('data/bluesky.json')
+
+    def test_concurrent_connections(self):
+        """Test that a second connection sees committed writes"""
+        self.store.upsert_authors({ALICE: {'handle': 'alice.bsky.social'}})
+        other = sqlite3.connect('.cache/store.sqlite3')
+        assert other.execute('SELECT handle FROM authors').fetchone() == ('alice.bsky.social',)
+        other.close()
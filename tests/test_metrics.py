@@ -0,0 +1,87 @@
+"""Tests for run metrics"""
+
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from metrics import Metrics
+
+
+class TestMetrics:
+    """Test cases for the metrics registry"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.test_dir = tempfile.mkdtemp()
+        self.metrics = Metrics()
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_api_call_counts_by_status(self):
+        """Test that API calls are counted as ok or error and timed"""
+        with self.metrics.api_call('youtube', 'videos', source='UC1'):
+            pass
+        with pytest.raises(RuntimeError):
+            with self.metrics.api_call('youtube', 'videos', source='UC1'):
+                raise RuntimeError("quota exceeded")
+
+        series = {(m['name'], m['labels'].get('status')): m for m in self.metrics.to_dict()}
+        assert series[('fetch_api_requests_total', 'ok')]['value'] == 1
+        assert series[('fetch_api_requests_total', 'error')]['value'] == 1
+        assert series[('fetch_api_requests_total', 'ok')]['labels'] == {
+            'provider': 'youtube', 'endpoint': 'videos', 'source': 'UC1', 'status': 'ok'
+        }
+        assert series[('fetch_api_request_duration_seconds', None)]['count'] == 2
+
+    def test_write_file_tracks_changes(self):
+        """Test that rewriting identical content is not counted as a change"""
+        path = os.path.join(self.test_dir, 'data.json')
+        assert self.metrics.write_file(path, '{"a": 1}', 'bluesky') is True
+        assert self.metrics.write_file(path, '{"a": 1}', 'bluesky') is False
+        assert self.metrics.write_file(path, '{"a": 2}', 'bluesky') is True
+
+        values = {m['name']: m.get('value') for m in self.metrics.to_dict()}
+        assert values['fetch_files_written_total'] == 3
+        assert values['fetch_files_changed_total'] == 2
+        assert values['fetch_bytes_written_total'] == 24
+
+    def test_write_file_is_atomic(self):
+        """Test that a failed write keeps the old file and leaves no temporary file behind"""
+        path = os.path.join(self.test_dir, 'data.json')
+        self.metrics.write_file(path, '{"a": 1}', 'bluesky')
+
+        with patch('os.replace', side_effect=OSError("disk full")), pytest.raises(OSError):
+            self.metrics.write_file(path, '{"a": 2}', 'bluesky')
+
+        with open(path) as f:
+            assert f.read() == '{"a": 1}'
+        assert os.listdir(self.test_dir) == ['data.json']
+
+    def test_metric_type_conflict(self):
+        """Test that one name cannot be used as two metric types"""
+        self.metrics.increment('fetch_items_total', provider='youtube')
+        with pytest.raises(ValueError):
+            self.metrics.set_gauge('fetch_items_total', 1)
+
+    def test_prometheus_text(self):
+        """Test the text exposition format, including summaries and label escaping"""
+        self.metrics.increment('fetch_items_total', 5, provider='bluesky', source='me "quoted"')
+        self.metrics.observe('fetch_write_duration_seconds', 0.25, provider='bluesky')
+        path = os.path.join(self.test_dir, 'textfile', 'fetch.prom')
+        self.metrics.write_prometheus(path)
+
+        with open(path) as f:
+            text = f.read()
+        assert text == (
+            '# TYPE fetch_items_total counter\n'
+            'fetch_items_total{provider="bluesky",source="me \\"quoted\\""} 5\n'
+            '# TYPE fetch_write_duration_seconds summary\n'
+            'fetch_write_duration_seconds_count{provider="bluesky"} 1\n'
+            'fetch_write_duration_seconds_sum{provider="bluesky"} 0.250000\n'
+        )
+        assert not os.path.exists(path + '.tmp')
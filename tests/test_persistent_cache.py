@@ -0,0 +1,90 @@
+"""Tests for the persistent LRU cache"""
+
+import json
+import os
+import shutil
+import tempfile
+
+from persistent_cache import PersistentLRUCache
+
+
+class TestPersistentLRUCache:
+    """Test cases for PersistentLRUCache"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.test_dir, 'cache', 'entries.json')
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_get_and_set(self):
+        """Test basic storage, hit and miss counting"""
+        cache = PersistentLRUCache(self.cache_file)
+        assert cache.get('missing') is None
+        assert cache.get('missing', 'default') == 'default'
+
+        cache.set('a', {'value': 1})
+        assert cache.get('a') == {'value': 1}
+        assert 'a' in cache
+        assert len(cache) == 1
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_values_are_copied(self):
+        """Test that callers cannot mutate cached values"""
+        cache = PersistentLRUCache(self.cache_file)
+        value = {'items': [1]}
+        cache.set('a', value)
+        value['items'].append(2)
+        cache.get('a')['items'].append(3)
+
+        assert cache.get('a') == {'items': [1]}
+
+    def test_least_recently_used_evicted(self):
+        """Test that the least recently used entry is evicted at capacity"""
+        cache = PersistentLRUCache(self.cache_file, max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert 'c' in cache
+
+    def test_persisted_between_instances(self):
+        """Test that entries and their recency order survive a save and reload"""
+        cache = PersistentLRUCache(self.cache_file, max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.save()
+
+        reloaded = PersistentLRUCache(self.cache_file, max_entries=2)
+        reloaded.set('c', 3)
+        assert reloaded.get('a') == 1
+        assert 'b' not in reloaded
+
+    def test_save_skipped_when_unchanged(self):
+        """Test that an unchanged cache does not write a file"""
+        cache = PersistentLRUCache(self.cache_file)
+        cache.get('missing')
+        cache.save()
+
+        assert not os.path.exists(self.cache_file)
+
+    def test_corrupt_file_starts_empty(self):
+        """Test that an unreadable cache file is treated as empty"""
+        os.makedirs(os.path.dirname(self.cache_file))
+        with open(self.cache_file, 'w') as f:
+            f.write('{not json')
+
+        cache = PersistentLRUCache(self.cache_file)
+        assert len(cache) == 0
+        cache.set('a', 1)
+        cache.save()
+
+        with open(self.cache_file) as f:
+            assert json.load(f) == {'entries': [['a', 1]]}
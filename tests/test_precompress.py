@@ -0,0 +1,149 @@
+"""Tests for precompression of the built site"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import brotli
+import pytest
+
+import precompress
+
+PAGE = '<html><body>' + '<p>Hello, world!</p>' * 100 + '</body></html>'
+
+
+class TestPrecompress:
+    """Test cases for precompress"""
+
+    def setup_method(self):
+        """Set up a built site in a temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        self.write_site(css='body { color: red; }\n' * 50)
+        self.write('tiny.js', 'x=1')
+        self.write('images/logo.png', os.urandom(2048))
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = Path('public') / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        path.write_bytes(content)
+
+    def test_writes_gzip_and_brotli_siblings(self):
+        """Test that compressible files get decodable variants and others are left alone"""
+        report = precompress.precompress('public', workers=2)
+
+        assert gzip.decompress(Path('public/index.html.gz').read_bytes()).decode() == PAGE
+        assert brotli.decompress(Path('public/index.html.br').read_bytes()).decode() == PAGE
+        assert not Path('public/tiny.js.gz').exists()
+        assert not Path('public/images/logo.png.gz').exists()
+        assert sorted(report['files']) == ['css/main.css', 'data.json', 'index.html']
+        page = report['files']['index.html']
+        assert page['size'] == len(PAGE) and page['gzip'] < page['size'] and page['cached'] is False
+        assert report['totals']['gzip_saved'] > 0
+
+    def test_gzip_output_is_deterministic(self):
+        """Test that unchanged files produce byte-identical variants"""
+        precompress.precompress('public', workers=1, use_brotli=False)
+        first = Path('public/index.html.gz').read_bytes()
+        shutil.rmtree('.cache')
+        precompress.precompress('public', workers=1, use_brotli=False)
+        assert Path('public/index.html.gz').read_bytes() == first
+
+    def test_unchanged_files_come_from_cache(self):
+        """Test that a rebuilt site only compresses files whose content changed"""
+        precompress.precompress('public', workers=2)
+        shutil.rmtree('public')
+        self.write_site(css='body { color: blue; }\n' * 50)
+
+        report = precompress.precompress('public', workers=2)
+
+        assert report['totals']['compressed'] == 1
+        assert report['files']['index.html']['cached'] is True
+        assert report['files']['css/main.css']['cached'] is False
+        assert gzip.decompress(Path('public/index.html.gz').read_bytes()).decode() == PAGE
+        # The old main.css variants are pruned from the cache
+        with open('.cache/precompress/index.json') as f:
+            assert len(json.load(f)) == 3
+
+    def test_cached_output_reused(self):
+        """Test that a file whose hash is cached gets the cached bytes without compressing again"""
+        precompress.precompress('public', workers=1)
+        digest = precompress.hash_file('public/index.html')
+        cached = gzip.compress(b'from the cache', mtime=0)
+        Path(f'.cache/precompress/{digest}.gz').write_bytes(cached)
+        shutil.rmtree('public')
+        self.write_site(css='body { color: red; }\n' * 50)
+
+        report = precompress.precompress('public', workers=1)
+
+        assert report['totals']['compressed'] == 0
+        assert all(record['cached'] for record in report['files'].values())
+        assert Path('public/index.html.gz').read_bytes() == cached
+
+    def test_stale_output_regenerated(self):
+        """Test that variants left from an earlier build, or missing from the cache, are compressed again"""
+        precompress.precompress('public', workers=1)
+        changed = PAGE.replace('Hello', 'Goodbye')
+        self.write('index.html', changed)
+        # The cache index still lists data.json, but its blobs are gone
+        for blob in Path('.cache/precompress').glob(f"{precompress.hash_file('public/data.json')}.*"):
+            blob.unlink()
+
+        report = precompress.precompress('public', workers=1)
+
+        assert report['totals']['compressed'] == 2
+        assert report['files']['data.json']['cached'] is False
+        assert gzip.decompress(Path('public/index.html.gz').read_bytes()).decode() == changed
+        assert brotli.decompress(Path('public/index.html.br').read_bytes()).decode() == changed
+        assert json.loads(gzip.decompress(Path('public/data.json.gz').read_bytes()))[0]['id'] == 0
+
+    def test_hash_and_compress_in_process(self):
+        """Test the worker functions directly, hashing in chunks smaller than the file"""
+        with patch.object(precompress, 'HASH_CHUNK_SIZE', 100):
+            digest = precompress.hash_file('public/index.html')
+        assert digest == hashlib.sha256(PAGE.encode('utf-8')).hexdigest()
+
+        os.makedirs('cache')
+        sizes = precompress.compress_file('public/index.html', 'cache', use_brotli=True)
+        assert sizes == {'gzip': len(Path(f'cache/{digest}.gz').read_bytes()),
+                         'br': len(Path(f'cache/{digest}.br').read_bytes())}
+        self.write('noise.txt', os.urandom(4096))
+        assert precompress.compress_file('public/noise.txt', 'cache', use_brotli=False) == {'gzip': None}
+        assert not list(Path('cache').glob('*.tmp'))
+
+    def write_site(self, css):
+        self.write('index.html', PAGE)
+        self.write('css/main.css', css)
+        self.write('data.json', json.dumps([{'id': i, 'title': f'Video {i}'} for i in range(30)]))
+
+    def test_incompressible_variant_removed(self):
+        """Test that a variant that saves too little is not written"""
+        self.write('noise.txt', os.urandom(4096))
+        precompress.precompress('public', workers=1, use_brotli=False)
+        assert not Path('public/noise.txt.gz').exists()
+
+    def test_main_writes_report(self):
+        """Test the command line entry point"""
+        with patch('builtins.print') as mock_print:
+            precompress.main(['public', '--no-brotli', '--workers', '1'])
+        with open('.cache/precompress-report.json') as f:
+            report = json.load(f)
+        assert 'br' not in report['totals']
+        assert not Path('public/index.html.br').exists()
+        mock_print.assert_any_call("Precompressed 3 files (3 compressed, 0 from cache)")
+
+        with pytest.raises(SystemExit), patch('builtins.print'):
+            precompress.main(['missing'])
@@ -0,0 +1,126 @@
+"""Tests for fetch run profiling"""
+
+import argparse
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+import profiling
+
+
+def build_strings(count):
+    return [str(i) * 50 for i in range(count)]
+
+
+class TestProfiling:
+    """Test cases for the stage profiler"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.test_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_stage_records_functions_and_allocations(self):
+        """Test that a stage dumps cProfile stats and lists its allocations"""
+        profiler = profiling.Profiler(self.test_dir, top=5)
+        with profiler.stage('youtube'):
+            kept = build_strings(2000)
+
+        stage = profiler.stages['youtube']
+        assert any('build_strings' in entry['function'] for entry in stage['functions'])
+        assert len(stage['functions']) <= 5
+        assert stage['allocations'][0]['location'].startswith('test_profiling.py:')
+        assert stage['peak_memory_bytes'] > 0
+        assert pstats.Stats(stage['prof_file']).total_calls > 0
+        assert len(kept) == 2000
+
+    def test_stage_recorded_when_block_raises(self):
+        """Test that a failing stage is still profiled"""
+        profiler = profiling.Profiler(self.test_dir)
+        with pytest.raises(RuntimeError):
+            with profiler.stage('bluesky'):
+                raise RuntimeError("boom")
+        assert 'bluesky' in profiler.stages
+
+    def test_save_and_print_summary(self):
+        """Test the JSON summary and the printed top-N table"""
+        profiler = profiling.Profiler(self.test_dir, top=3)
+        with profiler.stage('youtube'):
+            build_strings(10)
+        summary_file = profiler.save()
+
+        with open(summary_file) as f:
+            assert list(json.load(f)) == ['youtube']
+        with patch('builtins.print') as mock_print:
+            profiler.print_summary()
+        output = '\n'.join(str(call.args[0]) for call in mock_print.call_args_list)
+        assert 'Profile: youtube' in output
+
+        profiler.top = 0
+        with patch('builtins.print') as mock_print:
+            profiler.print_summary()
+        mock_print.assert_not_called()
+
+    def test_profiled_is_a_no_op_without_flag(self):
+        """Test that entry points run unprofiled unless --profile is given"""
+        parser = argparse.ArgumentParser()
+        profiling.add_arguments(parser)
+
+        with profiling.profiled(parser.parse_args([]), 'youtube', self.test_dir):
+            pass
+        assert not os.listdir(self.test_dir)
+
+        with patch('builtins.print'):
+            with profiling.profiled(parser.parse_args(['--profile', '--profile-top', '2']), 'youtube', self.test_dir):
+                build_strings(10)
+        assert sorted(os.listdir(self.test_dir)) == ['profile.json', 'youtube.prof']
+
+    def test_nested_stages_are_profiled_separately(self):
+        """Test that a stage inside another gets its own accumulated profile"""
+        profiler = profiling.Profiler(self.test_dir, top=20)
+        with profiler.stage('youtube'):
+            assert profiling.current is profiler
+            for _ in range(2):
+                with profiling.stage(profiling.current, 'generate_hugo_content'):
+                    build_strings(10)
+                    with profiling.stage(profiling.current, 'generate_hugo_content'):
+                        pass
+        assert profiling.current is None
+
+        assert list(profiler.stages) == ['youtube', 'generate_hugo_content']
+        nested = profiler.stages['generate_hugo_content']
+        assert nested['nested_in'] == 'youtube'
+        assert nested['calls'] == 2
+        assert any('build_strings' in entry['function'] for entry in nested['functions'])
+        assert not any('build_strings' in entry['function'] for entry in profiler.stages['youtube']['functions'])
+        assert pstats.Stats(nested['prof_file']).total_calls > 0
+
+        with patch('builtins.print') as mock_print:
+            profiler.print_summary()
+        output = '\n'.join(str(call.args[0]) for call in mock_print.call_args_list)
+        assert 'Profile: generate_hugo_content in youtube' in output
+
+    def test_executor_runs_inline_while_profiling(self):
+        """Test that worker pool tasks run in the profiled thread"""
+        with profiling.executor(2) as executor:
+            assert isinstance(executor, ThreadPoolExecutor)
+
+        profiler = profiling.Profiler(self.test_dir)
+        with profiler.stage('bluesky'):
+            with profiling.executor(4) as executor:
+                assert isinstance(executor, profiling.InlineExecutor)
+                assert executor.submit(threading.get_ident).result() == threading.get_ident()
+                assert list(executor.map(len, ['a', 'bc'])) == [1, 2]
+                failed = executor.submit(int, 'x')
+        with pytest.raises(ValueError):
+            failed.result()
@@ -0,0 +1,279 @@
+"""Tests for the long-running scheduler"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+import scheduler
+from change_feed import FEED as changes
+from fetch_youtube_data import YouTubeFetcher
+from scheduler import Job, Scheduler, build_jobs
+
+
+class FakeProvider:
+    """Provider whose fetch blocks until released and can record a change"""
+
+    name = 'fake'
+    deadline = 10
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.changed = False
+        self.error = None
+
+    def load_config(self):
+        return {'option': 1}
+
+    def fetch(self, config):
+        self.calls.append(('fetch', config))
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        if self.changed:
+            changes.compare('videos', 'data/youtube/UC1.json', [{'id': 'v1'}], 'id', 'youtube')
+        return {'items': 1}
+
+    def refresh_live(self, config):
+        self.calls.append(('refresh_live', config))
+        return {'items': 0}
+
+
+def wait_idle(jobs):
+    for job in jobs:
+        if job.thread:
+            job.thread.join(5)
+
+
+class TestScheduler:
+    """Test cases for the scheduler"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        changes.start()
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        changes.active = False
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_jobs_run_on_their_own_intervals(self):
+        """Test that each job runs when due and is rescheduled by its interval"""
+        provider, other = FakeProvider(), FakeProvider()
+        fast = Job('fast', provider, 'refresh_live', 10)
+        slow = Job('slow', other, 'fetch', 100)
+        runner = Scheduler([fast, slow], port=None)
+
+        with patch('builtins.print'):
+            start = fast.next_run
+            runner.tick(start)
+            wait_idle([fast, slow])
+            runner.tick(start + 5)
+            runner.tick(start + 10)
+            wait_idle([fast, slow])
+
+        assert [call[0] for call in provider.calls] == ['refresh_live', 'refresh_live']
+        assert other.calls == [('fetch', {'option': 1})]
+        assert fast.runs == 2
+        assert fast.last_result['status'] == 'ok'
+        assert fast.last_result['items'] == 0
+
+    def test_overlapping_jobs_are_coalesced(self):
+        """Test that a job due while its provider is busy waits and then runs once"""
+        provider = FakeProvider()
+        provider.release.clear()
+        full = Job('full', provider, 'fetch', 100)
+        live = Job('live', provider, 'refresh_live', 1)
+        runner = Scheduler([full, live], port=None)
+
+        with patch('builtins.print'):
+            start = full.next_run
+            runner.tick(start)
+            for offset in range(1, 5):
+                runner.tick(start + offset)
+            assert [call[0] for call in provider.calls] == ['fetch']
+            assert live.waiting and live.coalesced == 1
+
+            provider.release.set()
+            wait_idle([full])
+            runner.tick(start + 5)
+            wait_idle([live])
+
+        assert [call[0] for call in provider.calls] == ['fetch', 'refresh_live']
+        assert live.runs == 1
+        assert not live.waiting
+
+    def test_publish_only_after_changes(self):
+        """Test that indexes and publish commands run only when a job changed data"""
+        provider = FakeProvider()
+        job = Job('youtube', provider, 'fetch', 60)
+        runner = Scheduler([job], publish_commands=['hugo --minify', 'deploy now', 'never'], port=None)
+
+        with patch('builtins.print'), patch('listing_indexes.write_indexes') as mock_indexes, \
+                patch('search_index.update_index') as mock_search, \
+                patch.object(scheduler.subprocess, 'run') as mock_run:
+            mock_run.side_effect = [Mock(returncode=0), Mock(returncode=1)]
+            runner.tick(job.next_run)
+            wait_idle([job])
+            runner.tick(job.next_run - 1)
+            mock_run.assert_not_called()
+            mock_indexes.assert_not_called()
+
+            provider.changed = True
+            provider.release.clear()
+            runner.tick(job.next_run)
+            # Nothing is published while the job is still running
+            runner.tick(job.next_run - 1)
+            mock_indexes.assert_not_called()
+            provider.release.set()
+            wait_idle([job])
+            runner.tick(job.next_run - 1)
+
+        mock_indexes.assert_called_once_with()
+        assert mock_search.call_args[0][0]['videos']['added'][0]['id'] == 'v1'
+        assert [call[0][0] for call in mock_run.call_args_list] == [['hugo', '--minify'], ['deploy', 'now']]
+        assert runner.last_publish['status'] == 'error'
+        assert runner.last_publish['changes']['videos']['added'] == 1
+        with open('.cache/changes.json') as f:
+            assert json.load(f)['videos']['added'][0]['id'] == 'v1'
+        # The failed publish keeps its changes and reports the scheduler degraded
+        assert changes.summary()['videos']['added'] == 1
+        assert runner.status()['status'] == 'degraded'
+
+    def test_failed_publish_is_retried(self):
+        """Test that changes from a failed publish are published again after the retry delay"""
+        job = Job('youtube', FakeProvider(), 'fetch', 600)
+        runner = Scheduler([job], publish_commands=['hugo'], port=None)
+        changes.compare('videos', 'data/youtube/UC1.json', [{'id': 'v1'}], 'id', 'youtube')
+
+        with patch('builtins.print'), patch('listing_indexes.write_indexes'), \
+                patch('search_index.update_index') as mock_search, \
+                patch.object(scheduler.subprocess, 'run') as mock_run:
+            mock_run.side_effect = [Mock(returncode=1), Mock(returncode=0)]
+            # Well before the job is due, so only publishing happens
+            now = job.next_run - 2 * scheduler.PUBLISH_RETRY_SECONDS
+            runner.tick(now)
+            runner.tick(now + scheduler.PUBLISH_RETRY_SECONDS - 1)
+            assert mock_run.call_count == 1
+            runner.tick(now + scheduler.PUBLISH_RETRY_SECONDS)
+
+        assert mock_run.call_count == 2
+        assert mock_search.call_args[0][0]['videos']['added'][0]['id'] == 'v1'
+        assert runner.last_publish['status'] == 'ok'
+        assert runner.status()['status'] == 'ok'
+        # The feed starts over for the next batch
+        assert changes.summary()['videos']['added'] == 0
+        assert changes.active
+
+    def test_health_endpoint(self):
+        """Test the health and metrics endpoints over HTTP"""
+        provider = FakeProvider()
+        provider.error = RuntimeError("API down")
+        job = Job('youtube', provider, 'fetch', 60)
+        runner = Scheduler([job], host='127.0.0.1', port=0)
+        runner.start_health_server()
+        base = f"http://127.0.0.1:{runner.port}"
+        try:
+            with patch('builtins.print'), patch('traceback.print_exc'):
+                runner.tick(job.next_run)
+                wait_idle([job])
+
+            response = requests.get(f"{base}/health", timeout=5)
+            assert response.status_code == 200
+            status = response.json()
+            assert status['status'] == 'ok'
+            assert status['jobs']['youtube']['failures'] == 1
+            assert status['jobs']['youtube']['last_result']['error'] == 'API down'
+
+            # Unhealthy once it has not succeeded for three intervals plus the deadline
+            job.created -= 60 * 3 + provider.deadline + 1
+            response = requests.get(f"{base}/health", timeout=5)
+            assert response.status_code == 503
+            assert response.json()['status'] == 'degraded'
+
+            response = requests.get(f"{base}/metrics", timeout=5)
+            assert 'scheduler_job_runs_total{job="youtube",status="error"}' in response.text
+            assert requests.get(f"{base}/other", timeout=5).status_code == 404
+        finally:
+            runner.shutdown()
+
+    def test_run_until_stopped(self):
+        """Test that stopping waits for the running job and publishes its changes"""
+        provider = FakeProvider()
+        provider.changed = True
+        provider.release.clear()
+        job = Job('youtube', provider, 'fetch', 60)
+        runner = Scheduler([job], port=None, tick_seconds=0.01)
+
+        with patch('builtins.print'), patch('listing_indexes.write_indexes') as mock_indexes, \
+                patch('search_index.update_index'):
+            thread = threading.Thread(target=runner.run)
+            thread.start()
+            deadline = time.monotonic() + 5
+            while not provider.calls and time.monotonic() < deadline:
+                time.sleep(0.01)
+            runner.stop()
+            provider.release.set()
+            thread.join(5)
+
+        assert not thread.is_alive()
+        assert job.runs == 1
+        mock_indexes.assert_called_once_with()
+
+    def test_build_jobs(self):
+        """Test that providers are shared between jobs and missing ones skipped"""
+        Path('config').mkdir()
+        Path(YouTubeFetcher.config_file).write_text('channels: []\n')
+
+        with patch('builtins.print') as mock_print, patch.dict(os.environ, {'YOUTUBE_API_KEY': 'key'}):
+            jobs = build_jobs({'jobs': {'youtube': 600, 'bluesky': None, 'podcasts': 60}})
+
+        assert [(job.name, job.interval, job.method) for job in jobs] == [
+            ('youtube', 600, 'fetch'), ('youtube-live', 120, 'refresh_live')
+        ]
+        assert jobs[0].provider is jobs[1].provider
+        assert isinstance(jobs[0].provider.session, requests.Session)
+        assert "Unknown job 'podcasts'" in mock_print.call_args_list[0][0][0]
+
+        os.remove(YouTubeFetcher.config_file)
+        with patch('builtins.print') as mock_print:
+            assert build_jobs({}) == []
+        printed = [call[0][0] for call in mock_print.call_args_list]
+        assert 'Skipping youtube jobs: config/youtube-channels.yaml not found' in printed
+
+    def test_main(self):
+        """Test the command line entry point"""
+        Path('config').mkdir()
+        Path('config/scheduler.yaml').write_text(
+            'jobs:\n  youtube: 600\npublish_commands: [hugo]\nhealth:\n  port: 9999\n'
+        )
+        job = Job('youtube', FakeProvider(), 'fetch', 600)
+
+        with patch.object(scheduler, 'build_jobs', return_value=[job]) as mock_build, \
+                patch.object(scheduler, 'Scheduler') as mock_scheduler, \
+                patch.object(scheduler.signal, 'signal'):
+            scheduler.main(['--port', '0'])
+
+        assert mock_build.call_args[0][0]['jobs'] == {'youtube': 600}
+        args, kwargs = mock_scheduler.call_args
+        assert args == ([job],)
+        assert kwargs['publish_commands'] == ['hugo']
+        assert kwargs['port'] == 0
+        mock_scheduler.return_value.run.assert_called_once()
+
+        with patch.object(scheduler, 'build_jobs', return_value=[]), patch('builtins.print'), \
+                pytest.raises(SystemExit):
+            scheduler.main(['--config', 'missing.yaml'])
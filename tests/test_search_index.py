@@ -0,0 +1,217 @@
+"""Tests for the sharded client-side search index"""
+
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import search_index
+from search_index import decode_postings, encode_postings, shard_name, stem, tokenize, update_index
+
+AUTHOR = {'handle': 'test.bsky.social', 'display_name': 'Test User', 'avatar': None}
+
+
+def video(video_id, title, description=''):
+    return {
+        'id': video_id,
+        'title': title,
+        'description': description,
+        'published_at': '2025-01-15T10:00:00Z',
+        'url': f"https://www.youtube.com/watch?v={video_id}"
+    }
+
+
+class TestSearchIndex:
+    """Test cases for the search index"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        Path('data/youtube').mkdir(parents=True)
+        self.videos = [
+            video('v1', 'Flying the Boeing 777', 'Landing at https://example.com/kiad Dulles'),
+            video('v2', 'Airbus tutorials', 'Planes and flights')
+        ]
+        self.posts = [{'uri': 'at://post/1', 'text': 'Landed the 777 today', 'url': 'https://bsky.app/post/1',
+                       'created_at': '2025-02-01T00:00:00.000Z', 'author': 'did:plc:test'}]
+        self.write_data()
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def write_data(self):
+        with open('data/youtube/UC1.json', 'w') as f:
+            json.dump({'channel_id': 'UC1', 'channel_title': 'Channel One', 'videos': self.videos}, f)
+        with open('data/bluesky.json', 'w') as f:
+            json.dump({'authors': {'did:plc:test': AUTHOR}, 'posts': self.posts}, f)
+
+    def read(self, name):
+        with open(Path(search_index.SEARCH_DIR) / name) as f:
+            return json.load(f)
+
+    def lookup(self, term):
+        """Documents (as display fields) containing a term, with their weights"""
+        manifest = self.read('manifest.json')
+        shard = shard_name(term)
+        if shard not in manifest['shards']:
+            return {}
+        postings = decode_postings(self.read(f"terms/{shard}.json").get(term, []))
+        results = {}
+        for doc, weight in postings.items():
+            docs = self.read(f"docs/{doc // manifest['doc_shard_size']}.json")
+            results[docs[str(doc)][1]] = weight
+        return results
+
+    def test_stem(self):
+        """Test the plural and -ing/-ed rules"""
+        assert stem('flies') == 'fly'
+        assert stem('planes') == 'plane'
+        assert stem('flights') == 'flight'
+        assert stem('flying') == 'fly'
+        assert stem('landed') == 'land'
+        assert stem('bus') == 'bus'
+        assert stem('class') == 'class'
+        assert stem('sing') == 'sing'
+
+    def test_tokenize(self):
+        """Test that URLs, stopwords, punctuation and single characters are dropped"""
+        assert tokenize('The Boeing 777-200ER at https://example.com/a, a café!') == ['boe', '777', '200er', 'café']
+        assert tokenize(None) == []
+
+    def test_postings_round_trip(self):
+        """Test that postings are delta-encoded by document number"""
+        encoded = encode_postings({7: 1, 2: 3, 10: 2})
+        assert encoded == [2, 3, 5, 1, 3, 2]
+        assert decode_postings(encoded) == {2: 3, 7: 1, 10: 2}
+
+    def test_shard_name(self):
+        """Test that terms are sharded by their first two characters"""
+        assert shard_name('boeing') == 'bo'
+        assert shard_name('7') == '7'
+        assert shard_name('été') == '_'
+
+    def test_full_build(self):
+        """Test that the first run indexes every video and post"""
+        stats = update_index()
+
+        assert stats['rebuilt'] is True
+        assert stats['documents'] == 3
+        assert self.lookup('boe') == {'Flying the Boeing 777': 3}
+        assert self.lookup('777') == {'Flying the Boeing 777': 3, 'Landed the 777 today': 1}
+        assert self.lookup('land') == {'Flying the Boeing 777': 1, 'Landed the 777 today': 1}
+        assert self.lookup('example') == {}
+
+        docs = self.read('docs/0.json')
+        assert ['post', 'Landed the 777 today', 'https://bsky.app/post/1', '2025-02-01',
+                '@test.bsky.social'] in docs.values()
+        assert ['video', 'Airbus tutorials', 'https://www.youtube.com/watch?v=v2', '2025-01-15',
+                'Channel One'] in docs.values()
+
+    def test_update_from_change_feed(self):
+        """Test that only the items in the change feed are reindexed"""
+        update_index()
+        airbus_shard = Path(search_index.SEARCH_DIR) / 'terms' / 'ai.json'
+        os.utime(airbus_shard, (0, 0))
+
+        self.videos[0]['title'] = 'Flying the Airbus A350'
+        self.videos.append(video('v3', 'Cessna checkride'))
+        del self.posts[0]
+        self.write_data()
+        feed = {
+            'videos': {
+                'added': [{'id': 'v3', 'data_file': 'data/youtube/UC1.json'}],
+                'updated': [{'id': 'v1', 'data_file': 'data/youtube/UC1.json', 'fields': ['title']}],
+                'removed': []
+            },
+            'posts': {'added': [], 'updated': [],
+                      'removed': [{'id': 'at://post/1', 'data_file': 'data/bluesky.json'}]}
+        }
+
+        stats = update_index(feed)
+        assert stats['rebuilt'] is False
+        assert (stats['documents'], stats['indexed'], stats['removed']) == (3, 2, 1)
+        assert self.lookup('boe') == {}
+        assert self.lookup('airbus') == {'Airbus tutorials': 3, 'Flying the Airbus A350': 3}
+        assert self.lookup('cessna') == {'Cessna checkride': 3}
+        assert self.lookup('777') == {}
+        assert os.stat(airbus_shard).st_mtime > 0
+
+        # Untouched shards are not rewritten
+        dulles_shard = Path(search_index.SEARCH_DIR) / 'terms' / 'du.json'
+        os.utime(dulles_shard, (0, 0))
+        update_index({'videos': {'updated': [{'id': 'v3', 'data_file': 'data/youtube/UC1.json'}]}})
+        assert os.stat(dulles_shard).st_mtime == 0
+
+    def test_update_without_change_feed_compares_digests(self):
+        """Test that without a feed, changed documents are found by digest"""
+        update_index()
+        self.videos[1]['description'] = 'Now about gliders'
+        self.write_data()
+
+        stats = update_index()
+        assert stats['indexed'] == 1
+        assert stats['removed'] == 0
+        assert self.lookup('glider') == {'Airbus tutorials': 1}
+        assert self.lookup('plane') == {}
+
+        assert update_index()['shards_written'] == 0
+
+    def test_rebuild_when_state_does_not_match_shards(self):
+        """Test that a missing or mismatched state triggers a full rebuild"""
+        update_index()
+        os.remove(search_index.STATE_FILE)
+        assert update_index()['rebuilt'] is True
+
+        manifest = self.read('manifest.json')
+        manifest['build_id'] = 'other'
+        with open(Path(search_index.SEARCH_DIR) / 'manifest.json', 'w') as f:
+            json.dump(manifest, f)
+        stats = update_index({'videos': {}})
+        assert stats['rebuilt'] is True
+        assert stats['indexed'] == 3
+
+    def test_removing_every_document_deletes_shards(self):
+        """Test that empty shards are deleted and dropped from the manifest"""
+        update_index()
+        self.videos = []
+        self.posts = []
+        self.write_data()
+
+        stats = update_index()
+        assert stats['documents'] == 0
+        assert self.read('manifest.json')['shards'] == []
+        assert not list((Path(search_index.SEARCH_DIR) / 'terms').glob('*.json'))
+
+    def test_failed_write_keeps_previous_file(self):
+        """Test that a write failing partway leaves the old shard and no temporary file"""
+        update_index()
+        path = Path(search_index.SEARCH_DIR) / 'manifest.json'
+        before = path.read_text()
+
+        with pytest.raises(TypeError):
+            search_index.write_json(path, {'documents': 3, 'shards': object()})
+        assert path.read_text() == before
+        assert sorted(p.name for p in path.parent.iterdir() if p.is_file()) == ['manifest.json']
+
+    def test_main(self):
+        """Test the command line entry point with a change feed file"""
+        update_index()
+        with open('changes.json', 'w') as f:
+            json.dump({'videos': {'removed': [{'id': 'v2', 'data_file': 'data/youtube/UC1.json'}]}}, f)
+
+        with patch('builtins.print') as mock_print:
+            search_index.main(['--changes', 'changes.json'])
+        assert 'Updated search index: 2 documents (0 indexed, 1 removed)' in mock_print.call_args[0][0]
+
+        with patch('builtins.print') as mock_print:
+            search_index.main(['--changes', 'missing.json', '--rebuild'])
+        assert 'Could not read missing.json' in mock_print.call_args_list[0][0][0]
+        assert 'Rebuilt search index: 3 documents' in mock_print.call_args[0][0]
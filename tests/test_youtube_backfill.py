@@ -0,0 +1,244 @@
+"""Tests for the resumable YouTube backfill"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import requests
+
+import fetch_youtube_data
+import youtube_backfill
+from fetch_youtube_data import YouTubeFetcher
+from youtube_backfill import backfill_channel, backfill_channels, load_checkpoint, merge_history
+
+UPLOADS = [f"v{n:03d}" for n in range(119, -1, -1)]  # Newest first, like the uploads playlist
+
+
+def published(video_id):
+    day = int(video_id[1:])
+    return f"2020-{1 + day // 28:02d}-{1 + day % 28:02d}T12:00:00Z"
+
+
+class FakeYouTube:
+    """Stand-in for YouTubeFetcher.api_get serving a channel with 120 uploads in pages of 50"""
+
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    def __call__(self, endpoint, params, source=None):
+        self.calls.append((endpoint, dict(params)))
+        if self.fail_on and len(self.calls) == self.fail_on:
+            raise requests.HTTPError("403 quotaExceeded")
+        if endpoint == 'channels':
+            return {'items': [{'contentDetails': {'relatedPlaylists': {'uploads': 'UU1'}},
+                               'snippet': {'title': 'Channel One'}}]}
+        if endpoint == 'playlistItems':
+            start = int(params.get('pageToken', 'p0')[1:]) * 50
+            page = {'items': [{'snippet': {'resourceId': {'videoId': video_id}}}
+                              for video_id in UPLOADS[start:start + 50]]}
+            if start + 50 < len(UPLOADS):
+                page['nextPageToken'] = f"p{start // 50 + 1}"
+            return page
+        return {'items': [{
+            'id': video_id,
+            'snippet': {'title': f"Video {video_id}", 'description': '', 'publishedAt': published(video_id),
+                        'thumbnails': {'high': {'url': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"}}}
+        } for video_id in params['id'].split(',')]}
+
+    def endpoints(self):
+        return [endpoint for endpoint, _ in self.calls]
+
+
+class TestYouTubeBackfill:
+    """Test cases for the YouTube backfill"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        self.fetcher = YouTubeFetcher('test_api_key')
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def read_videos(self, channel_id='UC1'):
+        with open(f'data/youtube/{channel_id}.json') as f:
+            return [video['id'] for video in json.load(f)['videos']]
+
+    def backfill(self, youtube, **kwargs):
+        with patch.object(self.fetcher, 'api_get', youtube), patch('builtins.print'):
+            return backfill_channel(self.fetcher, 'UC1', 'channel-one', **kwargs)
+
+    def test_full_backfill(self):
+        """Test that every page is walked and the whole history written newest first"""
+        youtube = FakeYouTube()
+        result = self.backfill(youtube)
+
+        assert result['status'] == 'complete'
+        assert (result['videos'], result['pages'], result['quota_spent']) == (120, 3, 7)
+        assert youtube.endpoints() == ['channels'] + ['playlistItems', 'videos'] * 3
+        assert self.read_videos() == UPLOADS
+        assert Path('content/youtube/channel-one/_index.md').exists()
+
+        checkpoint = load_checkpoint('UC1')
+        assert checkpoint['completed_at'] is not None
+        assert checkpoint['page_token'] is None
+        assert len(checkpoint['fetched_ids']) == 120
+
+        # A completed backfill spends nothing
+        youtube = FakeYouTube()
+        assert self.backfill(youtube)['quota_spent'] == 0
+        assert youtube.calls == []
+
+    def test_budget_pauses_and_resumes(self):
+        """Test that a run stops at its budget and the next one continues from the page token"""
+        result = self.backfill(FakeYouTube(), quota_budget=3)
+        assert (result['status'], result['pages'], result['quota_spent']) == ('budget', 1, 3)
+        assert self.read_videos() == UPLOADS[:50]
+        assert load_checkpoint('UC1')['page_token'] == 'p1'
+
+        youtube = FakeYouTube()
+        result = self.backfill(youtube)
+        assert result['status'] == 'complete'
+        assert youtube.calls[0] == ('playlistItems', {'part': 'snippet', 'playlistId': 'UU1', 'maxResults': 50,
+                                                      'key': 'test_api_key', 'pageToken': 'p1'})
+        assert result['total_quota_spent'] == 7
+        assert self.read_videos() == UPLOADS
+
+    def test_deadline_and_errors_keep_the_checkpoint(self):
+        """Test that a passed deadline or an API error stops without losing progress"""
+        result = self.backfill(FakeYouTube(), deadline=time.monotonic() - 1)
+        assert (result['status'], result['quota_spent']) == ('deadline', 1)
+
+        # The second playlist page fails
+        result = self.backfill(FakeYouTube(fail_on=3))
+        assert result['status'] == 'error'
+        assert load_checkpoint('UC1')['page_token'] == 'p1'
+        assert self.read_videos() == UPLOADS[:50]
+
+        youtube = FakeYouTube()
+        assert self.backfill(youtube)['status'] == 'complete'
+        assert youtube.endpoints()[0] == 'playlistItems'
+
+    def test_interrupted_page_is_repeated_without_duplicates(self):
+        """Test that a crash between writing a page and saving its checkpoint is harmless"""
+        real_save = youtube_backfill.save_checkpoint
+        saves = []
+
+        def crash_on_second_save(checkpoint, checkpoint_dir):
+            saves.append(checkpoint['page_token'])
+            if len(saves) == 2:
+                raise RuntimeError("killed")
+            real_save(checkpoint, checkpoint_dir)
+
+        with patch.object(youtube_backfill, 'save_checkpoint', crash_on_second_save), pytest.raises(RuntimeError):
+            self.backfill(FakeYouTube())
+        assert self.read_videos() == UPLOADS[:50]
+        assert load_checkpoint('UC1')['page_token'] is None
+
+        youtube = FakeYouTube()
+        assert self.backfill(youtube)['status'] == 'complete'
+        assert 'pageToken' not in youtube.calls[0][1]
+        assert self.read_videos() == UPLOADS
+
+    def test_channel_not_found(self):
+        """Test that an unknown channel is reported as an error"""
+        youtube = FakeYouTube()
+        with patch.object(self.fetcher, 'api_get', return_value={'items': []}), patch('builtins.print'):
+            assert backfill_channel(self.fetcher, 'UC1', 'channel-one')['status'] == 'error'
+        assert self.backfill(youtube, quota_budget=0)['status'] == 'budget'
+        assert youtube.calls == []
+
+    def test_regular_fetch_copies_are_kept(self):
+        """Test that backfilled pages do not overwrite videos a regular fetch wrote"""
+        Path('data/youtube').mkdir(parents=True)
+        with open('data/youtube/UC1.json', 'w') as f:
+            json.dump({'channel_title': 'Renamed', 'channel_id': 'UC1', 'videos': [
+                {'id': 'v119', 'title': 'Edited title', 'published_at': published('v119')}
+            ]}, f)
+
+        self.backfill(FakeYouTube(), quota_budget=3)
+
+        with open('data/youtube/UC1.json') as f:
+            data = json.load(f)
+        assert data['channel_title'] == 'Renamed'
+        assert data['videos'][0]['title'] == 'Edited title'
+        assert len(data['videos']) == 50
+
+    def test_backfill_channels_shares_the_budget(self):
+        """Test that channels are backfilled in turn until the budget runs out"""
+        youtube = FakeYouTube()
+        with patch.object(self.fetcher, 'api_get', youtube), patch('builtins.print'):
+            results = backfill_channels(self.fetcher, [('UC1', 'one'), ('UC2', 'two'), ('UC3', 'three')],
+                                        quota_budget=10, deadline_seconds=None)
+
+        assert results['UC1']['status'] == 'complete'
+        assert (results['UC2']['status'], results['UC2']['quota_spent']) == ('budget', 3)
+        assert 'UC3' not in results
+
+    def test_merge_history(self):
+        """Test that older known videos are carried over and newer missing ones dropped"""
+        fetched = [{'id': 'c', 'published_at': '2025-03'}, {'id': 'b', 'published_at': '2025-02'}]
+        known = [{'id': 'x', 'published_at': '2025-04'}, {'id': 'b', 'published_at': '2025-02'},
+                 {'id': 'a', 'published_at': '2025-01'}]
+
+        assert [v['id'] for v in merge_history(fetched, known)] == ['c', 'b', 'a']
+        assert merge_history([], known) == known
+        assert merge_history(fetched, None) == fetched
+
+    def test_regular_fetch_keeps_history_when_configured(self):
+        """Test that fetch_channels carries the backfilled history over with a backfill section"""
+        with patch.object(self.fetcher, 'api_get', FakeYouTube()), patch('builtins.print'):
+            backfill_channel(self.fetcher, 'UC1', 'channel-one')
+        latest = {'channel_title': 'Channel One', 'channel_id': 'UC1', 'videos': [
+            {'id': 'new', 'title': 'New', 'published_at': '2021-01-01T00:00:00Z'},
+            {'id': 'v119', 'title': 'Video v119', 'published_at': published('v119')}
+        ]}
+        config = {'channels': [{'channel_id': 'UC1', 'name': 'Channel One'}]}
+
+        with patch.object(self.fetcher, 'get_channel_videos', side_effect=lambda *args: json.loads(json.dumps(latest))), \
+                patch('builtins.print'):
+            fetch_youtube_data.fetch_channels(self.fetcher, dict(config, backfill=True))
+            assert self.read_videos() == ['new'] + UPLOADS
+
+            fetch_youtube_data.fetch_channels(self.fetcher, config)
+            assert self.read_videos() == ['new', 'v119']
+
+    def test_main(self):
+        """Test the --backfill command line mode"""
+        Path('config').mkdir()
+        Path('config/youtube-channels.yaml').write_text(
+            'channels:\n  - channel_id: UC1\n    name: Channel One\nbackfill:\n  quota_budget: 3\n'
+        )
+
+        with patch.dict(os.environ, {'YOUTUBE_API_KEY': 'key'}), \
+                patch.object(YouTubeFetcher, 'api_get', side_effect=FakeYouTube()), \
+                patch('builtins.print') as mock_print:
+            fetch_youtube_data.main(['--backfill'])
+
+        assert self.read_videos() == UPLOADS[:50]
+        assert 'Backfill used 3 quota units; 0 of 1 channels complete' in mock_print.call_args[0][0]
+        assert Path('data/indexes/channels/UC1.json').exists()
+        with open('.cache/changes.json') as f:
+            assert len(json.load(f)['videos']['added']) == 50
+
+        Path('config/youtube-channels.yaml').write_text('channels:\n  - channel_id: UC1\n    name: Channel One\n')
+        with patch.dict(os.environ, {'YOUTUBE_API_KEY': 'key'}), \
+                patch.object(YouTubeFetcher, 'api_get', side_effect=FakeYouTube(fail_on=1)), \
+                patch('builtins.print') as mock_print, pytest.raises(SystemExit):
+            fetch_youtube_data.main(['--backfill', '--channel', 'UC1'])
+        printed = [call[0][0] for call in mock_print.call_args_list]
+        assert any('drops the backfilled history' in line for line in printed)
+
+        with patch.dict(os.environ, {'YOUTUBE_API_KEY': 'key'}), patch('builtins.print'), \
+                pytest.raises(SystemExit):
+            fetch_youtube_data.main(['--backfill', '--channel', 'UCunknown'])
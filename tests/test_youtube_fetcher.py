@@ -215,6 +215,8 @@ class TestYouTubeFetcherMethods(TestYouTubeFetcher):
         
         # Verify API calls
         self.assertEqual(mock_get.call_count, 3)
+        for call in mock_get.call_args_list:
+            self.assertEqual(call.kwargs['timeout'], fetch_youtube_data.REQUEST_TIMEOUT)
     
     @patch('fetch_youtube_data.requests.get')
     def test_get_channel_videos_duplicate_filtering(self, mock_get):
@@ -430,6 +432,18 @@ class TestContentGeneration(TestYouTubeFetcher):
         self.assertEqual(data['channel_slug'], 'test-channel')
         self.assertEqual(len(data['videos']), 1)
     
+    def test_generate_hugo_content_projects_from_store(self):
+        """Test that with a store the data file is built from the stored channel."""
+        self.fetcher.store = fetch_youtube_data.local_store.LocalStore('.cache/store.sqlite3')
+        self.fetcher.generate_hugo_content(self.create_test_channel_data(), 'content', 'test-channel')
+        self.fetcher.store.close()
+        
+        with open(Path('data') / 'youtube' / 'UCtest123.json') as f:
+            data = json.load(f)
+        self.assertEqual(data['channel_slug'], 'test-channel')
+        self.assertEqual(data['videos'][0]['id'], 'video1')
+        self.assertIn('fetched_at', data)
+    
     def test_generate_hugo_content_empty_videos(self):
         """Test content generation with empty video list."""
         channel_data = {
@@ -465,6 +479,469 @@ class TestContentGeneration(TestYouTubeFetcher):
         self.assertEqual(len(data['videos']), 1)
 
 
+FEED_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns:media="http://search.yahoo.com/mrss/"
+      xmlns="http://www.w3.org/2005/Atom">
+  <title>Test Channel</title>
+  <entry>
+    <id>yt:video:video3</id>
+    <yt:videoId>video3</yt:videoId>
+    <title>Brand New Video</title>
+    <media:group>
+      <media:title>Brand New Video</media:title>
+      <media:description>Just uploaded</media:description>
+    </media:group>
+  </entry>
+  <entry>
+    <id>yt:video:video1</id>
+    <yt:videoId>video1</yt:videoId>
+    <title>Renamed Video 1</title>
+    <media:group>
+      <media:description>Description 1</media:description>
+    </media:group>
+  </entry>
+</feed>
+"""
+
+
+class TestRssFastPath(TestYouTubeFetcher):
+    """Test the Atom feed fast path."""
+    
+    def setUp(self):
+        super().setUp()
+        self.fetcher.feed_cache = fetch_youtube_data.PersistentLRUCache(fetch_youtube_data.FEED_CACHE_FILE)
+        self.fetcher.feed_cache.set('UCtest123', {'full_fetch_at': datetime.now(timezone.utc).isoformat(),
+                                                  'etag': '"abc"'})
+        self.known = {
+            'channel_title': 'Test Channel',
+            'channel_id': 'UCtest123',
+            'videos': [
+                {'id': 'video1', 'title': 'Test Video 1', 'description': 'Description 1',
+                 'published_at': '2023-01-03T12:00:00Z', 'is_live_stream': False, 'live_status': None},
+                {'id': 'video2', 'title': 'Test Video 2', 'description': 'Description 2',
+                 'published_at': '2023-01-02T12:00:00Z', 'is_live_stream': False, 'live_status': None}
+            ]
+        }
+    
+    def feed_response(self, status_code=200, body=FEED_XML):
+        response = MagicMock(status_code=status_code, headers={'ETag': '"def"', 'Last-Modified': 'Mon, 01 Jan 2024'})
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [body[i:i + 100] for i in range(0, len(body), 100)]
+        return response
+    
+    def videos_response(self, items):
+        response = Mock(status_code=200)
+        response.json.return_value = {'items': items}
+        return response
+    
+    def test_parse_feed_streams_entries(self):
+        """Test that entries are read from chunked XML"""
+        entries = fetch_youtube_data.parse_feed([FEED_XML[i:i + 7] for i in range(0, len(FEED_XML), 7)])
+        self.assertEqual(entries, [
+            {'id': 'video3', 'title': 'Brand New Video', 'description': 'Just uploaded'},
+            {'id': 'video1', 'title': 'Renamed Video 1', 'description': 'Description 1'}
+        ])
+    
+    @patch('fetch_youtube_data.requests.get')
+    def test_not_modified_feed_uses_no_quota(self, mock_get):
+        """Test that a 304 feed returns the known videos without calling the API"""
+        mock_get.return_value = self.feed_response(304)
+        
+        with patch('builtins.print'):
+            result = self.fetcher.get_channel_updates('UCtest123', self.known)
+        
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(mock_get.call_args.args[0], fetch_youtube_data.FEED_URL)
+        self.assertEqual(mock_get.call_args.kwargs['headers'], {'If-None-Match': '"abc"'})
+        self.assertEqual(result['videos'], self.known['videos'])
+    
+    @patch('fetch_youtube_data.requests.get')
+    def test_new_feed_entries_fetch_only_unknown_videos(self, mock_get):
+        """Test that only videos missing from the known data are looked up"""
+        new_video = self.create_mock_videos_response()['items'][0]
+        new_video['id'] = 'video3'
+        mock_get.side_effect = [self.feed_response(), self.videos_response([new_video])]
+        
+        with patch('builtins.print'):
+            result = self.fetcher.get_channel_updates('UCtest123', self.known)
+        
+        self.assertEqual(mock_get.call_args.kwargs['params']['id'], 'video3')
+        self.assertEqual([v['id'] for v in result['videos']], ['video3', 'video1', 'video2'])
+        self.assertEqual(result['videos'][1]['title'], 'Renamed Video 1')
+        self.assertEqual(self.fetcher.feed_cache.get('UCtest123')['etag'], '"def"')
+    
+    @patch('fetch_youtube_data.requests.get')
+    def test_live_streams_are_refreshed(self, mock_get):
+        """Test that known live or upcoming streams are looked up even if the feed is unchanged"""
+        self.known['videos'][0].update(is_live_stream=True, live_status='upcoming')
+        live = self.create_mock_videos_response(include_live_stream=True, live_status='live')['items'][-1]
+        live['id'] = 'video1'
+        mock_get.side_effect = [self.feed_response(304), self.videos_response([live])]
+        
+        with patch('builtins.print'):
+            result = self.fetcher.get_channel_updates('UCtest123', self.known)
+        
+        self.assertEqual(mock_get.call_args.kwargs['params']['id'], 'video1')
+        self.assertEqual(result['videos'][0]['live_status'], 'live')
+    
+    @patch('fetch_youtube_data.requests.get')
+    def test_details_error_returns_empty(self, mock_get):
+        """Test that a failed details request is reported like a failed fetch"""
+        import requests
+        mock_get.side_effect = [self.feed_response(), requests.RequestException("quota exceeded")]
+        
+        with patch('builtins.print'):
+            self.assertEqual(self.fetcher.get_channel_updates('UCtest123', self.known), [])
+    
+    def test_falls_back_to_full_refresh(self):
+        """Test that missing known data, a due refresh or an unreadable feed use the full API path"""
+        import requests
+        full = {'channel_title': 'Test Channel', 'channel_id': 'UCtest123', 'videos': []}
+        with patch.object(self.fetcher, 'get_channel_videos', return_value=full) as mock_full, \
+                patch('builtins.print'):
+            self.assertEqual(self.fetcher.get_channel_updates('UCtest123', None), full)
+            
+            self.fetcher.feed_cache.set('UCtest123', {'full_fetch_at': '2020-01-01T00:00:00+00:00'})
+            self.fetcher.get_channel_updates('UCtest123', self.known)
+            
+            with patch('fetch_youtube_data.requests.get', side_effect=requests.ConnectionError("down")):
+                self.fetcher.get_channel_updates('UCtest123', self.known)
+            with patch('fetch_youtube_data.requests.get', return_value=self.feed_response(body=b'<feed')):
+                self.fetcher.get_channel_updates('UCtest123', self.known)
+        
+        self.assertEqual(mock_full.call_count, 4)
+        self.assertNotEqual(self.fetcher.feed_cache.get('UCtest123')['full_fetch_at'], '2020-01-01T00:00:00+00:00')
+    
+    def test_fetch_channels_uses_fast_path_when_enabled(self):
+        """Test that fetch_channels reads the feed with the last written data"""
+        config = {'channels': [{'channel_id': 'UCtest123', 'name': 'Test Channel'}],
+                  'rss_fast_path': {'full_refresh_hours': 6}}
+        fetch_youtube_data.last_known_good.save(Path('data') / 'youtube' / 'UCtest123.json', self.known)
+        
+        with patch('builtins.print'), \
+                patch.object(YouTubeFetcher, 'get_channel_updates', return_value=self.known) as mock_updates:
+            fetch_youtube_data.fetch_channels(self.fetcher, config)
+        
+        mock_updates.assert_called_once()
+        self.assertEqual(mock_updates.call_args.args[1]['videos'], self.known['videos'])
+        self.assertEqual(mock_updates.call_args.kwargs, {'full_refresh_hours': 6})
+        self.assertEqual(self.fetcher.feed_cache.path, Path(fetch_youtube_data.FEED_CACHE_FILE))
+
+
+class TestLiveRefresh(TestYouTubeFetcher):
+    """Test refreshing live streams and merging single videos."""
+    
+    def setUp(self):
+        super().setUp()
+        self.known = {
+            'channel_title': 'Test Channel',
+            'channel_id': 'UCtest123',
+            'videos': [
+                {'id': 'video2', 'title': 'Upcoming', 'published_at': '2023-01-03T12:00:00Z',
+                 'is_live_stream': True, 'live_status': 'upcoming'},
+                {'id': 'video1', 'title': 'Old', 'published_at': '2023-01-01T12:00:00Z',
+                 'is_live_stream': False, 'live_status': None}
+            ]
+        }
+        Path('data/youtube').mkdir(parents=True)
+        with open('data/youtube/UCtest123.json', 'w') as f:
+            json.dump(self.known, f)
+    
+    def read_videos(self):
+        with open('data/youtube/UCtest123.json') as f:
+            return {v['id']: v.get('live_status') for v in json.load(f)['videos']}
+    
+    def test_refresh_live_streams_only_looks_up_live_videos(self):
+        """Test that only live and upcoming streams are requested, and idle channels cost nothing"""
+        config = {'channels': [{'channel_id': 'UCtest123', 'name': 'Test Channel'},
+                               {'channel_id': 'UCnodata', 'name': 'No Data'}]}
+        live = dict(self.known['videos'][0], live_status='live')
+        
+        with patch('builtins.print'), \
+                patch.object(self.fetcher, 'get_video_details', return_value=[live]) as mock_details:
+            self.assertEqual(self.fetcher.refresh_live(config), {'items': 1})
+        
+        mock_details.assert_called_once_with('UCtest123', ['video2'])
+        self.assertEqual(self.read_videos(), {'video2': 'live', 'video1': None})
+        self.assertTrue(Path('content/youtube/test-channel/_index.md').exists())
+    
+    def test_update_videos_handles_failures(self):
+        """Test that missing data or API errors leave the data file alone"""
+        import requests
+        with patch('builtins.print') as mock_print:
+            self.assertFalse(self.fetcher.update_videos('UCother', 'other', ['x']))
+            self.assertIn('run a full fetch first', mock_print.call_args[0][0])
+            with patch.object(self.fetcher, 'get_video_details', side_effect=requests.HTTPError("403")):
+                self.assertFalse(self.fetcher.update_videos('UCtest123', 'test-channel', ['video2']))
+            with patch.object(self.fetcher, 'get_video_details', side_effect=KeyError('items')):
+                self.assertFalse(self.fetcher.update_videos('UCtest123', 'test-channel', ['video2']))
+            self.assertTrue(self.fetcher.update_videos('UCtest123', 'test-channel', [], deleted_ids=['video1']))
+        
+        self.assertEqual(self.read_videos(), {'video2': 'upcoming'})
+    
+    def test_requests_use_the_shared_session(self):
+        """Test that a session set on the fetcher is used for API calls"""
+        self.fetcher.session = Mock()
+        self.fetcher.session.get.return_value.json.return_value = {'items': []}
+        
+        self.assertEqual(self.fetcher.get_video_details('UCtest123', ['video1']), [])
+        self.fetcher.session.get.assert_called_once()
+        self.assertEqual(self.fetcher.session.get.call_args.kwargs['timeout'], fetch_youtube_data.REQUEST_TIMEOUT)
+
+
+class FakePlaylistApi:
+    """Stand-in for YouTubeFetcher.api_get serving a channel's uploads and two playlists, a page at a time."""
+    
+    PLAYLIST_PAGES = [[{'id': 'PL1', 'title': 'Series'}], [{'id': 'PL2', 'title': 'Favourites'}]]
+    ITEMS = {'PL1': [['up1', 'other1'], ['other2', 'up1']], 'PL2': [['other1', 'up2', 'private1']],
+             'UUtest': [['up2', 'up1']]}
+    
+    def __init__(self):
+        self.calls = []
+    
+    def page(self, pages, params, items):
+        number = int(params.get('pageToken', '0'))
+        page = {'items': items(pages[number])}
+        if number + 1 < len(pages):
+            page['nextPageToken'] = str(number + 1)
+        return page
+    
+    def __call__(self, endpoint, params, source=None):
+        self.calls.append((endpoint, dict(params)))
+        if endpoint == 'channels':
+            return {'items': [{'contentDetails': {'relatedPlaylists': {'uploads': 'UUtest'}},
+                               'snippet': {'title': 'Test Channel'}}]}
+        if endpoint == 'playlists':
+            return self.page(self.PLAYLIST_PAGES, params, lambda playlists: [{
+                'id': playlist['id'],
+                'snippet': {'title': playlist['title'], 'description': f"About {playlist['title']}",
+                            'publishedAt': '2023-01-01T00:00:00Z',
+                            'thumbnails': {'default': {'url': f"https://i.ytimg.com/{playlist['id']}.jpg"}}}
+            } for playlist in playlists])
+        if endpoint == 'playlistItems':
+            return self.page(self.ITEMS[params['playlistId']], params, lambda ids: [
+                {'contentDetails': {'videoId': video_id}, 'snippet': {'resourceId': {'videoId': video_id}}}
+                for video_id in ids
+            ])
+        return {'items': [{
+            'id': video_id,
+            'snippet': {'title': f"Video {video_id}", 'description': '', 'publishedAt': '2023-01-02T00:00:00Z',
+                        'thumbnails': {'high': {'url': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"}}}
+        } for video_id in params['id'].split(',') if not video_id.startswith('private')]}
+    
+    def requested_videos(self):
+        return [video_id for endpoint, params in self.calls if endpoint == 'videos'
+                for video_id in params['id'].split(',')]
+
+
+class TestPlaylists(TestYouTubeFetcher):
+    """Test fetching playlists through the shared video cache."""
+    
+    def read_playlists(self):
+        with open('data/youtube_playlists/UCtest123.json') as f:
+            return json.load(f)
+    
+    def test_fetch_channels_looks_up_each_video_once(self):
+        """Test that uploads and playlists share one lookup per video and playlists reference IDs"""
+        api = FakePlaylistApi()
+        config = {'channels': [{'channel_id': 'UCtest123', 'name': 'Test Channel'}],
+                  'playlists': {'max_workers': 2}}
+        
+        with patch.object(self.fetcher, 'api_get', api), patch('builtins.print'):
+            fetch_youtube_data.fetch_channels(self.fetcher, config)
+        
+        requested = api.requested_videos()
+        self.assertEqual(sorted(requested), ['other1', 'other2', 'private1', 'up1', 'up2'])
+        self.assertEqual([endpoint for endpoint, _ in api.calls].count('playlists'), 2)
+        self.assertIsNone(self.fetcher.video_cache)
+        
+        data = self.read_playlists()
+        self.assertEqual([(p['id'], p['video_ids']) for p in data['playlists']],
+                         [('PL1', ['up1', 'other1', 'other2']), ('PL2', ['other1', 'up2'])])
+        self.assertEqual(data['playlists'][0]['url'], 'https://www.youtube.com/playlist?list=PL1')
+        self.assertEqual(data['playlists'][0]['thumbnail'], 'https://i.ytimg.com/PL1.jpg')
+        # Uploads stay in the channel data file only
+        self.assertEqual(sorted(data['videos']), ['other1', 'other2'])
+    
+    def test_limits_and_batches(self):
+        """Test max_playlists/max_videos and that lookups are split into batches of 50"""
+        api = FakePlaylistApi()
+        api.ITEMS = dict(api.ITEMS, PL1=[[f"v{n}" for n in range(50)], [f"v{n}" for n in range(50, 100)]])
+        
+        with patch.object(self.fetcher, 'api_get', api):
+            result = self.fetcher.get_channel_playlists('UCtest123', max_playlists=1, max_videos=60)
+        
+        self.assertEqual([p['id'] for p in result['playlists']], ['PL1'])
+        self.assertEqual(len(result['playlists'][0]['video_ids']), 60)
+        self.assertEqual([len(params['id'].split(',')) for endpoint, params in api.calls if endpoint == 'videos'],
+                         [50, 10])
+    
+    def test_video_cache_answers_repeated_lookups(self):
+        """Test that a cached video, or one the API did not return, is not requested again"""
+        api = FakePlaylistApi()
+        self.fetcher.video_cache = {}
+        
+        with patch.object(self.fetcher, 'api_get', api):
+            first = self.fetcher.get_video_details('UCtest123', ['up1', 'private1', 'up1'])
+            second = self.fetcher.get_video_details('UCtest123', ['private1', 'up2', 'up1'])
+        
+        self.assertEqual([v['id'] for v in first], ['up1'])
+        self.assertEqual([v['id'] for v in second], ['up2', 'up1'])
+        self.assertEqual(api.requested_videos(), ['up1', 'private1', 'up2'])
+    
+    def test_failed_playlist_fetch_keeps_previous_file(self):
+        """Test that API errors are reported and the previous playlists stay"""
+        import requests
+        Path('data/youtube_playlists').mkdir(parents=True)
+        Path('data/youtube_playlists/UCtest123.json').write_text('{"playlists": []}')
+        self.fetcher.video_cache = {}
+        
+        with patch('builtins.print') as mock_print:
+            for error in (requests.HTTPError("403"), KeyError('items')):
+                with patch.object(self.fetcher, 'get_channel_playlists', side_effect=error):
+                    self.assertIsNone(fetch_youtube_data.fetch_playlists(self.fetcher, 'UCtest123', [], {}))
+        
+        self.assertIn('Unexpected API response structure', mock_print.call_args[0][0])
+        self.assertEqual(self.read_playlists(), {'playlists': []})
+    
+    def test_playlist_settings(self):
+        """Test reading the optional playlists section"""
+        self.assertIsNone(fetch_youtube_data.playlist_settings({}))
+        self.assertEqual(fetch_youtube_data.playlist_settings({'playlists': True}), {})
+        self.assertEqual(fetch_youtube_data.playlist_settings({'playlists': {'max_videos': 10, 'other': 1}}),
+                         {'max_videos': 10})
+
+
+class TestVideoEnrichment(TestYouTubeFetcher):
+    """Test durations, Shorts and view counts on video records."""
+    
+    def videos_response(self, *items):
+        return {'items': [dict({
+            'id': video_id,
+            'snippet': {'title': title, 'description': '', 'publishedAt': '2023-01-02T00:00:00Z',
+                        'thumbnails': {'high': {'url': 'https://example.com/thumb.jpg'}}},
+            'contentDetails': {'duration': duration},
+            'statistics': {'viewCount': '1200', 'likeCount': '30', 'commentCount': '4'}
+        }, **extra) for video_id, title, duration, extra in items]}
+    
+    def test_parse_duration(self):
+        """Test ISO-8601 durations as the Data API returns them"""
+        parse = fetch_youtube_data.parse_duration
+        self.assertEqual(parse('PT45S'), 45)
+        self.assertEqual(parse('PT1H2M3S'), 3723)
+        self.assertEqual(parse('PT10M'), 600)
+        self.assertEqual(parse('P1DT1S'), 86401)
+        self.assertEqual(parse('P1W'), 604800)
+        self.assertEqual(parse('P0D'), 0)
+        for value in (None, '', 'P', '1:00', 'PT1.5S'):
+            self.assertIsNone(parse(value))
+    
+    def test_video_details_include_statistics_and_shorts(self):
+        """Test that the same videos.list call returns counts and durations, and Shorts are classified"""
+        response = self.videos_response(
+            ('short', 'Quick tip', 'PT45S', {}),
+            ('tagged', 'Landing #Shorts', 'PT2M30S', {}),
+            ('long', 'Full flight', 'PT2M30S', {'statistics': {'viewCount': '7'}}),
+            ('live', 'Stream', 'P0D', {'liveStreamingDetails': {'actualStartTime': '2023-01-02T00:00:00Z'}})
+        )
+        with patch.object(self.fetcher, 'api_get', return_value=response) as mock_api:
+            videos = {video['id']: video for video in self.fetcher.get_video_details('UCtest123', list(response))}
+        
+        self.assertEqual(mock_api.call_args[0][1]['part'], 'snippet,liveStreamingDetails,statistics,contentDetails')
+        self.assertEqual({video_id: video['is_short'] for video_id, video in videos.items()},
+                         {'short': True, 'tagged': True, 'long': False, 'live': False})
+        self.assertEqual(videos['short']['duration_seconds'], 45)
+        self.assertEqual((videos['short']['view_count'], videos['short']['like_count']), (1200, 30))
+        # Hidden counts are None
+        self.assertEqual((videos['long']['view_count'], videos['long']['like_count']), (7, None))
+        self.assertIsNotNone(videos['long']['statistics_updated_at'])
+    
+    def test_refresh_statistics_only_touches_old_counts(self):
+        """Test that only videos with stale or missing counts are looked up, statistics part only"""
+        fresh = datetime.now(timezone.utc).isoformat()
+        old = (datetime.now(timezone.utc) - timedelta(hours=30)).isoformat()
+        videos = [
+            {'id': 'fresh', 'view_count': 5, 'statistics_updated_at': fresh, 'duration_seconds': 10},
+            {'id': 'old', 'view_count': 5, 'statistics_updated_at': old, 'duration_seconds': 600},
+            {'id': 'gone', 'view_count': 5, 'statistics_updated_at': old, 'duration_seconds': 600}
+        ]
+        response = {'items': [{'id': 'old', 'statistics': {'viewCount': '50'}}]}
+        
+        with patch.object(self.fetcher, 'api_get', return_value=response) as mock_api, patch('builtins.print'):
+            self.assertEqual(self.fetcher.refresh_statistics('UCtest123', videos), 1)
+        
+        mock_api.assert_called_once_with('videos', {'part': 'statistics', 'id': 'old,gone', 'key': self.api_key},
+                                         'UCtest123')
+        self.assertEqual([video['view_count'] for video in videos], [5, 50, 5])
+        
+        # Records from before durations were kept also get their contentDetails
+        legacy = [{'id': 'legacy', 'title': 'Clip', 'is_live_stream': False}]
+        response = {'items': [{'id': 'legacy', 'statistics': {'viewCount': '3'},
+                               'contentDetails': {'duration': 'PT30S'}}]}
+        with patch.object(self.fetcher, 'api_get', return_value=response) as mock_api, patch('builtins.print'):
+            self.fetcher.refresh_statistics('UCtest123', legacy)
+        self.assertEqual(mock_api.call_args[0][1]['part'], 'statistics,contentDetails')
+        self.assertEqual((legacy[0]['duration_seconds'], legacy[0]['is_short'], legacy[0]['view_count']),
+                         (30, True, 3))
+    
+    def test_refresh_statistics_errors_keep_counts(self):
+        """Test that API errors are reported and leave the counts alone"""
+        import requests
+        videos = [{'id': 'old', 'view_count': 5, 'duration_seconds': 600}]
+        with patch('builtins.print') as mock_print:
+            for error in (requests.HTTPError("403"), KeyError('items')):
+                with patch.object(self.fetcher, 'api_get', side_effect=error):
+                    self.assertEqual(self.fetcher.refresh_statistics('UCtest123', videos), 0)
+        self.assertIn('Unexpected API response structure', mock_print.call_args[0][0])
+        self.assertEqual(videos[0]['view_count'], 5)
+    
+    def test_identical_refetch_reports_no_changes(self):
+        """Test that refreshed statistics timestamps alone do not show up in the change feed"""
+        response = self.videos_response(('video1', 'Clip', 'PT45S', {}))
+        channel = {'items': [{'contentDetails': {'relatedPlaylists': {'uploads': 'UUtest'}},
+                              'snippet': {'title': 'Test Channel'}}]}
+        playlist = {'items': [{'snippet': {'resourceId': {'videoId': 'video1'}}}]}
+        config = {'channels': [{'channel_id': 'UCtest123', 'name': 'Test Channel'}]}
+
+        def api_get(endpoint, params, source=None):
+            return {'channels': channel, 'playlistItems': playlist, 'videos': response}[endpoint]
+
+        changes = fetch_youtube_data.changes
+        with patch.object(self.fetcher, 'api_get', side_effect=api_get), patch('builtins.print'):
+            fetch_youtube_data.fetch_channels(self.fetcher, config)
+            changes.start()
+            try:
+                fetch_youtube_data.fetch_channels(self.fetcher, config)
+                self.assertEqual(changes.summary()['videos'], {'added': 0, 'updated': 0, 'removed': 0})
+            finally:
+                changes.active = False
+    
+    def test_cancelled_fetch_writes_nothing(self):
+        """Test that a fetch cancelled by the orchestrator stops before the next channel"""
+        config = {'channels': [{'channel_id': 'UCtest123', 'name': 'Test Channel'}]}
+        self.fetcher.cancel()
+        
+        with patch.object(self.fetcher, 'get_channel_videos') as mock_videos, patch('builtins.print'):
+            self.assertEqual(fetch_youtube_data.fetch_channels(self.fetcher, config)['channels'], 0)
+            self.fetcher.generate_hugo_content({'channel_title': 'T', 'channel_id': 'UCtest123',
+                                                'videos': [{'id': 'v'}]}, 'content', 'test-channel')
+        
+        mock_videos.assert_not_called()
+        self.assertFalse(Path('data/youtube/UCtest123.json').exists())
+    
+    def test_fetch_channels_refreshes_statistics(self):
+        """Test that fetch_channels refreshes counts at the configured cadence"""
+        channel_data = {'channel_title': 'Test Channel', 'channel_id': 'UCtest123',
+                        'videos': [{'id': 'video1', 'title': 'Old', 'published_at': '2023-01-01T12:00:00Z'}]}
+        config = {'channels': [{'channel_id': 'UCtest123', 'name': 'Test Channel'}], 'statistics_refresh_hours': 6}
+        
+        with patch.object(self.fetcher, 'get_channel_videos', return_value=channel_data), \
+                patch.object(self.fetcher, 'refresh_statistics') as mock_refresh, patch('builtins.print'):
+            fetch_youtube_data.fetch_channels(self.fetcher, config)
+        
+        mock_refresh.assert_called_once_with('UCtest123', channel_data['videos'], 6)
+
+
 class TestUtilityFunctions(unittest.TestCase):
     """Test utility functions."""
     
@@ -551,7 +1028,9 @@ class TestMainFunction(unittest.TestCase):
     @patch('yaml.safe_load')
     @patch('builtins.open')
     @patch('pathlib.Path.exists')
-    def test_main_function_workflow(self, mock_exists, mock_open, mock_yaml_load, mock_fetcher_class):
+    @patch('listing_indexes.write_indexes')
+    @patch('search_index.update_index')
+    def test_main_function_workflow(self, mock_update_search, mock_write_indexes, mock_exists, mock_open, mock_yaml_load, mock_fetcher_class):
         """Test main function successful workflow"""
         # Mock file operations
         mock_exists.return_value = True
@@ -563,7 +1042,7 @@ class TestMainFunction(unittest.TestCase):
         }
         
         # Mock fetcher
-        mock_fetcher = Mock()
+        mock_fetcher = Mock(cancelled=False)
         mock_channel_data = {
             'channel_title': 'Test Channel',
             'channel_id': 'UCtest123',
@@ -587,6 +1066,47 @@ class TestMainFunction(unittest.TestCase):
         
         # Verify content generation was called
         assert mock_fetcher.generate_hugo_content.call_count == 2
+        mock_write_indexes.assert_called_once_with()
+        mock_update_search.assert_called_once()
+
+    
+    def test_failed_channel_falls_back_to_last_known_good(self):
+        """Test that a failing channel keeps its last good data, marked stale"""
+        fetcher = YouTubeFetcher('test-api-key')
+        config = {'channels': [{'channel_id': 'UCtest123', 'name': 'Test Channel'}]}
+        channel_data = {
+            'channel_title': 'Test Channel',
+            'channel_id': 'UCtest123',
+            'videos': [{'id': 'video1', 'title': 'Test Video'}]
+        }
+        
+        with patch('builtins.print'):
+            with patch.object(fetcher, 'get_channel_videos', return_value=channel_data):
+                fetch_youtube_data.fetch_channels(fetcher, config)
+            with patch.object(fetcher, 'get_channel_videos', return_value=[]):
+                summary = fetch_youtube_data.fetch_channels(fetcher, config)
+        
+        self.assertEqual(summary['stale'], ['UCtest123'])
+        with open(Path('data') / 'youtube' / 'UCtest123.json') as f:
+            data = json.load(f)
+        self.assertTrue(data['stale'])
+        self.assertEqual(data['videos'], channel_data['videos'])
+        self.assertIn('fetched_at', data)
+    
+    def test_open_circuit_skips_channel(self):
+        """Test that a channel with repeated failures is not requested"""
+        fetcher = YouTubeFetcher('test-api-key')
+        config = {
+            'channels': [{'channel_id': 'UCtest123', 'name': 'Test Channel'}],
+            'circuit_breaker': {'failure_threshold': 1}
+        }
+        
+        with patch('builtins.print'), patch.object(fetcher, 'get_channel_videos', return_value=[]) as mock_get:
+            fetch_youtube_data.fetch_channels(fetcher, config)
+            summary = fetch_youtube_data.fetch_channels(fetcher, config)
+        
+        mock_get.assert_called_once_with('UCtest123')
+        self.assertEqual(summary['channels'], 0)
 
 
 if __name__ == '__main__':
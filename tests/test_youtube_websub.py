@@ -0,0 +1,394 @@
+"""Tests for the YouTube WebSub receiver"""
+
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import Mock, patch
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import fetch_youtube_data
+import youtube_websub
+from fetch_youtube_data import YouTubeFetcher
+from youtube_websub import WebSubReceiver, parse_notification, topic_url, verify_signature
+
+SECRET = 'hub-secret'
+NOTIFICATION = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+  <link rel="hub" href="https://pubsubhubbub.appspot.com"/>
+  <link rel="self" href="https://www.youtube.com/xml/feeds/videos.xml?channel_id=UC1"/>
+  <title>YouTube video feed</title>
+  <entry>
+    <id>yt:video:v3</id>
+    <yt:videoId>v3</yt:videoId>
+    <yt:channelId>UC1</yt:channelId>
+    <title>Brand new video</title>
+  </entry>
+</feed>
+"""
+DELETION = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:at="http://purl.org/atompub/tombstones/1.0" xmlns="http://www.w3.org/2005/Atom">
+  <at:deleted-entry ref="yt:video:v1" when="2025-03-01T00:00:00+00:00">
+    <link href="https://www.youtube.com/watch?v=v1"/>
+    <at:by>
+      <name>Channel One</name>
+      <uri>https://www.youtube.com/channel/UC1</uri>
+    </at:by>
+  </at:deleted-entry>
+</feed>
+"""
+
+
+def video(video_id, published_at, **extra):
+    return dict({
+        'id': video_id,
+        'title': f"Video {video_id}",
+        'description': '',
+        'published_at': published_at,
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'is_live_stream': False,
+        'live_status': None
+    }, **extra)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the hub")
+        time.sleep(0.01)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class LocalHub:
+    """Local WebSub hub stand-in that verifies intent asynchronously and signs what it publishes"""
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.requests = []
+        hub = self
+
+        class HubHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                form = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+                hub.requests.append(form)
+                self.send_response(202)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                threading.Thread(target=hub.verify, args=(form,), daemon=True).start()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), HubHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/subscribe"
+
+    def verify(self, form):
+        challenge = secrets.token_hex(8)
+        response = requests.get(form['hub.callback'], params={
+            'hub.mode': form['hub.mode'],
+            'hub.topic': form['hub.topic'],
+            'hub.challenge': challenge,
+            'hub.lease_seconds': form.get('hub.lease_seconds', '')
+        }, timeout=5)
+        if response.status_code != 200 or response.text != challenge:
+            return
+        if form['hub.mode'] == 'subscribe':
+            self.subscriptions[form['hub.topic']] = (form['hub.callback'], form.get('hub.secret'))
+        else:
+            self.subscriptions.pop(form['hub.topic'], None)
+
+    def publish(self, topic, body, secret=None):
+        callback, subscription_secret = self.subscriptions[topic]
+        headers = {'Content-Type': 'application/atom+xml'}
+        key = secret or subscription_secret
+        if key:
+            headers['X-Hub-Signature'] = 'sha1=' + hmac.new(key.encode(), body, hashlib.sha1).hexdigest()
+        return requests.post(callback, data=body, headers=headers, timeout=5)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestWebSubReceiver:
+    """Test cases for WebSubReceiver"""
+
+    def setup_method(self):
+        """Set up test environment with temporary directory"""
+        self.original_cwd = os.getcwd()
+        self.test_dir = tempfile.mkdtemp()
+        os.chdir(self.test_dir)
+        self.fetcher = YouTubeFetcher('test_api_key')
+        self.known = {
+            'channel_title': 'Channel One',
+            'channel_id': 'UC1',
+            'videos': [video('v2', '2025-02-01T00:00:00Z'), video('v1', '2025-01-01T00:00:00Z')]
+        }
+        Path('data/youtube').mkdir(parents=True)
+        with open('data/youtube/UC1.json', 'w') as f:
+            json.dump(self.known, f)
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def make_receiver(self, **kwargs):
+        kwargs.setdefault('debounce_seconds', 0)
+        kwargs.setdefault('idle_timeout', 0.05)
+        kwargs.setdefault('host', '127.0.0.1')
+        return WebSubReceiver(self.fetcher, {'UC1': 'channel-one', 'UC2': 'channel-two'},
+                              'http://127.0.0.1/websub', **kwargs)
+
+    def read_videos(self):
+        with open('data/youtube/UC1.json') as f:
+            return [v['id'] for v in json.load(f)['videos']]
+
+    def test_verify_signature(self):
+        """Test HMAC signatures in the hub's 'method=hexdigest' form"""
+        body = b'<feed/>'
+        digest = hmac.new(SECRET.encode(), body, hashlib.sha1).hexdigest()
+        assert verify_signature(SECRET, body, f'sha1={digest}')
+        assert verify_signature(SECRET, body,
+                                'sha256=' + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest())
+        assert not verify_signature(SECRET, body + b' ', f'sha1={digest}')
+        assert not verify_signature('other', body, f'sha1={digest}')
+        assert not verify_signature(SECRET, body, f'md5={digest}')
+        assert not verify_signature(SECRET, body, None)
+
+    def test_parse_notification(self):
+        """Test that entries and tombstones are read with their channel"""
+        assert parse_notification(NOTIFICATION) == ([('UC1', 'v3')], [])
+        assert parse_notification(DELETION) == ([], [('UC1', 'v1')])
+
+    def test_end_to_end_with_local_hub(self):
+        """Test subscribing through a hub, then receiving signed notifications over HTTP"""
+        rebuilds = []
+        port = free_port()
+        new_video = video('v3', '2025-03-01T00:00:00Z')
+
+        with LocalHub() as hub, patch('builtins.print'), \
+                patch.object(self.fetcher, 'get_video_details', return_value=[new_video]) as mock_details:
+            receiver = self.make_receiver(hub=hub.url, secret=SECRET, port=port,
+                                          on_rebuild=lambda: rebuilds.append(self.read_videos()))
+            receiver.callback_url = f"http://127.0.0.1:{port}/websub"
+            thread = threading.Thread(target=receiver.run, daemon=True)
+            thread.start()
+            try:
+                wait_for(lambda: len(hub.subscriptions) == 2)
+                wait_for(lambda: all('expires_at' in receiver.subscriptions.get(c, {}) for c in ('UC1', 'UC2')))
+                assert {form['hub.secret'] for form in hub.requests} == {SECRET}
+                assert hub.requests[0]['hub.lease_seconds'] == str(youtube_websub.LEASE_SECONDS)
+
+                response = hub.publish(topic_url('UC1'), NOTIFICATION)
+                assert response.status_code == 204
+                mock_details.assert_called_once_with('UC1', ['v3'])
+                assert self.read_videos() == ['v3', 'v2', 'v1']
+                assert Path('content/youtube/channel-one/_index.md').exists()
+                wait_for(lambda: rebuilds)
+
+                # Bad signatures are acknowledged but ignored
+                assert hub.publish(topic_url('UC1'), DELETION, secret='wrong').status_code == 204
+                assert self.read_videos() == ['v3', 'v2', 'v1']
+
+                hub.publish(topic_url('UC1'), DELETION)
+                assert self.read_videos() == ['v3', 'v2']
+                wait_for(lambda: len(rebuilds) == 2)
+            finally:
+                receiver.stop()
+                thread.join(timeout=5)
+
+        assert rebuilds == [['v3', 'v2', 'v1'], ['v3', 'v2']]
+        with open(youtube_websub.STATE_FILE) as f:
+            assert set(json.load(f)['subscriptions']) == {'UC1', 'UC2'}
+
+    def test_notification_with_store(self):
+        """Test that a notification handled on a server thread can write through a store opened here"""
+        port = free_port()
+        self.fetcher.store = fetch_youtube_data.local_store.LocalStore('.cache/store.sqlite3')
+        self.fetcher.store.upsert_channel(dict(self.known, channel_slug='channel-one'))
+        receiver = self.make_receiver(port=port)
+
+        with patch('builtins.print'), \
+                patch.object(self.fetcher, 'get_video_details', return_value=[video('v3', '2025-03-01T00:00:00Z')]):
+            receiver.start()
+            try:
+                response = requests.post(f"http://127.0.0.1:{port}/websub", data=NOTIFICATION,
+                                         headers={'Content-Type': 'application/atom+xml'}, timeout=5)
+            finally:
+                receiver.server.shutdown()
+                receiver.server.server_close()
+
+        assert response.status_code == 204
+        assert self.read_videos() == ['v3', 'v2', 'v1']
+        assert [v['id'] for v in self.fetcher.store.channel_data('UC1')['videos']] == ['v3', 'v2', 'v1']
+        self.fetcher.store.close()
+
+    def test_due_requests(self):
+        """Test that only unverified, pending-too-long or expiring leases are renewed"""
+        now = datetime.now(timezone.utc)
+        receiver = self.make_receiver()
+        receiver.channels = {'UC1': 'one', 'UC2': 'two', 'UC3': 'three', 'UC4': 'four', 'UC5': 'five'}
+        receiver.subscriptions = {
+            'UC1': {'expires_at': (now + timedelta(days=3)).isoformat()},
+            'UC2': {'expires_at': (now + timedelta(hours=1)).isoformat()},
+            'UC3': {'requested_at': (now - timedelta(minutes=1)).isoformat()},
+            'UC4': {'requested_at': (now - timedelta(hours=1)).isoformat()},
+            'UCold': {'expires_at': (now + timedelta(days=3)).isoformat()}
+        }
+
+        assert receiver.due_requests(now) == [('UC2', 'subscribe'), ('UC4', 'subscribe'),
+                                              ('UC5', 'subscribe'), ('UCold', 'unsubscribe')]
+
+    def test_renew_records_requests(self):
+        """Test that accepted requests are recorded and failed ones retried next time"""
+        receiver = self.make_receiver()
+        receiver.subscriptions = {'UCold': {'expires_at': '2030-01-01T00:00:00+00:00'}}
+        responses = {'UC1': Mock(status_code=202), 'UC2': requests.ConnectionError("hub down"),
+                     'UCold': Mock(status_code=202)}
+
+        def post(url, data, timeout):
+            response = responses[parse_qs(data['hub.topic'].split('?')[1])['channel_id'][0]]
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        with patch('youtube_websub.requests.post', side_effect=post) as mock_post, patch('builtins.print'):
+            receiver.renew()
+
+        assert 'hub.secret' not in mock_post.call_args_list[0].kwargs['data']
+        assert mock_post.call_args_list[2].kwargs['data']['hub.mode'] == 'unsubscribe'
+        assert set(receiver.subscriptions) == {'UC1'}
+        assert 'requested_at' in receiver.subscriptions['UC1']
+        assert receiver.load_state() == receiver.subscriptions
+
+    def test_verify_intent(self):
+        """Test which verification requests are confirmed"""
+        receiver = self.make_receiver()
+        receiver.subscriptions = {'UC1': {'requested_at': '2025-01-01T00:00:00+00:00'},
+                                  'UCold': {'expires_at': '2030-01-01T00:00:00+00:00'}}
+
+        def verify(mode, topic, challenge='abc', **extra):
+            return receiver.verify_intent(dict({'hub.mode': mode, 'hub.topic': topic, 'hub.challenge': challenge},
+                                               **extra))
+
+        with patch('builtins.print'):
+            assert verify('subscribe', 'https://example.com/feed') == (404, '')
+            assert verify('subscribe', topic_url('UCnotconfigured')) == (404, '')
+            assert verify('subscribe', topic_url('UC1'), challenge=None) == (404, '')
+            assert verify('unsubscribe', topic_url('UC1')) == (404, '')
+            assert verify('subscribe', topic_url('UC1'), **{'hub.lease_seconds': '3600'}) == (200, 'abc')
+            assert verify('unsubscribe', topic_url('UCold')) == (200, 'abc')
+            assert verify('denied', topic_url('UC2'), **{'hub.reason': 'nope'}) == (200, '')
+
+        expires_at = datetime.fromisoformat(receiver.subscriptions['UC1']['expires_at'])
+        assert timedelta(minutes=59) < expires_at - datetime.now(timezone.utc) <= timedelta(hours=1)
+        assert set(receiver.load_state()) == {'UC1'}
+
+    def test_ignored_notifications(self):
+        """Test that malformed, unknown-channel and failed notifications leave the data alone"""
+        receiver = self.make_receiver()
+        other_channel = NOTIFICATION.replace(b'<yt:channelId>UC1', b'<yt:channelId>UC9')
+
+        with patch('builtins.print') as mock_print, \
+                patch.object(self.fetcher, 'get_video_details', side_effect=requests.HTTPError("403")):
+            assert receiver.handle_notification(b'<feed', None) is False
+            assert 'malformed' in mock_print.call_args[0][0]
+            assert receiver.handle_notification(other_channel, None) is False
+            assert 'unconfigured channel UC9' in mock_print.call_args[0][0]
+            assert receiver.handle_notification(NOTIFICATION, None) is False
+            assert 'Error fetching videos' in mock_print.call_args[0][0]
+            assert receiver.handle_notification(NOTIFICATION.replace(b'UC1', b'UC2'), None) is False
+            assert 'run a full fetch first' in mock_print.call_args[0][0]
+
+        assert self.read_videos() == ['v2', 'v1']
+        assert receiver.rebuild_due_at is None
+
+    def test_removed_notified_video(self):
+        """Test that a notified video the API no longer returns is dropped"""
+        receiver = self.make_receiver(max_results=1)
+        with patch('builtins.print'), patch.object(self.fetcher, 'get_video_details', return_value=[]):
+            assert receiver.handle_notification(NOTIFICATION.replace(b'v3', b'v2'), None) is True
+        assert self.read_videos() == ['v1']
+
+    @patch('builtins.print')
+    @patch('youtube_websub.WebSubReceiver')
+    @patch('yaml.safe_load')
+    @patch('builtins.open')
+    @patch('pathlib.Path.exists')
+    @patch('listing_indexes.write_indexes')
+    @patch('search_index.update_index')
+    def test_main_subscribe_mode(self, mock_update_search, mock_write_indexes, mock_exists, mock_open,
+                                 mock_yaml_load, mock_receiver_class, mock_print):
+        """Test that --subscribe starts the receiver for the configured channels"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {
+            'channels': [{'channel_id': 'UC1', 'name': 'Channel One'}],
+            'websub': {'callback_url': 'https://example.com/websub', 'port': 9000,
+                       'rebuild_command': 'hugo --minify'}
+        }
+
+        with patch.dict(os.environ, {'YOUTUBE_API_KEY': 'key', 'YOUTUBE_WEBSUB_SECRET': SECRET}), \
+                patch.object(fetch_youtube_data.signal, 'signal'), \
+                patch.object(YouTubeFetcher, 'get_channel_videos') as mock_fetch:
+            fetch_youtube_data.main(['--subscribe'])
+
+        args, kwargs = mock_receiver_class.call_args
+        assert args[1:] == ({'UC1': 'channel-one'}, 'https://example.com/websub')
+        assert kwargs['secret'] == SECRET
+        assert kwargs['port'] == 9000
+        assert kwargs['hub'] == youtube_websub.DEFAULT_HUB
+        mock_receiver_class.return_value.run.assert_called_once()
+        mock_fetch.assert_not_called()
+        mock_write_indexes.assert_not_called()
+
+        with patch.object(fetch_youtube_data.subprocess, 'run') as mock_run:
+            mock_run.return_value.returncode = 1
+            kwargs['on_rebuild']()
+        mock_run.assert_called_once_with(['hugo', '--minify'])
+        mock_write_indexes.assert_called_once_with()
+        mock_update_search.assert_called_once_with()
+        assert 'Rebuild exited with status 1' in mock_print.call_args[0][0]
+
+    @patch('builtins.print')
+    @patch('yaml.safe_load')
+    @patch('builtins.open')
+    @patch('pathlib.Path.exists')
+    def test_main_subscribe_requires_callback_url(self, mock_exists, mock_open, mock_yaml_load, mock_print):
+        """Test that --subscribe exits without a public callback URL"""
+        mock_exists.return_value = True
+        mock_yaml_load.return_value = {'channels': [{'channel_id': 'UC1', 'name': 'Channel One'}]}
+
+        with patch.dict(os.environ, {'YOUTUBE_API_KEY': 'key'}), pytest.raises(SystemExit):
+            fetch_youtube_data.main(['--subscribe'])
+        assert 'websub.callback_url' in mock_print.call_args[0][0]
@@ -0,0 +1,206 @@
+// Maison de Freyssinet Theme - Client-side search
+//
+// Queries the sharded index written by scripts/search_index.py. Only the
+// manifest, the term shards for the query's prefixes and the document shards
+// of the top results are fetched. tokenize() and stem() must match the Python
+// versions exactly.
+
+(function() {
+    const STOPWORDS = new Set((
+        'a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or our ' +
+        'she so that the their them then there these they this to us was we were what when which who will with you your'
+    ).split(' '));
+    const MIN_TOKEN_LENGTH = 2;
+    const MAX_RESULTS = 20;
+
+    function stem(word) {
+        const length = [...word].length;
+        if (word.endsWith('ies') && !word.endsWith('eies') && !word.endsWith('aies') && length > 4) {
+            word = word.slice(0, -3) + 'y';
+        } else if (word.endsWith('es') && !['aes', 'ees', 'oes'].some(s => word.endsWith(s)) && length > 3) {
+            word = word.slice(0, -1);
+        } else if (word.endsWith('s') && !word.endsWith('us') && !word.endsWith('ss') && length > 3) {
+            word = word.slice(0, -1);
+        }
+        for (const suffix of ['ing', 'ed']) {
+            if (word.endsWith(suffix) && [...word].length - suffix.length >= 3) {
+                return word.slice(0, -suffix.length);
+            }
+        }
+        return word;
+    }
+
+    function tokenize(text) {
+        const words = text.replace(/https?:\/\/\S+/g, ' ').toLowerCase().match(/[\p{L}\p{N}]+/gu) || [];
+        return words
+            .filter(word => [...word].length >= MIN_TOKEN_LENGTH && !STOPWORDS.has(word))
+            .map(stem);
+    }
+
+    function decodePostings(encoded) {
+        const postings = new Map();
+        let doc = 0;
+        for (let i = 0; i < encoded.length; i += 2) {
+            doc += encoded[i];
+            postings.set(doc, encoded[i + 1]);
+        }
+        return postings;
+    }
+
+    class SearchIndex {
+        constructor(baseUrl) {
+            this.baseUrl = baseUrl;
+            this.shards = new Map();
+            this.manifest = null;
+        }
+
+        fetchJson(path) {
+            return fetch(this.baseUrl + path).then(response => {
+                if (!response.ok) {
+                    throw new Error(`${path}: ${response.status}`);
+                }
+                return response.json();
+            });
+        }
+
+        load(path) {
+            if (!this.shards.has(path)) {
+                this.shards.set(path, this.fetchJson(path));
+            }
+            return this.shards.get(path);
+        }
+
+        async getManifest() {
+            if (!this.manifest) {
+                this.manifest = await this.fetchJson('manifest.json');
+            }
+            return this.manifest;
+        }
+
+        shardName(term, manifest) {
+            const prefix = term.slice(0, manifest.prefix_length);
+            return /^[a-z0-9]+$/.test(prefix) ? prefix : '_';
+        }
+
+        async termPostings(term, manifest, prefixMatch) {
+            const shard = this.shardName(term, manifest);
+            if (!manifest.shards.includes(shard)) {
+                return new Map();
+            }
+            const terms = await this.load(`terms/${shard}.json`);
+            const postings = new Map();
+            for (const [candidate, encoded] of Object.entries(terms)) {
+                if (candidate === term || (prefixMatch && candidate.startsWith(term))) {
+                    for (const [doc, weight] of decodePostings(encoded)) {
+                        postings.set(doc, Math.max(postings.get(doc) || 0, weight));
+                    }
+                }
+            }
+            return postings;
+        }
+
+        // Every term must match; the last one also matches as a prefix so results follow typing
+        async search(query) {
+            const terms = [...new Set(tokenize(query))];
+            if (!terms.length) {
+                return [];
+            }
+            const manifest = await this.getManifest();
+            const postingLists = await Promise.all(
+                terms.map((term, i) => this.termPostings(term, manifest, i === terms.length - 1))
+            );
+
+            let scores = null;
+            for (const postings of postingLists) {
+                const idf = Math.log(1 + manifest.documents / Math.max(postings.size, 1));
+                const next = new Map();
+                for (const [doc, weight] of postings) {
+                    if (scores === null || scores.has(doc)) {
+                        next.set(doc, (scores ? scores.get(doc) : 0) + weight * idf);
+                    }
+                }
+                scores = next;
+            }
+
+            const top = [...scores].sort((a, b) => b[1] - a[1]).slice(0, MAX_RESULTS);
+            return Promise.all(top.map(async ([doc]) => {
+                const docs = await this.load(`docs/${Math.floor(doc / manifest.doc_shard_size)}.json`);
+                const [type, title, url, date, source] = docs[doc];
+                return {type, title, url, date, source};
+            }));
+        }
+    }
+
+    function renderResults(container, results, query) {
+        container.replaceChildren();
+        if (!results.length) {
+            const empty = document.createElement('p');
+            empty.className = 'search-empty';
+            empty.textContent = `No videos or posts match "${query}".`;
+            container.appendChild(empty);
+            return;
+        }
+        const list = document.createElement('ol');
+        list.className = 'search-results-list';
+        for (const result of results) {
+            const item = document.createElement('li');
+            item.className = `search-result ${result.type}`;
+            const link = document.createElement('a');
+            link.href = result.url;
+            link.target = '_blank';
+            link.rel = 'noopener';
+            link.textContent = `${result.type === 'video' ? '📺' : '🦋'} ${result.title}`;
+            const meta = document.createElement('div');
+            meta.className = 'search-result-meta';
+            meta.textContent = [result.source, result.date].filter(Boolean).join(' · ');
+            item.append(link, meta);
+            list.appendChild(item);
+        }
+        container.appendChild(list);
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        const form = document.querySelector('[data-search-index]');
+        if (!form) {
+            return;
+        }
+        const input = form.querySelector('input[type="search"]');
+        const container = document.getElementById('search-results');
+        const index = new SearchIndex(form.dataset.searchIndex);
+        let pending = 0;
+
+        async function run() {
+            const query = input.value.trim();
+            const request = ++pending;
+            if (!query) {
+                container.replaceChildren();
+                return;
+            }
+            try {
+                const results = await index.search(query);
+                if (request === pending) {
+                    renderResults(container, results, query);
+                }
+            } catch (error) {
+                container.textContent = 'Search is not available right now.';
+                console.error('Search failed:', error);
+            }
+        }
+
+        let timer = null;
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(run, 150);
+        });
+        form.addEventListener('submit', function(e) {
+            e.preventDefault();
+            run();
+        });
+
+        const initial = new URLSearchParams(window.location.search).get('q');
+        if (initial) {
+            input.value = initial;
+            run();
+        }
+    });
+})();